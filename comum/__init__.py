@@ -0,0 +1 @@
+# Módulos compartilhados entre as páginas (acesso a dados, parsers, exportação).
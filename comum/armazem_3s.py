@@ -0,0 +1,120 @@
+import os
+import threading
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+from comum.armazenamento import diretorio_cache, escrever_atomico, ler_json, salvar_json
+from comum.db_3s import buscar_desconto_diario, buscar_meio_pagamento_diario, buscar_resumo_diario
+from comum.postgres import conexao_3s
+
+# Dias fechados já gravados não são buscados de novo, exceto os últimos
+# RECHECAR_DIAS antes da marca d'água (vendas sincronizadas com atraso pelas lojas).
+RECHECAR_DIAS = int(os.environ.get("MMR_3S_RECHECAR_DIAS", 3))
+
+# nome do conjunto -> função (conn, data_de, data_ate) que devolve agregados diários com coluna "data"
+CONJUNTOS = {
+    "resumo_diario": buscar_resumo_diario,
+    "meio_pagamento": buscar_meio_pagamento_diario,
+    "desconto": buscar_desconto_diario,
+}
+
+_locks = {nome: threading.Lock() for nome in CONJUNTOS}
+
+
+def _hoje_brasil():
+    return (datetime.utcnow() - timedelta(hours=3)).date()
+
+
+def _como_data(d):
+    return pd.Timestamp(d).date()
+
+
+def _arquivos(nome):
+    pasta = diretorio_cache("3s")
+    return os.path.join(pasta, f"{nome}.parquet"), os.path.join(pasta, f"{nome}.json")
+
+
+def _faixas_a_buscar(meta, data_de, data_ate, rechecar_dias):
+    """
+    Intervalos [de, até] a buscar no banco. O armazém cobre sempre um trecho
+    contínuo [inicio, marca_dagua]; as faixas estendem esse trecho sem deixar
+    buracos (um pedido longe da marca d'água busca também os dias entre eles).
+    """
+    if not meta:
+        return [(data_de, data_ate)]
+    inicio = date.fromisoformat(meta["inicio"])
+    marca = date.fromisoformat(meta["marca_dagua"])
+    faixas = []
+    if data_de < inicio:
+        faixas.append((data_de, inicio - timedelta(days=1)))
+    recheck = max(inicio, marca - timedelta(days=rechecar_dias - 1))
+    if data_ate >= recheck:
+        faixas.append((recheck, data_ate))
+    return faixas
+
+
+def carregar_3s(nome, data_de, data_ate, rechecar_dias=None):
+    """
+    Agregados diários do 3S (conjunto `nome` de CONJUNTOS) para [data_de, data_ate].
+
+    Os dias já fechados vêm do Parquet local em .cache/3s; no banco só se busca
+    o que falta: dias após a marca d'água (último business_dt completo gravado),
+    os `rechecar_dias` anteriores a ela e, se o período pedido começar antes do
+    armazém, o trecho inicial. O dia de hoje nunca avança a marca d'água.
+    """
+    rechecar_dias = RECHECAR_DIAS if rechecar_dias is None else max(int(rechecar_dias), 0)
+    data_de, data_ate = _como_data(data_de), _como_data(data_ate)
+    if data_de > data_ate:
+        data_de, data_ate = data_ate, data_de
+    arq_dados, arq_meta = _arquivos(nome)
+
+    with _locks[nome]:
+        meta = ler_json(arq_meta, {})
+        if meta and not os.path.exists(arq_dados):
+            meta = {}
+        df = pd.read_parquet(arq_dados) if meta else pd.DataFrame()
+
+        faixas = _faixas_a_buscar(meta, data_de, data_ate, rechecar_dias)
+        if faixas:
+            with conexao_3s() as conn:
+                novos = [CONJUNTOS[nome](conn, de, ate) for de, ate in faixas]
+            if not df.empty:
+                manter = pd.Series(True, index=df.index)
+                for de, ate in faixas:
+                    manter &= ~df["data"].between(pd.Timestamp(de), pd.Timestamp(ate))
+                df = df[manter]
+            df = pd.concat([df] + [n for n in novos if not n.empty], ignore_index=True)
+            if df.empty:
+                df = novos[0]  # nada no período: guarda ao menos as colunas
+            df = df.sort_values("data", kind="stable").reset_index(drop=True)
+
+            ontem = _hoje_brasil() - timedelta(days=1)
+            inicio = min([data_de] + ([date.fromisoformat(meta["inicio"])] if meta else []))
+            marca_antiga = date.fromisoformat(meta["marca_dagua"]) if meta else inicio - timedelta(days=1)
+            marca = max(marca_antiga, min(data_ate, ontem))
+            escrever_atomico(arq_dados, lambda tmp: df.to_parquet(tmp, index=False))
+            salvar_json(arq_meta, {
+                "inicio": inicio.isoformat(),
+                "marca_dagua": marca.isoformat(),
+                "atualizado_em": datetime.now().isoformat(),
+                "ultimas_faixas": [[de.isoformat(), ate.isoformat()] for de, ate in faixas],
+            })
+
+    if df.empty:
+        return df
+    return df[df["data"].between(pd.Timestamp(data_de), pd.Timestamp(data_ate))].reset_index(drop=True)
+
+
+def info_3s(nome):
+    """Metadados do armazém (inicio, marca_dagua, atualizado_em) ou {}."""
+    return ler_json(_arquivos(nome)[1], {})
+
+
+def invalidar_3s(nome=None):
+    """Apaga o armazém (um conjunto ou todos); a próxima leitura busca o período inteiro."""
+    for n in ([nome] if nome else list(CONJUNTOS)):
+        with _locks[n]:
+            for caminho in _arquivos(n):
+                if os.path.exists(caminho):
+                    os.remove(caminho)
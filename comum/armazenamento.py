@@ -0,0 +1,45 @@
+import os
+import json
+import tempfile
+
+# Diretório local para espelhos/caches em disco (sobrevive aos reruns do Streamlit).
+# Pode ser trocado por MMR_CACHE_DIR, p.ex. para um volume persistente.
+BASE_DIR = os.environ.get(
+    "MMR_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache"),
+)
+
+
+def diretorio_cache(*partes):
+    caminho = os.path.join(BASE_DIR, *partes)
+    os.makedirs(caminho, exist_ok=True)
+    return caminho
+
+
+def escrever_atomico(caminho, escrever):
+    """Chama escrever(caminho_tmp) e troca o arquivo de uma vez (os.replace)."""
+    pasta = os.path.dirname(caminho)
+    os.makedirs(pasta, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=pasta, prefix=".tmp-")
+    os.close(fd)
+    try:
+        escrever(tmp)
+        os.replace(tmp, caminho)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def ler_json(caminho, padrao=None):
+    try:
+        with open(caminho, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return padrao
+
+
+def salvar_json(caminho, dados):
+    def _escrever(tmp):
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(dados, f, ensure_ascii=False, default=str)
+    escrever_atomico(caminho, _escrever)
@@ -0,0 +1,61 @@
+from collections import deque
+
+
+class AutomatoPadroes:
+    """
+    Aho-Corasick: acha, numa única passada pelo texto, quais dos padrões
+    aparecem nele como substring (mesmo resultado de `p in texto` para cada p,
+    sem repetir a varredura por padrão).
+
+    Só usa listas/dicts, então pode ser devolvido por funções com st.cache_data.
+    """
+
+    def __init__(self, padroes):
+        self.padroes = []
+        self._ir = [{}]        # estado -> {caractere: próximo estado}
+        self._falha = [0]
+        self._saida = [[]]     # estado -> índices dos padrões que terminam nele
+
+        for padrao in dict.fromkeys(p for p in padroes if p):
+            estado = 0
+            for ch in padrao:
+                prox = self._ir[estado].get(ch)
+                if prox is None:
+                    prox = len(self._ir)
+                    self._ir[estado][ch] = prox
+                    self._ir.append({})
+                    self._falha.append(0)
+                    self._saida.append([])
+                estado = prox
+            self._saida[estado].append(len(self.padroes))
+            self.padroes.append(padrao)
+
+        fila = deque(self._ir[0].values())
+        while fila:
+            estado = fila.popleft()
+            for ch, prox in self._ir[estado].items():
+                fila.append(prox)
+                f = self._falha[estado]
+                while f and ch not in self._ir[f]:
+                    f = self._falha[f]
+                destino = self._ir[f].get(ch, 0)
+                self._falha[prox] = destino if destino != prox else 0
+                self._saida[prox] = self._saida[prox] + self._saida[self._falha[prox]]
+
+    def __len__(self):
+        return len(self.padroes)
+
+    def encontrados(self, texto):
+        """Conjunto dos padrões presentes em `texto`."""
+        if not self.padroes or not texto:
+            return set()
+        ir, falha, saida = self._ir, self._falha, self._saida
+        achados = set()
+        estado = 0
+        for ch in texto:
+            while estado and ch not in ir[estado]:
+                estado = falha[estado]
+            estado = ir[estado].get(ch, 0)
+            if saida[estado]:
+                achados.update(saida[estado])
+        return {self.padroes[i] for i in achados}
@@ -0,0 +1,106 @@
+"""
+Calendário de dias úteis para liquidação (recebíveis, previsões).
+
+Feriados nacionais (fixos + móveis pela Páscoa, inclusive Carnaval, em que
+não há liquidação bancária) + datas extras: as passadas na chamada e as da
+variável de ambiente MMR_FERIADOS ("dd/mm/aaaa,dd/mm/aaaa,...", p.ex.
+feriados municipais da praça da conta).
+
+As operações são vetorizadas com numpy.busday_offset sobre um
+numpy.busdaycalendar montado uma vez por conjunto de extras.
+"""
+import os
+from datetime import date, timedelta
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+ANOS_CALENDARIO = range(2000, 2101)
+
+# (mês, dia) -> a partir de que ano vale
+FERIADOS_FIXOS = {
+    (1, 1): 2000,    # Confraternização Universal
+    (4, 21): 2000,   # Tiradentes
+    (5, 1): 2000,    # Dia do Trabalho
+    (9, 7): 2000,    # Independência
+    (10, 12): 2000,  # Nossa Senhora Aparecida
+    (11, 2): 2000,   # Finados
+    (11, 15): 2000,  # Proclamação da República
+    (11, 20): 2024,  # Consciência Negra (Lei 14.759/2023)
+    (12, 25): 2000,  # Natal
+}
+# deslocamento em dias a partir do domingo de Páscoa
+FERIADOS_MOVEIS = (-48, -47, -2, 60)   # Carnaval (seg, ter), Sexta-feira Santa, Corpus Christi
+
+
+def pascoa(ano):
+    """Domingo de Páscoa (algoritmo de Meeus/Jones/Butcher, calendário gregoriano)."""
+    a, b, c = ano % 19, ano // 100, ano % 100
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    mes, dia = divmod(h + l - 7 * m + 114, 31)
+    return date(ano, mes, dia + 1)
+
+
+def feriados_nacionais(anos=ANOS_CALENDARIO):
+    out = []
+    for ano in anos:
+        out += [date(ano, m, d) for (m, d), desde in FERIADOS_FIXOS.items() if ano >= desde]
+        p = pascoa(ano)
+        out += [p + timedelta(days=n) for n in FERIADOS_MOVEIS]
+    return sorted(out)
+
+
+def _feriados_ambiente():
+    brutos = [t.strip() for t in os.environ.get("MMR_FERIADOS", "").split(",") if t.strip()]
+    datas = pd.to_datetime(pd.Series(brutos, dtype=object), dayfirst=True, errors="coerce").dropna()
+    return tuple(d.date() for d in datas)
+
+
+@lru_cache(maxsize=8)
+def _calendario(extras):
+    feriados = sorted(set(feriados_nacionais()) | set(extras))
+    return np.busdaycalendar(weekmask="1111100", holidays=np.array(feriados, dtype="datetime64[D]"))
+
+
+def calendario_util(extras=()):
+    """numpy.busdaycalendar: seg-sex, sem feriados nacionais, extras e MMR_FERIADOS."""
+    extras = tuple(sorted({pd.Timestamp(d).date() for d in extras} | set(_feriados_ambiente())))
+    return _calendario(extras)
+
+
+def _dias(datas):
+    return pd.to_datetime(pd.Series(datas)).to_numpy().astype("datetime64[D]")
+
+
+def somar_dias_uteis(datas, dias, calendario=None):
+    """
+    Data + n dias úteis, vetorizado (mesma regra de Data + BDay(n), com feriados):
+    n > 0 conta a partir do dia útil anterior (sábado + 1 = segunda);
+    n = 0 leva para o próximo dia útil. NaT permanece NaT.
+    """
+    cal = calendario if calendario is not None else calendario_util()
+    d = _dias(datas)
+    n = np.broadcast_to(np.asarray(dias, dtype=np.int64), d.shape)
+    ok = ~np.isnat(d)
+    out = np.full(d.shape, np.datetime64("NaT"), dtype="datetime64[D]")
+    if ok.any():
+        dd, nn = d[ok], n[ok]
+        out[ok] = np.where(
+            nn > 0,
+            np.busday_offset(dd, nn, roll="backward", busdaycal=cal),
+            np.busday_offset(dd, nn, roll="forward", busdaycal=cal),
+        )
+    return pd.to_datetime(out)
+
+
+def eh_feriado(datas, calendario=None):
+    """Máscara: a data é feriado do calendário (fins de semana não contam)."""
+    cal = calendario if calendario is not None else calendario_util()
+    return np.isin(_dias(datas), cal.holidays)
@@ -0,0 +1,138 @@
+import numpy as np
+import pandas as pd
+
+from comum.calendario import somar_dias_uteis
+
+TOLERANCIA_VALOR = 0.05   # R$ de diferença aceita entre previsto e creditado
+TOLERANCIA_PCT = 0.0      # ou fração do valor (a maior das duas vale)
+JANELA_DIAS = 3           # dias corridos entre a data prevista e a do crédito
+DIAS_ANTECIPACAO = 1      # dias úteis até o crédito quando o meio é antecipado
+
+
+def projetar_recebimentos(df_fat, df_tabela, calendario=None):
+    """
+    Data Prevista de cada venda do "Faturamento Meio Pagamento" pelos termos
+    da "Tabela Meio Pagamento" (merge por Meio de Pagamento), vetorizado.
+
+    - Antecipa S/N = "SIM": Data + "Prazo Antecipação" dias úteis, se a tabela
+      tiver essa coluna preenchida, senão + DIAS_ANTECIPACAO
+    - demais: Data + Prazo dias úteis
+    - dias úteis pelo calendário de comum.calendario (feriados nacionais + extras)
+
+    Devolve as linhas com Data válida, com Prazo, Antecipa S/N, as taxas da
+    tabela (se houver) e Data Prevista.
+    """
+    termos = ["Meio de Pagamento", "Prazo", "Antecipa S/N", "Prazo Antecipação", "Taxa Bandeira", "Taxa Antecipação"]
+    df = df_fat.drop(columns=[c for c in termos[1:] if c in df_fat.columns]).merge(
+        df_tabela[[c for c in termos if c in df_tabela.columns]].drop_duplicates("Meio de Pagamento"),
+        on="Meio de Pagamento",
+        how="left",
+    )
+    df = df.dropna(subset=["Data"]).reset_index(drop=True)
+    vazio = pd.Series("", index=df.index)
+    df["Prazo"] = pd.to_numeric(df.get("Prazo", vazio), errors="coerce").fillna(0).astype(int)
+    df["Antecipa S/N"] = df.get("Antecipa S/N", vazio).fillna("").astype(str).str.upper().str.strip()
+
+    antecipa = df["Antecipa S/N"].eq("SIM").to_numpy()
+    prazo_ant = pd.to_numeric(df.get("Prazo Antecipação", vazio), errors="coerce").fillna(DIAS_ANTECIPACAO)
+    dias = np.where(antecipa, prazo_ant.astype(int).to_numpy(), df["Prazo"].to_numpy())
+    df["Data Prevista"] = somar_dias_uteis(df["Data"], dias, calendario)
+    return df
+
+
+def prever_recebimentos(df_fat, df_tabela, agrupar_por=("Data Prevista", "Meio de Pagamento"), calendario=None):
+    """
+    Recebimentos esperados a partir do "Faturamento Meio Pagamento" e dos termos
+    da "Tabela Meio Pagamento" (já tipados por comum.meio_pagamento).
+
+    - Data Prevista: ver projetar_recebimentos (dias úteis com feriados)
+    - Valor Previsto = Valor (R$) - Taxa Bandeira - Taxa Antecipação
+    - somado por `agrupar_por` (a adquirente credita um lote por meio e dia)
+    """
+    colunas = list(agrupar_por) + ["Valor Bruto", "Valor Previsto", "Qtd Vendas"]
+    if df_fat is None or df_fat.empty:
+        return pd.DataFrame(columns=colunas)
+
+    df = projetar_recebimentos(df_fat, df_tabela, calendario)
+    bruto = df["Valor (R$)"].astype(float)
+    taxas = sum(df[c].fillna(0.0) for c in ("Taxa Bandeira", "Taxa Antecipação") if c in df.columns)
+    df["Valor Bruto"] = bruto
+    df["Valor Previsto"] = bruto * (1 - taxas)
+
+    return (
+        df.groupby(list(agrupar_por), as_index=False)
+        .agg(**{
+            "Valor Bruto": ("Valor Bruto", "sum"),
+            "Valor Previsto": ("Valor Previsto", "sum"),
+            "Qtd Vendas": ("Valor Bruto", "size"),
+        })
+        .round({"Valor Bruto": 2, "Valor Previsto": 2})
+    )
+
+
+def conciliar(lancamentos, previstos, tolerancia_valor=TOLERANCIA_VALOR, tolerancia_pct=TOLERANCIA_PCT,
+              janela_dias=JANELA_DIAS):
+    """
+    Casa cada crédito do extrato com no máximo um recebimento previsto.
+
+    Os previstos ficam ordenados por valor; para cada crédito, só a faixa
+    [valor - tol, valor + tol] é examinada (busca binária) e, dentro dela, os
+    ainda livres com |data prevista - data do crédito| <= janela_dias. Vence o
+    mais próximo em dias e, no empate, em valor. Custo ~ n·log m em vez de n·m.
+
+    Devolve (lancamentos com Status / Previsto * / Diferença / Dias,
+             previstos sem crédito correspondente).
+    """
+    extrato = lancamentos.copy()
+    extrato["Status"] = np.where(extrato["Valor"] > 0, "Não conciliado", "Débito")
+    extrato["Previsto Data"] = pd.NaT
+    extrato["Previsto Meio"] = ""
+    for col in ("Previsto Valor", "Diferença", "Dias"):
+        extrato[col] = np.nan
+    if previstos is None or previstos.empty or extrato.empty:
+        return extrato, (previstos if previstos is not None else pd.DataFrame())
+
+    prev = previstos.sort_values("Valor Previsto", kind="stable").reset_index(drop=True)
+    valores = prev["Valor Previsto"].to_numpy(float)
+    dias_prev = prev["Data Prevista"].to_numpy().astype("datetime64[D]").astype(np.int64)
+    usado = np.zeros(len(prev), dtype=bool)
+    casado_com = np.full(len(extrato), -1)
+
+    creditos = extrato.index[extrato["Valor"] > 0]
+    ordem = extrato.loc[creditos].sort_values(["Valor", "Data"], kind="stable").index
+    valores_ext = extrato["Valor"].to_numpy(float)
+    dias_ext = extrato["Data"].to_numpy().astype("datetime64[D]").astype(np.int64)
+    posicao = {idx: p for p, idx in enumerate(extrato.index)}
+
+    for idx in ordem:
+        p = posicao[idx]
+        v = valores_ext[p]
+        tol = max(tolerancia_valor, abs(v) * tolerancia_pct)
+        lo = np.searchsorted(valores, v - tol, side="left")
+        hi = np.searchsorted(valores, v + tol, side="right")
+        if lo >= hi:
+            continue
+        faixa = np.arange(lo, hi)
+        dd = np.abs(dias_prev[lo:hi] - dias_ext[p])
+        ok = ~usado[lo:hi] & (dd <= janela_dias)
+        if not ok.any():
+            continue
+        dv = np.abs(valores[lo:hi] - v)
+        escolhido = faixa[ok][np.lexsort((dv[ok], dd[ok]))[0]]
+        usado[escolhido] = True
+        casado_com[p] = escolhido
+
+    casados = casado_com >= 0
+    if casados.any():
+        alvo = prev.iloc[casado_com[casados]]
+        linhas = extrato.index[casados]
+        extrato.loc[linhas, "Status"] = "Conciliado"
+        extrato.loc[linhas, "Previsto Data"] = alvo["Data Prevista"].to_numpy()
+        if "Meio de Pagamento" in alvo.columns:
+            extrato.loc[linhas, "Previsto Meio"] = alvo["Meio de Pagamento"].to_numpy()
+        extrato.loc[linhas, "Previsto Valor"] = alvo["Valor Previsto"].to_numpy()
+        extrato.loc[linhas, "Diferença"] = (extrato.loc[linhas, "Valor"].to_numpy() - alvo["Valor Previsto"].to_numpy()).round(2)
+        extrato.loc[linhas, "Dias"] = dias_ext[casados] - dias_prev[casado_com[casados]]
+
+    pendentes = prev.loc[~usado].sort_values("Data Prevista", kind="stable").reset_index(drop=True)
+    return extrato, pendentes
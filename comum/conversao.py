@@ -0,0 +1,173 @@
+"""
+Conversões vetorizadas de valores em real e de datas vindas do Sheets/Excel.
+
+Mesma regra em todas as páginas (antes cada uma tinha seu parser por célula
+com .apply):
+
+- valor: número cru passa direto; texto aceita "R$ 1.234,56", "1234,56",
+  "1.234.567", "1234.56", "(1.234,56)", "-1.234,56", "1.234,56-" e "3,5%".
+  Com vírgula e ponto, o último dos dois é o decimal; só ponto é decimal,
+  exceto no padrão de milhar "1.234" / "1.234.567". Vazio, "-" e lixo -> NaN.
+- data: datetime passa direto; número (ou texto "45123" / "45123,5") é serial
+  do Sheets/Excel (dias desde 1899-12-30); texto "aaaa-mm-dd..." é ISO;
+  o resto é lido com dia primeiro ("dd/mm/aaaa", "d/m/aa", com ou sem hora).
+- mês: "Janeiro", "jan", "Março", "marco", "MAR.", "Sep", 3, "03" -> 3.
+
+Comparação com os parsers antigos (resultado e tempo): python -m pytest tests/test_conversao.py
+"""
+import unicodedata
+from datetime import date, datetime
+from itertools import repeat
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+MESES_PT = ["Janeiro", "Fevereiro", "Março", "Abril", "Maio", "Junho",
+            "Julho", "Agosto", "Setembro", "Outubro", "Novembro", "Dezembro"]
+MESES_PT_ABREV = ["Jan", "Fev", "Mar", "Abr", "Mai", "Jun", "Jul", "Ago", "Set", "Out", "Nov", "Dez"]
+
+_ORIGEM_SERIAL = "1899-12-30"
+_SERIAL_MAX = 100000   # ~ano 2173; acima disso não é data serial
+
+_RE_SO_MILHAR = r"^\d{1,3}(?:\.\d{3})+$"
+# sinal: "-1,00" / "R$ -1,00" / "1,00-" / "(1,00)" / "R$ (1,00)"
+_RE_NEGATIVO = r"(?i)^\s*(?:R\$)?\s*(?:-|\(.*\)\s*$)|-\s*$"
+_RE_LIXO_VALOR = r"(?i)R\$|[\s()%+\-]"
+_RE_SERIAL = r"^\d{1,5}(?:[.,]\d+)?$"
+_RE_ISO = r"^\d{4}-\d{2}-\d{2}"
+
+
+def _sem_acento(s):
+    return unicodedata.normalize("NFKD", str(s)).encode("ASCII", "ignore").decode("ASCII")
+
+
+_MES_POR_NOME = {}
+for _n, (_nome, _abrev) in enumerate(zip(MESES_PT, MESES_PT_ABREV), start=1):
+    _MES_POR_NOME[_sem_acento(_nome).lower()] = _n
+    _MES_POR_NOME[_abrev.lower()] = _n
+for _nome, _n in {"feb": 2, "apr": 4, "may": 5, "aug": 8, "sep": 9, "sept": 9, "oct": 10, "dec": 12}.items():
+    _MES_POR_NOME[_nome] = _n
+
+
+def _como_serie(valores):
+    return valores if isinstance(valores, pd.Series) else pd.Series(valores)
+
+
+def _mascara_tipo(serie, tipos):
+    # map(isinstance, ...) roda em C: sem lambda Python por célula
+    return np.fromiter(map(isinstance, serie.to_numpy(dtype=object), repeat(tipos)), dtype=bool, count=len(serie))
+
+
+def _texto_para_float(textos):
+    """
+    Textos de valor em real -> float, com os kernels de texto do Arrow (C++):
+    uma passada por regra sobre a coluna inteira, sem parser Python por célula.
+    """
+    s = pa.array(textos, type=pa.string(), from_pandas=True)
+    negativo = pc.fill_null(pc.match_substring_regex(s, _RE_NEGATIVO), False)
+    s = pc.replace_substring_regex(s, _RE_LIXO_VALOR, "")
+
+    # vírgula depois do último ponto (ou sem ponto) é o decimal; vírgula antes
+    # do ponto é milhar; sem vírgula, "1.234" / "1.234.567" é milhar
+    virgula_decimal = pc.fill_null(pc.match_substring_regex(s, r",[^.]*$"), False)
+    so_milhar = pc.fill_null(pc.match_substring_regex(s, _RE_SO_MILHAR), False)
+    sem_ponto = pc.replace_substring(s, ".", "")
+    s = pc.if_else(
+        virgula_decimal,
+        pc.replace_substring(sem_ponto, ",", "."),
+        pc.if_else(so_milhar, sem_ponto, pc.replace_substring(s, ",", "")),
+    )
+    valido = pc.fill_null(pc.match_substring_regex(s, r"^(?:\d+(?:\.\d*)?|\.\d+)$"), False)
+    num = pc.cast(pc.if_else(valido, s, pa.scalar(None, pa.string())), pa.float64())
+    num = pc.if_else(negativo, pc.negate(pc.abs(num)), num)
+    return num.to_numpy(zero_copy_only=False)
+
+
+def para_float_br(valores) -> pd.Series:
+    """Series/lista de valores em real -> Series float (NaN onde não há número)."""
+    serie = _como_serie(valores)
+    if pd.api.types.is_bool_dtype(serie):
+        return serie.astype(float)
+    if pd.api.types.is_numeric_dtype(serie):
+        return serie.astype(float)
+
+    texto = _mascara_tipo(serie, str)
+    out = pd.to_numeric(serie.where(~texto), errors="coerce").astype(float)
+    if texto.any():
+        out[texto] = _texto_para_float(serie.to_numpy(dtype=object)[texto])
+    return out
+
+
+def float_br(valor, padrao=0.0):
+    """Um valor em real (ex.: digitado num st.text_input) -> float; `padrao` se inválido."""
+    v = para_float_br([valor]).iloc[0]
+    return padrao if pd.isna(v) else float(v)
+
+
+def _serial_para_data(num):
+    num = num.where((num >= 1) & (num <= _SERIAL_MAX))
+    return pd.to_datetime(np.floor(num * 86400) / 86400, unit="D", origin=_ORIGEM_SERIAL, errors="coerce")
+
+
+def para_data_br(valores, so_data=True) -> pd.Series:
+    """
+    Series/lista de datas mistas (serial, texto dd/mm/aaaa, ISO, datetime) ->
+    Series datetime64 (NaT onde não há data). `so_data` descarta a hora.
+    """
+    serie = _como_serie(valores)
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        out = serie
+    elif pd.api.types.is_numeric_dtype(serie) and not pd.api.types.is_bool_dtype(serie):
+        out = _serial_para_data(serie.astype(float))
+    else:
+        out = pd.Series(pd.NaT, index=serie.index, dtype="datetime64[ns]")
+
+        datas = _mascara_tipo(serie, (datetime, date, pd.Timestamp))
+        if datas.any():
+            out[datas] = pd.to_datetime(serie[datas], errors="coerce")
+
+        numeros = _mascara_tipo(serie, (int, float, np.integer, np.floating)) & ~_mascara_tipo(serie, bool)
+        if numeros.any():
+            out[numeros] = _serial_para_data(serie[numeros].astype(float))
+
+        texto = _mascara_tipo(serie, str)
+        if texto.any():
+            s = serie[texto].str.strip()
+            serial = s.str.match(_RE_SERIAL)
+            iso = ~serial & s.str.match(_RE_ISO)
+            resto = ~serial & ~iso & s.ne("")
+            if serial.any():
+                out.loc[s.index[serial]] = _serial_para_data(
+                    pd.to_numeric(s[serial].str.replace(",", ".", regex=False), errors="coerce")
+                )
+            if iso.any():
+                out.loc[s.index[iso]] = pd.to_datetime(s[iso], format="ISO8601", errors="coerce")
+            if resto.any():
+                r = s[resto]
+                lidas = pd.to_datetime(r, format="%d/%m/%Y", errors="coerce")
+                faltam = lidas.isna()
+                if faltam.any():
+                    lidas[faltam] = pd.to_datetime(r[faltam], dayfirst=True, format="mixed", errors="coerce")
+                out.loc[r.index] = lidas
+    out = pd.to_datetime(out, errors="coerce")
+    return out.dt.normalize() if so_data else out
+
+
+def numero_mes_pt(valores) -> pd.Series:
+    """Nome/abreviação do mês (pt, ou abreviação em inglês) ou número 1..12 -> Int64 (NA se não for mês)."""
+    serie = _como_serie(valores)
+    chave = (serie.astype(str).str.strip().str.lower().str.rstrip(".")
+             .str.normalize("NFKD").str.encode("ascii", "ignore").str.decode("ascii"))
+    out = chave.map(_MES_POR_NOME)
+    num = pd.to_numeric(chave.where(out.isna()), errors="coerce")
+    num = num.where((num >= 1) & (num <= 12) & (num == np.floor(num)))
+    return out.fillna(num).astype("Int64")
+
+
+def nome_mes_pt(numeros, abreviado=False) -> pd.Series:
+    """1..12 -> "Janeiro".."Dezembro" (ou "Jan".."Dez"); vazio fora da faixa."""
+    nomes = MESES_PT_ABREV if abreviado else MESES_PT
+    num = pd.to_numeric(_como_serie(numeros), errors="coerce")
+    return num.map(dict(enumerate(nomes, start=1))).fillna("")
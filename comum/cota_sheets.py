@@ -0,0 +1,70 @@
+"""
+Chamadas ao Google Sheets dentro da cota, compartilhada entre threads.
+
+A API limita requisições por minuto por usuário (a service account é um
+usuário só), separadamente para leitura e escrita. chamar() espaça as
+chamadas num limitador por tipo e, em 429/5xx, espera com backoff
+exponencial + jitter, empurrando também o limitador para que as outras
+threads recuem junto em vez de insistirem na cota estourada.
+
+    valores = chamar(ws.get_all_values)
+    chamar(ws.update, "A1", linhas, value_input_option="USER_ENTERED", escrita=True)
+
+Limites por MMR_SHEETS_RPM (padrão 55 leituras e 55 escritas por minuto).
+"""
+import os
+import random
+import threading
+import time
+
+import gspread
+
+LIMITE_POR_MINUTO = int(os.environ.get("MMR_SHEETS_RPM", "55"))
+TENTATIVAS = 6
+ESPERA_MAXIMA = 64          # segundos entre tentativas
+STATUS_REPETIR = {429, 500, 502, 503}
+
+
+class LimitadorTaxa:
+    """Libera no máximo `por_minuto` chamadas por minuto, igualmente espaçadas."""
+
+    def __init__(self, por_minuto):
+        self.intervalo = 60.0 / max(int(por_minuto), 1)
+        self._lock = threading.Lock()
+        self._proximo = 0.0
+
+    def esperar(self):
+        with self._lock:
+            agora = time.monotonic()
+            vez = max(agora, self._proximo)
+            self._proximo = vez + self.intervalo
+        if vez > agora:
+            time.sleep(vez - agora)
+
+    def pausar(self, segundos):
+        """Ninguém passa pelos próximos `segundos` (após um 429)."""
+        with self._lock:
+            self._proximo = max(self._proximo, time.monotonic() + segundos)
+
+
+_LEITURA = LimitadorTaxa(LIMITE_POR_MINUTO)
+_ESCRITA = LimitadorTaxa(LIMITE_POR_MINUTO)
+
+
+def _status(erro):
+    resposta = getattr(erro, "response", None)
+    return getattr(resposta, "status_code", None)
+
+
+def chamar(fn, *args, escrita=False, **kwargs):
+    """fn(*args, **kwargs) respeitando a cota; repete em 429/5xx com backoff."""
+    limitador = _ESCRITA if escrita else _LEITURA
+    for tentativa in range(TENTATIVAS):
+        limitador.esperar()
+        try:
+            return fn(*args, **kwargs)
+        except gspread.exceptions.APIError as e:
+            if _status(e) not in STATUS_REPETIR or tentativa == TENTATIVAS - 1:
+                raise
+            pausa = min(ESPERA_MAXIMA, 2 ** tentativa) + random.random()
+            limitador.pausar(pausa)   # o esperar() da próxima volta cumpre a pausa
@@ -0,0 +1,171 @@
+"""
+Cubo de vendas pré-agregado sobre o espelho de 'Fat Sistema Externo'.
+
+Dimensões: Ano × Mês × Dia × Loja × Grupo × Tipo × Sistema
+Medidas:   Fat.Total, Serv/Tx, Fat.Real, Ticket (soma) e Registros (linhas
+           de origem; Ticket Médio = Ticket / Registros)
+
+Dois níveis ficam em disco (.cache/cubo_vendas):
+- "dia": uma linha por Data × Loja × Grupo × Sistema
+- "mes": uma linha por Ano × Mês × Loja × Grupo × Sistema; a coluna Data
+  guarda o último dia com venda do grupo (serve para "até dd/mm")
+
+Manutenção incremental: a sincronização do espelho só acrescenta linhas no
+fim do Parquet, então o cubo guarda quantas linhas já agregou e, a cada
+atualização, agrega só as novas e reagrega os dias/meses que elas tocam.
+Uma releitura completa do espelho (completo_em mudou) reconstrói o cubo.
+
+Tipo vem da Tabela Empresa na hora da leitura (por Loja), para que uma
+mudança de classificação valha também para o histórico.
+"""
+import os
+import threading
+
+import pandas as pd
+import pyarrow.parquet as pq
+import streamlit as st
+
+from comum.armazenamento import diretorio_cache, escrever_atomico, ler_json, salvar_json
+from comum.fat_externo import TTL_FAT_EXTERNO, espelho_fat_externo
+from comum.tabela_empresa import carregar_tabela_empresa
+
+MEDIDAS = ["Fat.Total", "Serv/Tx", "Fat.Real", "Ticket"]
+CHAVES_DIA = ["Data", "Loja", "Grupo", "Sistema"]
+CHAVES_MES = ["Ano", "Mês", "Loja", "Grupo", "Sistema"]
+NIVEIS = ("dia", "mes")
+
+_lock = threading.Lock()
+
+
+# ----------------- Arquivos -----------------
+def _arquivos():
+    pasta = diretorio_cache("cubo_vendas")
+    return {n: os.path.join(pasta, f"{n}.parquet") for n in NIVEIS}, os.path.join(pasta, "meta.json")
+
+
+def _salvar(df, caminho):
+    escrever_atomico(caminho, lambda tmp: df.to_parquet(tmp, index=False))
+
+
+# ----------------- Agregação -----------------
+def _texto(df, col):
+    if col not in df.columns:
+        return pd.Series("", index=df.index, dtype=object)
+    return df[col].fillna("").astype(str).str.strip()
+
+
+def _por_dia(df):
+    """Linhas do espelho (ou do próprio cubo diário) -> cubo diário."""
+    base = pd.DataFrame({
+        "Data": pd.to_datetime(df["Data"], errors="coerce").dt.normalize(),
+        "Loja": _texto(df, "Loja").str.upper(),
+        "Grupo": _texto(df, "Grupo"),
+        "Sistema": _texto(df, "Sistema"),
+    })
+    for m in MEDIDAS:
+        base[m] = pd.to_numeric(df[m], errors="coerce").fillna(0.0) if m in df.columns else 0.0
+    base["Registros"] = df["Registros"].to_numpy() if "Registros" in df.columns else 1
+    base = base.dropna(subset=["Data"])
+    out = base.groupby(CHAVES_DIA, as_index=False, sort=True)[MEDIDAS + ["Registros"]].sum()
+    out.insert(1, "Ano", out["Data"].dt.year.astype("int64"))
+    out.insert(2, "Mês", out["Data"].dt.month.astype("int64"))
+    out.insert(3, "Dia", out["Data"].dt.day.astype("int64"))
+    return out
+
+
+def _por_mes(dia):
+    """Cubo diário -> cubo mensal (Data = último dia com venda)."""
+    agg = {m: "sum" for m in MEDIDAS + ["Registros"]}
+    agg["Data"] = "max"
+    out = dia.groupby(CHAVES_MES, as_index=False, sort=True).agg(agg)
+    return out[CHAVES_MES + ["Data"] + MEDIDAS + ["Registros"]]
+
+
+def _colunas_espelho(arq_espelho):
+    nomes = set(pq.ParquetFile(arq_espelho).schema_arrow.names)
+    return [c for c in ["Data", "Loja", "Grupo", "Sistema"] + MEDIDAS if c in nomes]
+
+
+def _incorporar(dia, mes, novos):
+    """Soma as linhas novas do espelho aos cubos, reagregando só o trecho tocado."""
+    delta = _por_dia(novos)
+    if delta.empty:
+        return dia, mes
+    corte = delta["Data"].min().replace(day=1)   # início do 1º mês tocado
+    dia = pd.concat(
+        [dia[dia["Data"] < corte], _por_dia(pd.concat([dia[dia["Data"] >= corte], delta]))],
+        ignore_index=True,
+    )
+    mes = pd.concat(
+        [mes[(mes["Ano"] * 100 + mes["Mês"]) < corte.year * 100 + corte.month],
+         _por_mes(dia[dia["Data"] >= corte])],
+        ignore_index=True,
+    )
+    return dia, mes
+
+
+# ----------------- Manutenção -----------------
+def atualizar_cubo_vendas(arq_espelho, meta_espelho, reconstruir=False):
+    """
+    Deixa os cubos em disco em dia com o espelho e devolve {"modo", "linhas_novas"}.
+
+    meta_espelho: meta.json do espelho (usa 'completo_em' para saber se houve
+    releitura completa, o que invalida a contagem de linhas já agregadas).
+    """
+    arqs, arq_meta = _arquivos()
+    with _lock:
+        meta = ler_json(arq_meta, {})
+        total = pq.ParquetFile(arq_espelho).metadata.num_rows
+        feitas = int(meta.get("linhas_espelho", -1))
+        valido = (not reconstruir
+                  and meta.get("completo_em") == meta_espelho.get("completo_em")
+                  and 0 <= feitas <= total
+                  and all(os.path.exists(a) for a in arqs.values()))
+        if valido and feitas == total:
+            return {"modo": "em dia", "linhas_novas": 0}
+
+        cols = _colunas_espelho(arq_espelho)
+        if valido:
+            novos = pd.read_parquet(arq_espelho, columns=cols).iloc[feitas:]
+            dia, mes = _incorporar(pd.read_parquet(arqs["dia"]), pd.read_parquet(arqs["mes"]), novos)
+            modo, linhas = "incremental", len(novos)
+        else:
+            dia = _por_dia(pd.read_parquet(arq_espelho, columns=cols))
+            mes = _por_mes(dia)
+            modo, linhas = "completo", total
+
+        _salvar(dia, arqs["dia"])
+        _salvar(mes, arqs["mes"])
+        salvar_json(arq_meta, {"completo_em": meta_espelho.get("completo_em"), "linhas_espelho": total})
+        return {"modo": modo, "linhas_novas": linhas}
+
+
+# ----------------- Leitura -----------------
+@st.cache_data(ttl=TTL_FAT_EXTERNO, show_spinner=False)
+def carregar_cubo_vendas(nivel="dia"):
+    """
+    Cubo de vendas ("dia" ou "mes") em dia com 'Fat Sistema Externo', com Tipo.
+
+    Colunas: Ano, Mês (1-12), [Dia], Data, Loja (maiúsculas), Grupo, Sistema,
+    Tipo (None se a loja não está na Tabela Empresa), Fat.Total, Serv/Tx,
+    Fat.Real, Ticket, Registros e Ticket Médio.
+    """
+    if nivel not in NIVEIS:
+        raise ValueError(f"nível do cubo deve ser um de {NIVEIS}, não {nivel!r}")
+    arq_espelho, meta_espelho = espelho_fat_externo()
+    atualizar_cubo_vendas(arq_espelho, meta_espelho)
+    arqs, _ = _arquivos()
+    cubo = pd.read_parquet(arqs[nivel])
+
+    emp = carregar_tabela_empresa()
+    if {"Loja", "Tipo"}.issubset(emp.columns):
+        tipos = (emp.assign(_k=emp["Loja"].astype(str).str.strip().str.upper())
+                    .drop_duplicates("_k").set_index("_k")["Tipo"])
+        tipos = tipos[tipos.astype(str).str.strip() != ""]
+        cubo["Tipo"] = cubo["Loja"].map(tipos)
+    else:
+        cubo["Tipo"] = None
+    cubo["Ticket Médio"] = (cubo["Ticket"] / cubo["Registros"].where(cubo["Registros"] > 0)).fillna(0.0)
+
+    dims = ["Ano", "Mês"] + (["Dia"] if nivel == "dia" else []) + ["Data", "Loja", "Grupo", "Tipo", "Sistema"]
+    return cubo[dims + MEDIDAS + ["Registros", "Ticket Médio"]]
@@ -0,0 +1,205 @@
+import pandas as pd
+
+# Lojas de teste/homologação que nunca entram nos relatórios
+LOJAS_IGNORADAS = ("0000", "0001", "9999")
+
+# Número em texto dentro do JSON (TIP_AMOUNT, tipAmount): só converte se for numérico
+_NUMERO_JSON = """
+    CASE WHEN btrim({campo}) ~ '^-?[0-9]+(\\.[0-9]+)?$'
+         THEN btrim({campo})::numeric
+         ELSE 0 END
+"""
+
+# JSON de custom_properties/details: se a coluna já é json/jsonb o cast é
+# direto; se é texto, passa por pg_temp.jsonb_seguro, que devolve NULL para
+# a linha com JSON inválido em vez de derrubar a consulta inteira (a linha
+# segue como pedido sem propriedades, como no parser antigo).
+_SQL_JSONB_SEGURO = """
+    CREATE OR REPLACE FUNCTION pg_temp.jsonb_seguro(t text) RETURNS jsonb
+    LANGUAGE plpgsql IMMUTABLE AS $$
+    BEGIN
+        RETURN NULLIF(btrim(t), '')::jsonb;
+    EXCEPTION WHEN others THEN
+        RETURN NULL;
+    END $$
+"""
+_SQL_TIPOS_JSON = """
+    SELECT table_name, data_type
+    FROM information_schema.columns
+    WHERE table_schema = 'public'
+      AND ((table_name = 'order_picture' AND column_name = 'custom_properties')
+        OR (table_name = 'order_picture_tender' AND column_name = 'details'))
+"""
+
+# Pedidos fechados (state_id = 5) e não cancelados na janela [inicio, fim].
+# Cancelamento = VOID_TYPE preenchido e diferente de 0 em custom_properties.
+_CTE_PEDIDOS = """
+    pedidos AS (
+        SELECT
+            op.order_picture_id,
+            ltrim(op.store_code, '0')          AS store_code,
+            op.business_dt::date               AS data,
+            op.total_gross,
+            op.order_code,
+            {props} AS props
+        FROM public.order_picture op
+        WHERE op.business_dt >= %(inicio)s
+          AND op.business_dt <= %(fim)s
+          AND op.store_code NOT IN %(lojas_ignoradas)s
+          AND op.state_id = 5
+          AND COALESCE(btrim({props} ->> 'VOID_TYPE'), '') IN ('', '0')
+    )
+"""
+
+# Resumo diário por loja: uma linha por loja/dia em vez de um registro por pedido
+SQL_RESUMO_DIARIO = f"""
+    WITH {_CTE_PEDIDOS}
+    SELECT
+        store_code,
+        data,
+        COALESCE(SUM(total_gross), 0)::float8 AS fat_real,
+        COALESCE(SUM({_NUMERO_JSON.format(campo="props ->> 'TIP_AMOUNT'")}), 0)::float8 AS serv_tx,
+        COUNT(DISTINCT order_code)             AS qtd_pedidos,
+        COUNT(*)                               AS qtd_registros
+    FROM pedidos
+    GROUP BY store_code, data
+    ORDER BY data, store_code
+"""
+
+# Meio de pagamento por loja/dia: tenders ligados por JOIN aos pedidos válidos.
+# Meio = tenderDescr -> tenderDesc -> tenderTypeDescription -> tender_name.
+# Valor líquido de troco (nunca negativo); gorjeta (tipAmount) vem separada.
+SQL_MEIO_PAGAMENTO_DIARIO = f"""
+    WITH {_CTE_PEDIDOS},
+    pedidos_dia AS (
+        SELECT store_code, data, COUNT(*) AS pedidos_dia
+        FROM pedidos
+        GROUP BY store_code, data
+    ),
+    pagamentos AS (
+        SELECT
+            p.store_code,
+            p.data,
+            p.order_picture_id,
+            COALESCE(
+                NULLIF(btrim(d.details ->> 'tenderDescr'), ''),
+                NULLIF(btrim(d.details ->> 'tenderDesc'), ''),
+                NULLIF(btrim(d.details ->> 'tenderTypeDescription'), ''),
+                NULLIF(btrim(t.tender_name), '')
+            )                                   AS meio_pagamento,
+            GREATEST(COALESCE(t.tender_amount, 0) - COALESCE(t.change_amount, 0), 0) AS valor_liquido,
+            {_NUMERO_JSON.format(campo="d.details ->> 'tipAmount'")} AS gorjeta
+        FROM pedidos p
+        JOIN public.order_picture_tender t ON t.order_picture_id = p.order_picture_id
+        CROSS JOIN LATERAL (SELECT {{details}} AS details) d
+    )
+    SELECT
+        pg.store_code,
+        pg.data,
+        pg.meio_pagamento,
+        SUM(pg.valor_liquido)::float8          AS valor_liquido,
+        SUM(pg.gorjeta)::float8                AS gorjeta,
+        COUNT(DISTINCT pg.order_picture_id)    AS qtd_pedidos,
+        MAX(pd.pedidos_dia)                    AS pedidos_dia
+    FROM pagamentos pg
+    JOIN pedidos_dia pd ON pd.store_code = pg.store_code AND pd.data = pg.data
+    GROUP BY pg.store_code, pg.data, pg.meio_pagamento
+    ORDER BY pg.data, pg.store_code, pg.meio_pagamento
+"""
+
+
+# Desconto por loja/dia. Mantém o critério histórico das telas de Desconto:
+# exclui cancelados pela coluna VOID_TYPE ou, na falta dela, por pod_type;
+# se nenhuma das duas existir, não filtra.
+SQL_DESCONTO_DIARIO = """
+    SELECT
+        ltrim(store_code, '0')                 AS store_code,
+        business_dt::date                      AS data,
+        COALESCE(SUM(order_discount_amount::numeric), 0)::float8 AS order_discount_amount
+    FROM public.order_picture
+    WHERE business_dt >= %(inicio)s
+      AND business_dt <= %(fim)s
+      AND store_code NOT IN %(lojas_ignoradas)s
+      AND state_id = 5
+      {filtro_void}
+    GROUP BY 1, 2
+    ORDER BY 2, 1
+"""
+_FILTROS_VOID_DESCONTO = [
+    ("VOID_TYPE", "AND (VOID_TYPE IS NULL OR VOID_TYPE = '' OR LOWER(VOID_TYPE) NOT LIKE '%%void%%')"),
+    ("pod_type", "AND (pod_type IS NULL OR pod_type = '' OR LOWER(pod_type) NOT LIKE '%%void%%')"),
+    (None, ""),
+]
+
+
+def _expressoes_json(conn):
+    """{props, details}: expressão SQL jsonb de cada coluna conforme o tipo dela no banco."""
+    with conn.cursor() as cur:
+        cur.execute(_SQL_TIPOS_JSON)
+        tipos = dict(cur.fetchall())
+        colunas = {"props": ("order_picture", "op.custom_properties"),
+                   "details": ("order_picture_tender", "t.details")}
+        out = {}
+        for nome, (tabela, coluna) in colunas.items():
+            if tipos.get(tabela) in ("json", "jsonb"):
+                out[nome] = f"{coluna}::jsonb"
+            else:
+                out[nome] = f"pg_temp.jsonb_seguro({coluna}::text)"
+        if any("jsonb_seguro" in e for e in out.values()):
+            cur.execute(_SQL_JSONB_SEGURO)
+    return out
+
+
+def _ler(sql, conn, data_inicio, data_fim):
+    df = pd.read_sql(
+        sql,
+        conn,
+        params={"inicio": data_inicio, "fim": data_fim, "lojas_ignoradas": LOJAS_IGNORADAS},
+    )
+    df["data"] = pd.to_datetime(df["data"], errors="coerce")
+    return df
+
+
+def buscar_resumo_diario(conn, data_inicio, data_fim):
+    """
+    Vendas do 3S agregadas por loja e dia business_dt (inclusive nas duas pontas).
+
+    Colunas: store_code (sem zeros à esquerda), data (datetime64),
+    fat_real, serv_tx, qtd_pedidos e qtd_registros (pedidos válidos lidos).
+    """
+    return _ler(SQL_RESUMO_DIARIO.format(**_expressoes_json(conn)), conn, data_inicio, data_fim)
+
+
+def buscar_meio_pagamento_diario(conn, data_inicio, data_fim):
+    """
+    Pagamentos do 3S agregados por loja, dia business_dt e meio de pagamento.
+
+    Colunas: store_code, data (datetime64), meio_pagamento (None se não houver
+    descrição), valor_liquido (tender - troco), gorjeta, qtd_pedidos e
+    pedidos_dia (pedidos válidos da loja no dia, repetido em cada meio).
+    """
+    return _ler(SQL_MEIO_PAGAMENTO_DIARIO.format(**_expressoes_json(conn)), conn, data_inicio, data_fim)
+
+
+def buscar_desconto_diario(conn, data_inicio, data_fim):
+    """
+    Soma de order_discount_amount por loja e dia business_dt.
+
+    Colunas: store_code, data (datetime64), order_discount_amount.
+    """
+    for coluna, filtro in _FILTROS_VOID_DESCONTO:
+        try:
+            return _ler(SQL_DESCONTO_DIARIO.format(filtro_void=filtro), conn, data_inicio, data_fim)
+        except Exception as e:
+            msg = str(e).lower()
+            if coluna and ("does not exist" in msg or ("column" in msg and coluna.lower() in msg)):
+                conn.rollback()  # transação abortada pelo erro; limpa antes da próxima tentativa
+                continue
+            raise
+
+
+def contar_pedidos(df_meio):
+    """Pedidos válidos lidos num resultado de buscar_meio_pagamento_diario."""
+    if df_meio is None or df_meio.empty:
+        return 0
+    return int(df_meio.drop_duplicates(["store_code", "data"])["pedidos_dia"].sum())
@@ -0,0 +1,129 @@
+"""
+Downloads (.xlsx/.pdf) gerados sob demanda e memorizados.
+
+O Streamlit reexecuta a página inteira a cada clique, e montar o arquivo só
+para entregar ao st.download_button custa segundos mesmo quando ninguém
+baixa. botao_download() só chama `gerar()` quando o usuário pede o arquivo;
+os bytes ficam num LRU do processo (teto MMR_DOWNLOADS_MB, padrão 256 MB),
+chaveado pelo hash dos dados filtrados + opções da exportação. Com os
+mesmos filtros, o botão de download já aparece pronto.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+import pandas as pd
+import streamlit as st
+
+LIMITE_BYTES = int(os.environ.get("MMR_DOWNLOADS_MB", "256")) * 1024 * 1024
+
+_lock = threading.Lock()
+_cache = OrderedDict()   # chave -> bytes (mais recente no fim)
+_total = 0
+
+
+# ----------------- Chave -----------------
+def _atualizar_hash(h, parte):
+    if isinstance(parte, pd.DataFrame):
+        h.update(repr([str(c) for c in parte.columns]).encode())
+        h.update(repr([str(t) for t in parte.dtypes]).encode())
+        try:
+            h.update(pd.util.hash_pandas_object(parte, index=True).to_numpy().tobytes())
+        except TypeError:  # células não hasheáveis (listas, dicts)
+            h.update(parte.to_csv().encode())
+    elif isinstance(parte, pd.Series):
+        h.update(repr((str(parte.name), str(parte.dtype))).encode())
+        try:
+            h.update(pd.util.hash_pandas_object(parte, index=True).to_numpy().tobytes())
+        except TypeError:
+            h.update(parte.to_csv().encode())
+    elif isinstance(parte, dict):
+        for k in sorted(parte, key=str):
+            _atualizar_hash(h, k)
+            _atualizar_hash(h, parte[k])
+    elif isinstance(parte, (list, tuple)):
+        for p in parte:
+            _atualizar_hash(h, p)
+    elif isinstance(parte, (set, frozenset)):
+        for p in sorted(parte, key=repr):
+            _atualizar_hash(h, p)
+    elif isinstance(parte, (bytes, bytearray)):
+        h.update(parte)
+    else:
+        h.update(repr(parte).encode())
+    h.update(b"\x1f")
+
+
+def chave_download(*partes) -> str:
+    """Hash estável de DataFrames/Series/valores (dados filtrados + opções)."""
+    h = hashlib.sha1()
+    for parte in partes:
+        _atualizar_hash(h, parte)
+    return h.hexdigest()
+
+
+# ----------------- LRU -----------------
+def _obter(chave):
+    with _lock:
+        dados = _cache.get(chave)
+        if dados is not None:
+            _cache.move_to_end(chave)
+        return dados
+
+
+def _guardar(chave, dados):
+    global _total
+    if len(dados) > LIMITE_BYTES:
+        return
+    with _lock:
+        antigo = _cache.pop(chave, None)
+        if antigo is not None:
+            _total -= len(antigo)
+        _cache[chave] = dados
+        _total += len(dados)
+        while _total > LIMITE_BYTES and _cache:
+            _, removido = _cache.popitem(last=False)
+            _total -= len(removido)
+
+
+def _como_bytes(conteudo):
+    if isinstance(conteudo, BytesIO):
+        return conteudo.getvalue()
+    if isinstance(conteudo, str):
+        return conteudo.encode("utf-8")
+    return bytes(conteudo)
+
+
+def gerar_em_cache(chave, gerar) -> bytes:
+    """Bytes de `gerar()` para `chave`, gerando só se ainda não estiverem no LRU."""
+    dados = _obter(chave)
+    if dados is None:
+        dados = _como_bytes(gerar())
+        _guardar(chave, dados)
+    return dados
+
+
+# ----------------- Botão -----------------
+def botao_download(label, gerar, dados, file_name, mime, key=None, opcoes=None, rotulo_gerar=None, **kwargs):
+    """
+    st.download_button com o arquivo montado só quando pedido.
+
+    dados:  o que determina o conteúdo (DataFrame filtrado, tupla de DataFrames...)
+    opcoes: parâmetros da exportação que não estão em `dados` (nome de aba, período...)
+    gerar:  função sem argumentos -> bytes/BytesIO
+
+    Se os bytes dessa combinação já estão no cache, mostra o download direto;
+    senão mostra um botão "Gerar" e, ao clicar, gera e mostra o download.
+    """
+    key = key or f"dl_{file_name}"
+    chave = chave_download(file_name, dados, opcoes)
+    conteudo = _obter(chave)
+    if conteudo is None:
+        if not st.button(rotulo_gerar or f"⚙️ Gerar {file_name}", key=f"{key}__gerar",
+                         use_container_width=kwargs.get("use_container_width", False)):
+            return False
+        with st.spinner("⏳ Gerando arquivo..."):
+            conteudo = gerar_em_cache(chave, gerar)
+    return st.download_button(label=label, data=conteudo, file_name=file_name, mime=mime, key=key, **kwargs)
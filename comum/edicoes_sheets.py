@@ -0,0 +1,78 @@
+"""
+Gravação de edições feitas na tela (st.data_editor) de volta numa aba do
+Sheets, sem sobrescrever o que outra pessoa mudou no meio tempo.
+
+O submit de um form roda a página de novo, e a página relê a aba. Então o
+"antes" que importa não é o da releitura: é o que estava na tela quando o
+usuário clicou. A página guarda esse instantâneo (instantaneo()) a cada
+render e, ao salvar, planejar_gravacao() compara a aba lida agora com ele:
+
+- célula igual ao que a tela mostrava -> grava o valor editado
+- célula já igual ao valor editado    -> nada a fazer
+- célula diferente dos dois           -> conflito, fica de fora
+"""
+import pandas as pd
+
+
+def mesmo_valor(a, b) -> bool:
+    """Compara textos de célula; get_all_records devolve números ("007" -> 7)."""
+    a = "" if a is None or (isinstance(a, float) and pd.isna(a)) else str(a).strip()
+    b = "" if b is None or (isinstance(b, float) and pd.isna(b)) else str(b).strip()
+    if a == b:
+        return True
+    try:
+        return float(a.replace(",", ".")) == float(b.replace(",", "."))
+    except ValueError:
+        return False
+
+
+def instantaneo(df, colunas, chave="Duplicidade"):
+    """{chave: {coluna: valor}} das `colunas` como estão na tela (1ª linha de cada chave)."""
+    colunas = [c for c in colunas if c in df.columns]
+    if chave not in df.columns or not colunas:
+        return {}
+    base = df[[chave, *colunas]].copy()
+    base[chave] = base[chave].astype(str).str.strip()
+    base = base.drop_duplicates(chave).set_index(chave)
+    return {k: {c: v for c, v in linha.items()} for k, linha in base.to_dict("index").items()}
+
+
+def planejar_gravacao(valores, edicoes, tela, chave="Duplicidade"):
+    """
+    Células a gravar e conflitos, a partir da aba lida agora.
+
+    valores:  aba inteira (get_all_values, 1ª linha = cabeçalho)
+    edicoes:  [(chave, coluna, novo valor)] com os nomes de coluna da aba
+    tela:     instantâneo do que o usuário viu ({chave: {coluna: valor}})
+
+    Devolve ({(linha, coluna 1-based): valor}, [conflitos]) ou None se a aba
+    não tem a coluna `chave`. Chave/coluna fora do instantâneo (a tela não
+    mostrava) também vira conflito: não há o que comparar.
+    """
+    if not valores or chave not in valores[0]:
+        return None
+    header = valores[0]
+    col_map = {c: i + 1 for i, c in enumerate(header)}
+    i_chave = header.index(chave)
+    linhas_por_chave = {}
+    for n, linha in enumerate(valores[1:], start=2):
+        k = str(linha[i_chave]).strip() if i_chave < len(linha) else ""
+        linhas_por_chave.setdefault(k, []).append((n, linha))
+
+    celulas, conflitos = {}, []
+    for k, coluna, novo in edicoes:
+        if coluna not in col_map:
+            continue
+        k, novo = str(k).strip(), str(novo).strip()
+        i_col = col_map[coluna] - 1
+        visto = tela.get(k, {}).get(coluna)
+        for n, linha in linhas_por_chave.get(k, []):
+            no_sheets = linha[i_col] if i_col < len(linha) else ""
+            if mesmo_valor(no_sheets, novo):
+                continue
+            if coluna not in tela.get(k, {}) or not mesmo_valor(no_sheets, visto):
+                conflitos.append({chave: k, "Coluna": coluna, "Na tela": visto,
+                                  "No Sheets": no_sheets, "Editado": novo})
+                continue
+            celulas[(n, col_map[coluna])] = novo
+    return celulas, conflitos
@@ -0,0 +1,198 @@
+"""
+Exportação .xlsx por coluna com xlsxwriter.
+
+- cada coluna é convertida de uma vez (número / data / texto) e ganha um
+  escritor tipado (ws.write só nas colunas mistas); nada de df.iterrows()
+- formatos vêm de um cache (dict de propriedades -> Format): cada combinação
+  é criada uma única vez no workbook, em vez de um add_format por linha
+- estilos condicionais são regras (máscara booleana por linha + formato,
+  opcionalmente restritas a algumas colunas), resolvidas em numpy por coluna
+- o workbook é aberto em modo constant_memory: as linhas vão para o disco à
+  medida que são escritas (exceto quando há tabela do Excel, que o xlsxwriter
+  não suporta nesse modo)
+
+Exemplo:
+
+    buf = exportar_excel(
+        df, aba="Vendas",
+        formatos_coluna={"Total": FORMATO_REAIS},
+        regras=[(df["Loja"].eq("TOTAL"), {"bold": True, "bg_color": "#D9D9D9"})],
+        larguras="auto",
+    )
+"""
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+import xlsxwriter
+
+FORMATO_CABECALHO = {"bold": True, "bg_color": "#CCCCCC"}
+FORMATO_REAIS = {"num_format": "R$ #,##0.00"}
+FORMATO_PERCENTUAL = {"num_format": "0.00%"}
+FORMATO_INTEIRO = {"num_format": "0"}
+FORMATO_DATA = {"num_format": "dd/mm/yyyy"}
+
+LARGURA_MAXIMA = 60   # teto da largura "auto"
+
+
+class _Formatos:
+    """Um Format por combinação de propriedades (o xlsxwriter não deduplica)."""
+
+    def __init__(self, workbook):
+        self._wb = workbook
+        self._cache = {}
+
+    def __call__(self, *dicts):
+        props = {}
+        for d in dicts:
+            if d:
+                props.update(d)
+        if not props:
+            return None
+        chave = tuple(sorted(props.items()))
+        fmt = self._cache.get(chave)
+        if fmt is None:
+            fmt = self._cache[chave] = self._wb.add_format(props)
+        return fmt
+
+
+def _valores_coluna(serie, ws):
+    """Series -> (lista de valores com None no lugar de vazios, escritor tipado)."""
+    if pd.api.types.is_bool_dtype(serie):
+        return serie.tolist(), ws.write_boolean
+    if pd.api.types.is_numeric_dtype(serie):
+        arr = serie.to_numpy(dtype=float)
+        valores = arr.tolist()
+        if np.isnan(arr).any() or np.isinf(arr).any():
+            ok = np.isfinite(arr)
+            valores = [v if o else None for v, o in zip(valores, ok)]
+        return valores, ws.write_number
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        if getattr(serie.dt, "tz", None) is not None:
+            serie = serie.dt.tz_localize(None)
+        datas = serie.dt.to_pydatetime().tolist()
+        nulos = serie.isna().to_numpy()
+        return [None if n else d for d, n in zip(datas, nulos)], ws.write_datetime
+    # object/misto: texto, número, data, "" ... -> ws.write resolve o tipo
+    nulos = serie.isna().to_numpy()
+    return [None if n else v for v, n in zip(serie.tolist(), nulos)], ws.write
+
+
+def _formatos_por_linha(n, coluna, base, regras, formatos):
+    """Lista de Format (um por linha) para `coluna`, combinando base + regras que batem."""
+    aplicaveis = [(m, f) for m, f, cols in regras if cols is None or coluna in cols]
+    if not aplicaveis:
+        return [formatos(base)] * n
+    codigo = np.zeros(n, dtype=np.int64)
+    for bit, (mascara, _) in enumerate(aplicaveis):
+        codigo |= mascara.astype(np.int64) << bit
+    unicos, inversa = np.unique(codigo, return_inverse=True)
+    por_codigo = [
+        formatos(base, *[f for bit, (_, f) in enumerate(aplicaveis) if (int(u) >> bit) & 1])
+        for u in unicos
+    ]
+    return [por_codigo[i] for i in inversa]
+
+
+def _normalizar_regras(regras, n):
+    out = []
+    for regra in regras or ():
+        mascara, formato = regra[0], regra[1]
+        colunas = set(regra[2]) if len(regra) > 2 and regra[2] is not None else None
+        if np.isscalar(mascara):
+            mascara = np.full(n, bool(mascara))
+        else:
+            mascara = pd.Series(mascara).fillna(False).to_numpy(dtype=bool)
+        if len(mascara) != n:
+            raise ValueError(f"Regra com {len(mascara)} linhas para um DataFrame de {n}.")
+        out.append((mascara, formato, colunas))
+    if len(out) > 62:
+        raise ValueError("Máximo de 62 regras de formatação por aba.")
+    return out
+
+
+def _larguras_auto(df):
+    larguras = {}
+    for col in df.columns:
+        s = df[col]
+        tam = s[s.notna() & s.astype(str).ne("")].astype(str).str.len().max() if len(s) else 0
+        tam = 0 if pd.isna(tam) else int(tam)
+        larguras[col] = min(max(tam, len(str(col))) + 2, LARGURA_MAXIMA)
+    return larguras
+
+
+def escrever_aba(workbook, formatos, df, aba="Dados", formatos_coluna=None, formato_base=None,
+                 regras=None, formato_cabecalho=FORMATO_CABECALHO, larguras=None,
+                 altura_cabecalho=None, congelar_cabecalho=False, tabela=None):
+    """
+    Escreve `df` numa nova aba de `workbook` (linha 0 = cabeçalho) e devolve a worksheet.
+
+    formatos_coluna: {coluna: dict de formato} (ex.: FORMATO_REAIS)
+    formato_base:    dict aplicado a todas as células de dados (ex.: {"border": 1})
+    regras:          [(máscara por linha, dict de formato[, colunas])]; todas as que
+                     batem são combinadas, na ordem (a última vence no conflito)
+    larguras:        "auto" ou {coluna ou índice: largura}
+    tabela:          opções de ws.add_table ({"name": ..., "style": ...}); exige
+                     workbook sem constant_memory
+    """
+    ws = workbook.add_worksheet(aba)
+    formatos_coluna = formatos_coluna or {}
+    colunas = list(df.columns)
+    n = len(df)
+    regras = _normalizar_regras(regras, n)
+
+    if altura_cabecalho:
+        ws.set_row(0, altura_cabecalho)
+    if larguras is not None:
+        for chave, largura in (_larguras_auto(df) if larguras == "auto" else larguras).items():
+            j = chave if isinstance(chave, int) else (colunas.index(chave) if chave in colunas else None)
+            if j is not None:
+                ws.set_column(j, j, largura)
+    if congelar_cabecalho:
+        ws.freeze_panes(1, 0)
+
+    fmt_cab = formatos(formato_cabecalho)
+    for j, nome in enumerate(colunas):
+        ws.write_string(0, j, str(nome), fmt_cab)
+
+    valores, escritores, fmts = [], [], []
+    for j, col in enumerate(colunas):
+        v, escrever = _valores_coluna(df.iloc[:, j], ws)
+        valores.append(v)
+        escritores.append(escrever)
+        fmts.append(_formatos_por_linha(n, col, {**(formato_base or {}), **formatos_coluna.get(col, {})},
+                                        regras, formatos))
+
+    # constant_memory exige linha a linha, em ordem; as colunas já estão prontas
+    faixa = range(len(colunas))
+    for i in range(n):
+        r = i + 1
+        for j in faixa:
+            v = valores[j][i]
+            if v is None:
+                ws.write_blank(r, j, None, fmts[j][i])
+            else:
+                escritores[j](r, j, v, fmts[j][i])
+
+    if tabela is not None:
+        opcoes = {"columns": [{"header": str(c)} for c in colunas], **tabela}
+        ws.add_table(0, 0, max(n, 1), max(len(colunas) - 1, 0), opcoes)
+    return ws
+
+
+def exportar_excel(df, aba="Dados", ajustar=None, **opcoes) -> BytesIO:
+    """
+    DataFrame -> BytesIO de um .xlsx com uma aba (opções de `escrever_aba`).
+
+    `ajustar(workbook, worksheet)` roda antes de fechar o arquivo (slicers,
+    validações etc.).
+    """
+    buf = BytesIO()
+    constant_memory = opcoes.get("tabela") is None
+    wb = xlsxwriter.Workbook(buf, {"constant_memory": True} if constant_memory else {"in_memory": True})
+    ws = escrever_aba(wb, _Formatos(wb), df, aba=aba, **opcoes)
+    if ajustar is not None:
+        ajustar(wb, ws)
+    wb.close()
+    buf.seek(0)
+    return buf
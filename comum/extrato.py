@@ -0,0 +1,187 @@
+import io
+import re
+import unicodedata
+
+import pandas as pd
+
+try:
+    import pdfplumber
+except ImportError:
+    pdfplumber = None
+
+COLUNAS = ["Data", "Valor", "Descrição", "Documento"]
+LINHAS_CABECALHO = 30  # linhas iniciais onde se procura o cabeçalho em CSV/Excel
+
+_RE_DINHEIRO = r"\(?-?(?:R\$\s*)?\d{1,3}(?:\.\d{3})*,\d{2}\)?(?:\s*[-+CD](?![A-Za-z]))?"
+_RE_LINHA_PDF = re.compile(r"^(\d{1,2}/\d{1,2}(?:/\d{2,4})?)\s+(.*)$")
+_RE_VALOR_PDF = re.compile(_RE_DINHEIRO)
+_RE_DOCUMENTO = re.compile(r"(?<![\d/,.])(\d{4,})(?![\d/,.])")
+_IGNORAR_PDF = re.compile(r"SALDO|S A L D O", re.IGNORECASE)
+
+
+# ----------------- Conversões -----------------
+def _norm(c):
+    s = unicodedata.normalize("NFKD", str(c)).encode("ASCII", "ignore").decode("ASCII")
+    return re.sub(r"[^a-z0-9]", "", s.lower())
+
+
+def _valor_extrato(serie):
+    """
+    Valores de extrato -> float com sinal: "1.234,56", "-1.234,56", "1.234,56-",
+    "1.234,56 D", "(1.234,56)", "R$ 1.234,56 C" e também "1234.56".
+    """
+    s = serie.astype(str).str.strip().str.upper()
+    negativo = (
+        s.str.startswith("-") | s.str.endswith("-") | s.str.endswith("D")
+        | (s.str.startswith("(") & s.str.endswith(")"))
+    )
+    s = s.str.replace(r"R\$|[\s()+CD-]", "", regex=True)
+    br = s.str.contains(",", regex=False)
+    s = s.where(~br, s.str.replace(".", "", regex=False).str.replace(",", ".", regex=False))
+    valor = pd.to_numeric(s, errors="coerce")
+    return valor.where(~negativo, -valor.abs())
+
+
+def _data_extrato(serie, ano_padrao=None):
+    s = serie.astype(str).str.strip()
+    if ano_padrao:
+        s = s.where(~s.str.fullmatch(r"\d{1,2}/\d{1,2}"), s + f"/{ano_padrao}")
+    iso = s.str.match(r"\d{4}-\d{2}-\d{2}")
+    out = pd.to_datetime(s.where(~iso), dayfirst=True, errors="coerce")
+    if iso.any():
+        out[iso] = pd.to_datetime(s[iso].str[:10], format="%Y-%m-%d", errors="coerce")
+    return out.dt.floor("D")
+
+
+# ----------------- CSV / Excel -----------------
+def _papel_coluna(nome):
+    k = _norm(nome)
+    if not k or "saldo" in k:
+        return None
+    if k.startswith("data") or k in ("dt", "dtlancamento", "datamov"):
+        return "data"
+    if "credito" in k or k in ("entrada", "entradas"):
+        return "credito"
+    if "debito" in k or k in ("saida", "saidas"):
+        return "debito"
+    if "valor" in k or k.startswith("vlr") or "montante" in k or k == "quantia":
+        return "valor"
+    if "doc" in k or k.startswith("numero") or k in ("nr", "num", "ndoc", "cheque"):
+        return "documento"
+    if "hist" in k or "descr" in k or "lanc" in k or "memo" in k or "detalhe" in k:
+        return "descricao"
+    return None
+
+
+def _achar_cabecalho(bruto):
+    """Primeira linha (entre as LINHAS_CABECALHO iniciais) com coluna de data e de valor."""
+    for i in range(min(LINHAS_CABECALHO, len(bruto))):
+        papeis = {_papel_coluna(v) for v in bruto.iloc[i].tolist()}
+        if "data" in papeis and papeis & {"valor", "credito", "debito"}:
+            return i
+    return None
+
+
+def _tabela_para_lancamentos(bruto):
+    bruto = bruto.fillna("").astype(str)
+    i = _achar_cabecalho(bruto)
+    if i is None:
+        return pd.DataFrame(columns=COLUNAS)
+    papeis = {}
+    for j, nome in enumerate(bruto.iloc[i].tolist()):
+        papel = _papel_coluna(nome)
+        if papel and papel not in papeis:
+            papeis[papel] = j
+    corpo = bruto.iloc[i + 1:]
+
+    out = pd.DataFrame(index=corpo.index)
+    out["Data"] = _data_extrato(corpo.iloc[:, papeis["data"]])
+    if "valor" in papeis:
+        out["Valor"] = _valor_extrato(corpo.iloc[:, papeis["valor"]])
+    else:
+        # colunas separadas de crédito e débito: Valor = crédito - débito
+        partes = [_valor_extrato(corpo.iloc[:, papeis[p]]).abs() * sinal
+                  for p, sinal in (("credito", 1), ("debito", -1)) if p in papeis]
+        out["Valor"] = pd.concat(partes, axis=1).sum(axis=1, min_count=1)
+    out["Descrição"] = corpo.iloc[:, papeis["descricao"]].str.strip() if "descricao" in papeis else ""
+    out["Documento"] = corpo.iloc[:, papeis["documento"]].str.strip() if "documento" in papeis else ""
+    return out
+
+
+def _ler_csv(file_bytes):
+    for enc in ("utf-8-sig", "latin-1"):
+        try:
+            texto = file_bytes.decode(enc)
+            break
+        except UnicodeDecodeError:
+            continue
+    return pd.read_csv(io.StringIO(texto), sep=None, engine="python", header=None, dtype=str,
+                       skip_blank_lines=False, on_bad_lines="skip")
+
+
+# ----------------- PDF -----------------
+def _linhas_pdf(file_bytes):
+    with pdfplumber.open(io.BytesIO(file_bytes)) as pdf:
+        for page in pdf.pages:
+            for linha in (page.extract_text() or "").splitlines():
+                yield linha.strip()
+
+
+def _pdf_para_lancamentos(file_bytes, ano_padrao=None):
+    """
+    Linhas "dd/mm[/aaaa] descrição ... 1.234,56 [C|D]" viram lançamentos. Linhas sem
+    data que trazem valor herdam a data anterior (bancos que não repetem a data no dia).
+    O primeiro valor da linha é o lançamento; os seguintes (saldo) são ignorados.
+    """
+    registros = []
+    data_atual = None
+    for linha in _linhas_pdf(file_bytes):
+        if not linha or _IGNORAR_PDF.search(linha):
+            continue
+        m = _RE_LINHA_PDF.match(linha)
+        if m:
+            data_atual, resto = m.group(1), m.group(2)
+        elif data_atual:
+            resto = linha
+        else:
+            continue
+        valor = _RE_VALOR_PDF.search(resto)
+        if not valor:
+            continue
+        descricao = resto[:valor.start()].strip()
+        docs = _RE_DOCUMENTO.findall(descricao)
+        registros.append((data_atual, valor.group(0), descricao, docs[-1] if docs else ""))
+
+    if not registros:
+        return pd.DataFrame(columns=COLUNAS)
+    bruto = pd.DataFrame(registros, columns=COLUNAS)
+    bruto["Data"] = _data_extrato(bruto["Data"], ano_padrao)
+    bruto["Valor"] = _valor_extrato(bruto["Valor"])
+    return bruto
+
+
+# ----------------- Público -----------------
+def ler_extrato(file_bytes: bytes, file_name: str, ano_padrao=None) -> pd.DataFrame:
+    """
+    Extrato bancário (CSV/TXT, XLSX/XLS ou PDF) em lançamentos tipados:
+    Data (datetime64), Valor (float; crédito positivo, débito negativo),
+    Descrição e Documento (texto). Linhas sem data ou sem valor são descartadas.
+
+    `ano_padrao` completa datas "dd/mm" de extratos em PDF que omitem o ano.
+    """
+    ext = file_name.lower().rsplit(".", 1)[-1] if "." in file_name else ""
+    if ext in ("csv", "txt"):
+        df = _tabela_para_lancamentos(_ler_csv(file_bytes))
+    elif ext in ("xlsx", "xls"):
+        folhas = pd.read_excel(io.BytesIO(file_bytes), sheet_name=None, header=None, dtype=str)
+        partes = [_tabela_para_lancamentos(f) for f in folhas.values()]
+        partes = [p for p in partes if not p.empty]
+        df = pd.concat(partes, ignore_index=True) if partes else pd.DataFrame(columns=COLUNAS)
+    elif ext == "pdf" and pdfplumber is not None:
+        df = _pdf_para_lancamentos(file_bytes, ano_padrao)
+    else:
+        return pd.DataFrame(columns=COLUNAS)
+
+    df = df.dropna(subset=["Data", "Valor"])
+    df = df[df["Valor"] != 0]
+    return df[COLUNAS].reset_index(drop=True)
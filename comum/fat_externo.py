@@ -0,0 +1,209 @@
+import os
+import re
+import threading
+import unicodedata
+from datetime import datetime, timedelta
+
+import pandas as pd
+import streamlit as st
+
+from comum.armazenamento import diretorio_cache, escrever_atomico, ler_json, salvar_json
+from comum.conversao import para_data_br, para_float_br
+from comum.gsheets import abrir_planilha
+from comum.tabela_empresa import normalizar_codigo
+
+ABA_FAT_EXTERNO = "Fat Sistema Externo"
+TTL_FAT_EXTERNO = 300          # segundos entre verificações de linhas novas
+RESYNC_COMPLETO_HORAS = 24     # releitura completa periódica (pega edições no meio da aba)
+RENDER = "UNFORMATTED_VALUE"   # números/datas crus, sem "R$ 1.234,56"
+
+# colunas tipadas (nome normalizado -> tipo)
+_COLS_VALOR = {"fattotal", "servtx", "fatreal", "ticket"}
+_COLS_CODIGO = {"codigoeverest", "codigogrupoeverest"}
+_COLS_INTEIRO = {"ano"}
+_COLS_CHAVE = ("M", "N")
+
+_lock = threading.Lock()
+
+
+# ----------------- Helpers -----------------
+def _norm_col(c):
+    s = unicodedata.normalize("NFKD", str(c)).encode("ASCII", "ignore").decode("ASCII")
+    return re.sub(r"[^a-z0-9]", "", s.lower())
+
+
+def _texto(v):
+    if v is None:
+        return ""
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    return str(v).strip()
+
+
+def _arquivos():
+    pasta = diretorio_cache("fat_externo")
+    return os.path.join(pasta, "dados.parquet"), os.path.join(pasta, "meta.json")
+
+
+def _montar(header, linhas):
+    """Linhas cruas (UNFORMATTED_VALUE) -> DataFrame já tipado."""
+    n = len(header)
+    linhas = [(list(r) + [""] * n)[:n] for r in linhas]
+    df = pd.DataFrame(linhas, columns=header, dtype=object)
+    df = df.loc[:, [c != "" for c in df.columns]]
+    df = df.loc[:, ~df.columns.duplicated()]
+    df = df.loc[df.ne("").any(axis=1)]
+    for col in df.columns:
+        k = _norm_col(col)
+        if k == "data":
+            df[col] = para_data_br(df[col])
+        elif k in _COLS_VALOR:
+            df[col] = para_float_br(df[col])
+        elif k in _COLS_CODIGO:
+            df[col] = normalizar_codigo(df[col].map(_texto))
+        elif k in _COLS_INTEIRO:
+            df[col] = pd.to_numeric(df[col].map(_texto), errors="coerce").astype("Int64")
+        else:
+            df[col] = df[col].map(_texto)
+    return df.reset_index(drop=True)
+
+
+def _chave(header, linha):
+    """Conteúdo das colunas M/N (ou da linha inteira, se não existirem) para detectar mudanças."""
+    linha = (list(linha) + [""] * len(header))[:len(header)]
+    idx = [i for i, h in enumerate(header) if h in _COLS_CHAVE] or range(len(header))
+    return [_texto(linha[i]) for i in idx]
+
+
+def _sem_vazias_finais(cab):
+    cab = list(cab)
+    while cab and cab[-1] == "":
+        cab.pop()
+    return cab
+
+
+def _letra_coluna(n):
+    letras = ""
+    while n > 0:
+        n, r = divmod(n - 1, 26)
+        letras = chr(65 + r) + letras
+    return letras
+
+
+def _salvar(df, arq_dados):
+    escrever_atomico(arq_dados, lambda tmp: df.to_parquet(tmp, index=False))
+
+
+# ----------------- Sincronização -----------------
+def _sincronizar_completo(ws, arq_dados):
+    valores = ws.get_all_values(value_render_option=RENDER)
+    header = [str(h).strip() for h in valores[0]] if valores else []
+    df = _montar(header, valores[1:])
+    _salvar(df, arq_dados)
+    return df, {
+        "header": header,
+        "linhas_planilha": len(valores),
+        "chave_ultima": _chave(header, valores[-1]) if valores else [],
+        "completo_em": datetime.now().isoformat(),
+    }
+
+
+def _sincronizar_incremental(ws, meta, arq_dados):
+    """Busca só as linhas abaixo da última espelhada. None = espelho divergiu, refazer completo."""
+    header = meta["header"]
+    n = int(meta["linhas_planilha"])
+    ult = _letra_coluna(len(header))
+    cab, ultima, novas = ws.batch_get(
+        ["1:1", f"A{n}:{ult}{n}", f"A{n + 1}:{ult}"],
+        value_render_option=RENDER,
+    )
+    cab = [str(h).strip() for h in (cab[0] if cab else [])]
+    if _sem_vazias_finais(cab) != _sem_vazias_finais(header):
+        return None
+    if _chave(header, ultima[0] if ultima else []) != meta["chave_ultima"]:
+        return None  # linhas apagadas/reordenadas acima do ponto de sincronização
+
+    novas = list(novas)
+    if novas:
+        df_novos = _montar(header, novas)
+        if not df_novos.empty:
+            df = pd.concat([pd.read_parquet(arq_dados), df_novos], ignore_index=True)
+            _salvar(df, arq_dados)
+        meta = dict(meta, linhas_planilha=n + len(novas), chave_ultima=_chave(header, novas[-1]))
+    return len(novas), meta
+
+
+def sincronizar_fat_externo(forcar_completo=False):
+    """
+    Atualiza o espelho local (Parquet) da aba 'Fat Sistema Externo'.
+
+    Normalmente lê só as linhas acrescentadas desde a última sincronização,
+    conferindo antes o cabeçalho e as chaves M/N da última linha espelhada.
+    Se algo divergir (linhas apagadas, colunas novas) ou a última leitura
+    completa tiver mais de RESYNC_COMPLETO_HORAS, relê a aba inteira.
+    """
+    arq_dados, arq_meta = _arquivos()
+    with _lock:
+        meta = ler_json(arq_meta, {})
+        ws = abrir_planilha("Vendas diarias").worksheet(ABA_FAT_EXTERNO)
+
+        completo_em = meta.get("completo_em")
+        vencido = (not completo_em or
+                   datetime.now() - datetime.fromisoformat(completo_em) > timedelta(hours=RESYNC_COMPLETO_HORAS))
+        if not forcar_completo and not vencido and os.path.exists(arq_dados):
+            res = _sincronizar_incremental(ws, meta, arq_dados)
+            if res is not None:
+                novas, meta = res
+                meta["sincronizado_em"] = datetime.now().isoformat()
+                salvar_json(arq_meta, meta)
+                return {"modo": "incremental", "linhas_novas": novas}
+
+        df, meta = _sincronizar_completo(ws, arq_dados)
+        meta["sincronizado_em"] = meta["completo_em"]
+        salvar_json(arq_meta, meta)
+        return {"modo": "completo", "linhas_novas": len(df)}
+
+
+def espelho_fat_externo():
+    """
+    Sincroniza (se der) e devolve (caminho do Parquet, meta) do espelho local.
+
+    Se a planilha estiver inacessível mas já houver espelho, avisa e segue com ele.
+    """
+    arq_dados, arq_meta = _arquivos()
+    try:
+        sincronizar_fat_externo()
+    except Exception as e:
+        if not os.path.exists(arq_dados):
+            raise
+        meta = ler_json(arq_meta, {})
+        st.warning(f"⚠️ Falha ao sincronizar 'Fat Sistema Externo' ({e}). "
+                   f"Usando espelho local de {meta.get('sincronizado_em', '?')}.")
+    return arq_dados, ler_json(arq_meta, {})
+
+
+@st.cache_data(ttl=TTL_FAT_EXTERNO, show_spinner=False)
+def carregar_fat_externo():
+    """
+    'Fat Sistema Externo' já tipado, lido do espelho local após sincronizar.
+
+    Data -> datetime64; Fat.Total, Serv/Tx, Fat.Real, Ticket -> float;
+    códigos Everest -> texto só com dígitos; Ano -> Int64; demais colunas -> texto.
+    """
+    arq_dados, _ = espelho_fat_externo()
+    return pd.read_parquet(arq_dados)
+
+
+def invalidar_fat_externo(completo=False):
+    """
+    Chamar após escrever na aba. Apêndices são pegos pela sincronização
+    incremental; use completo=True após apagar/editar linhas existentes.
+    """
+    if completo:
+        _, arq_meta = _arquivos()
+        with _lock:
+            if os.path.exists(arq_meta):
+                os.remove(arq_meta)
+    carregar_fat_externo.clear()
+    from comum.cubo_vendas import carregar_cubo_vendas
+    carregar_cubo_vendas.clear()
@@ -0,0 +1,114 @@
+import json
+
+import pandas as pd
+import streamlit as st
+import gspread
+from oauth2client.service_account import ServiceAccountCredentials
+
+from comum.indice_chaves import linhas_anexadas
+
+SCOPE = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+
+# Planilhas conhecidas: abrir por chave evita a busca por título no Drive
+PLANILHAS = {
+    "Vendas diarias": "1AVacOZDQT8vT-E8CiD59IVREe3TpKwE_25wjsj--qTU",
+}
+
+
+@st.cache_resource
+def get_gspread_client():
+    """Cliente gspread único por processo (compartilhado entre sessões)."""
+    secret = st.secrets.get("GOOGLE_SERVICE_ACCOUNT")
+    if secret is None:
+        raise RuntimeError("st.secrets['GOOGLE_SERVICE_ACCOUNT'] não encontrado.")
+    credentials_dict = json.loads(secret) if isinstance(secret, str) else dict(secret)
+    credentials = ServiceAccountCredentials.from_json_keyfile_dict(credentials_dict, SCOPE)
+    return gspread.authorize(credentials)
+
+
+def abrir_planilha(nome_ou_chave, gc=None):
+    """Abre pelo título; usa a chave quando a planilha está em PLANILHAS."""
+    gc = gc or get_gspread_client()
+    chave = PLANILHAS.get(nome_ou_chave)
+    if chave:
+        return gc.open_by_key(chave)
+    return gc.open(nome_ou_chave)
+
+
+# ----------------- Escrita em delta -----------------
+def valores_para_planilha(df):
+    """
+    DataFrame -> lista de linhas para o gspread, convertida por coluna:
+    numéricas viram int/float nativos, o resto texto; vazios viram "".
+    """
+    colunas = []
+    for col in df.columns:
+        s = df[col]
+        nulos = s.isna()
+        if pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s):
+            colunas.append(s.astype(object).where(~nulos, "").tolist())
+        else:
+            colunas.append(s.astype(str).where(~nulos, "").tolist())
+    return [list(linha) for linha in zip(*colunas)]
+
+
+def _faixas(linhas):
+    """[2, 3, 4, 9] -> [(2, 4), (9, 9)] (1-based, inclusivo)."""
+    faixas = []
+    for r in sorted(set(linhas)):
+        if faixas and r == faixas[-1][1] + 1:
+            faixas[-1] = (faixas[-1][0], r)
+        else:
+            faixas.append((r, r))
+    return faixas
+
+
+def apagar_linhas(ws, linhas):
+    """Apaga as linhas (1-based) num único batch_update, de baixo para cima."""
+    reqs = [
+        {"deleteDimension": {"range": {"sheetId": ws.id, "dimension": "ROWS",
+                                       "startIndex": r1 - 1, "endIndex": r2}}}
+        for r1, r2 in reversed(_faixas(linhas))
+    ]
+    if reqs:
+        ws.spreadsheet.batch_update({"requests": reqs})
+    return len(set(linhas))
+
+
+def substituir_linhas(ws, df, chaves, intervalo_chaves="A:B", value_input_option="RAW"):
+    """
+    Troca na aba só as linhas cujas células em `intervalo_chaves` estão em `chaves`
+    (conjunto de tuplas, p.ex. {("3S Checkout", "03/2025")}) pelas linhas de `df`.
+
+    Acrescenta as linhas novas (append_rows) e só então relê as colunas-chave:
+    o Sheets pode inserir o bloco no meio da aba (linha em branco no meio
+    dela desloca o fim da "tabela"), então as linhas a apagar são calculadas
+    sobre as posições de depois do append, fora da faixa que ele devolveu, e
+    apagadas num único batch_update. Nunca limpa a aba: se algo falhar no
+    meio, sobram no máximo linhas duplicadas do período, e rodar de novo
+    corrige. Aba vazia recebe cabeçalho (colunas de df) + linhas.
+    """
+    novas = valores_para_planilha(df)
+    if not ws.get(intervalo_chaves):
+        ws.update("A1", [list(map(str, df.columns))] + novas, value_input_option=value_input_option)
+        return {"kept_rows": 0, "deleted_rows": 0, "inserted_rows": len(novas)}
+
+    inseridas = set()
+    if novas:
+        resposta = ws.append_rows(novas, value_input_option=value_input_option,
+                                  insert_data_option="INSERT_ROWS", table_range="A1")
+        faixa = linhas_anexadas(resposta)
+        if faixa is None:
+            raise RuntimeError("append_rows não informou onde gravou as linhas; as antigas foram mantidas.")
+        inseridas = set(range(faixa[0], faixa[1] + 1))
+
+    existentes = ws.get(intervalo_chaves)
+    largura = max(len(c) for c in chaves) if chaves else 0
+    remover = [
+        i for i, linha in enumerate(existentes[1:], start=2)
+        if i not in inseridas
+        and tuple(str(v).strip() for v in (list(linha) + [""] * largura)[:largura]) in chaves
+    ]
+    apagadas = apagar_linhas(ws, remover)
+    return {"kept_rows": len(existentes) - 1 - len(inseridas) - apagadas,
+            "deleted_rows": apagadas, "inserted_rows": len(novas)}
@@ -0,0 +1,176 @@
+"""
+Índice local das chaves de deduplicação (M, N, ...) de uma aba do Sheets.
+
+Antes de cada envio as páginas baixavam a aba inteira só para montar os
+conjuntos de chaves. O índice guarda em .cache/indice_chaves, por aba,
+o número da linha e as colunas-chave de cada linha já vista:
+
+- sincronizar_indice() lê só o cabeçalho, a última linha indexada e as
+  linhas abaixo dela, e apenas das colunas-chave. Se o cabeçalho mudou ou
+  a última linha não bate mais (linhas apagadas/reordenadas), ou a última
+  leitura completa tem mais de RESYNC_COMPLETO_HORAS, relê as colunas-chave
+  inteiras
+- registrar_anexadas() acrescenta ao índice as linhas que a própria página
+  acabou de enviar, pela faixa devolvida pelo append_rows
+- ler_linhas() busca linhas completas só quando é preciso mostrá-las
+  (ex.: painel de suspeitos)
+
+A checagem de duplicados vira um .isin() contra as colunas do índice.
+"""
+import os
+import re
+import threading
+from datetime import datetime, timedelta
+
+import gspread
+import pandas as pd
+
+from comum.armazenamento import diretorio_cache, escrever_atomico, ler_json, salvar_json
+from comum.cota_sheets import chamar
+
+RESYNC_COMPLETO_HORAS = 24
+LINHAS_POR_LEITURA = 200   # faixas por batch_get em ler_linhas
+
+_lock = threading.Lock()
+
+
+# ----------------- Helpers -----------------
+def _arquivos(ws):
+    pasta = diretorio_cache("indice_chaves")
+    base = f"{ws.spreadsheet.id}_{ws.id}"
+    return os.path.join(pasta, f"{base}.parquet"), os.path.join(pasta, f"{base}.json")
+
+
+def _letra(indice0):
+    return re.sub(r"\d", "", gspread.utils.rowcol_to_a1(1, indice0 + 1))
+
+
+def _faixa(header, colunas):
+    """Colunas presentes -> (1ª letra, última letra, posição de cada chave na faixa ou None)."""
+    pos = [header.index(c) if c in header else None for c in colunas]
+    presentes = [p for p in pos if p is not None]
+    if not presentes:
+        return None
+    i0, i1 = min(presentes), max(presentes)
+    return _letra(i0), _letra(i1), [None if p is None else p - i0 for p in pos]
+
+
+def _chaves(linhas, rel, colunas, primeira_linha):
+    """Linhas cruas da faixa -> DataFrame [linha, *colunas] (texto sem espaços nas pontas)."""
+    largura = max((r for r in rel if r is not None), default=-1) + 1
+    linhas = [(list(r) + [""] * largura)[:largura] for r in linhas]
+    df = pd.DataFrame({"linha": range(primeira_linha, primeira_linha + len(linhas))})
+    for col, r in zip(colunas, rel):
+        df[col] = [str(l[r]).strip() for l in linhas] if r is not None else ""
+    return df
+
+
+def _ultima(df, colunas):
+    return [str(v) for v in df.iloc[-1][list(colunas)]] if len(df) else []
+
+
+def _salvar(df, arq):
+    escrever_atomico(arq, lambda tmp: df.to_parquet(tmp, index=False))
+
+
+# ----------------- Sincronização -----------------
+def _completo(ws, colunas, arq, arq_meta):
+    header = [str(h).strip() for h in chamar(ws.row_values, 1)]
+    faixa = _faixa(header, colunas)
+    if faixa is None:
+        df = pd.DataFrame(columns=["linha", *colunas])
+        n = 1
+    else:
+        l0, l1, rel = faixa
+        valores = chamar(ws.get, f"{l0}2:{l1}")
+        df = _chaves(valores, rel, colunas, 2)
+        n = 1 + len(valores)
+    _salvar(df, arq)
+    salvar_json(arq_meta, {
+        "header": header, "colunas": list(colunas), "linhas_planilha": n,
+        "chave_ultima": _ultima(df, colunas), "completo_em": datetime.now().isoformat(),
+    })
+    return df, header
+
+
+def sincronizar_indice(ws, colunas=("M", "N")):
+    """
+    (índice, cabeçalho) da aba, com o índice em dia.
+
+    índice: DataFrame com 'linha' (número da linha na planilha) e as `colunas`
+    como texto; coluna-chave ausente no cabeçalho vem vazia.
+    """
+    colunas = tuple(colunas)
+    arq, arq_meta = _arquivos(ws)
+    with _lock:
+        meta = ler_json(arq_meta, {})
+        completo_em = meta.get("completo_em")
+        valido = (meta.get("colunas") == list(colunas) and os.path.exists(arq) and completo_em and
+                  datetime.now() - datetime.fromisoformat(completo_em) <= timedelta(hours=RESYNC_COMPLETO_HORAS))
+        faixa = _faixa(meta.get("header", []), colunas) if valido else None
+        if faixa is not None:
+            l0, l1, rel = faixa
+            n = int(meta["linhas_planilha"])
+            cab, ultima, novas = chamar(ws.batch_get, ["1:1", f"{l0}{n}:{l1}{n}", f"{l0}{n + 1}:{l1}"])
+            header = [str(h).strip() for h in (cab[0] if cab else [])]
+            ultima = _chaves(ultima or [[]], rel, colunas, n)
+            if header == meta["header"] and (n == 1 or _ultima(ultima, colunas) == meta["chave_ultima"]):
+                df = pd.read_parquet(arq)
+                novas = list(novas)
+                if novas:
+                    df = pd.concat([df, _chaves(novas, rel, colunas, n + 1)], ignore_index=True)
+                    _salvar(df, arq)
+                    salvar_json(arq_meta, dict(meta, linhas_planilha=n + len(novas), chave_ultima=_ultima(df, colunas)))
+                return df, header
+        return _completo(ws, colunas, arq, arq_meta)
+
+
+# ----------------- Após enviar -----------------
+def linhas_anexadas(resposta):
+    """(primeira, última) linha escrita por ws.append_rows, ou None."""
+    faixa = ((resposta or {}).get("updates") or {}).get("updatedRange", "")
+    nums = re.findall(r"[A-Z]+(\d+)", faixa.split("!")[-1])
+    if not nums:
+        return None
+    return int(nums[0]), int(nums[-1])
+
+
+def registrar_anexadas(ws, resposta, df_chaves, colunas=("M", "N")):
+    """
+    Acrescenta ao índice as linhas recém-enviadas (df_chaves com as `colunas`,
+    na ordem do envio). Se alguém escreveu na aba no meio do caminho, não mexe:
+    a próxima sincronização lê o que estiver abaixo do último ponto conhecido.
+    """
+    colunas = tuple(colunas)
+    faixa = linhas_anexadas(resposta)
+    arq, arq_meta = _arquivos(ws)
+    with _lock:
+        meta = ler_json(arq_meta, {})
+        if (faixa is None or meta.get("colunas") != list(colunas) or not os.path.exists(arq)
+                or int(meta.get("linhas_planilha", -1)) != faixa[0] - 1
+                or faixa[1] - faixa[0] + 1 != len(df_chaves)):
+            return False
+        novas = pd.DataFrame({"linha": range(faixa[0], faixa[1] + 1)})
+        for col in colunas:
+            novas[col] = (df_chaves[col].astype(str).str.strip().to_numpy()
+                          if col in df_chaves.columns else "")
+        df = pd.concat([pd.read_parquet(arq), novas], ignore_index=True)
+        _salvar(df, arq)
+        salvar_json(arq_meta, dict(meta, linhas_planilha=faixa[1], chave_ultima=_ultima(df, colunas)))
+        return True
+
+
+# ----------------- Linhas completas -----------------
+def ler_linhas(ws, linhas, header):
+    """DataFrame (colunas = header) com as linhas pedidas da planilha, em poucas leituras."""
+    linhas = sorted(set(int(l) for l in linhas))
+    if not linhas:
+        return pd.DataFrame(columns=header)
+    ult = _letra(max(len(header), 1) - 1)
+    valores = []
+    for i in range(0, len(linhas), LINHAS_POR_LEITURA):
+        bloco = linhas[i:i + LINHAS_POR_LEITURA]
+        for faixa in chamar(ws.batch_get, [f"A{l}:{ult}{l}" for l in bloco]):
+            linha = list(faixa[0]) if faixa else []
+            valores.append((linha + [""] * len(header))[:len(header)])
+    return pd.DataFrame(valores, columns=header)
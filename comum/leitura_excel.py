@@ -0,0 +1,130 @@
+"""
+Leitura de planilhas enviadas por upload (.xlsx/.xlsm/.xls), uma vez só.
+
+As páginas abriam o mesmo arquivo várias vezes a cada rerun (header=None
+para validar o layout, depois skiprows/header para os dados, uma aba por
+vez). Aqui o arquivo é identificado pelo hash do conteúdo e cada aba é
+lida uma única vez, como grade crua (header=None), e guardada em
+st.cache_data; cabeçalho, linhas puladas e colunas pedidas saem dessa
+grade, sem reabrir o arquivo.
+
+Motor: o formato é detectado pelos bytes iniciais (zip = xlsx, OLE = xls).
+Com python-calamine instalado usa o motor "calamine" do pandas (Rust, bem
+mais rápido para xls e xlsx); senão openpyxl (que o pandas abre em modo
+read-only) ou xlrd, e o outro como segunda tentativa.
+
+    abas = abas_excel(uploaded_file)
+    df_raw = ler_aba(uploaded_file, "FaturamentoDiarioPorLoja")
+    df = ler_aba(uploaded_file, 0, header=0, colunas=["Data", "Valor"])
+"""
+import hashlib
+import io
+
+import pandas as pd
+import streamlit as st
+
+try:
+    import python_calamine  # noqa: F401  (habilita engine="calamine" no pandas >= 2.2)
+except ImportError:
+    python_calamine = None
+
+MAX_ARQUIVOS = 8    # arquivos distintos mantidos no cache
+MAX_ABAS = 48       # grades (arquivo × aba) mantidas no cache
+
+
+# ----------------- Formato -----------------
+def tipo_excel(dados: bytes) -> str:
+    """'xlsx', 'xls' ou 'desconhecido', pelos bytes iniciais."""
+    cabeca = bytes(dados[:8])
+    if cabeca[:4] in (b"PK\x03\x04", b"PK\x05\x06", b"PK\x07\x08"):
+        return "xlsx"
+    if cabeca == b"\xD0\xCF\x11\xE0\xA1\xB1\x1A\xE1":
+        return "xls"
+    return "desconhecido"
+
+
+def _motores(tipo):
+    nativo = ["xlrd", "openpyxl"] if tipo == "xls" else ["openpyxl", "xlrd"]
+    return (["calamine"] if python_calamine is not None else []) + nativo
+
+
+def _conteudo(arquivo):
+    """(hash, bytes) de UploadedFile / arquivo aberto / bytes."""
+    if isinstance(arquivo, (bytes, bytearray)):
+        dados = bytes(arquivo)
+    elif hasattr(arquivo, "getvalue"):
+        dados = arquivo.getvalue()
+    else:
+        pos = arquivo.tell()
+        arquivo.seek(0)
+        dados = arquivo.read()
+        arquivo.seek(pos)
+    return hashlib.sha1(dados).hexdigest(), dados
+
+
+def _abrir(dados, fn):
+    """fn(motor) no primeiro motor que conseguir abrir o arquivo."""
+    tipo = tipo_excel(dados)
+    erros = []
+    for motor in _motores(tipo):
+        try:
+            return fn(motor)
+        except Exception as e:
+            erros.append(f"{motor}: {e}")
+    raise RuntimeError(f"Falha lendo Excel (tipo={tipo}). Tentativas: {' | '.join(erros)}")
+
+
+# ----------------- Cache -----------------
+@st.cache_data(show_spinner=False, max_entries=MAX_ARQUIVOS)
+def _abas(chave, _dados):
+    return _abrir(_dados, lambda motor: list(pd.ExcelFile(io.BytesIO(_dados), engine=motor).sheet_names))
+
+
+@st.cache_data(show_spinner=False, max_entries=MAX_ABAS)
+def _grade(chave, aba, _dados):
+    return _abrir(_dados, lambda motor: pd.read_excel(io.BytesIO(_dados), sheet_name=aba, header=None, engine=motor))
+
+
+# ----------------- Leitura -----------------
+def abas_excel(arquivo):
+    """Nomes das abas, na ordem do arquivo."""
+    chave, dados = _conteudo(arquivo)
+    return _abas(chave, dados)
+
+
+def _nomes_colunas(valores):
+    """Mesma regra do read_excel: vazio -> 'Unnamed: i', repetido -> 'X.1', 'X.2'..."""
+    nomes, vistos = [], {}
+    for i, v in enumerate(valores):
+        nome = f"Unnamed: {i}" if pd.isna(v) or str(v).strip() == "" else v
+        if nome in vistos:
+            vistos[nome] += 1
+            nome = f"{nome}.{vistos[nome]}"
+        else:
+            vistos[nome] = 0
+        nomes.append(nome)
+    return nomes
+
+
+def ler_aba(arquivo, aba=0, header=None, skiprows=0, colunas=None):
+    """
+    DataFrame de uma aba, a partir da grade crua em cache.
+
+    aba:      nome ou posição
+    header:   None (grade crua, colunas 0..n) ou linha do cabeçalho, contada
+              depois de `skiprows` (como no read_excel)
+    colunas:  nomes (com header) ou posições a manter; ausentes são ignoradas
+    """
+    chave, dados = _conteudo(arquivo)
+    if isinstance(aba, int):
+        aba = _abas(chave, dados)[aba]
+    df = _grade(chave, aba, dados)
+    if skiprows:
+        df = df.iloc[skiprows:]
+    if header is not None:
+        nomes = _nomes_colunas(df.iloc[header].tolist()) if len(df) > header else list(df.columns)
+        df = df.iloc[header + 1:].set_axis(nomes, axis=1).infer_objects()
+    df = df.reset_index(drop=True)
+    if colunas is not None:
+        df = df[[c for c in colunas if c in df.columns]]
+    return df
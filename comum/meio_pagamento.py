@@ -0,0 +1,67 @@
+import pandas as pd
+import streamlit as st
+
+from comum.conversao import para_data_br, para_float_br
+from comum.gsheets import get_gspread_client
+
+ID_PLANILHA_FATURAMENTO_MP = "1GSI291SEeeU9MtOWkGwsKGCGMi_xXMSiQnL_9GhXxfU"
+ABA_FATURAMENTO_MP = "Faturamento Meio Pagamento"
+ID_PLANILHA_TABELA_MP = "1QfmPRZBzbdd2lQA8uajnqWnb3mAmxwLgUwzDM4FtYeA"
+ABA_TABELA_MP = "Tabela Meio Pagamento"
+TTL_MEIO_PAGAMENTO = 600  # segundos
+RENDER = "UNFORMATTED_VALUE"
+
+
+def _ler_aba(id_planilha, aba):
+    valores = get_gspread_client().open_by_key(id_planilha).worksheet(aba).get_all_values(value_render_option=RENDER)
+    if len(valores) < 2:
+        return pd.DataFrame()
+    header = [str(h).strip() for h in valores[0]]
+    n = len(header)
+    linhas = [(list(r) + [""] * n)[:n] for r in valores[1:]]
+    df = pd.DataFrame(linhas, columns=header, dtype=object)
+    df = df.loc[:, [c != "" for c in df.columns]]
+    df = df.loc[:, ~df.columns.duplicated()]
+    return df.loc[df.ne("").any(axis=1)].reset_index(drop=True)
+
+
+@st.cache_data(ttl=TTL_MEIO_PAGAMENTO, show_spinner=False)
+def carregar_faturamento_meio_pagamento():
+    """
+    Aba "Faturamento Meio Pagamento" tipada: Data (datetime64, sem hora),
+    Valor (R$) (float) e Loja / Meio de Pagamento sem espaços nas pontas.
+    """
+    df = _ler_aba(ID_PLANILHA_FATURAMENTO_MP, ABA_FATURAMENTO_MP)
+    if df.empty:
+        return df
+    if "Data" in df.columns:
+        df["Data"] = para_data_br(df["Data"])
+    if "Valor (R$)" in df.columns:
+        df["Valor (R$)"] = para_float_br(df["Valor (R$)"]).fillna(0.0)
+    for col in ("Loja", "Grupo", "Meio de Pagamento", "Tipo de Pagamento"):
+        if col in df.columns:
+            df[col] = df[col].astype(str).str.strip()
+    return df
+
+
+@st.cache_data(ttl=TTL_MEIO_PAGAMENTO, show_spinner=False)
+def carregar_tabela_meio_pagamento():
+    """
+    "Tabela Meio Pagamento" com os termos de recebimento tipados:
+    Prazo (dias úteis, int), Antecipa S/N ("SIM"/"NÃO"...) e as taxas
+    Taxa Bandeira / Taxa Antecipação como fração (3,5% -> 0.035).
+    """
+    df = _ler_aba(ID_PLANILHA_TABELA_MP, ABA_TABELA_MP)
+    if df.empty:
+        return df
+    df["Meio de Pagamento"] = df["Meio de Pagamento"].astype(str).str.strip()
+    if "Prazo" in df.columns:
+        df["Prazo"] = pd.to_numeric(df["Prazo"].astype(str).str.strip(), errors="coerce").fillna(0).astype(int)
+    if "Antecipa S/N" in df.columns:
+        df["Antecipa S/N"] = df["Antecipa S/N"].astype(str).str.upper().str.strip()
+    for col in ("Taxa Bandeira", "Taxa Antecipação"):
+        if col in df.columns:
+            taxa = para_float_br(df[col]).fillna(0.0)
+            # no Sheets a taxa vem como fração (0,035) ou como "3,5%" / 3,5
+            df[col] = taxa.where(taxa.abs() < 1, taxa / 100)
+    return df
@@ -0,0 +1,150 @@
+import hashlib
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from io import BytesIO
+
+import pdfplumber
+
+from comum.armazenamento import diretorio_cache, escrever_atomico
+
+PAGINAS_POR_TAREFA = 8   # páginas por tarefa no pool quando o PDF é lido inteiro
+
+_RE_RESUMO = re.compile(r"Resumo Contrato", re.IGNORECASE)
+_RE_TOTAIS = re.compile(r"\nTotais\b", re.IGNORECASE)
+_RE_LIQUIDO = re.compile(r"Líquido[:\s]*[\d\.,]+", re.IGNORECASE)
+
+
+def hash_arquivo(conteudo: bytes) -> str:
+    return hashlib.sha256(conteudo).hexdigest()
+
+
+def _caminho_cache(sha, parcial):
+    return os.path.join(diretorio_cache("pdf_texto"), f"{sha}{'.parcial' if parcial else ''}.txt")
+
+
+def _ler_cache(sha, parar_em_totais):
+    # o texto completo serve para os dois modos; o parcial só para parar_em_totais
+    candidatos = [_caminho_cache(sha, False)] + ([_caminho_cache(sha, True)] if parar_em_totais else [])
+    for caminho in candidatos:
+        try:
+            with open(caminho, "r", encoding="utf-8") as f:
+                return f.read()
+        except OSError:
+            continue
+    return None
+
+
+def _salvar_cache(sha, texto, parcial):
+    def _escrever(tmp):
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(texto)
+    escrever_atomico(_caminho_cache(sha, parcial), _escrever)
+
+
+def _contar_paginas(conteudo):
+    with pdfplumber.open(BytesIO(conteudo)) as pdf:
+        return len(pdf.pages)
+
+
+def _texto_paginas(conteudo, inicio=0, fim=None, parar_em_totais=False):
+    """
+    Texto das páginas [inicio, fim) no formato de sempre (cada página + "\\n").
+    Com parar_em_totais, encerra quando o "Totais" do Resumo Contrato e o
+    Líquido já foram lidos (no máximo uma página depois do "Totais").
+    Devolve (texto, parou_antes_do_fim).
+    """
+    texto = ""
+    with pdfplumber.open(BytesIO(conteudo)) as pdf:
+        paginas = pdf.pages[inicio:fim]
+        pagina_totais = None
+        for n, p in enumerate(paginas):
+            texto += (p.extract_text() or "") + "\n"
+            if not parar_em_totais:
+                continue
+            if pagina_totais is None:
+                resumo = _RE_RESUMO.search(texto)
+                totais = resumo and _RE_TOTAIS.search(texto, resumo.end())
+                if not totais:
+                    continue
+                pagina_totais = n
+                if _RE_LIQUIDO.search(texto, totais.end()):
+                    return texto, n < len(paginas) - 1
+            else:
+                return texto, n < len(paginas) - 1
+    return texto, False
+
+
+def extrair_textos_pdf(conteudos, parar_em_totais=False, max_processos=None, ao_progredir=None):
+    """
+    Texto de vários PDFs (lista de bytes) na mesma ordem, como
+    [(texto, None) | (None, mensagem_de_erro)].
+
+    - cache em disco por hash do arquivo: reruns e reenvios não releem o PDF
+    - extração em paralelo num pool de processos (pdfplumber é CPU-bound);
+      PDFs lidos inteiros são divididos em blocos de PAGINAS_POR_TAREFA páginas
+    - parar_em_totais: cada PDF é lido só até a seção "Totais"
+    """
+    resultados = [None] * len(conteudos)
+    hashes = [hash_arquivo(c) for c in conteudos]
+
+    pendentes = []
+    for i, sha in enumerate(hashes):
+        texto = _ler_cache(sha, parar_em_totais)
+        if texto is not None:
+            resultados[i] = (texto, None)
+        else:
+            pendentes.append(i)
+
+    # tarefas: (arquivo, inicio, fim); com parar_em_totais o arquivo é lido em sequência
+    tarefas = []
+    for i in pendentes:
+        if parar_em_totais:
+            tarefas.append((i, 0, None))
+            continue
+        try:
+            n = _contar_paginas(conteudos[i])
+        except Exception as e:
+            resultados[i] = (None, str(e))
+            continue
+        tarefas += [(i, ini, min(ini + PAGINAS_POR_TAREFA, n)) for ini in range(0, max(n, 1), PAGINAS_POR_TAREFA)]
+
+    partes = {}   # arquivo -> {inicio: (texto, parou)}
+    erros = {}
+    total = len(tarefas)
+    if total:
+        max_processos = max_processos or min(os.cpu_count() or 1, total)
+        if max_processos <= 1 or total == 1:
+            for feitas, (i, ini, fim) in enumerate(tarefas, start=1):
+                try:
+                    partes.setdefault(i, {})[ini] = _texto_paginas(conteudos[i], ini, fim, parar_em_totais)
+                except Exception as e:
+                    erros[i] = str(e)
+                if ao_progredir:
+                    ao_progredir(feitas, total)
+        else:
+            with ProcessPoolExecutor(max_workers=max_processos) as pool:
+                futuros = {
+                    pool.submit(_texto_paginas, conteudos[i], ini, fim, parar_em_totais): (i, ini)
+                    for i, ini, fim in tarefas
+                }
+                for feitas, futuro in enumerate(as_completed(futuros), start=1):
+                    i, ini = futuros[futuro]
+                    try:
+                        partes.setdefault(i, {})[ini] = futuro.result()
+                    except Exception as e:
+                        erros[i] = str(e)
+                    if ao_progredir:
+                        ao_progredir(feitas, total)
+
+    for i in {t[0] for t in tarefas}:
+        if i in erros:
+            resultados[i] = (None, erros[i])
+            continue
+        blocos = [partes[i][ini] for ini in sorted(partes[i])]
+        texto = "".join(t for t, _ in blocos)
+        parcial = any(parou for _, parou in blocos)
+        _salvar_cache(hashes[i], texto, parcial)
+        resultados[i] = (texto, None)
+
+    return resultados
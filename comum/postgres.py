@@ -0,0 +1,159 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import pool as pg_pool
+import streamlit as st
+
+from comum.armazenamento import diretorio_cache
+
+# Ajustáveis em st.secrets["db"] (max_conexoes, statement_timeout_ms)
+MAX_CONEXOES = 5                 # teto por processo, somando todas as sessões/páginas
+STATEMENT_TIMEOUT_MS = 300_000   # consulta que passar disso é cancelada pelo servidor
+ESPERA_CONEXAO_S = 60            # quanto uma sessão espera por uma conexão livre
+CHECAR_APOS_S = 30               # conexão ociosa há mais que isso leva um SELECT 1 antes do uso
+
+
+def _parametros():
+    """Credenciais de st.secrets['db'] ou, na falta, das variáveis PG*."""
+    try:
+        db = st.secrets["db"]
+        params = {
+            "host": db["host"],
+            "port": int(db.get("port", 5432)),
+            "dbname": db["database"],
+            "user": db["user"],
+            "password": db["password"],
+        }
+        extras = {
+            "max_conexoes": int(db.get("max_conexoes", MAX_CONEXOES)),
+            "statement_timeout_ms": int(db.get("statement_timeout_ms", STATEMENT_TIMEOUT_MS)),
+        }
+    except Exception:
+        params = {
+            "host": os.environ.get("PGHOST", "localhost"),
+            "port": int(os.environ.get("PGPORT", 5432)),
+            "dbname": os.environ.get("PGDATABASE", ""),
+            "user": os.environ.get("PGUSER", ""),
+            "password": os.environ.get("PGPASSWORD", ""),
+        }
+        extras = {"max_conexoes": MAX_CONEXOES, "statement_timeout_ms": STATEMENT_TIMEOUT_MS}
+    if not params["dbname"] or not params["user"] or not params["password"]:
+        raise RuntimeError("Credenciais do banco nao encontradas. Configure st.secrets['db'] ou variaveis de ambiente PG*.")
+    return params, extras
+
+
+def _certificado():
+    """Grava o CA da AWS uma vez por processo (só reescreve se mudou). None se não houver."""
+    try:
+        conteudo = st.secrets["certs"]["aws_rds_us_east_2"]
+    except Exception:
+        return None
+    caminho = os.path.join(diretorio_cache("certs"), "aws-us-east-2-bundle.pem")
+    try:
+        with open(caminho, "r", encoding="utf-8") as f:
+            if f.read() == conteudo:
+                return caminho
+    except OSError:
+        pass
+    with open(caminho, "w", encoding="utf-8") as f:
+        f.write(conteudo)
+    return caminho
+
+
+class _Pool:
+    """
+    ThreadedConnectionPool com teto de conexões: quem chega com o pool cheio
+    espera (até ESPERA_CONEXAO_S) em vez de receber PoolError.
+    """
+
+    def __init__(self):
+        params, extras = _parametros()
+        cert = _certificado()
+        if cert:
+            params.update(sslmode="verify-full", sslrootcert=cert)
+        self.max_conexoes = max(1, extras["max_conexoes"])
+        self._vagas = threading.BoundedSemaphore(self.max_conexoes)
+        self._ultimo_uso = {}
+        self._pool = pg_pool.ThreadedConnectionPool(
+            0,
+            self.max_conexoes,
+            connect_timeout=10,
+            keepalives=1,
+            keepalives_idle=60,
+            options=f"-c statement_timeout={extras['statement_timeout_ms']}",
+            **params,
+        )
+
+    def _saudavel(self, conn):
+        if conn.closed:
+            return False
+        if time.monotonic() - self._ultimo_uso.get(id(conn), 0) < CHECAR_APOS_S:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def obter(self):
+        if not self._vagas.acquire(timeout=ESPERA_CONEXAO_S):
+            raise RuntimeError(
+                f"Todas as {self.max_conexoes} conexões com o banco estão em uso. Tente novamente em instantes."
+            )
+        try:
+            for _ in range(2):
+                conn = self._pool.getconn()
+                if self._saudavel(conn):
+                    return conn
+                self._ultimo_uso.pop(id(conn), None)
+                self._pool.putconn(conn, close=True)  # caiu (idle timeout, failover): descarta e abre outra
+            raise RuntimeError("Não foi possível obter uma conexão válida com o banco.")
+        except Exception:
+            self._vagas.release()
+            raise
+
+    def devolver(self, conn):
+        descartar = bool(conn.closed)
+        if not descartar:
+            try:
+                conn.rollback()  # não devolve transação aberta / abortada ao pool
+            except psycopg2.Error:
+                descartar = True
+        if descartar:
+            self._ultimo_uso.pop(id(conn), None)
+        else:
+            self._ultimo_uso[id(conn)] = time.monotonic()
+        try:
+            self._pool.putconn(conn, close=descartar)
+        finally:
+            self._vagas.release()
+
+
+@st.cache_resource(show_spinner=False)
+def _pool_3s():
+    return _Pool()
+
+
+def obter_conexao():
+    """Conexão do pool compartilhado do 3S; devolver sempre com devolver_conexao()."""
+    return _pool_3s().obter()
+
+
+def devolver_conexao(conn):
+    if conn is not None:
+        _pool_3s().devolver(conn)
+
+
+@contextmanager
+def conexao_3s():
+    """with conexao_3s() as conn: ...  (devolve ao pool mesmo com erro ou st.stop)."""
+    conn = obter_conexao()
+    try:
+        yield conn
+    finally:
+        devolver_conexao(conn)
@@ -0,0 +1,61 @@
+import pandas as pd
+import streamlit as st
+
+from comum.gsheets import abrir_planilha
+
+ABA_TABELA_EMPRESA = "Tabela Empresa"
+TTL_TABELA_EMPRESA = 600  # segundos
+
+
+def normalizar_codigo(serie: pd.Series) -> pd.Series:
+    """Código Everest só com dígitos e sem zeros à esquerda ("0123" -> "123")."""
+    return serie.astype(str).str.replace(r"\D", "", regex=True).str.lstrip("0")
+
+
+@st.cache_data(ttl=TTL_TABELA_EMPRESA, show_spinner=False)
+def carregar_tabela_empresa(planilha="Vendas diarias"):
+    """
+    Catálogo de lojas ("Tabela Empresa") carregado uma vez por TTL para todas as sessões.
+
+    - nomes de coluna e células sem espaços nas pontas; linhas vazias descartadas
+    - 'Código Everest' normalizado (só dígitos, sem zeros à esquerda)
+    - 'Loja' e 'Grupo' sem espaços (a caixa fica a critério de cada página)
+    - índice 'cod_everest' = código normalizado, para lookups com .reindex/.map
+
+    O st.cache_data devolve uma cópia a cada chamada: o original em cache é
+    somente leitura e as páginas podem alterar o DataFrame recebido à vontade.
+    """
+    ws = abrir_planilha(planilha).worksheet(ABA_TABELA_EMPRESA)
+    values = ws.get_all_values()
+    if len(values) < 2:
+        return pd.DataFrame()
+
+    max_cols = max(len(r) for r in values)
+    rows = [r + [""] * (max_cols - len(r)) for r in values]
+    header = [str(h).strip() for h in rows[0]]
+    df = pd.DataFrame(rows[1:], columns=header)
+    df = df.apply(lambda s: s.astype(str).str.strip())
+    df = df.loc[(df != "").any(axis=1)]
+
+    if "Código Everest" in df.columns:
+        df["Código Everest"] = normalizar_codigo(df["Código Everest"])
+        df.index = pd.Index(df["Código Everest"].to_numpy(), name="cod_everest")
+    else:
+        df = df.reset_index(drop=True)
+    return df
+
+
+def invalidar_tabela_empresa():
+    """Descarta o cache; chamar logo após qualquer escrita na aba 'Tabela Empresa'."""
+    carregar_tabela_empresa.clear()
+
+
+def mapa_por_codigo(df_empresa: pd.DataFrame, coluna: str) -> dict:
+    """{código normalizado: valor da coluna}, mantendo a primeira ocorrência de cada código."""
+    if df_empresa is None or df_empresa.empty or coluna not in df_empresa.columns:
+        return {}
+    if df_empresa.index.name != "cod_everest":
+        return {}
+    serie = df_empresa[coluna]
+    serie = serie[~serie.index.duplicated(keep="first")]
+    return serie.to_dict()
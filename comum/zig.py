@@ -0,0 +1,414 @@
+import hashlib
+import os
+import re
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+from typing import NamedTuple
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+import streamlit as st
+
+from comum.armazenamento import BASE_DIR, diretorio_cache, ler_json, salvar_json
+
+BASE_URL = "https://api.zigcore.com.br/integration"
+
+# Requisições simultâneas por host (somando todas as sessões do processo).
+# A API da Zig responde bem até uns 8 em paralelo; acima disso começam os 429/timeouts.
+MAX_PARALELO_POR_HOST = 8
+
+# Respostas de dias fechados nunca mudam: ficam em disco sem prazo.
+# Consultas que incluem hoje (ou datas futuras) valem só por TTL_HOJE_S.
+TTL_HOJE_S = 600
+
+_vagas_por_host = {}
+_vagas_lock = threading.Lock()
+_local = threading.local()
+
+
+# ----------------- HTTP -----------------
+def _headers():
+    return {
+        "Authorization": st.secrets["zig"]["token"],
+        "Accept": "application/json",
+    }
+
+
+def rede_zig():
+    return st.secrets["zig"]["rede"]
+
+
+def _sessao():
+    """Uma requests.Session por thread (keep-alive, sem disputar o pool de conexões)."""
+    sessao = getattr(_local, "sessao", None)
+    if sessao is None:
+        sessao = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=MAX_PARALELO_POR_HOST)
+        sessao.mount("https://", adaptador)
+        _local.sessao = sessao
+    return sessao
+
+
+def _vagas(url):
+    host = urlparse(url).netloc
+    with _vagas_lock:
+        if host not in _vagas_por_host:
+            _vagas_por_host[host] = threading.BoundedSemaphore(MAX_PARALELO_POR_HOST)
+        return _vagas_por_host[host]
+
+
+# ----------------- Cache em disco -----------------
+class EstatisticasCache:
+    """Contadores de acertos/faltas do cache de uma execução (seguro entre threads)."""
+
+    def __init__(self):
+        self.acertos = 0
+        self.faltas = 0
+        self._lock = threading.Lock()
+
+    def registrar(self, acerto):
+        with self._lock:
+            if acerto:
+                self.acertos += 1
+            else:
+                self.faltas += 1
+
+    def resumo(self):
+        total = self.acertos + self.faltas
+        taxa = (self.acertos / total * 100) if total else 0
+        return f"Cache ZIG: {self.acertos} de {total} chamadas vieram do disco ({taxa:.0f}%); {self.faltas} foram à API."
+
+
+def _hoje_brasil():
+    return (datetime.utcnow() - timedelta(hours=3)).date()
+
+
+def _arquivo_cache(endpoint, params):
+    """
+    .cache/zig/<endpoint>/<loja>/<dtinicio>_<dtfim>_<hash>.json, ou None quando
+    a consulta não tem loja + datas (p.ex. /erp/lojas) e portanto não é cacheada.
+    """
+    loja = params.get("loja")
+    inicio = params.get("dtinicio") or params.get("desde")
+    fim = params.get("dtfim") or inicio
+    if loja in (None, "") or not inicio:
+        return None, None
+    try:
+        ultimo_dia = date.fromisoformat(str(fim)[:10])
+    except ValueError:
+        return None, None
+    assinatura = "&".join(f"{k}={params[k]}" for k in sorted(params))
+    h = hashlib.sha256(f"{endpoint}?{assinatura}".encode("utf-8")).hexdigest()[:16]
+    pasta = diretorio_cache("zig", re.sub(r"[^A-Za-z0-9]+", "_", endpoint).strip("_"), str(loja))
+    return os.path.join(pasta, f"{inicio}_{fim}_{h}.json"), ultimo_dia
+
+
+def _ler_cache(caminho, ultimo_dia):
+    entrada = ler_json(caminho)
+    if not entrada:
+        return None
+    if ultimo_dia >= _hoje_brasil() and time.time() - entrada.get("salvo_em", 0) > TTL_HOJE_S:
+        return None
+    return entrada.get("dados")
+
+
+def _salvar_cache(caminho, dados):
+    salvar_json(caminho, {"salvo_em": time.time(), "dados": dados})
+
+
+def limpar_cache_zig():
+    """Apaga todas as respostas da Zig guardadas em disco."""
+    shutil.rmtree(os.path.join(BASE_DIR, "zig"), ignore_errors=True)
+
+
+def buscar_get(endpoint, params, timeout=60, headers=None, usar_cache=True, estatisticas=None):
+    """
+    GET em BASE_URL + endpoint. Devolve (lista, erro) — erro é None quando deu certo.
+
+    Respostas com loja + datas são guardadas em disco (ver _arquivo_cache);
+    dias fechados nunca expiram, e o que inclui hoje vale por TTL_HOJE_S.
+    """
+    caminho, ultimo_dia = _arquivo_cache(endpoint, params) if usar_cache else (None, None)
+    if caminho:
+        dados = _ler_cache(caminho, ultimo_dia)
+        if estatisticas is not None:
+            estatisticas.registrar(dados is not None)
+        if dados is not None:
+            return dados, None
+
+    url = f"{BASE_URL}{endpoint}"
+    try:
+        with _vagas(url):
+            resp = _sessao().get(url, headers=headers or _headers(), params=params, timeout=timeout)
+
+        if resp.status_code != 200:
+            return [], f"Erro {resp.status_code}: {resp.text}"
+
+        dados = resp.json()
+
+        if isinstance(dados, dict):
+            dados = [dados]
+
+        if not isinstance(dados, list):
+            return [], "Retorno não é lista nem dicionário"
+
+        if caminho:
+            _salvar_cache(caminho, dados)
+        return dados, None
+
+    except Exception as e:
+        return [], str(e)
+
+
+def buscar_paginado(endpoint, params_base, campo_page="page", max_paginas=100, headers=None,
+                    usar_cache=True, estatisticas=None):
+    """
+    Percorre as páginas até vir vazia ou dar erro. Devolve (lista, [erros]).
+    Chegar a `max_paginas` sem página vazia é erro: o resultado está incompleto.
+    """
+    todos = []
+    erros = []
+
+    for page in range(1, max_paginas + 1):
+        params = dict(params_base)
+        params[campo_page] = page
+
+        dados, erro = buscar_get(endpoint, params, headers=headers,
+                                 usar_cache=usar_cache, estatisticas=estatisticas)
+
+        if erro:
+            erros.append(f"Página {page}: {erro}")
+            break
+
+        if not dados:
+            break
+
+        todos.extend(dados)
+    else:
+        erros.append(f"Limite de {max_paginas} páginas atingido; resultado incompleto")
+
+    return todos, erros
+
+
+def buscar_lojas():
+    """Lojas da rede. Devolve (lista, erro)."""
+    dados, erro = buscar_get("/erp/lojas", {"rede": rede_zig()}, timeout=30, usar_cache=False)
+    if erro:
+        return [], erro
+    return dados, None
+
+
+# ----------------- Janelas de vários dias -----------------
+# Endpoints cujo retorno traz a data de cada registro: aceitam janelas de
+# vários dias e o resultado é separado de volta por dia pelo campo indicado.
+# Os demais (compradores, máquina integrada, checkins, recargas) seguem dia a dia.
+CAMPO_DATA_POR_ENDPOINT = {
+    "/erp/saida-produtos": "eventDate",
+    "/erp/faturamento": "eventDate",
+    "/erp/invoice": "eventDate",
+}
+JANELA_INICIAL_DIAS = 7
+JANELA_MAX_DIAS = 31
+ALVO_REGISTROS = 5000    # acima disso por chamada, a próxima janela diminui
+ALVO_SEGUNDOS = 15       # idem para o tempo de resposta
+
+_janela_por_endpoint = {}
+_janela_lock = threading.Lock()
+
+
+def _janela_atual(endpoint):
+    with _janela_lock:
+        return _janela_por_endpoint.get(endpoint, JANELA_INICIAL_DIAS)
+
+
+def _ajustar_janela(endpoint, dias, registros, segundos, falhou):
+    """Metade da janela em erro/timeout/retorno grande; dobro quando sobra folga."""
+    if falhou or registros > ALVO_REGISTROS or segundos > ALVO_SEGUNDOS:
+        nova = max(1, dias // 2)
+    elif registros < ALVO_REGISTROS / 4 and segundos < ALVO_SEGUNDOS / 4:
+        nova = min(JANELA_MAX_DIAS, dias * 2)
+    else:
+        nova = dias
+    with _janela_lock:
+        _janela_por_endpoint[endpoint] = nova
+
+
+def _params_dia(base, dia):
+    d = dia.strftime("%Y-%m-%d")
+    return {**base, "dtinicio": d, "dtfim": d}
+
+
+def _buscar_janela(endpoint, paginado, base, dias, opcoes):
+    """
+    Uma chamada para dias[0]..dias[-1]. Devolve ({dia: (dados, erros)}, ok);
+    ok=False pede nova tentativa com janela menor (erro ou registro sem data reconhecível).
+    """
+    params = {**base, "dtinicio": dias[0].strftime("%Y-%m-%d"), "dtfim": dias[-1].strftime("%Y-%m-%d")}
+    inicio = time.monotonic()
+    if paginado:
+        dados, erros = buscar_paginado(endpoint, params, headers=opcoes["headers"], usar_cache=False)
+    else:
+        dados, erro = buscar_get(endpoint, params, headers=opcoes["headers"], usar_cache=False)
+        erros = [erro] if erro else []
+    segundos = time.monotonic() - inicio
+
+    por_dia = {d.strftime("%Y-%m-%d"): [] for d in dias}
+    separou = True
+    if len(dias) > 1 and not erros:
+        campo = CAMPO_DATA_POR_ENDPOINT[endpoint]
+        for item in dados:
+            chave = str(item.get(campo) or "")[:10] if isinstance(item, dict) else ""
+            if chave not in por_dia:
+                separou = False
+                break
+            por_dia[chave].append(item)
+
+    _ajustar_janela(endpoint, len(dias), len(dados), segundos, bool(erros) or not separou)
+    if len(dias) == 1:
+        por_dia[dias[0].strftime("%Y-%m-%d")] = dados
+    elif erros or not separou:
+        return {}, False
+
+    resultado = {}
+    for d in dias:
+        dados_dia = por_dia[d.strftime("%Y-%m-%d")]
+        if not erros and opcoes["usar_cache"]:
+            caminho, _ = _arquivo_cache(endpoint, _params_dia(base, d))
+            if caminho:
+                _salvar_cache(caminho, dados_dia)
+        resultado[d] = (dados_dia, list(erros))
+    return resultado, True
+
+
+def _executar_janelas(endpoint, paginado, base, dias, opcoes):
+    """
+    Todos os dias de uma loja/endpoint: o que já está no cache vem do disco;
+    os dias restantes são buscados em janelas contíguas de tamanho adaptativo.
+    """
+    resultado = {}
+    pendentes = []
+    estatisticas = opcoes["estatisticas"]
+    for d in sorted(dias):
+        dados = None
+        if opcoes["usar_cache"]:
+            caminho, ultimo_dia = _arquivo_cache(endpoint, _params_dia(base, d))
+            dados = _ler_cache(caminho, ultimo_dia) if caminho else None
+            if estatisticas is not None:
+                estatisticas.registrar(dados is not None)
+        if dados is not None:
+            resultado[d] = (dados, [])
+        else:
+            pendentes.append(d)
+
+    i = 0
+    while i < len(pendentes):
+        bloco = [pendentes[i]]
+        tamanho = _janela_atual(endpoint)
+        while (len(bloco) < tamanho and i + len(bloco) < len(pendentes)
+               and pendentes[i + len(bloco)] == bloco[-1] + timedelta(days=1)):
+            bloco.append(pendentes[i + len(bloco)])
+        por_dia, ok = _buscar_janela(endpoint, paginado, base, bloco, opcoes)
+        if not ok:
+            continue  # janela já foi reduzida; tenta de novo a partir do mesmo dia
+        resultado.update(por_dia)
+        i += len(bloco)
+    return resultado
+
+
+def _agrupavel(consulta):
+    p = consulta.params
+    return (consulta.endpoint in CAMPO_DATA_POR_ENDPOINT
+            and set(p) == {"dtinicio", "dtfim", "loja"}
+            and p.get("dtinicio") and p.get("dtinicio") == p.get("dtfim"))
+
+
+# ----------------- Consultas em paralelo -----------------
+class Consulta(NamedTuple):
+    endpoint: str
+    params: dict
+    paginado: bool = False
+
+
+def chave_consulta(endpoint, params, paginado=False):
+    return (endpoint, tuple(sorted((k, str(v)) for k, v in params.items())), bool(paginado))
+
+
+def _executar(consulta, headers, usar_cache, estatisticas):
+    opcoes = dict(headers=headers, usar_cache=usar_cache, estatisticas=estatisticas)
+    if consulta.paginado:
+        return buscar_paginado(consulta.endpoint, consulta.params, **opcoes)
+    dados, erro = buscar_get(consulta.endpoint, consulta.params, **opcoes)
+    return dados, ([erro] if erro else [])
+
+
+def executar_consultas(consultas, max_paralelo=MAX_PARALELO_POR_HOST, ao_progredir=None,
+                       usar_cache=True, estatisticas=None):
+    """
+    Executa as consultas em paralelo (limitado por host) e devolve
+    {chave_consulta: (dados, [erros])} na mesma ordem da lista recebida.
+
+    Consultas de um dia só (dtinicio == dtfim) nos endpoints de
+    CAMPO_DATA_POR_ENDPOINT são agrupadas por loja e buscadas em janelas de
+    vários dias (tamanho adaptativo); o resultado volta separado por dia,
+    com a mesma chave que teria a consulta diária.
+
+    ao_progredir(feitas, total) é chamado na thread do script, então pode
+    atualizar st.progress / st.empty normalmente. Passe um EstatisticasCache
+    em `estatisticas` para contar acertos/faltas do cache em disco.
+    """
+    consultas = [c if isinstance(c, Consulta) else Consulta(*c) for c in consultas]
+    total = len(consultas)
+    resultados = [None] * total
+    if not total:
+        return {}
+
+    headers = _headers()  # st.secrets só é lido na thread do script
+    opcoes = dict(headers=headers, usar_cache=usar_cache, estatisticas=estatisticas)
+
+    # (endpoint, paginado, loja) -> {dia: [índices]} para as consultas agrupáveis
+    grupos = {}
+    tarefas = []
+    for i, c in enumerate(consultas):
+        if _agrupavel(c):
+            dia = date.fromisoformat(str(c.params["dtinicio"])[:10])
+            chave = (c.endpoint, c.paginado, c.params.get("loja"))
+            grupos.setdefault(chave, {}).setdefault(dia, []).append(i)
+        else:
+            tarefas.append(([i], lambda c=c: {None: _executar(c, headers, usar_cache, estatisticas)}))
+    for (endpoint, paginado, loja), dias in grupos.items():
+        indices = [i for lista in dias.values() for i in lista]
+        tarefas.append((indices, lambda e=endpoint, p=paginado, l=loja, d=list(dias):
+                        _executar_janelas(e, p, {"loja": l}, d, opcoes)))
+
+    feitas = 0
+    with ThreadPoolExecutor(max_workers=max(1, min(max_paralelo, len(tarefas)))) as pool:
+        futuros = {pool.submit(tarefa): indices for indices, tarefa in tarefas}
+        for futuro in as_completed(futuros):
+            por_dia = futuro.result()
+            for i in futuros[futuro]:
+                c = consultas[i]
+                dia = date.fromisoformat(str(c.params["dtinicio"])[:10]) if None not in por_dia else None
+                resultados[i] = por_dia[dia]
+            feitas += len(futuros[futuro])
+            if ao_progredir:
+                ao_progredir(feitas, total)
+
+    return {
+        chave_consulta(c.endpoint, c.params, c.paginado): r
+        for c, r in zip(consultas, resultados)
+    }
+
+
+def resultado_get(resultados, endpoint, params):
+    """(dados, erro) de uma consulta simples, como buscar_get."""
+    dados, erros = resultados[chave_consulta(endpoint, params)]
+    return dados, (erros[0] if erros else None)
+
+
+def resultado_paginado(resultados, endpoint, params):
+    """(dados, [erros]) de uma consulta paginada, como buscar_paginado."""
+    return resultados[chave_consulta(endpoint, params, True)]
@@ -2,145 +2,38 @@ import streamlit as st
 import pandas as pd
 from io import BytesIO
 from datetime import datetime, timedelta
-import json
-import psycopg2
 
-st.set_page_config(page_title="Atualização 3S", layout="wide")
-
-# ================================
-# 1. Certificado AWS
-# ================================
-CERT_PATH = "aws-us-east-2-bundle.pem"
-
-if "cert_written" not in st.session_state:
-    with open(CERT_PATH, "w", encoding="utf-8") as f:
-        f.write(st.secrets["certs"]["aws_rds_us_east_2"])
-    st.session_state["cert_written"] = True
+from comum.armazem_3s import carregar_3s
+from comum.db_3s import contar_pedidos
 
-# ================================
-# 2. Conexão com PostgreSQL
-# ================================
-def get_db_conn():
-    return psycopg2.connect(
-        host=st.secrets["db"]["host"],
-        port=st.secrets["db"]["port"],
-        dbname=st.secrets["db"]["database"],
-        user=st.secrets["db"]["user"],
-        password=st.secrets["db"]["password"],
-        sslmode="verify-full",
-        sslrootcert=CERT_PATH,
-    )
+st.set_page_config(page_title="Atualização 3S", layout="wide")
 
 # ================================
-# 3. Conexão com Google Sheets (Tabela Empresa)
+# 1. Tabela Empresa (cache compartilhado)
 # ================================
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
+from comum.tabela_empresa import carregar_tabela_empresa
 
-scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-credentials_dict = json.loads(st.secrets["GOOGLE_SERVICE_ACCOUNT"])
-credentials = ServiceAccountCredentials.from_json_keyfile_dict(credentials_dict, scope)
-gc = gspread.authorize(credentials)
-planilha_empresa = gc.open("Vendas diarias")
-
-# Carrega Tabela Empresa
-aba_empresa = planilha_empresa.worksheet("Tabela Empresa")
-valores_empresa = aba_empresa.get_all_values()
-
-if len(valores_empresa) > 1:
-    df_empresa = pd.DataFrame(valores_empresa[1:], columns=valores_empresa[0])
-    df_empresa.columns = df_empresa.columns.str.strip()
-    
-    if "Loja" in df_empresa.columns:
-        df_empresa["Loja"] = df_empresa["Loja"].astype(str).str.lower().str.strip()
-else:
-    df_empresa = pd.DataFrame()
+df_empresa = carregar_tabela_empresa()
+if "Loja" in df_empresa.columns:
+    df_empresa["Loja"] = df_empresa["Loja"].astype(str).str.lower().str.strip()
 
 # ================================
-# 4. Função auxiliar para parse JSON
+# 2. Função de busca e processamento
 # ================================
-def parse_props(x):
-    if pd.isna(x): 
-        return {}
-    try:
-        if isinstance(x, str):
-            return json.loads(x)
-    except:
-        try:
-            import ast
-            return ast.literal_eval(x)
-        except:
-            return {}
-    return x if isinstance(x, dict) else {}
-
-# ================================
-# 5. Função de busca e processamento
-# ================================
-def buscar_dados_3s_checkout():
+def buscar_dados_3s_checkout(data_inicio, data_fim):
     """Busca dados do 3S Checkout - Apenas Meio de Pagamento Agrupado"""
-    conn = get_db_conn()
     try:
-        ontem = (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d')
-        
-        # QUERY 1: order_picture (BASE)
-        query_op = """
-            SELECT 
-                order_picture_id,
-                store_code, 
-                business_dt,
-                custom_properties
-            FROM public.order_picture
-            WHERE business_dt >= '2024-12-01'
-              AND business_dt <= %s
-              AND store_code NOT IN ('0000', '0001', '9999')
-              AND state_id = 5
-        """
-        df_op = pd.read_sql(query_op, conn, params=(ontem,))
-        
-        # Filtrar VOID_TYPE na base de pedidos
-        props = df_op['custom_properties'].apply(parse_props)
-        df_op['VOID_TYPE'] = props.apply(lambda x: x.get('VOID_TYPE'))
-        df_op = df_op[df_op['VOID_TYPE'].isna() | (df_op['VOID_TYPE'] == "") | (df_op['VOID_TYPE'] == 0)].copy()
-
-        # QUERY 2: order_picture_tender (PAGAMENTOS)
-        query_tender = """
-            SELECT 
-                order_picture_id,
-                tender_amount,
-                change_amount,
-                details
-            FROM public.order_picture_tender
-            WHERE order_picture_id IN (
-                SELECT order_picture_id 
-                FROM public.order_picture
-                WHERE business_dt >= '2024-12-01'
-                  AND business_dt <= %s
-                  AND store_code NOT IN ('0000', '0001', '9999')
-                  AND state_id = 5
-            )
-        """
-        df_tender = pd.read_sql(query_tender, conn, params=(ontem,))
+        # Tenders ligados aos pedidos válidos (sem VOID) e já somados por
+        # loja / dia / meio de pagamento; dias fechados vêm do armazém local
+        df_tender = carregar_3s("meio_pagamento", data_inicio, data_fim)
         
         if df_tender.empty:
             return pd.DataFrame(), None, 0
+        total = contar_pedidos(df_tender)
 
-        # Processar Pagamentos
-        df_tender["tender_amount"] = pd.to_numeric(df_tender["tender_amount"], errors="coerce").fillna(0)
-        df_tender["change_amount"] = pd.to_numeric(df_tender["change_amount"], errors="coerce").fillna(0)
-        
-        tender_props = df_tender['details'].apply(parse_props)
-        df_tender['Meio de Pagamento'] = tender_props.apply(lambda x: x.get("tenderDescr") if isinstance(x, dict) else None)
-        df_tender['tender_tip_amount'] = pd.to_numeric(
-            tender_props.apply(lambda x: x.get('tipAmount', 0) if isinstance(x, dict) else 0), 
-            errors='coerce'
-        ).fillna(0)
-        
-        # Cálculo Líquido (Descontando Troco)
-        df_tender["Fat.Real"] = (df_tender["tender_amount"] - df_tender["change_amount"]).clip(lower=0)
-        df_tender["Fat.Total"] = df_tender["Fat.Real"] + df_tender["tender_tip_amount"]
-        
-        # Merge com dados do pedido
-        df_tender = df_tender.merge(df_op[['order_picture_id', 'store_code', 'business_dt']], on='order_picture_id', how='inner')
+        # Líquido de troco + gorjeta
+        df_tender = df_tender.rename(columns={"meio_pagamento": "Meio de Pagamento", "data": "business_dt"})
+        df_tender["Fat.Total"] = df_tender["valor_liquido"] + df_tender["gorjeta"]
         
         # Formatação de Datas e Tradução
         dias_traducao = {
@@ -151,7 +44,6 @@ def buscar_dados_3s_checkout():
         df_tender['Dia da Semana'] = pd.to_datetime(df_tender['business_dt']).dt.day_name().map(dias_traducao)
         
         # PROCV Tabela Empresa
-        df_empresa["Código Everest"] = df_empresa["Código Everest"].astype(str).str.replace(r"\D", "", regex=True).str.lstrip("0")
         df_tender['Código Everest'] = df_tender['store_code'].astype(str).str.lstrip('0').str.strip()
         
         df_tender = pd.merge(df_tender, df_empresa[["Código Everest", "Loja", "Grupo", "Código Grupo Everest"]], on="Código Everest", how="left")
@@ -183,24 +75,30 @@ def buscar_dados_3s_checkout():
         resumo_pagamento['Data_Sort'] = pd.to_datetime(resumo_pagamento['Data'], format='%d/%m/%Y')
         resumo_pagamento = resumo_pagamento.sort_values(by=['Data_Sort', 'Loja', 'Meio de Pagamento']).drop(columns='Data_Sort')
         
-        return resumo_pagamento, None, len(df_op)
+        return resumo_pagamento, None, total
         
     except Exception as e:
         return None, str(e), 0
-    finally:
-        conn.close()
 
 # ================================
-# 6. Interface do Streamlit
+# 3. Interface do Streamlit
 # ================================
 st.title("🔄 Atualização 3S")
 
 if "resumo_pagamento" not in st.session_state:
     st.session_state["resumo_pagamento"] = None
 
+# Janela de datas (padrão: últimos 60 dias até ontem, horário de Brasília)
+ontem = (datetime.utcnow() - timedelta(hours=3)).date() - timedelta(days=1)
+col_de, col_ate = st.columns(2)
+with col_de:
+    data_inicio = st.date_input("De", value=ontem - timedelta(days=59), max_value=ontem, format="DD/MM/YYYY")
+with col_ate:
+    data_fim = st.date_input("Até", value=ontem, max_value=ontem, format="DD/MM/YYYY")
+
 if st.button("🔄 Atualizar 3S Checkout", type="primary", use_container_width=True):
     with st.spinner("Buscando dados do banco..."):
-        resumo_pagamento, erro_3s, total_pedidos = buscar_dados_3s_checkout()
+        resumo_pagamento, erro_3s, total_pedidos = buscar_dados_3s_checkout(data_inicio, data_fim)
     
     if erro_3s:
         st.error(f"❌ Erro: {erro_3s}")
@@ -1,64 +1,17 @@
-import os
-import re
 import json
 from datetime import datetime, timedelta
 
 import streamlit as st
 import pandas as pd
-import numpy as np
-import psycopg2
 import gspread
 from oauth2client.service_account import ServiceAccountCredentials
 
-# ----------------- Helpers -----------------
-def _parse_money_to_float(x):
-    if pd.isna(x):
-        return 0.0
-    s = str(x).strip()
-    s = s.replace("R$", "").replace("\u00A0", "").replace(" ", "")
-    s = re.sub(r"[^\d,\-\.]", "", s)
-    if s == "":
-        return 0.0
-    if s.count(",") == 1 and s.count(".") >= 1:
-        s = s.replace(".", "").replace(",", ".")
-    elif s.count(",") == 1 and s.count(".") == 0:
-        s = s.replace(",", ".")
-    try:
-        return float(s)
-    except Exception:
-        try:
-            return float(s.replace(",", "."))
-        except Exception:
-            return 0.0
-
-def _get_db_params():
-    try:
-        db = st.secrets["db"]
-        return {
-            "host": db["host"],
-            "port": int(db.get("port", 5432)),
-            "dbname": db["database"],
-            "user": db["user"],
-            "password": db["password"]
-        }
-    except Exception:
-        return {
-            "host": os.environ.get("PGHOST", "localhost"),
-            "port": int(os.environ.get("PGPORT", 5432)),
-            "dbname": os.environ.get("PGDATABASE", ""),
-            "user": os.environ.get("PGUSER", ""),
-            "password": os.environ.get("PGPASSWORD", "")
-        }
-
-def create_db_conn(params):
-    return psycopg2.connect(
-        host=params["host"],
-        port=params["port"],
-        dbname=params["dbname"],
-        user=params["user"],
-        password=params["password"]
-    )
+from comum.armazem_3s import carregar_3s
+from comum.conversao import para_float_br
+from comum.gsheets import substituir_linhas
+from comum.tabela_empresa import carregar_tabela_empresa
 
+# ----------------- Helpers -----------------
 def create_gspread_client():
     if "GOOGLE_SERVICE_ACCOUNT" not in st.secrets:
         raise RuntimeError(
@@ -70,58 +23,20 @@ def create_gspread_client():
     credentials = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
     return gspread.authorize(credentials)
 
-@st.cache_data(ttl=300)
 def fetch_tabela_empresa():
-    gc = create_gspread_client()
-    sh = gc.open("Vendas diarias")
-    ws = sh.worksheet("Tabela Empresa")
-    values = ws.get_all_values()
-    if not values:
+    # catálogo compartilhado (cache por processo); aqui as colunas viram letras A, B, C...
+    df = carregar_tabela_empresa().reset_index(drop=True)
+    if df.empty:
         return pd.DataFrame()
-    max_cols = max(len(r) for r in values)
-    rows = [r + [""] * (max_cols - len(r)) for r in values]
-    cols = [chr(ord("A") + i) for i in range(max_cols)]
-    data_rows = rows[1:] if len(rows) > 1 else []
-    df = pd.DataFrame(data_rows, columns=cols)
-    df = df.loc[~(df[cols].apply(lambda r: all(str(x).strip() == "" for x in r), axis=1))]
+    df.columns = [chr(ord("A") + i) for i in range(df.shape[1])]
     return df
 
-@st.cache_data(ttl=300)
-def fetch_order_picture(data_de, data_ate, excluir_stores=("0000", "0001", "9999"), estado_filtrar=5):
-    params = _get_db_params()
-    if not params["dbname"] or not params["user"] or not params["password"]:
-        raise RuntimeError("Credenciais do banco nao encontradas. Configure st.secrets['db'] ou variaveis de ambiente PG*.")
-    conn = create_db_conn(params)
-    try:
-        base_sql = """
-            SELECT store_code, business_dt, order_discount_amount
-            FROM public.order_picture
-            WHERE business_dt >= %s
-              AND business_dt <= %s
-              AND store_code NOT IN %s
-              AND state_id = %s
-        """
-        try_cols = [
-            ("VOID_TYPE", "AND (VOID_TYPE IS NULL OR VOID_TYPE = '' OR LOWER(VOID_TYPE) NOT LIKE %s)"),
-            ("pod_type", "AND (pod_type IS NULL OR pod_type = '' OR LOWER(pod_type) NOT LIKE %s)")
-        ]
-        like_void = "%void%"
-        for col_name, cond_sql in try_cols:
-            sql = f"{base_sql} {cond_sql} ORDER BY business_dt, store_code"
-            try:
-                df = pd.read_sql(sql, conn, params=(data_de, data_ate, tuple(excluir_stores), estado_filtrar, like_void))
-                return df
-            except Exception as e:
-                msg = str(e).lower()
-                if "does not exist" in msg or (("column" in msg) and (col_name.lower() in msg)):
-                    continue
-                else:
-                    raise
-        sql = f"{base_sql} ORDER BY business_dt, store_code"
-        df = pd.read_sql(sql, conn, params=(data_de, data_ate, tuple(excluir_stores), estado_filtrar))
+def fetch_order_picture(data_de, data_ate):
+    """Desconto (order_discount_amount) por loja/dia: dias fechados do armazém local, o resto do banco."""
+    df = carregar_3s("desconto", data_de, data_ate)
+    if df.empty:
         return df
-    finally:
-        conn.close()
+    return df.rename(columns={"data": "business_dt"})
 
 def process_and_build_report_summary(df_orders: pd.DataFrame, df_empresa: pd.DataFrame) -> pd.DataFrame:
     if df_orders is None or df_orders.empty:
@@ -133,7 +48,7 @@ def process_and_build_report_summary(df_orders: pd.DataFrame, df_empresa: pd.Dat
     df["store_code"] = df["store_code"].astype(str).str.replace(r"\D", "", regex=True).str.lstrip("0").replace("", "0")
     df["business_dt"] = pd.to_datetime(df["business_dt"], errors="coerce")
     df["business_month"] = df["business_dt"].dt.strftime("%m/%Y").fillna("")
-    df["order_discount_amount_val"] = df["order_discount_amount"].apply(_parse_money_to_float)
+    df["order_discount_amount_val"] = para_float_br(df["order_discount_amount"]).fillna(0.0)
     if df_empresa is None or df_empresa.empty:
         mapa_codigo_para_nome = {}
         mapa_codigo_para_colB = {}
@@ -183,41 +98,10 @@ def upload_df_to_gsheet_replace_months(df: pd.DataFrame,
         ws = sh.worksheet(worksheet_name)
     except gspread.exceptions.WorksheetNotFound:
         ws = sh.add_worksheet(title=worksheet_name, rows="1000", cols="20")
-    existing = ws.get_all_values()
-    header = existing[0] if existing else df.columns.tolist()
-    existing_rows = existing[1:] if len(existing) > 1 else []
-    meses_importar = set(df["Business Month"].astype(str).unique())
-    def keep_row(row):
-        a = row[0].strip() if len(row) > 0 else ""
-        b = row[1].strip() if len(row) > 1 else ""
-        if a == "3S Checkout" and b in meses_importar:
-            return False
-        return True
-    filtered_existing = [r for r in existing_rows if keep_row(r)]
-    df_clean = df.copy()
-    df_clean = df_clean.where(pd.notnull(df_clean), None)
-    numeric_cols = df_clean.select_dtypes(include=[np.number]).columns.tolist()
-    df_rows = []
-    for _, row in df_clean.iterrows():
-        converted = []
-        for col in df_clean.columns:
-            val = row[col]
-            if val is None:
-                converted.append("")
-            elif col in numeric_cols:
-                if isinstance(val, (np.integer,)):
-                    converted.append(int(val))
-                elif isinstance(val, (np.floating,)):
-                    converted.append(float(val))
-                else:
-                    converted.append(val)
-            else:
-                converted.append(str(val))
-        df_rows.append(converted)
-    final_values = [header] + filtered_existing + df_rows
-    ws.clear()
-    ws.update("A1", final_values)
-    return {"kept_rows": len(filtered_existing), "inserted_rows": len(df_rows), "header": header}
+    # delta: só as linhas "3S Checkout" dos meses importados são trocadas
+    meses_importar = df["Business Month"].astype(str).str.strip().unique()
+    chaves = {("3S Checkout", m) for m in meses_importar}
+    return substituir_linhas(ws, df, chaves, intervalo_chaves="A:B")
 
 # ----------------- Streamlit UI -----------------
 st.title("Atualizar Desconto 3S no Google Sheets")
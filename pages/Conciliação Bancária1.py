@@ -11,6 +11,11 @@ import gspread
 from gspread.exceptions import WorksheetNotFound
 from oauth2client.service_account import ServiceAccountCredentials
 
+from comum.busca_padroes import AutomatoPadroes
+from comum.conciliacao import JANELA_DIAS, TOLERANCIA_VALOR, conciliar, prever_recebimentos
+from comum.extrato import ler_extrato
+from comum.meio_pagamento import carregar_faturamento_meio_pagamento, carregar_tabela_meio_pagamento
+
 # Para leitura de PDF (adicionar pdfplumber no requirements.txt)
 try:
     import pdfplumber
@@ -70,8 +75,7 @@ def _open_planilha_fluxo():
         st.error(f"⚠️ Erro ao abrir planilha 'Fluxo de Caixa' (open_by_url): {repr(e)}")
         return None
 
-@st.cache_data(show_spinner=False)
-def carregar_fluxo_caixa():
+def _ler_fluxo_caixa():
     """
     Lê a planilha **Fluxo de Caixa** (URL fixo), aba 'Fluxo de Caixa', e mapeia:
     - Grupo
@@ -128,6 +132,37 @@ def carregar_fluxo_caixa():
     df = df[~(df[["Grupo", "Loja", "Banco", "Agencia", "ContaCorrente"]].eq("").all(axis=1))]
     return df
 
+def _indexar_contas(df):
+    """
+    Índice para o reconhecimento automático: padrão -> [(posição da linha, peso)]
+    para Agência (1) e Conta (2), só dígitos, e ExtratoNomeEmpresa (3), minúsculo,
+    mais um autômato de busca para cada grupo de padrões.
+    """
+    digitos, nomes = {}, {}
+    if not df.empty:
+        for pos, (ag, cc, nome) in enumerate(zip(df["Agencia"], df["ContaCorrente"], df["ExtratoNomeEmpresa"])):
+            ag = re.sub(r"\D", "", str(ag))
+            cc = re.sub(r"\D", "", str(cc))
+            nome = str(nome).strip().lower()
+            if ag:
+                digitos.setdefault(ag, []).append((pos, 1))
+            if cc:
+                digitos.setdefault(cc, []).append((pos, 2))  # peso maior para conta
+            if nome:
+                nomes.setdefault(nome, []).append((pos, 3))  # peso forte para o nome da empresa no extrato
+    return {
+        "digitos": digitos,
+        "nomes": nomes,
+        "automato_digitos": AutomatoPadroes(digitos),
+        "automato_nomes": AutomatoPadroes(nomes),
+    }
+
+@st.cache_data(show_spinner=False)
+def carregar_fluxo_caixa():
+    """Aba Fluxo de Caixa padronizada + índice de reconhecimento de contas (cacheados juntos)."""
+    df = _ler_fluxo_caixa()
+    return df, _indexar_contas(df)
+
 def gerar_nome_padronizado(grupo, loja, banco, agencia, conta, data_inicio, data_fim):
     grupo_limpo = re.sub(r"[^\w\s-]", "", str(grupo)).strip()
     loja_limpa = re.sub(r"[^\w\s-]", "", str(loja)).strip()
@@ -222,6 +257,11 @@ def extrair_texto_arquivo(file_bytes: bytes, file_name: str) -> str:
 
     return ""
 
+@st.cache_data(show_spinner=False, max_entries=20)
+def ler_lancamentos_extrato(file_bytes: bytes, file_name: str, ano_padrao=None) -> pd.DataFrame:
+    """Lançamentos tipados do extrato (Data, Valor, Descrição, Documento), cacheados por arquivo."""
+    return ler_extrato(file_bytes, file_name, ano_padrao)
+
 def extrair_datas_do_texto(texto: str):
     """Procura datas no formato dd/mm/aaaa ou dd/mm/aa e retorna (data_min, data_max) ou (None, None)."""
     padrao = r"\b(\d{1,2}/\d{1,2}/\d{2,4})\b"
@@ -242,7 +282,30 @@ def extrair_datas_do_texto(texto: str):
 
     return min(datas), max(datas)
 
-def reconhecer_conta_no_texto(texto: str, df_fluxo: pd.DataFrame):
+def ranquear_contas(texto: str, df_fluxo: pd.DataFrame, indice: dict):
+    """
+    Contas do Fluxo de Caixa citadas no texto, da maior para a menor pontuação:
+    lista de (score, linha). Agência vale 1, Conta 2 e ExtratoNomeEmpresa 3
+    (mesma comparação por substring de sempre, numa passada só pelo texto).
+    """
+    if df_fluxo.empty or not texto or not indice:
+        return []
+
+    texto_digitos = re.sub(r"\D", "", texto)
+    texto_lower = texto.lower()
+
+    scores = {}
+    for padrao in indice["automato_digitos"].encontrados(texto_digitos):
+        for pos, peso in indice["digitos"][padrao]:
+            scores[pos] = scores.get(pos, 0) + peso
+    for padrao in indice["automato_nomes"].encontrados(texto_lower):
+        for pos, peso in indice["nomes"][padrao]:
+            scores[pos] = scores.get(pos, 0) + peso
+
+    ordem = sorted(scores, key=lambda pos: (-scores[pos], pos))
+    return [(scores[pos], df_fluxo.iloc[pos]) for pos in ordem]
+
+def reconhecer_conta_no_texto(texto: str, df_fluxo: pd.DataFrame, indice: dict):
     """
     Tenta encontrar uma combinação única de Agência + Conta + ExtratoNomeEmpresa no texto,
     comparando com a aba Fluxo de Caixa.
@@ -250,51 +313,23 @@ def reconhecer_conta_no_texto(texto: str, df_fluxo: pd.DataFrame):
       - match de Agência (1 ponto)
       - match de Conta (2 pontos)
       - match de "Extrato Nome Empresa" (3 pontos)
+    Retorna (linha, erro, candidatos ranqueados).
     """
     if df_fluxo.empty or not texto:
-        return None, "Fluxo de Caixa vazio ou texto não disponível."
-
-    texto_digitos = re.sub(r"\D", "", texto)
-    texto_lower = texto.lower()
-
-    melhor_linha = None
-    melhor_score = 0
-    candidatos = []
+        return None, "Fluxo de Caixa vazio ou texto não disponível.", []
 
-    for _, row in df_fluxo.iterrows():
-        ag = re.sub(r"\D", "", str(row["Agencia"]))
-        cc = re.sub(r"\D", "", str(row["ContaCorrente"]))
-        nome_extrato = str(row.get("ExtratoNomeEmpresa", "")).strip()
-        nome_extrato_lower = nome_extrato.lower()
-
-        score = 0
-
-        if ag and ag in texto_digitos:
-            score += 1
-
-        if cc and cc in texto_digitos:
-            score += 2  # peso maior para conta
-
-        if nome_extrato_lower and nome_extrato_lower in texto_lower:
-            score += 3  # peso forte para o nome da empresa no extrato
-
-        if score > 0:
-            candidatos.append((score, row))
-
-        if score > melhor_score:
-            melhor_score = score
-            melhor_linha = row
-
-    if melhor_score == 0 or melhor_linha is None:
-        return None, "Nenhuma conta/agência/nome de empresa do Fluxo de Caixa foi encontrada no arquivo."
+    candidatos = ranquear_contas(texto, df_fluxo, indice)
+    if not candidatos:
+        return None, "Nenhuma conta/agência/nome de empresa do Fluxo de Caixa foi encontrada no arquivo.", []
 
+    melhor_score, melhor_linha = candidatos[0]
     qtd_max = sum(1 for s, _ in candidatos if s == melhor_score)
     if qtd_max > 1:
-        return None, "Mais de uma conta possível encontrada no arquivo (ambiguidade)."
+        return None, "Mais de uma conta possível encontrada no arquivo (ambiguidade).", candidatos
 
-    return melhor_linha, None
+    return melhor_linha, None, candidatos
 
-def aplicar_reconhecimento_automatico(uploaded_file, df_fluxo, grupos, lojas_map):
+def aplicar_reconhecimento_automatico(uploaded_file, df_fluxo, indice_contas, grupos, lojas_map):
     """
     Lê o arquivo enviado, tenta reconhecer:
     - Grupo
@@ -321,7 +356,7 @@ def aplicar_reconhecimento_automatico(uploaded_file, df_fluxo, grupos, lojas_map
         st.session_state["auto_info"]["mensagem"] = "Não foi possível extrair texto do arquivo para reconhecimento automático."
         return
 
-    linha_conta, erro_conta = reconhecer_conta_no_texto(texto, df_fluxo)
+    linha_conta, erro_conta, candidatos = reconhecer_conta_no_texto(texto, df_fluxo, indice_contas)
     data_ini_auto, data_fim_auto = extrair_datas_do_texto(texto)
 
     reconhecido = {}
@@ -369,6 +404,17 @@ def aplicar_reconhecimento_automatico(uploaded_file, df_fluxo, grupos, lojas_map
         msg_lista.append("⚠️ Não foi possível reconhecer o período completo do extrato.")
 
     st.session_state["auto_info"]["reconhecido"] = reconhecido
+    st.session_state["auto_info"]["candidatos"] = [
+        {
+            "Pontos": score,
+            "Grupo": linha["Grupo"],
+            "Loja": linha["Loja"],
+            "Banco": linha["Banco"],
+            "Agência": linha["Agencia"],
+            "Conta": linha["ContaCorrente"],
+        }
+        for score, linha in candidatos[:10]
+    ]
     st.session_state["auto_info"]["mensagem"] = "\n".join(msg_lista)
 
     st.session_state["auto_aplicado"] = True
@@ -376,7 +422,7 @@ def aplicar_reconhecimento_automatico(uploaded_file, df_fluxo, grupos, lojas_map
 # ======================
 # Carregar bases
 # ======================
-df_fluxo = carregar_fluxo_caixa()
+df_fluxo, indice_contas = carregar_fluxo_caixa()
 
 if df_fluxo.empty:
     GRUPOS = []
@@ -409,7 +455,7 @@ uploaded_file = st.file_uploader(
 # 🔍 Reconhecimento Automático (após upload)
 if uploaded_file is not None and not df_fluxo.empty:
     with st.spinner("🔍 Lendo o arquivo e tentando reconhecer as informações automaticamente..."):
-        aplicar_reconhecimento_automatico(uploaded_file, df_fluxo, GRUPOS, LOJAS_MAP)
+        aplicar_reconhecimento_automatico(uploaded_file, df_fluxo, indice_contas, GRUPOS, LOJAS_MAP)
 
     auto_info = st.session_state.get("auto_info", {})
     if auto_info:
@@ -418,6 +464,10 @@ if uploaded_file is not None and not df_fluxo.empty:
             if msg:
                 for linha in msg.split("\n"):
                     st.markdown(f"- {linha}")
+            candidatos = auto_info.get("candidatos", [])
+            if len(candidatos) > 1 and not auto_info.get("reconhecido", {}).get("conta"):
+                st.markdown("**Contas candidatas (maior pontuação primeiro):**")
+                st.dataframe(pd.DataFrame(candidatos), use_container_width=True, hide_index=True)
             rec = auto_info.get("reconhecido", {})
             if rec:
                 st.markmarkdown("**Resumo dos dados sugeridos:**")
@@ -575,6 +625,82 @@ with col_a2:
     else:
         st.button("📊 Registrar extrato no Google Sheets", disabled=True, use_container_width=True)
 
+# ======================
+# Conciliação dos lançamentos
+# ======================
+st.markdown("### 🔄 Conciliação dos Lançamentos")
+
+if uploaded_file is None:
+    st.info("Faça o upload do extrato para conciliar os créditos com os recebimentos previstos (Faturamento Meio Pagamento).")
+else:
+    ano_padrao = data_fim.year if data_fim else None
+    try:
+        lancamentos = ler_lancamentos_extrato(uploaded_file.getvalue(), uploaded_file.name, ano_padrao)
+    except Exception as e:
+        st.error(f"❌ Não foi possível ler os lançamentos do extrato: {e}")
+        lancamentos = pd.DataFrame()
+
+    if lancamentos.empty:
+        st.warning("⚠️ Nenhum lançamento (data + valor) reconhecido no arquivo.")
+    else:
+        with st.expander(f"📄 Lançamentos lidos do extrato ({len(lancamentos)})"):
+            st.dataframe(lancamentos, use_container_width=True, hide_index=True)
+
+        try:
+            df_fat_mp = carregar_faturamento_meio_pagamento()
+            df_tab_mp = carregar_tabela_meio_pagamento()
+        except Exception as e:
+            st.error(f"❌ Erro ao carregar Faturamento / Tabela Meio Pagamento: {e}")
+            df_fat_mp = pd.DataFrame()
+            df_tab_mp = pd.DataFrame()
+
+        if df_fat_mp.empty or df_tab_mp.empty:
+            st.info("Sem dados de Faturamento Meio Pagamento / Tabela Meio Pagamento para conciliar.")
+        else:
+            lojas_fat = sorted(df_fat_mp["Loja"].dropna().unique().tolist())
+            loja_padrao = [l for l in lojas_fat if l.upper() == str(loja_sel or "").strip().upper()]
+
+            col_c1, col_c2, col_c3, col_c4 = st.columns([3, 1, 1, 2])
+            with col_c1:
+                lojas_conc = st.multiselect("Lojas do faturamento:", lojas_fat, default=loja_padrao, key="cb_conc_lojas")
+            with col_c2:
+                tolerancia = st.number_input("Tolerância (R$):", min_value=0.0, value=TOLERANCIA_VALOR, step=0.01, format="%.2f")
+            with col_c3:
+                janela = st.number_input("Janela (dias):", min_value=0, value=JANELA_DIAS, step=1)
+            with col_c4:
+                nivel = st.radio("Previsto por:", ["Dia + Meio de Pagamento", "Dia (total)"], horizontal=True)
+
+            if not lojas_conc:
+                st.info("Selecione ao menos uma loja do faturamento.")
+            else:
+                agrupar_por = ("Data Prevista", "Meio de Pagamento") if nivel == "Dia + Meio de Pagamento" else ("Data Prevista",)
+                previstos = prever_recebimentos(df_fat_mp[df_fat_mp["Loja"].isin(lojas_conc)], df_tab_mp, agrupar_por)
+                ini = pd.Timestamp(lancamentos["Data"].min()) - pd.Timedelta(days=int(janela))
+                fim = pd.Timestamp(lancamentos["Data"].max()) + pd.Timedelta(days=int(janela))
+                previstos = previstos[previstos["Data Prevista"].between(ini, fim)]
+
+                resultado, pendentes = conciliar(lancamentos, previstos, tolerancia_valor=tolerancia, janela_dias=int(janela))
+
+                creditos = resultado[resultado["Status"] != "Débito"]
+                conciliados = resultado[resultado["Status"] == "Conciliado"]
+                m1, m2, m3, m4 = st.columns(4)
+                m1.metric("Créditos no extrato", len(creditos))
+                m2.metric("Conciliados", len(conciliados))
+                m3.metric("Valor conciliado", f"R$ {conciliados['Valor'].sum():,.2f}".replace(",", "X").replace(".", ",").replace("X", "."))
+                m4.metric("Previstos sem crédito", len(pendentes))
+
+                filtro_status = st.multiselect(
+                    "Status:", ["Conciliado", "Não conciliado", "Débito"],
+                    default=["Conciliado", "Não conciliado"],
+                )
+                st.dataframe(
+                    resultado[resultado["Status"].isin(filtro_status)],
+                    use_container_width=True,
+                    hide_index=True,
+                )
+                with st.expander(f"⏳ Recebimentos previstos sem crédito no extrato ({len(pendentes)})"):
+                    st.dataframe(pendentes, use_container_width=True, hide_index=True)
+
 # Ajuda
 with st.expander("ℹ️ Como funciona a amarração com a planilha de Fluxo de Caixa?"):
     st.markdown("""
@@ -1,18 +1,23 @@
-import os
 import streamlit as st
 import pandas as pd
 import json
-import re
+import os
 import io
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta, date
 from oauth2client.service_account import ServiceAccountCredentials
 import gspread
-import numpy as np
-import psycopg2
 
 from st_aggrid import AgGrid, GridOptionsBuilder, GridUpdateMode
 from st_aggrid.shared import JsCode
 
+from comum.armazem_3s import carregar_3s
+from comum.conversao import para_float_br
+from comum.cota_sheets import chamar
+from comum.downloads import botao_download
+from comum.gsheets import substituir_linhas
+from comum.tabela_empresa import carregar_tabela_empresa
+
 try:
     from googleapiclient.discovery import build
 except Exception:
@@ -130,106 +135,19 @@ st.markdown(
 )
 # ----------------- Helpers para Desconto 3S / DB / GSheets -----------------
 
-def _parse_money_to_float(x):
-    if pd.isna(x):
-        return 0.0
-    s = str(x).strip()
-    s = s.replace("R$", "").replace("\u00A0", "").replace(" ", "")
-    s = re.sub(r"[^\d,\-\.]", "", s)
-    if s == "":
-        return 0.0
-    if s.count(",") == 1 and s.count(".") >= 1:
-        s = s.replace(".", "").replace(",", ".")
-    elif s.count(",") == 1 and s.count(".") == 0:
-        s = s.replace(",", ".")
-    try:
-        return float(s)
-    except Exception:
-        try:
-            return float(s.replace(",", "."))
-        except Exception:
-            return 0.0
-
-def _get_db_params():
-    try:
-        db = st.secrets["db"]
-        return {
-            "host": db["host"],
-            "port": int(db.get("port", 5432)),
-            "dbname": db["database"],
-            "user": db["user"],
-            "password": db["password"]
-        }
-    except Exception:
-        return {
-            "host": os.environ.get("PGHOST", "localhost"),
-            "port": int(os.environ.get("PGPORT", 5432)),
-            "dbname": os.environ.get("PGDATABASE", ""),
-            "user": os.environ.get("PGUSER", ""),
-            "password": os.environ.get("PGPASSWORD", "")
-        }
-
-def create_db_conn(params):
-    return psycopg2.connect(
-        host=params["host"],
-        port=params["port"],
-        dbname=params["dbname"],
-        user=params["user"],
-        password=params["password"]
-    )
-
-@st.cache_data(ttl=300)
-def fetch_order_picture(data_de, data_ate, excluir_stores=("0000", "0001", "9999"), estado_filtrar=5):
-    params = _get_db_params()
-    if not params["dbname"] or not params["user"] or not params["password"]:
-        raise RuntimeError("Credenciais do banco nao encontradas. Configure st.secrets['db'] ou variaveis de ambiente PG*.")
-    conn = create_db_conn(params)
-    try:
-        base_sql = """
-            SELECT store_code, business_dt, order_discount_amount
-            FROM public.order_picture
-            WHERE business_dt >= %s
-              AND business_dt <= %s
-              AND store_code NOT IN %s
-              AND state_id = %s
-        """
-        try_cols = [
-            ("VOID_TYPE", "AND (VOID_TYPE IS NULL OR VOID_TYPE = '' OR LOWER(VOID_TYPE) NOT LIKE %s)"),
-            ("pod_type", "AND (pod_type IS NULL OR pod_type = '' OR LOWER(pod_type) NOT LIKE %s)")
-        ]
-        like_void = "%void%"
-        for col_name, cond_sql in try_cols:
-            sql = f"{base_sql} {cond_sql} ORDER BY business_dt, store_code"
-            try:
-                df = pd.read_sql(sql, conn, params=(data_de, data_ate, tuple(excluir_stores), estado_filtrar, like_void))
-                return df
-            except Exception as e:
-                msg = str(e).lower()
-                if "does not exist" in msg or (("column" in msg) and (col_name.lower() in msg)):
-                    continue
-                else:
-                    raise
-        sql = f"{base_sql} ORDER BY business_dt, store_code"
-        df = pd.read_sql(sql, conn, params=(data_de, data_ate, tuple(excluir_stores), estado_filtrar))
+def fetch_order_picture(data_de, data_ate):
+    """Desconto (order_discount_amount) por loja/dia: dias fechados do armazém local, o resto do banco."""
+    df = carregar_3s("desconto", data_de, data_ate)
+    if df.empty:
         return df
-    finally:
-        conn.close()
+    return df.rename(columns={"data": "business_dt"})
 
-@st.cache_data(ttl=300)
 def fetch_tabela_empresa():
-    # usa o gc global retornado por autenticar()
-    global gc
-    sh = gc.open_by_key(ID_PLANILHA_ORIGEM_FAT) if 'ID_PLANILHA_ORIGEM_FAT' in globals() else gc.open("Vendas diarias")
-    ws = sh.worksheet("Tabela Empresa")
-    values = ws.get_all_values()
-    if not values:
+    # catálogo compartilhado (cache por processo); aqui as colunas viram letras A, B, C...
+    df = carregar_tabela_empresa().reset_index(drop=True)
+    if df.empty:
         return pd.DataFrame()
-    max_cols = max(len(r) for r in values)
-    rows = [r + [""] * (max_cols - len(r)) for r in values]
-    cols = [chr(ord("A") + i) for i in range(max_cols)]
-    data_rows = rows[1:] if len(rows) > 1 else []
-    df = pd.DataFrame(data_rows, columns=cols)
-    df = df.loc[~(df[cols].apply(lambda r: all(str(x).strip() == "" for x in r), axis=1))]
+    df.columns = [chr(ord("A") + i) for i in range(df.shape[1])]
     return df
 
 def process_and_build_report_summary(df_orders: pd.DataFrame, df_empresa: pd.DataFrame) -> pd.DataFrame:
@@ -242,7 +160,7 @@ def process_and_build_report_summary(df_orders: pd.DataFrame, df_empresa: pd.Dat
     df["store_code"] = df["store_code"].astype(str).str.replace(r"\D", "", regex=True).str.lstrip("0").replace("", "0")
     df["business_dt"] = pd.to_datetime(df["business_dt"], errors="coerce")
     df["business_month"] = df["business_dt"].dt.strftime("%m/%Y").fillna("")
-    df["order_discount_amount_val"] = df["order_discount_amount"].apply(_parse_money_to_float)
+    df["order_discount_amount_val"] = para_float_br(df["order_discount_amount"]).fillna(0.0)
     if df_empresa is None or df_empresa.empty:
         mapa_codigo_para_nome = {}
         mapa_codigo_para_colB = {}
@@ -294,61 +212,11 @@ def upload_df_to_gsheet_replace_months(df: pd.DataFrame,
     except gspread.exceptions.WorksheetNotFound:
         ws = sh.add_worksheet(title=worksheet_name, rows="1000", cols="20")
 
-    existing = ws.get_all_values()
-    header = existing[0] if existing else df.columns.tolist()
-    existing_rows = existing[1:] if len(existing) > 1 else []
-
-    meses_importar = set(df["Business Month"].astype(str).unique())
-
-    def keep_row(row):
-        a = row[0].strip() if len(row) > 0 else ""
-        b = row[1].strip() if len(row) > 1 else ""
-        if a == "3S Checkout" and b in meses_importar:
-            return False
-        return True
-
-    filtered_existing = [r for r in existing_rows if keep_row(r)]
-
-    # Prepara df convertendo NaN -> None para não virar "nan" e preservando tipos numéricos nativos
-    df_clean = df.copy()
-    df_clean = df_clean.where(pd.notnull(df_clean), None)
-
-    # Detecta colunas numéricas (pandas) para preservar como números
-    numeric_cols = df_clean.select_dtypes(include=[np.number]).columns.tolist()
-
-    df_rows = []
-    for _, row in df_clean.iterrows():
-        converted = []
-        for col in df_clean.columns:
-            val = row[col]
-            if val is None:
-                converted.append("")
-            elif col in numeric_cols:
-                # garante tipos nativos do Python para o gspread entender como número
-                if isinstance(val, (np.integer,)):
-                    converted.append(int(val))
-                elif isinstance(val, (np.floating,)):
-                    converted.append(float(val))
-                elif isinstance(val, (int, float)):
-                    converted.append(val)
-                else:
-                    # fallback: tenta converter
-                    try:
-                        converted.append(float(val))
-                    except Exception:
-                        converted.append(str(val))
-            else:
-                # Mantém strings (datas no formato "MM/YYYY" ou "dd/mm/yyyy" serão interpretadas pelo Sheets)
-                converted.append("" if val is None else str(val))
-        df_rows.append(converted)
-
-    final_values = [header] + filtered_existing + df_rows
-
-    ws.clear()
-    # IMPORTANTE: usar USER_ENTERED para que o Sheets interprete números/datas corretamente
-    ws.update("A1", final_values, value_input_option="USER_ENTERED")
-
-    return {"kept_rows": len(filtered_existing), "inserted_rows": len(df_rows), "header": header}
+    # delta: só as linhas "3S Checkout" dos meses importados são trocadas
+    meses_importar = df["Business Month"].astype(str).str.strip().unique()
+    chaves = {("3S Checkout", m) for m in meses_importar}
+    # IMPORTANTE: USER_ENTERED para que o Sheets interprete números/datas corretamente
+    return substituir_linhas(ws, df, chaves, intervalo_chaves="A:B", value_input_option="USER_ENTERED")
 
 # ---- AUTENTICAÇÃO ----
 @st.cache_resource
@@ -409,26 +277,20 @@ def list_spreadsheets_in_folders(_drive, folder_ids):
 def read_codes_from_config_sheet(gsheet):
     try:
         ws = None
-        for w in gsheet.worksheets():
+        for w in chamar(gsheet.worksheets):
             if TARGET_SHEET_NAME.strip().lower() in w.title.strip().lower():
                 ws = w
                 break
         if ws is None: return None, None, None, None
-        b2 = ws.acell("B2").value
-        b3 = ws.acell("B3").value
-        b4 = ws.acell("B4").value
-        b5 = ws.acell("B5").value
-        return (
-            str(b2).strip() if b2 else None,
-            str(b3).strip() if b3 else None,
-            str(b4).strip() if b4 else None,
-            str(b5).strip() if b5 else None
-        )
+        # B2:B5 numa leitura só (eram 4 acell)
+        celulas = [(linha[0] if linha else "") for linha in chamar(ws.get, "B2:B5")]
+        celulas = (celulas + [""] * 4)[:4]
+        return tuple(str(v).strip() if v else None for v in celulas)
     except Exception:
         return None, None, None, None
 
 def get_headers_and_df_raw(ws):
-    vals = ws.get_all_values()
+    vals = chamar(ws.get_all_values)
     if not vals: return [], pd.DataFrame()
     headers = [str(h).strip() for h in vals[0]]
     df = pd.DataFrame(vals[1:], columns=headers)
@@ -443,35 +305,13 @@ def detect_date_col(headers):
         if "data" in h.lower(): return h
     return None
 
-def _parse_currency_like(s):
-    if s is None: return None
-    s = str(s).strip()
-    if s == "" or s in ["-", "–"]: return None
-    neg = False
-    if s.startswith("(") and s.endswith(")"):
-        neg = True
-        s = s[1:-1].strip()
-    s = s.replace("R$", "").replace("r$", "").replace(" ", "")
-    s = re.sub(r"[^0-9,.\-]", "", s)
-    if s == "" or s == "-" or s == ".": return None
-    if s.count(".") > 0 and s.count(",") > 0:
-        s = s.replace(".", "").replace(",", ".")
-    else:
-        if s.count(",") > 0 and s.count(".") == 0: s = s.replace(",", ".")
-        if s.count(".") > 1 and s.count(",") == 0: s = s.replace(".", "")
-    try:
-        val = float(s)
-        if neg: val = -val
-        return val
-    except: return None
-
 def tratar_numericos(df, headers):
     indices_valor = [6, 7, 8, 9]
     for idx in indices_valor:
         if idx < len(headers):
             col_name = headers[idx]
             try:
-                df[col_name] = df[col_name].apply(_parse_currency_like).fillna(0.0)
+                df[col_name] = para_float_br(df[col_name]).fillna(0.0)
             except Exception:
                 pass
     return df
@@ -501,6 +341,186 @@ def to_bool_like(x):
     s = str(x).strip().lower()
     return s in ("true", "t", "1", "yes", "y", "sim", "s")
 
+# ---- ATUALIZAÇÃO EM PARALELO (uma planilha destino por tarefa) ----
+DRE_WORKERS = int(os.environ.get("MMR_DRE_WORKERS", "4"))
+
+def particionar(df, col):
+    """{valor da coluna (sem espaços): linhas}; None = sem coluna para filtrar."""
+    if col is None or df.empty or col not in df.columns:
+        return None
+    return {k: g for k, g in df.groupby(df[col].astype(str).str.strip(), sort=False)}
+
+def fatia(partes, df, chave):
+    if partes is None:
+        return df
+    return partes.get(str(chave).strip(), df.iloc[0:0])
+
+def abrir_ou_criar_aba(sh, nome, cols=30):
+    try:
+        return chamar(sh.worksheet, nome)
+    except gspread.exceptions.WorksheetNotFound:
+        return chamar(sh.add_worksheet, nome, 1000, cols, escrita=True)
+
+def regravar_aba(ws, valores, linhas_antes, colunas_antes):
+    """
+    Sobrescreve a partir de A1 e limpa só a sobra da versão anterior
+    (linhas abaixo / colunas à direita). Sem ws.clear(): a aba nunca fica vazia.
+    """
+    chamar(ws.update, "A1", valores, value_input_option="USER_ENTERED", escrita=True)
+    n = len(valores)
+    w = max((len(r) for r in valores), default=0)
+    sobras = []
+    if linhas_antes > n:
+        sobras.append(f"A{n + 1}:{gspread.utils.rowcol_to_a1(linhas_antes, max(w, colunas_antes, 1))}")
+    if colunas_antes > w and n:
+        sobras.append(f"{gspread.utils.rowcol_to_a1(1, w + 1)}:{gspread.utils.rowcol_to_a1(min(n, linhas_antes) or 1, colunas_antes)}")
+    if sobras:
+        chamar(ws.batch_clear, sobras, escrita=True)
+
+def substituir_periodo(sh_dest, aba, df_ins, h_orig, c_b2, b2, data_de, data_ate):
+    """Troca na aba destino as linhas do período (e do B2) pelas da origem."""
+    ws_dest = abrir_ou_criar_aba(sh_dest, aba)
+    h_dest, df_dest = get_headers_and_df_raw(ws_dest)
+    if df_dest.empty:
+        df_f, h_f = df_ins, h_orig
+    else:
+        c_dt_d = detect_date_col(h_dest)
+        if c_dt_d:
+            df_dest["_dt"] = pd.to_datetime(df_dest[c_dt_d], dayfirst=True, errors="coerce").dt.date
+            rem = (df_dest["_dt"] >= data_de) & (df_dest["_dt"] <= data_ate)
+        else:
+            rem = pd.Series([False] * len(df_dest))
+        if c_b2 and c_b2 in df_dest.columns:
+            rem &= (df_dest[c_b2].astype(str).str.strip() == str(b2).strip())
+        df_f = pd.concat([df_dest.loc[~rem], df_ins], ignore_index=True)
+        h_f = h_dest if h_dest else h_orig
+    if "_dt" in df_f.columns:
+        df_f = df_f.drop(columns=["_dt"])
+    send = df_f[h_f].fillna("")
+    regravar_aba(ws_dest, [h_f] + send.values.tolist(), len(df_dest) + 1 if h_dest else 0, len(h_dest))
+
+def atualizar_destino(row, fontes, data_de, data_ate):
+    """Atualiza uma planilha DRE (Fat / MP / Desconto) e devolve as linhas de log."""
+    nome = row.get("Planilha", "(sem nome)")
+    logs = []
+    sid = row.get("ID_Planilha")
+    if not sid:
+        return [f"{nome}: ID não encontrado."]
+
+    sh_dest = chamar(gc.open_by_key, sid)
+    b2, b3, b4, b5 = read_codes_from_config_sheet(sh_dest)
+    if not b2:
+        return [f"{nome}: Sem B2."]
+    lojas_filtro = [str(b).strip() for b in (b3, b4, b5) if b]
+
+    # --- ATUALIZAR FATURAMENTO ---
+    if row.get("Faturamento"):
+        h_orig_fat, partes_fat, df_orig_fat_f = fontes["fat"]
+        try:
+            df_ins = fatia(partes_fat, df_orig_fat_f, b2)
+            c_b2 = h_orig_fat[5] if len(h_orig_fat) > 5 else None
+            if lojas_filtro and not df_ins.empty and len(h_orig_fat) > 3:
+                c_loja = h_orig_fat[3]
+                df_ins = df_ins[df_ins[c_loja].astype(str).str.strip().isin(lojas_filtro)]
+            if not df_ins.empty:
+                try:
+                    substituir_periodo(sh_dest, "Importado_Fat", df_ins, h_orig_fat, c_b2, b2, data_de, data_ate)
+                    logs.append(f"{nome}: Fat OK.")
+                except Exception as e:
+                    logs.append(f"{nome}: Fat Erro ao gravar destino: {e}")
+            else:
+                logs.append(f"{nome}: Fat Sem dados.")
+        except Exception as e:
+            logs.append(f"{nome}: Fat Erro {e}")
+
+    # --- ATUALIZAR MEIO DE PAGAMENTO ---
+    if row.get("Meio Pagamento"):
+        h_orig_mp, partes_mp, df_orig_mp_f = fontes["mp"]
+        try:
+            df_ins_mp = fatia(partes_mp, df_orig_mp_f, b2)
+            c_b2_mp = h_orig_mp[8] if len(h_orig_mp) > 8 else None
+            if lojas_filtro and not df_ins_mp.empty and len(h_orig_mp) > 6:
+                c_loja_mp = h_orig_mp[6]
+                df_ins_mp = df_ins_mp[df_ins_mp[c_loja_mp].astype(str).str.strip().isin(lojas_filtro)]
+            if not df_ins_mp.empty:
+                try:
+                    substituir_periodo(sh_dest, "Meio de Pagamento", df_ins_mp, h_orig_mp, c_b2_mp, b2, data_de, data_ate)
+                    logs.append(f"{nome}: MP OK.")
+                except Exception as e:
+                    logs.append(f"{nome}: MP Erro ao gravar destino: {e}")
+            else:
+                logs.append(f"{nome}: MP Sem dados.")
+        except Exception as e:
+            logs.append(f"{nome}: MP Erro {e}")
+
+    # --- ATUALIZAR DESCONTO ---
+    if row.get("Desconto"):
+        try:
+            h_orig_des, partes_des, df_orig_des_f = fontes["des"]
+            if len(h_orig_des) <= 1:
+                logs.append(f"{nome}: Desconto - Coluna B não encontrada.")
+
+            # nomes/índices fixos solicitados: B, D, E, F, G, H => índices 1,3,4,5,6,7
+            desired_idx = [1, 3, 4, 5, 6, 7]
+            cols_to_take = [h_orig_des[i] for i in desired_idx if i < len(h_orig_des)]
+            c_b2_des = h_orig_des[7] if len(h_orig_des) > 7 else None  # coluna H
+
+            # Filtro pelo B2 (coluna H da origem, já particionada)
+            df_ins_des = fatia(partes_des, df_orig_des_f, b2)
+
+            # Filtro por lojas usando COL G na origem (código já normalizado em _loja_norm)
+            if lojas_filtro and not df_ins_des.empty and "_loja_norm" in df_ins_des.columns:
+                lojas_norm = [normalize_code(x) for x in lojas_filtro]
+                df_ins_des = df_ins_des[df_ins_des["_loja_norm"].isin(lojas_norm)]
+
+            # Seleciona apenas as colunas solicitadas
+            if not df_ins_des.empty and cols_to_take:
+                existing_take = [c for c in cols_to_take if c in df_ins_des.columns]
+                df_ins_des = df_ins_des[existing_take].copy()
+
+            if not df_ins_des.empty:
+                try:
+                    ws_dest_des = abrir_ou_criar_aba(sh_dest, "Desconto", max(30, len(cols_to_take)))
+                    h_dest_des, df_dest_des = get_headers_and_df_raw(ws_dest_des)
+
+                    if df_dest_des.empty:
+                        df_f_des, h_f_des = df_ins_des, list(df_ins_des.columns)
+                    else:
+                        c_dt_d_des = detect_date_col(h_dest_des)
+                        if c_dt_d_des:
+                            df_dest_des["_dt"] = pd.to_datetime(df_dest_des[c_dt_d_des], dayfirst=True, errors="coerce").dt.date
+                            rem_des = (df_dest_des["_dt"] >= data_de) & (df_dest_des["_dt"] <= data_ate)
+                        else:
+                            rem_des = pd.Series([False] * len(df_dest_des))
+
+                        if c_b2_des and c_b2_des in df_dest_des.columns and b2:
+                            rem_des &= (df_dest_des[c_b2_des].astype(str).str.strip() == str(b2).strip())
+
+                        # Alinha colunas
+                        df_dest_sub = df_dest_des.copy()
+                        for col in cols_to_take:
+                            if col not in df_dest_sub.columns: df_dest_sub[col] = ""
+                        df_dest_sub = df_dest_sub[[c for c in cols_to_take if c in df_dest_sub.columns]]
+
+                        for col in cols_to_take:
+                            if col not in df_ins_des.columns: df_ins_des[col] = ""
+                        df_ins_des = df_ins_des[[c for c in cols_to_take if c in df_ins_des.columns]]
+
+                        df_f_des = pd.concat([df_dest_sub.loc[~rem_des], df_ins_des], ignore_index=True)
+                        h_f_des = [c for c in cols_to_take if c in df_f_des.columns]
+
+                    send_des = df_f_des[h_f_des].fillna("")
+                    regravar_aba(ws_dest_des, [h_f_des] + send_des.values.tolist(),
+                                 len(df_dest_des) + 1 if h_dest_des else 0, len(h_dest_des))
+                    logs.append(f"{nome}: Desconto OK.")
+                except Exception as e:
+                    logs.append(f"{nome}: Desconto Erro ao gravar destino: {e}")
+            else:
+                logs.append(f"{nome}: Desconto Sem dados no período/filtros.")
+        except Exception as e:
+            logs.append(f"{nome}: Desconto Erro {e}")
+    return logs
+
 # ---- TABS ----
 tab_atual, tab_audit = st.tabs(["Atualização", "Auditoria"])
 
@@ -581,8 +601,7 @@ with tab_atual:
 
                 # Carregar Origem Faturamento
                 try:
-                    sh_orig_fat = gc.open_by_key(ID_PLANILHA_ORIGEM_FAT)
-                    ws_orig_fat = sh_orig_fat.worksheet(ABA_ORIGEM_FAT)
+                    ws_orig_fat = chamar(chamar(gc.open_by_key, ID_PLANILHA_ORIGEM_FAT).worksheet, ABA_ORIGEM_FAT)
                     h_orig_fat, df_orig_fat = get_headers_and_df_raw(ws_orig_fat)
                     c_dt_fat = detect_date_col(h_orig_fat)
                     if c_dt_fat:
@@ -595,8 +614,7 @@ with tab_atual:
 
                 # Carregar Origem Meio Pagamento
                 try:
-                    sh_orig_mp = gc.open_by_key(ID_PLANILHA_ORIGEM_MP)
-                    ws_orig_mp = sh_orig_mp.worksheet(ABA_ORIGEM_MP)
+                    ws_orig_mp = chamar(chamar(gc.open_by_key, ID_PLANILHA_ORIGEM_MP).worksheet, ABA_ORIGEM_MP)
                     h_orig_mp, df_orig_mp = get_headers_and_df_raw(ws_orig_mp)
                     c_dt_mp = detect_date_col(h_orig_mp)
                     if c_dt_mp:
@@ -607,218 +625,52 @@ with tab_atual:
                 except Exception as e:
                     st.error(f"Erro origem MP: {e}"); st.stop()
 
+                # Carregar Origem Desconto (uma vez, só se alguma planilha pede)
+                h_orig_des, df_orig_des_f = [], pd.DataFrame()
+                if df_marcadas["Desconto"].any():
+                    try:
+                        ws_orig_des = chamar(chamar(gc.open_by_key, ID_PLANILHA_ORIGEM_DESCONTO).worksheet, ABA_ORIGEM_DESCONTO)
+                        h_orig_des, df_orig_des = get_headers_and_df_raw(ws_orig_des)
+                        # --- FILTRO DE DATA NA ORIGEM (Forçando Coluna B / Índice 1) ---
+                        if len(h_orig_des) > 1:
+                            df_orig_des["_dt_orig"] = pd.to_datetime(df_orig_des[h_orig_des[1]], dayfirst=True, errors="coerce").dt.date
+                            df_orig_des_f = df_orig_des[(df_orig_des["_dt_orig"] >= data_de) & (df_orig_des["_dt_orig"] <= data_ate)].copy()
+                        else:
+                            df_orig_des_f = df_orig_des.copy()
+                        if len(h_orig_des) > 6:
+                            df_orig_des_f["_loja_norm"] = [normalize_code(x) if pd.notna(x) else "" for x in df_orig_des_f[h_orig_des[6]]]
+                    except Exception as e:
+                        st.error(f"Erro origem Desconto: {e}"); st.stop()
+
+                # Particiona as origens pelo código B2 uma vez (cada destino pega só a sua fatia)
+                fontes = {
+                    "fat": (h_orig_fat, particionar(df_orig_fat_f, h_orig_fat[5] if len(h_orig_fat) > 5 else None), df_orig_fat_f),
+                    "mp": (h_orig_mp, particionar(df_orig_mp_f, h_orig_mp[8] if len(h_orig_mp) > 8 else None), df_orig_mp_f),
+                    "des": (h_orig_des, particionar(df_orig_des_f, h_orig_des[7] if len(h_orig_des) > 7 else None), df_orig_des_f),
+                }
+
                 total = len(df_marcadas)
+                workers = max(1, min(DRE_WORKERS, total))
+                status_placeholder.info(f"Atualizando {total} planilha(s), {workers} por vez...")
                 prog = st.progress(0)
                 logs = []
                 log_placeholder = st.empty()
 
-                for i, (_, row) in enumerate(df_marcadas.iterrows()):
-                    try:
-                        sid = row.get("ID_Planilha")
-                        if not sid:
-                            sid = row.get("ID_Planilha")
-                        if not sid:
-                            logs.append(f"{row.get('Planilha', '(sem nome)')}: ID não encontrado.")
-                            prog.progress((i+1)/total)
-                            log_placeholder.text("\n".join(logs))
-                            continue
-
-                        sh_dest = gc.open_by_key(sid)
-                        b2, b3, b4, b5 = read_codes_from_config_sheet(sh_dest)
-
-                        if not b2:
-                            logs.append(f"{row.get('Planilha', '(sem nome)')}: Sem B2.")
-                            log_placeholder.text("\n".join(logs))
-                            prog.progress((i+1)/total)
-                            continue
-
-                        lojas_filtro = []
-                        if b3: lojas_filtro.append(str(b3).strip())
-                        if b4: lojas_filtro.append(str(b4).strip())
-                        if b5: lojas_filtro.append(str(b5).strip())
-
-                        # --- ATUALIZAR FATURAMENTO ---
-                        if row.get("Faturamento"):
-                            try:
-                                df_ins = df_orig_fat_f.copy()
-                                if len(h_orig_fat) > 5:
-                                    c_b2 = h_orig_fat[5]
-                                    df_ins = df_ins[df_ins[c_b2].astype(str).str.strip() == str(b2).strip()]
-                                if lojas_filtro and not df_ins.empty:
-                                    if len(h_orig_fat) > 3:
-                                        c_loja = h_orig_fat[3]
-                                        df_ins = df_ins[df_ins[c_loja].astype(str).str.strip().isin(lojas_filtro)]
-                                if not df_ins.empty:
-                                    try:
-                                        try:
-                                            ws_dest = sh_dest.worksheet("Importado_Fat")
-                                        except Exception:
-                                            ws_dest = sh_dest.add_worksheet("Importado_Fat", 1000, 30)
-                                        h_dest, df_dest = get_headers_and_df_raw(ws_dest)
-                                        if df_dest.empty:
-                                            df_f_ws, h_f = df_ins, h_orig_fat
-                                        else:
-                                            c_dt_d = detect_date_col(h_dest)
-                                            if c_dt_d:
-                                                df_dest["_dt"] = pd.to_datetime(df_dest[c_dt_d], dayfirst=True, errors="coerce").dt.date
-                                                rem = (df_dest["_dt"] >= data_de) & (df_dest["_dt"] <= data_ate)
-                                            else:
-                                                rem = pd.Series([False] * len(df_dest))
-                                            if len(h_orig_fat) > 5 and c_b2 in df_dest.columns:
-                                                rem &= (df_dest[c_b2].astype(str).str.strip() == str(b2).strip())
-                                            df_f_ws = pd.concat([df_dest.loc[~rem], df_ins], ignore_index=True)
-                                            h_f = h_dest if h_dest else h_orig_fat
-                                        if "_dt" in df_f_ws.columns:
-                                            df_f_ws = df_f_ws.drop(columns=["_dt"])
-                                        send = df_f_ws[h_f].fillna("")
-                                        ws_dest.clear()
-                                        ws_dest.update("A1", [h_f] + send.values.tolist(), value_input_option="USER_ENTERED")
-                                        logs.append(f"{row.get('Planilha', '(sem nome)')}: Fat OK.")
-                                    except Exception as e:
-                                        logs.append(f"{row.get('Planilha', '(sem nome)')}: Fat Erro ao gravar destino: {e}")
-                                else:
-                                    logs.append(f"{row.get('Planilha', '(sem nome)')}: Fat Sem dados.")
-                            except Exception as e:
-                                logs.append(f"{row.get('Planilha', '(sem nome)')}: Fat Erro {e}")
-
-                        # --- ATUALIZAR MEIO DE PAGAMENTO ---
-                        if row.get("Meio Pagamento"):
-                            try:
-                                df_ins_mp = df_orig_mp_f.copy()
-                                if len(h_orig_mp) > 8:
-                                    c_b2_mp = h_orig_mp[8]
-                                    df_ins_mp = df_ins_mp[df_ins_mp[c_b2_mp].astype(str).str.strip() == str(b2).strip()]
-                                if lojas_filtro and not df_ins_mp.empty:
-                                    if len(h_orig_mp) > 6:
-                                        c_loja_mp = h_orig_mp[6]
-                                        df_ins_mp = df_ins_mp[df_ins_mp[c_loja_mp].astype(str).str.strip().isin(lojas_filtro)]
-                                if not df_ins_mp.empty:
-                                    try:
-                                        try:
-                                            ws_dest_mp = sh_dest.worksheet("Meio de Pagamento")
-                                        except Exception:
-                                            ws_dest_mp = sh_dest.add_worksheet("Meio de Pagamento", 1000, 30)
-                                        h_dest_mp, df_dest_mp = get_headers_and_df_raw(ws_dest_mp)
-                                        if df_dest_mp.empty:
-                                            df_f_mp, h_f_mp = df_ins_mp, h_orig_mp
-                                        else:
-                                            c_dt_d_mp = detect_date_col(h_dest_mp)
-                                            if c_dt_d_mp:
-                                                df_dest_mp["_dt"] = pd.to_datetime(df_dest_mp[c_dt_d_mp], dayfirst=True, errors="coerce").dt.date
-                                                rem_mp = (df_dest_mp["_dt"] >= data_de) & (df_dest_mp["_dt"] <= data_ate)
-                                            else:
-                                                rem_mp = pd.Series([False] * len(df_dest_mp))
-                                            if len(h_orig_mp) > 8 and c_b2_mp in df_dest_mp.columns:
-                                                rem_mp &= (df_dest_mp[c_b2_mp].astype(str).str.strip() == str(b2).strip())
-                                            df_f_mp = pd.concat([df_dest_mp.loc[~rem_mp], df_ins_mp], ignore_index=True)
-                                            h_f_mp = h_dest_mp if h_dest_mp else h_orig_mp
-                                        if "_dt" in df_f_mp.columns:
-                                            df_f_mp = df_f_mp.drop(columns=["_dt"])
-                                        send_mp = df_f_mp[h_f_mp].fillna("")
-                                        ws_dest_mp.clear()
-                                        ws_dest_mp.update("A1", [h_f_mp] + send_mp.values.tolist(), value_input_option="USER_ENTERED")
-                                        logs.append(f"{row.get('Planilha', '(sem nome)')}: MP OK.")
-                                    except Exception as e:
-                                        logs.append(f"{row.get('Planilha', '(sem nome)')}: MP Erro ao gravar destino: {e}")
-                                else:
-                                    logs.append(f"{row.get('Planilha', '(sem nome)')}: MP Sem dados.")
-                            except Exception as e:
-                                logs.append(f"{row.get('Planilha', '(sem nome)')}: MP Erro {e}")
-
-                        # --- ATUALIZAR DESCONTO ---
-                        if row.get("Desconto"):
-                            try:
-                                # abrir origem Desconto
-                                sh_orig_des = gc.open_by_key(ID_PLANILHA_ORIGEM_DESCONTO)
-                                ws_orig_des = sh_orig_des.worksheet(ABA_ORIGEM_DESCONTO)
-                                h_orig_des, df_orig_des = get_headers_and_df_raw(ws_orig_des)
-
-                                # --- FILTRO DE DATA NA ORIGEM (Forçando Coluna B / Índice 1) ---
-                                if len(h_orig_des) > 1:
-                                    c_dt_orig_des = h_orig_des[1]  # Coluna B
-                                    df_orig_des["_dt_orig"] = pd.to_datetime(df_orig_des[c_dt_orig_des], dayfirst=True, errors="coerce").dt.date
-                                    df_ins_des = df_orig_des[(df_orig_des["_dt_orig"] >= data_de) & (df_orig_des["_dt_orig"] <= data_ate)].copy()
-                                else:
-                                    logs.append(f"{row.get('Planilha')}: Desconto - Coluna B não encontrada.")
-                                    df_ins_des = df_orig_des.copy()
-
-                                # nomes/índices fixos solicitados: B, D, E, F, G, H => índices 1,3,4,5,6,7
-                                desired_idx = [1, 3, 4, 5, 6, 7]
-                                cols_to_take = [h_orig_des[i] for i in desired_idx if i < len(h_orig_des)]
-
-                                # prepara nomes de colunas para filtros de B2 e Loja
-                                c_b2_des = h_orig_des[7] if len(h_orig_des) > 7 else None  # coluna H
-                                c_loja_des = h_orig_des[6] if len(h_orig_des) > 6 else None  # coluna G
-
-                                # Filtro pelo B2 (coluna H da origem)
-                                if c_b2_des and b2:
-                                    df_ins_des = df_ins_des[df_ins_des[c_b2_des].astype(str).str.strip() == str(b2).strip()]
-
-                                # Filtro por lojas usando COL G na origem
-                                if lojas_filtro and not df_ins_des.empty and c_loja_des:
-                                    lojas_norm = [normalize_code(x) for x in lojas_filtro]
-                                    df_ins_des = df_ins_des[df_ins_des[c_loja_des].apply(lambda x: normalize_code(x) if pd.notna(x) else "").isin(lojas_norm)]
-
-                                # Seleciona apenas as colunas solicitadas
-                                if not df_ins_des.empty and cols_to_take:
-                                    existing_take = [c for c in cols_to_take if c in df_ins_des.columns]
-                                    df_ins_des = df_ins_des[existing_take].copy()
-
-                                if not df_ins_des.empty:
-                                    try:
-                                        try:
-                                            ws_dest_des = sh_dest.worksheet("Desconto")
-                                        except Exception:
-                                            ws_dest_des = sh_dest.add_worksheet("Desconto", 1000, max(30, len(cols_to_take)))
-
-                                        h_dest_des, df_dest_des = get_headers_and_df_raw(ws_dest_des)
-
-                                        if df_dest_des.empty:
-                                            df_f_des, h_f_des = df_ins_des, list(df_ins_des.columns)
-                                        else:
-                                            c_dt_d_des = detect_date_col(h_dest_des)
-                                            if c_dt_d_des:
-                                                df_dest_des["_dt"] = pd.to_datetime(df_dest_des[c_dt_d_des], dayfirst=True, errors="coerce").dt.date
-                                                rem_des = (df_dest_des["_dt"] >= data_de) & (df_dest_des["_dt"] <= data_ate)
-                                            else:
-                                                rem_des = pd.Series([False] * len(df_dest_des))
-
-                                            if c_b2_des and c_b2_des in df_dest_des.columns and b2:
-                                                rem_des &= (df_dest_des[c_b2_des].astype(str).str.strip() == str(b2).strip())
-
-                                            # Alinha colunas
-                                            df_dest_sub = df_dest_des.copy()
-                                            for col in cols_to_take:
-                                                if col not in df_dest_sub.columns: df_dest_sub[col] = ""
-                                            df_dest_sub = df_dest_sub[[c for c in cols_to_take if c in df_dest_sub.columns]]
-
-                                            for col in cols_to_take:
-                                                if col not in df_ins_des.columns: df_ins_des[col] = ""
-                                            df_ins_des = df_ins_des[[c for c in cols_to_take if c in df_ins_des.columns]]
-
-                                            df_f_des = pd.concat([df_dest_sub.loc[~rem_des], df_ins_des], ignore_index=True)
-                                            h_f_des = [c for c in cols_to_take if c in df_f_des.columns]
-
-                                        if "_dt" in df_f_des.columns: df_f_des = df_f_des.drop(columns=["_dt"])
-                                        if "_dt_orig" in df_f_des.columns: df_f_des = df_f_des.drop(columns=["_dt_orig"])
-
-                                        send_des = df_f_des[h_f_des].fillna("")
-                                        ws_dest_des.clear()
-                                        ws_dest_des.update("A1", [h_f_des] + send_des.values.tolist(), value_input_option="USER_ENTERED")
-                                        logs.append(f"{row.get('Planilha')}: Desconto OK.")
-                                    except Exception as e:
-                                        logs.append(f"{row.get('Planilha')}: Desconto Erro ao gravar destino: {e}")
-                                else:
-                                    logs.append(f"{row.get('Planilha')}: Desconto Sem dados no período/filtros.")
-                            except Exception as e:
-                                logs.append(f"{row.get('Planilha')}: Desconto Erro {e}")
-
-                    except Exception as e:
-                        logs.append(f"{row.get('Planilha', '(sem nome)')}: Erro {e}")
-
-                    prog.progress((i+1)/total)
-                    log_placeholder.text("\n".join(logs))
+                # as threads só falam com o Sheets; a tela é atualizada aqui, na thread do Streamlit
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    futuros = {
+                        pool.submit(atualizar_destino, row, fontes, data_de, data_ate): row.get("Planilha", "(sem nome)")
+                        for row in df_marcadas.to_dict("records")
+                    }
+                    for feitos, futuro in enumerate(as_completed(futuros), start=1):
+                        try:
+                            logs.extend(futuro.result())
+                        except Exception as e:
+                            logs.append(f"{futuros[futuro]}: Erro {e}")
+                        prog.progress(feitos / total, text=f"{feitos}/{total} planilhas")
+                        log_placeholder.text("\n".join(logs))
 
+                status_placeholder.empty()
                 st.success("Concluído!")
 
 # -----------------------------
@@ -930,46 +782,48 @@ with tab_audit:
     df_para_excel_btn = st.session_state.au_planilhas_df[cols_for_excel].copy()
     is_empty_btn = df_para_excel_btn.empty
 
-    def _to_numeric_or_nan(x):
-        if pd.isna(x) or str(x).strip() == "": return pd.NA
-        if isinstance(x, (int, float)): return float(x)
-        n = _parse_currency_like(x)
-        if n is None:
-            try: return float(str(x).replace(".", "").replace(",", "."))
-            except: return pd.NA
-        return float(n)
+    def gerar_excel_auditoria():
+        df_to_write = df_para_excel_btn.copy()
+        for col in currency_cols:
+            if col in df_to_write.columns:
+                df_to_write[col] = para_float_br(df_to_write[col])
+
+        output_btn = io.BytesIO()
+        with pd.ExcelWriter(output_btn, engine="xlsxwriter") as writer:
+            df_to_write.to_excel(writer, index=False, sheet_name="Auditoria")
+            workbook = writer.book
+            worksheet = writer.sheets["Auditoria"]
+            currency_fmt = workbook.add_format({'num_format': u'R$ #,##0.00'})
+            for i, col in enumerate(df_to_write.columns):
+                if col in currency_cols:
+                    worksheet.set_column(i, i, 18, currency_fmt)
+                else:
+                    worksheet.set_column(i, i, 40)
+        return output_btn.getvalue()
 
     with col_btn3:
-        if not is_empty_btn:
-            df_to_write = df_para_excel_btn.copy()
-            for col in currency_cols:
-                if col in df_to_write.columns:
-                    df_to_write[col] = df_to_write[col].apply(_to_numeric_or_nan)
-
-            output_btn = io.BytesIO()
-            with pd.ExcelWriter(output_btn, engine="xlsxwriter") as writer:
-                df_to_write.to_excel(writer, index=False, sheet_name="Auditoria")
-                workbook = writer.book
-                worksheet = writer.sheets["Auditoria"]
-                currency_fmt = workbook.add_format({'num_format': u'R$ #,##0.00'})
-                for i, col in enumerate(df_to_write.columns):
-                    if col in currency_cols:
-                        worksheet.set_column(i, i, 18, currency_fmt)
-                    else:
-                        worksheet.set_column(i, i, 40)
-            processed_btn = output_btn.getvalue()
+        if is_empty_btn:
+            st.download_button(
+                label="⬇️ Excel",
+                data=b"",
+                file_name=f"auditoria_dre_{date.today()}.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                use_container_width=True,
+                disabled=True,
+                key="au_download"
+            )
         else:
-            processed_btn = b""
-
-        st.download_button(
-            label="⬇️ Excel",
-            data=processed_btn,
-            file_name=f"auditoria_dre_{date.today()}.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            use_container_width=True,
-            disabled=is_empty_btn,
-            key="au_download"
-        )
+            # só monta o .xlsx quando pedido; mesma tabela -> mesmo arquivo do cache
+            botao_download(
+                label="⬇️ Excel",
+                gerar=gerar_excel_auditoria,
+                dados=df_para_excel_btn,
+                file_name=f"auditoria_dre_{date.today()}.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                key="au_download",
+                rotulo_gerar="⚙️ Gerar Excel",
+                use_container_width=True,
+            )
 
     # place the verification button in the 4th column (aligned)
     with col_btn4:
@@ -980,14 +834,10 @@ with tab_audit:
         st.info("Executando verificação — gerando arquivo para download quando concluir...")
         try:
             # --- PASSO 1: Ler Tabela Empresa (Origem) col A (nome) e col C (código) ---
-            sh_origem = gc.open_by_key(ID_PLANILHA_ORIGEM_FAT)
-            ws_empresa = sh_origem.worksheet("Tabela Empresa")
-            dados_empresa = ws_empresa.get_all_values()
+            df_emp_origem = fetch_tabela_empresa()
 
             nomes_codigos = []  # lista de tuples (nome, codigo_normalizado)
-            for r in dados_empresa[1:]:  # pula cabeçalho
-                nome = r[0].strip() if len(r) > 0 and r[0] is not None else ""
-                codigo_raw = r[2] if len(r) > 2 else ""
+            for nome, codigo_raw in zip(df_emp_origem.get("A", []), df_emp_origem.get("C", [])):
                 if str(codigo_raw).strip() != "":
                     cod_norm = normalize_code(codigo_raw)
                     nomes_codigos.append((nome, cod_norm))
@@ -1,11 +1,13 @@
 # -*- coding: utf-8 -*-
 
 import streamlit as st
-import pdfplumber
 import re
 import pandas as pd
 from io import BytesIO
 
+from comum.conversao import para_float_br
+from comum.pdf_texto import extrair_textos_pdf
+
 # ================= FUSÍVEL ANTI-HELP =================
 try:
     import builtins
@@ -100,26 +102,6 @@ def is_money(tok: str) -> bool:
         return True
     return bool(_money_re.match(t))
 
-def _to_float_br(x):
-    t = str(x or "").strip()
-    if not t or t.upper() in ("NAN", "NONE"):
-        return None
-    t = t.replace(" ", "")
-    has_c = "," in t
-    has_p = "." in t
-    # Caso formato brasileiro com pontos como milhares e vírgula decimal
-    if has_c and has_p:
-        if t.rfind(",") > t.rfind("."):
-            t = t.replace(".", "").replace(",", ".")
-        else:
-            t = t.replace(",", "")
-    elif has_c:
-        t = t.replace(".", "").replace(",", ".")
-    try:
-        return float(t)
-    except:
-        return None
-
 _MONTHS_PT = {
     1: "Janeiro", 2: "Fevereiro", 3: "Março", 4: "Abril",
     5: "Maio", 6: "Junho", 7: "Julho", 8: "Agosto",
@@ -347,7 +329,7 @@ def extrair_dados(texto):
     df = df.rename(columns={"Col1": "Codigo da Descrição"})
     df = df[["Codigo Empresa", "Empresa", "CNPJ", "Período", "Mês", "Ano", "Tipo", "Codigo da Descrição", "Descrição", "Valor"]]
 
-    df["Valor_num"] = df["Valor"].apply(_to_float_br)
+    df["Valor_num"] = para_float_br(df["Valor"])
 
     valores_match = re.search(
         r"Proventos[:\s]*([\d\.,]+)\s*Vantagens[:\s]*([\d\.,]+)\s*Descontos[:\s]*([\d\.,]+)\s*Líquido[:\s]*([\d\.,]+)",
@@ -493,7 +475,7 @@ def extrair_dados_csv(file):
     }
 
     df["Tipo"] = df["Tipo_raw"].map(tipo_map).fillna("")
-    df["Valor_num"] = df["Valor"].apply(_to_float_br)
+    df["Valor_num"] = para_float_br(df["Valor"])
 
     df["Codigo Empresa"] = codigo_empresa
     df["Empresa"] = nome_empresa
@@ -522,6 +504,11 @@ uploaded_files = st.file_uploader(
 )
 #show_debug = st.checkbox("Mostrar debug (tokens & blocks)")
 show_debug = False
+parar_em_totais = st.checkbox(
+    "⏩ Ler cada PDF só até o Totais do Resumo Contrato",
+    value=False,
+    help="Mais rápido: páginas depois do resumo não são lidas. Não use se o PDF tiver mais de um Resumo Contrato.",
+)
 if uploaded_files:
     all_dfs = []
     all_proventos = []
@@ -529,6 +516,18 @@ if uploaded_files:
     all_descontos = []
     all_liquido = []
 
+    # ================= TEXTO DOS PDFs (em paralelo, com cache por hash) =================
+    pdfs = [f for f in uploaded_files if f.name.lower().endswith(".pdf")]
+    textos_pdf = {}
+    if pdfs:
+        barra_pdf = st.progress(0.0, text="Lendo PDFs...")
+        extraidos = extrair_textos_pdf(
+            [f.getvalue() for f in pdfs],
+            parar_em_totais=parar_em_totais,
+            ao_progredir=lambda feitas, total: barra_pdf.progress(feitas / total, text=f"Lendo PDFs... {feitas}/{total}"),
+        )
+        barra_pdf.empty()
+        textos_pdf = {id(f): r for f, r in zip(pdfs, extraidos)}
 
     for uploaded_file in uploaded_files:
         try:
@@ -536,10 +535,9 @@ if uploaded_files:
     
             # ================= PDF =================
             if nome.endswith(".pdf"):
-                with pdfplumber.open(uploaded_file) as pdf:
-                    texto = ""
-                    for p in pdf.pages:
-                        texto += (p.extract_text() or "") + "\n"
+                texto, erro_pdf = textos_pdf[id(uploaded_file)]
+                if erro_pdf:
+                    raise RuntimeError(erro_pdf)
     
                 dados = extrair_dados(texto)
                 df = dados["tabela"].copy()
@@ -698,16 +696,10 @@ if uploaded_files:
         )
 
         # ---------------- Totais combinados (somatório dos campos extraídos dos arquivos) ----------------
-        def parse_valor_str(v):
-            try:
-                return float(v.replace(".", "").replace(",", "."))
-            except:
-                return 0.0
-
-        total_proventos = sum(parse_valor_str(v) for v in all_proventos if v)
-        total_vantagens = sum(parse_valor_str(v) for v in all_vantagens if v)
-        total_descontos = sum(parse_valor_str(v) for v in all_descontos if v)
-        total_liquido = sum(parse_valor_str(v) for v in all_liquido if v)
+        total_proventos = para_float_br([v for v in all_proventos if v]).sum()
+        total_vantagens = para_float_br([v for v in all_vantagens if v]).sum()
+        total_descontos = para_float_br([v for v in all_descontos if v]).sum()
+        total_liquido = para_float_br([v for v in all_liquido if v]).sum()
 
        # st.subheader("Totais combinados dos PDFs (se extraídos das seções de totais)")
        # st.markdown(f"- **Proventos:** R$ {total_proventos:,.2f}".replace(",", "X").replace(".", ",").replace("X", "."))
@@ -8,6 +8,10 @@ from io import StringIO, BytesIO
 import gspread
 from gspread.exceptions import WorksheetNotFound
 from oauth2client.service_account import ServiceAccountCredentials
+
+from comum.conversao import para_float_br
+from comum.tabela_empresa import carregar_tabela_empresa
+
 # --- fusível anti-help: evita que qualquer help() imprima no app ---
 try:
     import builtins
@@ -84,41 +88,6 @@ def _try_parse_paste(text: str) -> pd.DataFrame:
     df.columns = [str(c).strip() if str(c).strip() else f"col_{i}" for i,c in enumerate(df.columns)]
     return df
 
-def _to_float_br(x):
-    """
-    Converte strings '1.234,56', '14,33' ou '14.33' em float.
-    Regra:
-      - Se tem vírgula e ponto: o que aparecer por último é o separador decimal.
-      - Se tem só vírgula: vírgula é decimal.
-      - Se tem só ponto: ponto é decimal.
-    """
-    t = str(x or "").strip().replace(" ", "")
-    if t == "":
-        return None
-    has_c = "," in t
-    has_p = "." in t
-
-    if has_c and has_p:
-        # separador decimal = o último que aparece
-        if t.rfind(",") > t.rfind("."):
-            # vírgula decimal => remova pontos (milhar) e troque vírgula por ponto
-            t = t.replace(".", "").replace(",", ".")
-        else:
-            # ponto decimal => remova vírgulas (milhar)
-            t = t.replace(",", "")
-    elif has_c:
-        t = t.replace(".", "")        # se houver ponto perdido de milhar
-        t = t.replace(",", ".")
-    else:
-        # só ponto ou sem separador: mantém
-        pass
-
-    try:
-        return float(t)
-    except:
-        return None
-
-
 def _tokenize(txt: str):
     # normaliza e separa por palavras/nums
     return [w for w in re.findall(r"[0-9a-zA-Z]+", _norm_basic(txt)) if w]
@@ -139,32 +108,9 @@ def _download_excel(df: pd.DataFrame, filename: str, label_btn: str, disabled=Fa
 
     # 2.1) Decimais — NÃO remover ponto à toa. Se já for número, mantém.
     import re
-    def _parse_dec_series(s: pd.Series) -> pd.Series:
-        if pd.api.types.is_numeric_dtype(s):
-            return s.astype(float)
-        s = s.astype(str).str.strip().str.replace(r"\s", "", regex=True)
-        def _fix(v: str):
-            if v == "":
-                return None
-            has_c = "," in v
-            has_p = "." in v
-            if has_c and has_p:
-                if v.rfind(",") > v.rfind("."):
-                    v = v.replace(".", "").replace(",", ".")
-                else:
-                    v = v.replace(",", "")
-            elif has_c:
-                v = v.replace(".", "").replace(",", ".")
-            # elif só ponto: mantém
-            try:
-                return float(v)
-            except:
-                return None
-        return s.map(_fix)
-
     for col in DEC_COLS:
         if col in df_export.columns:
-            df_export[col] = _parse_dec_series(df_export[col]).fillna(0.0)
+            df_export[col] = para_float_br(df_export[col]).fillna(0.0)
 
     # 2.2) CNPJ/Cliente — 14 dígitos vira TEXTO; se só dígitos e != 14, vira NÚMERO
     if "CNPJ/Cliente" in df_export.columns:
@@ -240,13 +186,8 @@ def _open_planilha(title="Vendas diarias"):
 
 @st.cache_data(show_spinner=False)
 def carregar_empresas():
-    sh = _open_planilha("Vendas diarias")
-    if sh is None:
-        df_vazio = pd.DataFrame(columns=["Grupo","Loja","Código Everest","Código Grupo Everest","CNPJ"])
-        return df_vazio, [], {}
     try:
-        ws = sh.worksheet("Tabela Empresa")
-        df = pd.DataFrame(ws.get_all_records())
+        df = carregar_tabela_empresa().reset_index(drop=True)
     except Exception as e:
         st.warning(f"⚠️ Erro lendo 'Tabela Empresa': {e}")
         df = pd.DataFrame(columns=["Grupo","Loja","Código Everest","Código Grupo Everest","CNPJ"])
@@ -309,7 +250,8 @@ def carregar_tabela_meio_pagto():
       - 'Cod Gerencial Everest'
       - 'CNPJ Bandeira'
       - 'PIX Padrão Cod Gerencial'   (regras de fallback para PIX)
-    Retorna: DF_MEIO, MEIO_RULES, PIX_RULES
+    Retorna: DF_MEIO, MEIO_RULES, PIX_RULES, INDICES_REGRAS
+    (INDICES_REGRAS = {"meio": ..., "pix": ...}, índices invertidos de _indexar_regras)
     """
     COL_PADRAO = "Padrão Cod Gerencial"
     COL_COD    = "Cod Gerencial Everest"
@@ -318,13 +260,13 @@ def carregar_tabela_meio_pagto():
 
     sh = _open_planilha("Vendas diarias")
     if not sh:
-        return pd.DataFrame(), [], []
+        return pd.DataFrame(), [], [], {"meio": _indexar_regras([]), "pix": _indexar_regras([])}
 
     try:
         ws = sh.worksheet("Tabela Meio Pagamento")
     except WorksheetNotFound:
         st.warning("⚠️ Aba 'Tabela Meio Pagamento' não encontrada.")
-        return pd.DataFrame(), [], []
+        return pd.DataFrame(), [], [], {"meio": _indexar_regras([]), "pix": _indexar_regras([])}
 
     df = pd.DataFrame(ws.get_all_records()).astype(str)
 
@@ -360,51 +302,56 @@ def carregar_tabela_meio_pagto():
             continue
         pix_rules.append({"tokens": tokens, "codigo_gerencial": codigo, "cnpj_bandeira": cnpj})
 
-    return df, meio_rules, pix_rules
+    indices = {"meio": _indexar_regras(meio_rules), "pix": _indexar_regras(pix_rules)}
+    return df, meio_rules, pix_rules, indices
 
 
-def _best_rule_for_tokens(ref_tokens: set):
-    best = None
-    best_hits = 0
-    best_tokens_len = 0
-    best_matched = set()
-    for rule in MEIO_RULES:
-        tokens = set(rule["tokens"])
-        matched = tokens & ref_tokens
-        hits = len(matched)
-        if hits == 0:
-            continue
-        if (hits > best_hits) or (hits == best_hits and len(tokens) > best_tokens_len):
-            best = rule
-            best_hits = hits
-            best_tokens_len = len(tokens)
-            best_matched = matched
-    return best, best_hits, best_matched
-
-def _match_bandeira_to_gerencial(ref_text: str):
-    if not ref_text or not MEIO_RULES:
-        return "", "", ""
-    ref_tokens = set(_tokenize(ref_text))
-    if not ref_tokens:
-        return "", "", ""
-    best, _, _ = _best_rule_for_tokens(ref_tokens)
-    if best:
-        return best["codigo_gerencial"], best.get("cnpj_bandeira",""), ""
-    return "", "", ""
-def _best_rule_for_tokens_from(rules_list, ref_tokens: set):
-    best = None
-    best_hits = 0
-    best_tokens_len = 0
-    for rule in rules_list:
-        tokens = set(rule["tokens"])
-        hits = len(tokens & ref_tokens)
-        if hits == 0:
-            continue
-        if (hits > best_hits) or (hits == best_hits and len(tokens) > best_tokens_len):
-            best = rule
-            best_hits = hits
-            best_tokens_len = len(tokens)
-    return best
+def _indexar_regras(rules_list):
+    """
+    Índice invertido token -> ids das regras que o contêm, com o nº de tokens
+    de cada regra já calculado. Montado uma vez junto com a tabela (cacheado).
+    """
+    indice = {}
+    for rid, rule in enumerate(rules_list):
+        for tok in rule["tokens"]:
+            indice.setdefault(tok, []).append(rid)
+    return {
+        "regras": rules_list,
+        "tamanhos": [len(rule["tokens"]) for rule in rules_list],
+        "indice": indice,
+    }
+
+def _best_rule_indexed(idx, ref_tokens: set):
+    """
+    Regra com mais tokens em comum com ref_tokens; empate -> a de mais tokens;
+    persistindo o empate, a que vem primeiro na tabela. Só visita as regras
+    que compartilham algum token (via índice), não a tabela inteira.
+    """
+    hits = {}
+    indice = idx["indice"]
+    for tok in ref_tokens:
+        for rid in indice.get(tok, ()):
+            hits[rid] = hits.get(rid, 0) + 1
+    if not hits:
+        return None
+    tamanhos = idx["tamanhos"]
+    rid = max(hits, key=lambda r: (hits[r], tamanhos[r], -r))
+    return idx["regras"][rid]
+
+def _match_rules_batch(textos, idx):
+    """
+    Regra (ou None) para cada texto da coluna colada. Textos repetidos
+    (a mesma bandeira em milhares de linhas) são tokenizados e casados uma vez só.
+    """
+    cache = {}
+    out = []
+    for txt in textos:
+        txt = str(txt or "")
+        if txt not in cache:
+            ref_tokens = set(_tokenize(txt))
+            cache[txt] = _best_rule_indexed(idx, ref_tokens) if ref_tokens else None
+        out.append(cache[txt])
+    return out
 
 def _apply_pix_fallback_on_errors(df_importador: pd.DataFrame) -> pd.DataFrame:
     """
@@ -416,7 +363,7 @@ def _apply_pix_fallback_on_errors(df_importador: pd.DataFrame) -> pd.DataFrame:
     """
     if df_importador.empty:
         return df_importador
-    if 'PIX_RULES' not in globals() or not PIX_RULES:
+    if 'INDICES_REGRAS' not in globals() or not PIX_RULES:
         return df_importador
 
     df = df_importador.copy()
@@ -432,16 +379,17 @@ def _apply_pix_fallback_on_errors(df_importador: pd.DataFrame) -> pd.DataFrame:
         df[col_cnpj] = ""
 
     mask_err = df[col_cod].astype(str).str.strip().eq("")
-    for i in df.index[mask_err]:
-        ref_text = str(df.at[i, col_ref] or "")
-        ref_tokens = set(_tokenize(ref_text))
-        if not ref_tokens:
-            continue
-        best = _best_rule_for_tokens_from(PIX_RULES, ref_tokens)
-        if best:
-            df.at[i, col_cod] = best["codigo_gerencial"]
-            if str(df.at[i, col_cnpj]).strip() == "":
-                df.at[i, col_cnpj] = best.get("cnpj_bandeira", "")
+    if not mask_err.any():
+        return df
+    linhas = df.index[mask_err]
+    melhores = pd.Series(_match_rules_batch(df.loc[linhas, col_ref], INDICES_REGRAS["pix"]), index=linhas)
+    melhores = melhores[melhores.notna()]
+    if melhores.empty:
+        return df
+    df.loc[melhores.index, col_cod] = [r["codigo_gerencial"] for r in melhores]
+    sem_cnpj = df.loc[melhores.index, col_cnpj].astype(str).str.strip().eq("")
+    alvo = sem_cnpj.index[sem_cnpj]
+    df.loc[alvo, col_cnpj] = [r.get("cnpj_bandeira", "") for r in melhores[alvo]]
     return df
 
 
@@ -502,7 +450,7 @@ def confirmar_loja(prefix: str, grupo: str, loja: str) -> bool:
 # ===== Dados base (carrega ANTES de montar a UI) =====
 df_emp, GRUPOS, LOJAS_MAP = carregar_empresas()
 PORTADORES, MAPA_BANCO_PARA_PORTADOR = carregar_portadores()
-DF_MEIO, MEIO_RULES, PIX_RULES = carregar_tabela_meio_pagto()
+DF_MEIO, MEIO_RULES, PIX_RULES, INDICES_REGRAS = carregar_tabela_meio_pagto()
 
 # fallbacks na sessão (evita NameError em re-runs)
 st.session_state["_grupos"] = GRUPOS
@@ -586,7 +534,7 @@ if st.session_state.get("editor_on_meio"):
                     _save_sheet_full(edited, ws_rules)
                     # recarrega regras do app
                     st.cache_data.clear()
-                    DF_MEIO, MEIO_RULES, PIX_RULES = carregar_tabela_meio_pagto()
+                    DF_MEIO, MEIO_RULES, PIX_RULES, INDICES_REGRAS = carregar_tabela_meio_pagto()
                     st.session_state["editor_on_meio"] = False
                     st.success("Alterações salvas, regras atualizadas e editor fechado.")
                 except Exception as e:
@@ -762,15 +710,13 @@ def _build_importador_df(df_raw: pd.DataFrame, prefix: str, grupo: str, loja: st
 
     # dados do usuário (mantém a data exatamente como veio)
     data_original  = df_raw[cd].astype(str)
-    valor_original = pd.to_numeric(df_raw[cv].apply(_to_float_br), errors="coerce").round(2)
+    valor_original = para_float_br(df_raw[cv]).round(2)
     ref_txt        = df_raw[cb].astype(str).str.strip()
 
-    # mapeamento por tokens do Padrão Cod Gerencial
-    cod_conta_list, cnpj_cli_list = [], []
-    for b in ref_txt:
-        cod, cnpj_band, _ = _match_bandeira_to_gerencial(b)
-        cod_conta_list.append(cod)
-        cnpj_cli_list.append(cnpj_band)
+    # mapeamento por tokens do Padrão Cod Gerencial (coluna inteira de uma vez)
+    regras = _match_rules_batch(ref_txt, INDICES_REGRAS["meio"]) if MEIO_RULES else [None] * len(ref_txt)
+    cod_conta_list = [r["codigo_gerencial"] if r else "" for r in regras]
+    cnpj_cli_list  = [r.get("cnpj_bandeira", "") if r else "" for r in regras]
 
     out = pd.DataFrame({
         "CNPJ Empresa":          cnpj_loja,
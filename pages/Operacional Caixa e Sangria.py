@@ -2,11 +2,16 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import json
+import re
 from io import BytesIO
 import gspread
 from oauth2client.service_account import ServiceAccountCredentials
 from gspread_formatting import format_cell_range, CellFormat, NumberFormat
 
+from comum.tabela_empresa import carregar_tabela_empresa
+from comum.conversao import para_data_br, para_float_br
+from comum.leitura_excel import abas_excel, ler_aba
+
 
 
 
@@ -48,13 +53,42 @@ NOME_SISTEMA = "Colibri"
 # Helpers
 # -----------------------
 def auto_read_first_or_sheet(uploaded, preferred="Sheet"):
-    """Lê a guia 'preferred' se existir; senão, lê a primeira guia."""
-    xls = pd.ExcelFile(uploaded)
-    sheets = xls.sheet_names
+    """Lê a guia 'preferred' se existir; senão, lê a primeira guia (uma leitura por arquivo, ver comum/leitura_excel)."""
+    sheets = abas_excel(uploaded)
     sheet_to_read = preferred if preferred in sheets else sheets[0]
-    df0 = pd.read_excel(xls, sheet_name=sheet_to_read)
+    df0 = ler_aba(uploaded, sheet_to_read, header=0)
+    df0.columns = [str(c).strip() for c in df0.columns]
     return df0, sheet_to_read, sheets
 
+def compilar_regras_sangria(df_regras):
+    """
+    'Tabela Sangria' -> (regex única com todas as palavras-chave, palavra-chave -> (ordem, Descrição Agrupada)).
+
+    Vale a primeira regra da tabela cuja palavra-chave aparece na descrição
+    (comparação em minúsculas). A regex é um lookahead com as palavras-chave
+    na ordem da tabela: em cada posição ela devolve a regra de menor ordem
+    que casa ali, e a de menor ordem entre todas as posições é a vencedora.
+    """
+    regras = {}
+    for ordem, (chave, grupo) in enumerate(zip(df_regras["Palavra-chave"], df_regras["Descrição Agrupada"])):
+        regras.setdefault(str(chave).lower(), (ordem, grupo))
+    if not regras:
+        return None, regras
+    padrao = re.compile("(?=(" + "|".join(re.escape(k) for k in regras) + "))")
+    return padrao, regras
+
+def mapear_descricoes(descricoes, regras_compiladas, rotulo_sem_regra="Outros"):
+    """Descrição Agrupada de cada linha (uma busca por descrição distinta) + descrições sem regra."""
+    padrao, regras = regras_compiladas
+    chaves = descricoes.astype(str).str.lower()
+    grupos = {}
+    for desc in chaves.unique():
+        achadas = [regras[m.group(1)] for m in padrao.finditer(desc)] if padrao is not None else []
+        grupos[desc] = min(achadas, key=lambda r: r[0])[1] if achadas else None
+    agrupada = chaves.map(grupos)
+    sem_regra = descricoes[agrupada.isna()].astype(str).value_counts()
+    return agrupada.fillna(rotulo_sem_regra), sem_regra
+
 def normalize_dates(s):
     """Para comparar datas (remove horário)."""
     return pd.to_datetime(s, errors="coerce", dayfirst=True).dt.normalize()
@@ -67,7 +101,7 @@ with st.spinner("⏳ Processando..."):
     gc = gspread.authorize(credentials)
     planilha = gc.open("Vendas diarias")
 
-    df_empresa = pd.DataFrame(planilha.worksheet("Tabela Empresa").get_all_records())
+    df_empresa = carregar_tabela_empresa()
     ws_tab = planilha.worksheet("Tabela Sangria")
     dados = ws_tab.get_all_records()  # lê usando a primeira linha como cabeçalho
     df_descricoes = pd.DataFrame(dados)
@@ -76,6 +110,7 @@ with st.spinner("⏳ Processando..."):
     if not {"Palavra-chave", "Descrição Agrupada"}.issubset(df_descricoes.columns):
         st.error("A aba 'Tabela Sangria' precisa ter as colunas 'Palavra-chave' e 'Descrição Agrupada'.")
         st.stop()
+    regras_sangria = compilar_regras_sangria(df_descricoes)
 
     # 🔥 Título
     st.markdown("""
@@ -99,14 +134,6 @@ with st.spinner("⏳ Processando..."):
         )
     
         if uploaded_file:
-            def auto_read_first_or_sheet(uploaded, preferred="Sheet"):
-                xls = pd.ExcelFile(uploaded)
-                sheets = xls.sheet_names
-                sheet_to_read = preferred if preferred in sheets else sheets[0]
-                df0 = pd.read_excel(xls, sheet_name=sheet_to_read)
-                df0.columns = [str(c).strip() for c in df0.columns]
-                return df0, sheet_to_read, sheets
-    
             try:
                 df_dados, guia_lida, lista_guias = auto_read_first_or_sheet(uploaded_file, preferred="Sheet")
                 #st.caption(f"Guia lida: **{guia_lida}** (disponíveis: {', '.join(lista_guias)})")
@@ -124,7 +151,7 @@ with st.spinner("⏳ Processando..."):
                     st.session_state.mode = "everest"
                     st.session_state.df_everest = df.copy()
                 
-                    import unicodedata, re
+                    import unicodedata
                     def _norm(s: str) -> str:
                         s = unicodedata.normalize('NFKD', str(s)).encode('ASCII','ignore').decode('ASCII')
                         s = s.lower()
@@ -171,37 +198,6 @@ with st.spinner("⏳ Processando..."):
                 
                     valor_col = detect_valor_col(df, avoid_col=date_col)
                     st.session_state.everest_value_col = valor_col
-                    # Conversor pt-BR robusto: R$, parênteses, sinal no final (1.234,56-)
-                    def to_number_br(series):
-                        def _one(x):
-                            if pd.isna(x):
-                                return 0.0
-                            s = str(x).strip()
-                            if s == "":
-                                return 0.0
-                            neg = False
-                            # parênteses => negativo
-                            if s.startswith("(") and s.endswith(")"):
-                                neg = True
-                                s = s[1:-1].strip()
-                            # remove R$
-                            s = s.replace("R$", "").replace("r$", "").strip()
-                            # sinal no final (ex.: 1.234,56-)
-                            if s.endswith("-"):
-                                neg = True
-                                s = s[:-1].strip()
-                            # separadores pt-BR
-                            s = s.replace(".", "").replace(",", ".")
-                            s_clean = re.sub(r"[^0-9.\-]", "", s)
-                            if s_clean in ["", "-", "."]:
-                                return 0.0
-                            try:
-                                val = float(s_clean)
-                            except:
-                                s_fallback = re.sub(r"[^0-9.]", "", s_clean)
-                                val = float(s_fallback) if s_fallback else 0.0
-                            return -abs(val) if neg else val
-                        return series.apply(_one)
                 
                     # 3) Métricas
                     periodo_txt = "—"
@@ -226,7 +222,7 @@ with st.spinner("⏳ Processando..."):
                         if pd.api.types.is_numeric_dtype(df[valor_col]):
                             serie_val = pd.to_numeric(df[valor_col], errors="coerce").fillna(0.0)
                         else:
-                            serie_val = to_number_br(df[valor_col])
+                            serie_val = para_float_br(df[valor_col]).fillna(0.0)
                         total_liquido = float(serie_val.sum())
                         st.session_state.everest_total_liquido = total_liquido
                 
@@ -341,14 +337,7 @@ with st.spinner("⏳ Processando..."):
                         df = pd.merge(df, df_empresa, on="Loja", how="left", sort=False)
     
                         # Agrupamento de descrição
-                        def mapear_descricao(desc):
-                            desc_lower = str(desc).lower()
-                            for _, r in df_descricoes.iterrows():
-                                if str(r["Palavra-chave"]).lower() in desc_lower:
-                                    return r["Descrição Agrupada"]
-                            return "Outros"
-    
-                        df["Descrição Agrupada"] = df["Descrição"].apply(mapear_descricao)
+                        df["Descrição Agrupada"], descricoes_sem_regra = mapear_descricoes(df["Descrição"], regras_sangria)
     
                         # ➕ Colunas adicionais
                         df["Sistema"] = NOME_SISTEMA
@@ -390,6 +379,14 @@ with st.spinner("⏳ Processando..."):
                         )
     
                         st.success("✅ Relatório gerado com sucesso!")
+
+                        if not descricoes_sem_regra.empty:
+                            with st.expander(f"🏷️ {int(descricoes_sem_regra.sum())} linha(s) sem regra na Tabela Sangria "
+                                             f"({len(descricoes_sem_regra)} descrição(ões)) → 'Outros'"):
+                                st.dataframe(
+                                    descricoes_sem_regra.rename_axis("Descrição").reset_index(name="Linhas"),
+                                    use_container_width=True, hide_index=True
+                                )
     
                         lojas_sem_codigo = df[df["Código Everest"].isna()]["Loja"].unique()
                         if len(lojas_sem_codigo) > 0:
@@ -460,7 +457,7 @@ with st.spinner("⏳ Processando..."):
         if mode == "everest" and "df_everest" in st.session_state:
             df_file = st.session_state.df_everest.copy()
         
-            import re, unicodedata
+            import unicodedata
         
             def _norm(s: str) -> str:
                 s = unicodedata.normalize('NFKD', str(s)).encode('ASCII','ignore').decode('ASCII')
@@ -501,49 +498,10 @@ with st.spinner("⏳ Processando..."):
             valor_file_col  = detect_valor_col(df_file.columns)
             rateio_file_col = detect_rateio_col(df_file.columns)
         
-            # Conversor robusto pt-BR → número
-            def to_number_br(series):
-                def _one(x):
-                    if pd.isna(x): return 0.0
-                    s = str(x).strip()
-                    if s == "": return 0.0
-                    neg = False
-                    if s.startswith("(") and s.endswith(")"):
-                        neg = True; s = s[1:-1].strip()
-                    s = s.replace("R$", "").replace("r$", "").strip()
-                    if s.endswith("-"):
-                        neg = True; s = s[:-1].strip()
-                    s = s.replace(".", "").replace(",", ".")
-                    s_clean = re.sub(r"[^0-9.\-]", "", s)
-                    if s_clean in ["", "-", "."]: return 0.0
-                    try:
-                        val = float(s_clean)
-                    except:
-                        s_fallback = re.sub(r"[^0-9.]", "", s_clean)
-                        val = float(s_fallback) if s_fallback else 0.0
-                    return -abs(val) if neg else val
-                return series.apply(_one)
         
             # ▶️ Datas como STRING dd/mm/aaaa (aceita texto e serial Excel)
             def date_to_str(series):
-                def _parse_one(x):
-                    if pd.isna(x): return ""
-                    s = str(x).strip()
-                    if s == "": return ""
-                    # número/float → serial Excel (sistema 1900)
-                    if re.fullmatch(r"\d+([.,]\d+)?", s):
-                        try:
-                            f = float(s.replace(",", "."))
-                            dt = pd.Timestamp("1899-12-30") + pd.to_timedelta(f, unit="D")
-                            return dt.strftime("%d/%m/%Y")
-                        except Exception:
-                            pass
-                    # tenta dd/mm/aaaa etc. (dayfirst) e ISO
-                    dt = pd.to_datetime(s, dayfirst=True, errors="coerce")
-                    if pd.isna(dt):
-                        dt = pd.to_datetime(s, errors="coerce")
-                    return "" if pd.isna(dt) else dt.strftime("%d/%m/%Y")
-                return series.apply(_parse_one)
+                return para_data_br(series).dt.strftime("%d/%m/%Y").fillna("")
         
             # Conjunto de datas do ARQUIVO (strings dd/mm/aaaa)
             file_dates_str = set([d for d in date_to_str(df_file[date_file_col]).tolist() if d])
@@ -571,7 +529,7 @@ with st.spinner("⏳ Processando..."):
                     if pd.api.types.is_numeric_dtype(series_like):
                         nums = pd.to_numeric(series_like, errors="coerce").fillna(0.0)
                     else:
-                        nums = to_number_br(series_like)
+                        nums = para_float_br(series_like).fillna(0.0)
                     return nums.apply(lambda v: f"{float(v):.2f}".replace(".", ","))
         
                 if valor_file_col and valor_file_col in df_insert.columns:
@@ -661,7 +619,7 @@ with st.spinner("⏳ Processando..."):
                 if pd.api.types.is_numeric_dtype(series_like):
                     nums = pd.to_numeric(series_like, errors="coerce").fillna(0.0)
                 else:
-                    nums = to_number_br(series_like)
+                    nums = para_float_br(series_like).fillna(0.0)
                 return nums.apply(lambda v: f"{float(v):.2f}".replace(".", ","))
         
             if valor_sheet_col:
@@ -735,7 +693,7 @@ with st.spinner("⏳ Processando..."):
                         if _pd.api.types.is_numeric_dtype(series_like):
                             nums = _pd.to_numeric(series_like, errors="coerce").fillna(0.0)
                         else:
-                            nums = to_number_br(series_like)
+                            nums = para_float_br(series_like).fillna(0.0)
                         return nums.apply(lambda v: f"{float(v):.2f}".replace(".", ","))
             
                     if valor_sheet_col:
@@ -828,7 +786,6 @@ with st.spinner("⏳ Processando..."):
                 # Normalização/matching
                 # =========================
                 import unicodedata
-                import re
                 
                 def _normalize_name(s: str) -> str:
                     s = str(s or "").strip()
@@ -9,9 +9,15 @@ import gspread
 import os
 from oauth2client.service_account import ServiceAccountCredentials
 from openpyxl.utils import get_column_letter, column_index_from_string
-import psycopg2
 from datetime import datetime, timedelta, date
 
+from comum.armazem_3s import carregar_3s
+from comum.db_3s import contar_pedidos
+from comum.tabela_empresa import carregar_tabela_empresa
+from comum.conversao import para_data_br
+from comum.leitura_excel import abas_excel, ler_aba
+from comum.indice_chaves import registrar_anexadas, sincronizar_indice
+
 st.set_page_config(page_title="Meio de Pagamento", layout="wide")
 
 # ====== CSS para travar  o botão 3S e estilizar abas (cole após imports) ======
@@ -148,96 +154,6 @@ def first_nonempty_df(*candidates):
             return x
     return None
 
-# ======================
-# Leitura robusta por assinatura (xls/xlsx/xlsm)
-# ======================
-def _sniff_excel_kind(uploaded_file) -> str:
-    try:
-        pos = uploaded_file.tell()
-    except Exception:
-        pos = None
-    try:
-        uploaded_file.seek(0)
-        head = uploaded_file.read(8)
-    finally:
-        try:
-            uploaded_file.seek(pos or 0)
-        except Exception:
-            pass
-
-    if not isinstance(head, (bytes, bytearray)):
-        return "unknown"
-    if head.startswith(b"PK\x03\x04") or head.startswith(b"PK\x05\x06") or head.startswith(b"PK\x07\x08"):
-        return "xlsx"
-    if head.startswith(b"\xD0\xCF\x11\xE0\xA1\xB1\x1A\xE1"):
-        return "xls"
-    return "unknown"
-
-def read_excel_smart(file_or_xls, sheet_name=0, header=0):
-    if isinstance(file_or_xls, pd.ExcelFile):
-        return pd.read_excel(file_or_xls, sheet_name=sheet_name, header=header)
-    kind = _sniff_excel_kind(file_or_xls)
-    try:
-        file_or_xls.seek(0)
-    except Exception:
-        pass
-    try:
-        if kind == "xls":
-            return pd.read_excel(file_or_xls, sheet_name=sheet_name, header=header, engine="xlrd")
-        return pd.read_excel(file_or_xls, sheet_name=sheet_name, header=header, engine="openpyxl")
-    except Exception as e1:
-        try:
-            file_or_xls.seek(0)
-        except Exception:
-            pass
-        alt = "openpyxl" if kind == "xls" else "xlrd"
-        try:
-            return pd.read_excel(file_or_xls, sheet_name=sheet_name, header=header, engine=alt)
-        except Exception as e2:
-            raise RuntimeError(f"Falha lendo Excel (kind={kind}). Tentativas: {e1} | {e2}")
-
-def excel_file_smart(uploaded_file):
-    kind = _sniff_excel_kind(uploaded_file)
-    try:
-        uploaded_file.seek(0)
-    except Exception:
-        pass
-
-    eng = "xlrd" if kind == "xls" else "openpyxl"
-    try:
-        return pd.ExcelFile(uploaded_file, engine=eng)
-    except Exception as e1:
-        try:
-            uploaded_file.seek(0)
-        except Exception:
-            pass
-        alt = "openpyxl" if eng == "xlrd" else "xlrd"
-        try:
-            return pd.ExcelFile(uploaded_file, engine=alt)
-        except Exception as e2:
-            raise RuntimeError(f"Falha abrindo ExcelFile (kind={kind}). Tentativas: {e1} | {e2}")
-
-# The above excel_file_smart had a tricky engine selection in original; preserve resilient behavior:
-def excel_file_smart(uploaded_file):
-    kind = _sniff_excel_kind(uploaded_file)
-    try:
-        uploaded_file.seek(0)
-    except Exception:
-        pass
-    eng = "xlrd" if kind == "xls" else "openpyxl"
-    try:
-        return pd.ExcelFile(uploaded_file, engine=eng)
-    except Exception as e1:
-        try:
-            uploaded_file.seek(0)
-        except Exception:
-            pass
-        alt = "openpyxl" if eng == "xlrd" else "xlrd"
-        try:
-            return pd.ExcelFile(uploaded_file, engine=alt)
-        except Exception as e2:
-            raise RuntimeError(f"Falha abrindo ExcelFile (kind={kind}). Tentativas: {e1} | {e2}")
-
 # ======================
 # Processamento Formato 2 (plano)
 # ======================
@@ -378,132 +294,26 @@ def processar_formato2(
     return df_final
 
 # ======================
-# 3SCheckout - Certificado AWS + Postgres
+# 3SCheckout - armazém diário local + delta no Postgres
 # ======================
-CERT_PATH = "aws-us-east-2-bundle.pem"
-
-if "cert_written" not in st.session_state:
-    with open(CERT_PATH, "w", encoding="utf-8") as f:
-        f.write(st.secrets["certs"]["aws_rds_us_east_2"])
-    st.session_state["cert_written"] = True
-
-def get_db_conn():
-    return psycopg2.connect(
-        host=st.secrets["db"]["host"],
-        port=st.secrets["db"]["port"],
-        dbname=st.secrets["db"]["database"],
-        user=st.secrets["db"]["user"],
-        password=st.secrets["db"]["password"],
-        sslmode="verify-full",
-        sslrootcert=CERT_PATH,
-    )
-
-def parse_props(x):
-    if pd.isna(x): return {}
-    try:
-        if isinstance(x, str):
-            return json.loads(x)
-    except:
-        try:
-            import ast
-            return ast.literal_eval(x)
-        except:
-            return {}
-    return x if isinstance(x, dict) else {}
-
 def buscar_meio_pagamento_3s_checkout(df_empresa: pd.DataFrame, df_meio_pgto_google: pd.DataFrame):
     """Busca dados do 3S Checkout direto do banco e processa para Meio de Pagamento (últimos 60 dias até ontem)"""
-    conn = get_db_conn()
     try:
         # Ajuste para fuso horário de Brasília (UTC-3) e define "ontem" como limite máximo
         agora_brasil = datetime.utcnow() - timedelta(hours=3)
         ontem = (agora_brasil - timedelta(days=1)).date()
         data_inicio = ontem - timedelta(days=59)  # últimos 60 dias incluindo ontem
 
-        # BASE (order_picture) p/ VOID_TYPE + store/date
-        query_op = """
-            SELECT
-                order_picture_id,
-                store_code,
-                business_dt,
-                custom_properties
-            FROM public.order_picture
-            WHERE business_dt >= %s
-              AND business_dt <= %s
-              AND store_code NOT IN ('0000', '0001', '9999')
-              AND state_id = 5
-        """
-        # Passa os dois parâmetros: data_inicio e ontem
-        df_op = pd.read_sql(query_op, conn, params=(data_inicio, ontem))
-
-        if df_op.empty:
-            return None, f"Nenhum dado encontrado no período {data_inicio.strftime('%d/%m/%Y')} até {ontem.strftime('%d/%m/%Y')}", 0
-
-        df_op["business_dt"] = pd.to_datetime(df_op["business_dt"], errors="coerce")
-        df_op["store_code"] = df_op["store_code"].astype(str).str.lstrip("0").str.strip()
-
-        props = df_op["custom_properties"].apply(parse_props)
-        df_op["VOID_TYPE"] = props.apply(lambda x: x.get("VOID_TYPE") if isinstance(x, dict) else None)
-        df_op = df_op[df_op["VOID_TYPE"].isna() | (df_op["VOID_TYPE"] == "") | (df_op["VOID_TYPE"] == 0)].copy()
-        if df_op.empty:
-            return None, "Todos os registros foram filtrados (VOID)", 0
-
-        # TENDER (order_picture_tender) com troco
-        query_tender = """
-            SELECT
-                order_picture_id,
-                tender_amount,
-                change_amount,
-                tender_name,
-                details
-            FROM public.order_picture_tender
-            WHERE order_picture_id = ANY(%s)
-        """
-        op_ids = df_op["order_picture_id"].dropna().astype(int).tolist()
-        df_tender = pd.read_sql(query_tender, conn, params=(op_ids,))
+        # Tenders ligados aos pedidos válidos (sem VOID) e somados por loja/dia/meio no banco;
+        # dias fechados vêm do armazém local
+        df_tender = carregar_3s("meio_pagamento", data_inicio, ontem)
         if df_tender.empty:
-            return None, "Nenhum tender encontrado", 0
+            return None, f"Nenhum tender encontrado no período {data_inicio.strftime('%d/%m/%Y')} até {ontem.strftime('%d/%m/%Y')}", 0
+        total_registros = contar_pedidos(df_tender)
 
-        df_tender["tender_amount"] = pd.to_numeric(df_tender["tender_amount"], errors="coerce").fillna(0)
-        df_tender["change_amount"] = pd.to_numeric(df_tender["change_amount"], errors="coerce").fillna(0)
-
-        tender_props = df_tender["details"].apply(parse_props)
-
-        def extrair_meio(row):
-            d = row["details_parsed"]
-            # 1. Tenta extrair do details (tenderDescr, tenderDesc, tenderTypeDescription)
-            if isinstance(d, dict):
-                meio = (
-                    d.get("tenderDescr")
-                    or d.get("tenderDesc")
-                    or d.get("tenderTypeDescription")
-                )
-                if meio and str(meio).strip():
-                    return str(meio).strip()
-            # 2. Fallback: usa tender_name quando details está vazio {}
-            tn = row.get("tender_name")
-            if tn is not None and str(tn).strip() not in ("", "None", "nan"):
-                return str(tn).strip()
-            return None
-
-        df_tender["details_parsed"] = tender_props
-        df_tender["Meio de Pagamento"] = df_tender.apply(extrair_meio, axis=1)
-        df_tender.drop(columns=["details_parsed"], inplace=True, errors="ignore")
-        df_tender["tip_amount"] = pd.to_numeric(
-            tender_props.apply(lambda x: x.get("tipAmount", 0) if isinstance(x, dict) else 0),
-            errors="coerce"
-        ).fillna(0)
-
-        # líquido de troco
-        df_tender["valor_liquido"] = (df_tender["tender_amount"] - df_tender["change_amount"]).clip(lower=0)
-        df_tender["Valor (R$)"] = df_tender["valor_liquido"] + df_tender["tip_amount"]
-
-        # junta com a base filtrada (VOID ok)
-        df_tender = df_tender.merge(
-            df_op[["order_picture_id", "store_code", "business_dt"]],
-            on="order_picture_id",
-            how="inner"
-        )
+        # líquido de troco + gorjeta
+        df_tender = df_tender.rename(columns={"meio_pagamento": "Meio de Pagamento", "data": "business_dt"})
+        df_tender["Valor (R$)"] = df_tender["valor_liquido"] + df_tender["gorjeta"]
 
         dias_traducao = {
             "Monday": "segunda-feira", "Tuesday": "terça-feira", "Wednesday": "quarta-feira",
@@ -572,13 +382,10 @@ def buscar_meio_pagamento_3s_checkout(df_empresa: pd.DataFrame, df_meio_pgto_goo
                 resumo[c] = ""
         resumo = resumo[col_order]
 
-        total_registros = len(df_op)
         return resumo, None, total_registros
 
     except Exception as e:
         return None, str(e), 0
-    finally:
-        conn.close()
 
 # ======================
 # Spinner + cargas do Google
@@ -592,7 +399,7 @@ with st.spinner("⏳ Processando..."):
     planilha = gc.open("Tabelas")
 
     # Tabela Empresa
-    df_empresa = pd.DataFrame(planilha.worksheet("Tabela Empresa").get_all_records())
+    df_empresa = carregar_tabela_empresa("Tabelas")
 
     # Tabela Meio Pagamento (RAW = com duplicatas)
     df_meio_pgto_raw = pd.DataFrame(planilha.worksheet("Tabela Meio Pagamento").get_all_records())
@@ -757,7 +564,8 @@ with st.spinner("⏳ Processando..."):
             if uploaded_file:
                 try:
                     # Detecta Formato 2 pelo header real
-                    df_head = read_excel_smart(uploaded_file, sheet_name=0, header=0)
+                    # cada aba é lida uma vez só (comum/leitura_excel); 1ª aba com cabeçalho para detectar o formato
+                    df_head = ler_aba(uploaded_file, 0, header=0)
                     if _is_formato2(df_head):
                         # ➜ Formato 2 (plano)
                         df_meio_pagamento = processar_formato2(
@@ -768,14 +576,12 @@ with st.spinner("⏳ Processando..."):
                         )
                     else:
                         # ➜ Formato 1 (layout antigo)
-                        uploaded_file.seek(0)
-                        xls = excel_file_smart(uploaded_file)
-                        abas_disponiveis = xls.sheet_names
+                        abas_disponiveis = abas_excel(uploaded_file)
 
                         aba_escolhida = abas_disponiveis[0] if len(abas_disponiveis) == 1 else st.selectbox(
                             "Escolha a aba para processar", abas_disponiveis, key="select_aba_upload")
 
-                        df_raw = read_excel_smart(xls, sheet_name=aba_escolhida, header=None)
+                        df_raw = ler_aba(uploaded_file, aba_escolhida)
                         df_raw = df_raw[~df_raw.iloc[:, 1].astype(str).str.lower().str.contains("total|subtotal", na=False)]
 
                         if str(df_raw.iloc[0, 1]).strip().lower() != "faturamento diário por meio de pagamento":
@@ -1060,11 +866,10 @@ with st.spinner("⏳ Processando..."):
             sh_fatur = gc.open("Faturamento Meio Pagamento")
             aba_destino = sh_fatur.worksheet("Faturamento Meio Pagamento")
             #aba_destino = gc.open("Faturamento Meio Pagamento").worksheet("Faturamento Meio Pagamento")
-            valores_existentes = aba_destino.get_all_values()
+            # chaves M já gravadas pelo índice local (lê só as linhas novas da coluna M)
+            indice_destino, header = sincronizar_indice(aba_destino, ("M",))
 
-            if valores_existentes:
-                header = [h.strip() for h in valores_existentes[0]]
-            else:
+            if not header:
                 header = [
                     "Data","Dia da Semana","Meio de Pagamento","Tipo de Pagamento","Tipo DRE",
                     "Loja","Código Everest","Grupo","Código Grupo Everest",
@@ -1075,31 +880,16 @@ with st.spinner("⏳ Processando..."):
                 if c not in df_final.columns:
                     df_final[c] = ""
 
-            df_final = df_final.reindex(columns=header, fill_value="")
+            df_final = df_final.reindex(columns=header, fill_value="").fillna("")
 
             header_lower = [h.lower() for h in header]
-            m_idx = header_lower.index("m") if "m" in header_lower else -1
+            m_idx = header_lower.index("m") if "m" in header_lower else len(header) - 1
 
-            if len(valores_existentes) > 1:
-                if m_idx >= 0:
-                    dados_existentes = set(
-                        linha[m_idx] for linha in valores_existentes[1:] if len(linha) > m_idx
-                    )
-                else:
-                    dados_existentes = set(
-                        linha[-1] for linha in valores_existentes[1:] if len(linha) > 0
-                    )
-            else:
-                dados_existentes = set()
-
-            novos_dados, duplicados = [], []
-            for linha in df_final.fillna("").values.tolist():
-                chave_m = linha[m_idx] if m_idx >= 0 else linha[-1]
-                if chave_m not in dados_existentes:
-                    novos_dados.append(linha)
-                    dados_existentes.add(chave_m)
-                else:
-                    duplicados.append(linha)
+            # duplicado: M já na planilha ou repetido no próprio lote (fica a 1ª ocorrência)
+            chaves_m = df_final.iloc[:, m_idx].astype(str)
+            mask_dup = chaves_m.isin(set(indice_destino["M"])) | chaves_m.duplicated()
+            novos_dados = df_final.loc[~mask_dup].values.tolist()
+            duplicados = df_final.loc[mask_dup].values.tolist()
 
             lojas_nao_cadastradas = df_final[df_final["Código Everest"].astype(str).isin(["", "nan"])]['Loja'].unique() \
                 if "Código Everest" in df_final.columns else []
@@ -1114,7 +904,8 @@ with st.spinner("⏳ Processando..."):
                 with st.spinner("🔄 Processando envio e atualizando..."):
                     # 1. Envio dos novos dados
                     if novos_dados:
-                        aba_destino.append_rows(novos_dados)
+                        resposta = aba_destino.append_rows(novos_dados)
+                        registrar_anexadas(aba_destino, resposta, pd.DataFrame(novos_dados, columns=header), ("M",))
                         st.success(f"✅ {len(novos_dados)} novos registros enviados!")
                     else:
                         st.info("ℹ️ Nenhum novo registro para enviar.")
@@ -1136,15 +927,9 @@ with st.spinner("⏳ Processando..."):
                         ultimo_dia_mes_anterior = primeiro_dia_mes_atual - timedelta(days=1)
                         primeiro_dia_mes_anterior = date(ultimo_dia_mes_anterior.year, ultimo_dia_mes_anterior.month, 1)
                         
-                        def converter_data_filtro(x):
-                            try:
-                                if str(x).isdigit(): return (pd.Timestamp("1899-12-30") + pd.Timedelta(days=float(x))).date()
-                                return pd.to_datetime(x, dayfirst=True).date()
-                            except: return None
-
-                        df_temp['__dt_filtro__'] = df_temp['Data'].apply(converter_data_filtro)
-                        mask = (df_temp['__dt_filtro__'] >= primeiro_dia_mes_anterior) & (df_temp['__dt_filtro__'] <= ultimo_dia_mes_anterior)
-                        dados_filtrados = df_temp.loc[mask].drop(columns=['__dt_filtro__']).values.tolist()
+                        dt_filtro = para_data_br(df_temp['Data'])
+                        mask = dt_filtro.between(pd.Timestamp(primeiro_dia_mes_anterior), pd.Timestamp(ultimo_dia_mes_anterior))
+                        dados_filtrados = df_temp.loc[mask].values.tolist()
 
                         try:
                             sh_cache = sh_fatur.worksheet("CACHE_FILTRADO")
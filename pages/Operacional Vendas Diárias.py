@@ -12,7 +12,13 @@ from oauth2client.service_account import ServiceAccountCredentials
 import json
 import plotly.express as px
 from datetime import date
-import psycopg2
+
+from comum.armazem_3s import carregar_3s
+from comum.fat_externo import carregar_fat_externo, invalidar_fat_externo
+from comum.leitura_excel import abas_excel, ler_aba
+from comum.indice_chaves import ler_linhas, linhas_anexadas, registrar_anexadas, sincronizar_indice
+from comum.tabela_empresa import carregar_tabela_empresa
+from comum.conversao import numero_mes_pt, para_data_br, para_float_br
 
 st.set_page_config(page_title="Vendas Diarias", layout="wide")
 
@@ -39,6 +45,56 @@ def limpar_estado_aba_google():
         if k in st.session_state:
             del st.session_state[k]
 
+# ✅ Parser do relatório "FaturamentoDiarioPorLoja" (Everest, multi-loja)
+# Layout: linha 4 = "código - loja" no início de cada bloco de 5 colunas
+# (Fat.Total, Serv/Tx, Fat.Real, Pessoas, Ticket); linha 5 = cabeçalhos;
+# dados a partir da linha 6, com a data na coluna C e "Total"/"Subtotal" na B.
+COLUNAS_BLOCO_LOJA = ["Fat.Total", "Serv/Tx", "Fat.Real", "Pessoas", "Ticket"]
+
+def blocos_lojas(df_raw):
+    """[(coluna inicial, loja)] dos blocos de 5 colunas, lidos só das linhas de cabeçalho."""
+    lojas = df_raw.iloc[3].astype(str).str.strip().tolist()
+    cabecalhos = df_raw.iloc[4].astype(str).str.strip().str.lower().tolist()
+    blocos, col = [], 3
+    while col < df_raw.shape[1]:
+        if re.match(r"^\d+\s*-?\s*", lojas[col]):
+            if "fat.total" in cabecalhos[col]:
+                blocos.append((col, lojas[col].split("-", 1)[-1].strip()))
+            col += 5
+        else:
+            col += 1
+    return blocos
+
+def faturamento_multiloja(df_raw):
+    """Planilha crua (header=None) -> uma linha por Data × Loja, todos os blocos de uma vez."""
+    colunas = ["Data", "Loja", *COLUNAS_BLOCO_LOJA, "Mês", "Ano"]
+    if df_raw.shape[0] <= 5:
+        return pd.DataFrame(columns=colunas)
+    dados = df_raw.iloc[5:]
+    datas = pd.to_datetime(dados.iloc[:, 2], dayfirst=True, errors="coerce")
+    marca = dados.iloc[:, 1].astype(str).str.strip().str.lower()
+    validas = (datas.notna() & ~marca.isin(["total", "subtotal"])).to_numpy()
+    blocos = blocos_lojas(df_raw)
+    if not blocos or not validas.any():
+        return pd.DataFrame(columns=colunas)
+
+    datas = datas[validas].to_numpy()
+    largura = len(COLUNAS_BLOCO_LOJA)
+    valores = dados.to_numpy(dtype=object)[validas]
+    # empilha os blocos (loja a loja, na ordem das colunas) em uma matriz só
+    matriz = np.concatenate([
+        np.pad(valores[:, c:c + largura], ((0, 0), (0, max(0, c + largura - valores.shape[1]))),
+               constant_values=np.nan)
+        for c, _ in blocos
+    ])
+    df = pd.DataFrame(matriz, columns=COLUNAS_BLOCO_LOJA).infer_objects()
+    df.insert(0, "Data", np.tile(datas, len(blocos)))
+    df.insert(1, "Loja", np.repeat([loja for _, loja in blocos], len(datas)))
+    df = df[~pd.isna(matriz).all(axis=1)].reset_index(drop=True)
+    df["Mês"] = df["Data"].dt.strftime("%b")
+    df["Ano"] = df["Data"].dt.year
+    return df[colunas]
+
 # ======================
 # CSS para esconder só a barra superior
 # ======================
@@ -124,48 +180,19 @@ with st.spinner("⏳ Processando..."):
     credentials_dict = json.loads(st.secrets["GOOGLE_SERVICE_ACCOUNT"])
     credentials = ServiceAccountCredentials.from_json_keyfile_dict(credentials_dict, scope)
     gc = gspread.authorize(credentials)
-    planilha_empresa = gc.open("Vendas diarias")
-    
-    # ✅ OTIMIZAÇÃO: Carrega valores brutos e normaliza ANTES de criar DataFrame
-    aba_empresa = planilha_empresa.worksheet("Tabela Empresa")
-    valores_empresa = aba_empresa.get_all_values()
-    
-    if len(valores_empresa) > 1:
-        # Cria DataFrame com cabeçalho
-        df_empresa = pd.DataFrame(valores_empresa[1:], columns=valores_empresa[0])
-        df_empresa.columns = df_empresa.columns.str.strip()
-        
-        # ✅ Força Loja em minúsculo IMEDIATAMENTE após carregar
-        if "Loja" in df_empresa.columns:
-            df_empresa["Loja"] = df_empresa["Loja"].astype(str).str.lower().str.strip()
-    else:
-        df_empresa = pd.DataFrame()
-    # ================================
-    # 2. Função de conexão com PostgreSQL
-    # ================================
-    CERT_PATH = "aws-us-east-2-bundle.pem"
-    
-    if "cert_written" not in st.session_state:
-        with open(CERT_PATH, "w", encoding="utf-8") as f:
-            f.write(st.secrets["certs"]["aws_rds_us_east_2"])
-        st.session_state["cert_written"] = True
-    
-    def get_db_conn():
-        return psycopg2.connect(
-            host=st.secrets["db"]["host"],
-            port=st.secrets["db"]["port"],
-            dbname=st.secrets["db"]["database"],
-            user=st.secrets["db"]["user"],
-            password=st.secrets["db"]["password"],
-            sslmode="verify-full",
-            sslrootcert=CERT_PATH,
-        )
     
+    # ✅ Tabela Empresa do cache compartilhado (já normalizada)
+    df_empresa = carregar_tabela_empresa()
     
+    # ✅ Força Loja em minúsculo IMEDIATAMENTE após carregar
+    if "Loja" in df_empresa.columns:
+        df_empresa["Loja"] = df_empresa["Loja"].astype(str).str.lower().str.strip()
+    # ================================
+    # 2. Busca 3S (armazém diário local + delta no PostgreSQL, ver comum/armazem_3s.py)
+    # ================================
     
     def buscar_dados_3s_checkout():
         """Busca dados do 3S Checkout direto do banco e processa"""
-        conn = get_db_conn()
         try:
             # Ajuste para fuso horário de Brasília (UTC-3) e define "ontem" como limite máximo
             from datetime import datetime, timedelta
@@ -173,54 +200,15 @@ with st.spinner("⏳ Processando..."):
             ontem = (agora_brasil - timedelta(days=1)).date()
             data_inicio = ontem - timedelta(days=99)  # últimos 30 dias incluindo ontem
             
-            # ✅ FILTRO SQL: Adicionado "AND business_dt <= %s"
-            query = """
-                SELECT store_code, business_dt, total_gross, custom_properties, order_code, state_id
-                FROM public.order_picture
-                WHERE business_dt >= %s
-                  AND business_dt <= %s
-                  AND store_code NOT IN ('0000', '0001', '9999')
-                  AND state_id = 5
-            """
-            df = pd.read_sql(query, conn, params=(data_inicio, ontem))
-            
-            
-            # 1. Converter datas
-            df['business_dt'] = pd.to_datetime(df['business_dt'], errors='coerce')
-            
-            # 2. ✅ REMOVER ZEROS À ESQUERDA do store_code
-            df['store_code'] = df['store_code'].astype(str).str.lstrip('0')
-            
-            # 3. Extrair campos de custom_properties
-            def parse_props(x):
-                if pd.isna(x): return {}
-                try:
-                    if isinstance(x, str):
-                        return json.loads(x)
-                except:
-                    try:
-                        import ast
-                        return ast.literal_eval(x)
-                    except:
-                        return {}
-                return x if isinstance(x, dict) else {}
-            
-            props = df['custom_properties'].apply(parse_props)
-            df['TIP_AMOUNT'] = pd.to_numeric(props.apply(lambda x: x.get('TIP_AMOUNT')), errors='coerce').fillna(0)
-            df['VOID_TYPE'] = props.apply(lambda x: x.get('VOID_TYPE'))
-            
-            # 4. Desconsiderar registros com VOID_TYPE preenchido
-            df = df[df['VOID_TYPE'].isna() | (df['VOID_TYPE'] == "") | (df['VOID_TYPE'] == 0)].copy()
-            
-            # 5. Criar coluna de data sem hora para agrupamento
-            df['data'] = df['business_dt'].dt.date
-            
-            # 6. Agrupar totais por store_code e data
-            resumo = df.groupby(['store_code', 'data']).agg(
-                Fat_Real=('total_gross', 'sum'),
-                Serv_Tx=('TIP_AMOUNT', 'sum'),
-                Qtd_Pedidos=('order_code', 'nunique')
-            ).reset_index()
+            # ✅ Agregação no Postgres: cancelamentos filtrados e gorjeta somada no SQL,
+            #    voltam só as linhas loja/dia; dias já fechados vêm do armazém local
+            resumo = carregar_3s("resumo_diario", data_inicio, ontem)
+            if resumo.empty:
+                return pd.DataFrame(), None, 0
+            total_registros = int(resumo["qtd_registros"].sum())
+            resumo = resumo.rename(columns={
+                "fat_real": "Fat_Real", "serv_tx": "Serv_Tx", "qtd_pedidos": "Qtd_Pedidos",
+            })
             
             # 7. Calcular Fat.Total e Ticket (na ordem correta)
             resumo['Fat_Total'] = resumo['Fat_Real'] + resumo['Serv_Tx']
@@ -282,11 +270,9 @@ with st.spinner("⏳ Processando..."):
             resumo['Data_Ordenada'] = pd.to_datetime(resumo['Data'], format='%d/%m/%Y')
             resumo = resumo.sort_values(by=['Data_Ordenada', 'Loja']).drop(columns='Data_Ordenada')
             
-            return resumo, None, len(df)
+            return resumo, None, total_registros
         except Exception as e:
             return None, str(e), 0
-        finally:
-            conn.close()
     
     # ================================
     # Configuração inicial do app
@@ -312,17 +298,10 @@ with st.spinner("⏳ Processando..."):
     """, unsafe_allow_html=True)
     
     try:
-        planilha = gc.open("Vendas diarias")
-        aba_fat = planilha.worksheet("Fat Sistema Externo")
-        data_raw = aba_fat.get_all_values()
-
-        if len(data_raw) > 1:
-            df = pd.DataFrame(data_raw[1:], columns=data_raw[0])
-            df.columns = df.columns.str.strip()
+        df = carregar_fat_externo()  # espelho local já tipado
 
+        if not df.empty:
             if "Data" in df.columns:
-                df["Data"] = pd.to_datetime(df["Data"].astype(str).str.strip(), dayfirst=True, errors="coerce")
-
                 ultima_data_valida = df["Data"].dropna()
 
                 if not ultima_data_valida.empty:
@@ -485,53 +464,24 @@ with st.spinner("⏳ Processando..."):
 
             if uploaded_file:
                 try:
-                    xls = pd.ExcelFile(uploaded_file)
-                    abas = xls.sheet_names
+                    # cada aba é lida uma vez por arquivo (comum/leitura_excel), mesmo entre reruns
+                    abas = abas_excel(uploaded_file)
         
                     if "FaturamentoDiarioPorLoja" in abas:
-                        df_raw = pd.read_excel(xls, sheet_name="FaturamentoDiarioPorLoja", header=None)
+                        df_raw = ler_aba(uploaded_file, "FaturamentoDiarioPorLoja")
                         texto_b1 = str(df_raw.iloc[0, 1]).strip().lower()
                         if texto_b1 != "faturamento diário sintético multi-loja":
                             st.error(f"❌ A célula B1 está com '{texto_b1}'. Corrija para 'Faturamento diário sintético multi-loja'.")
                             st.stop()
         
-                        df = pd.read_excel(xls, sheet_name="FaturamentoDiarioPorLoja", header=None, skiprows=4)
-                        df.iloc[:, 2] = pd.to_datetime(df.iloc[:, 2], dayfirst=True, errors='coerce')
-        
-                        registros = []
-                        col = 3
-                        while col < df.shape[1]:
-                            nome_loja = str(df_raw.iloc[3, col]).strip()
-                            if re.match(r"^\d+\s*-?\s*", nome_loja):
-                                nome_loja = nome_loja.split("-", 1)[-1].strip()
-                                header_col = str(df.iloc[0, col]).strip().lower()
-                                if "fat.total" in header_col:
-                                    for i in range(1, df.shape[0]):
-                                        linha = df.iloc[i]
-                                        valor_data = df.iloc[i, 2]
-                                        valor_check = str(df.iloc[i, 1]).strip().lower()
-                                        if pd.isna(valor_data) or valor_check in ["total", "subtotal"]:
-                                            continue
-                                        valores = linha[col:col+5].values
-                                        if pd.isna(valores).all():
-                                            continue
-                                        registros.append([
-                                            valor_data, nome_loja, *valores,
-                                            valor_data.strftime("%b"), valor_data.year
-                                        ])
-                                col += 5
-                            else:
-                                col += 1
-        
-                        if len(registros) == 0:
+                        df_final = faturamento_multiloja(df_raw)
+                        if df_final.empty:
                             st.warning("⚠️ Nenhum registro encontrado.")
         
-                        df_final = pd.DataFrame(registros, columns=[
-                            "Data", "Loja", "Fat.Total", "Serv/Tx", "Fat.Real", "Pessoas", "Ticket", "Mês", "Ano"
-                        ])
-        
                     elif "Relatório 100132" in abas:
-                        df = pd.read_excel(xls, sheet_name="Relatório 100132")
+                        df = ler_aba(uploaded_file, "Relatório 100132", header=0, colunas=[
+                            "Código - Nome Empresa", "Data", "Valor Total", "Taxa de Serviço", "Ticket Médio"
+                        ])
                         #df["Loja"] = df["Código - Nome Empresa"].astype(str).str.split("-", n=1).str[-1].str.strip().str.lower()
                         df["Código Everest"] = (
                             df["Código - Nome Empresa"]
@@ -578,30 +528,20 @@ with st.spinner("⏳ Processando..."):
                     # =====================================================
                     else:
                         nome_aba = abas[0]
-                        df_bruto = pd.read_excel(xls, sheet_name=nome_aba, header=None)
+                        df_bruto = ler_aba(uploaded_file, nome_aba)
         
                         # localizar linha do cabeçalho (ID LOJA na coluna A)
-                        linha_header = None
-                        for i in range(len(df_bruto)):
-                            if "ID LOJA" in str(df_bruto.iloc[i, 0]).upper():
-                                linha_header = i
-                                break
+                        achou = df_bruto.iloc[:, 0].astype(str).str.upper().str.contains("ID LOJA", regex=False)
+                        linha_header = int(achou.to_numpy().argmax()) if achou.any() else None
         
                         if linha_header is None:
                             st.error("❌ Arquivo não reconhecido. Não encontrei 'ID LOJA' na coluna A.")
                             st.stop()
         
                         # leitura dos dados (SEM cabeçalho)
-                        df = pd.read_excel(
-                            xls,
-                            sheet_name=nome_aba,
-                            skiprows=linha_header + 1,
-                            header=None
-                        )
-        
                         # colunas fixas
                         # A=0 ID LOJA | C=2 DATA | G=6 Ticket | H=7 Fat.Total | L=11 Serv/Tx | M=12 Fat.Real
-                        df = df.iloc[:, [0, 2, 6, 7, 11, 12]]
+                        df = ler_aba(uploaded_file, nome_aba, skiprows=linha_header + 1, colunas=[0, 2, 6, 7, 11, 12])
                         df = df.dropna(how="all")
         
                         # normalizações
@@ -856,10 +796,9 @@ with st.spinner("⏳ Processando..."):
             s = re.sub(r"[^a-z0-9]+", " ", s).strip()
             return s
     
-        def carregar_catalogo_codigos(gc, nome_planilha="Vendas diarias", aba_catalogo="Tabela Empresa"):
+        def carregar_catalogo_codigos(nome_planilha="Vendas diarias"):
             try:
-                ws = gc.open(nome_planilha).worksheet(aba_catalogo)
-                df = get_as_dataframe(ws, evaluate_formulas=True, dtype=str).fillna("")
+                df = carregar_tabela_empresa(nome_planilha).reset_index(drop=True)
                 if df.empty:
                     return pd.DataFrame(columns=["Loja","Loja_norm","Grupo","Código Everest","Código Grupo Everest"])
     
@@ -916,35 +855,6 @@ with st.spinner("⏳ Processando..."):
         # ======== Conferência: helpers ========
         MESES_PT = ["jan","fev","mar","abr","mai","jun","jul","ago","set","out","nov","dez"]
         
-        def _parse_money(txt: str) -> float:
-            import re
-            s = str(txt or "").strip()
-            s = s.replace("R$", "").replace("\u00A0","")
-            s = re.sub(r"[^\d,.\-]", "", s)
-            if s.count(",") == 1 and s.count(".") >= 1:
-                s = s.replace(".", "").replace(",", ".")
-            elif s.count(",") == 1 and s.count(".") == 0:
-                s = s.replace(",", ".")
-            try:
-                return float(s)
-            except:
-                return float("nan")
-        
-        def _coerce_float(x):
-            import re
-            s = str(x or "").strip().replace("\u00A0", "")
-            s = re.sub(r"[^\d,.\-]", "", s)
-            if s == "":
-                return float("nan")
-            if s.count(",") == 1 and s.count(".") >= 1:
-                s = s.replace(".", "").replace(",", ".")
-            elif s.count(",") == 1 and s.count(".") == 0:
-                s = s.replace(",", ".")
-            try:
-                return float(s)
-            except:
-                return float("nan")
-        
         def _ns_header(s: str) -> str:
             import unicodedata, re
             s = str(s or "").strip().lower()
@@ -1026,7 +936,7 @@ with st.spinner("⏳ Processando..."):
             alvo = str(sistema or "").strip().lower()
         
             mask = (sis_norm == alvo) & (df["_mes_num"] == int(mes_num)) & (df["_ano_num"] == int(ano))
-            sub = df.loc[mask, col_fat].apply(_coerce_float)
+            sub = para_float_br(df.loc[mask, col_fat])
             total = float(np.nansum(sub.values))
             return round(total, 2)
 
@@ -1075,6 +985,14 @@ with st.spinner("⏳ Processando..."):
             return df[cols]
 
 
+        # colunas do índice local de 'Fat Sistema Externo' (ver comum/indice_chaves)
+        CHAVES_DESTINO = ("M", "N", "Sistema")
+
+        def _n_sem_sistema(n, sistema):
+            """N sem o Sistema (coluna O) embutido, para comparar lançamentos entre sistemas."""
+            return [str(a).replace(str(b).strip(), "").strip() for a, b in zip(n, sistema)]
+
+
         def enviar_para_sheets(df_input: pd.DataFrame, titulo_origem: str = "dados") -> bool:
             if df_input.empty:
                 st.info("ℹ️ Nada a enviar.")
@@ -1170,17 +1088,10 @@ with st.spinner("⏳ Processando..."):
                 planilha_destino = gc.open("Vendas diarias")
                 aba_destino = planilha_destino.worksheet("Fat Sistema Externo")
         
-                valores_existentes_df = get_as_dataframe(aba_destino, evaluate_formulas=True, dtype=str).fillna("")
-                colunas_df_existente = valores_existentes_df.columns.str.strip().tolist()
-                dados_existentes   = set(valores_existentes_df["M"].astype(str).str.strip()) if "M" in colunas_df_existente else set()
-                dados_n_existentes = set(
-                    valores_existentes_df.apply(
-                        lambda row: str(row["N"]).replace(str(row["Sistema"]).strip(), "").strip()
-                        if "N" in colunas_df_existente and "Sistema" in colunas_df_existente
-                        else str(row.get("N","")).strip(),
-                        axis=1
-                    )
-                ) if "N" in colunas_df_existente else set()
+                # chaves já gravadas (M, N, Sistema) pelo índice local: lê só o que entrou desde o último envio
+                indice_destino, headers_raw = sincronizar_indice(aba_destino, CHAVES_DESTINO)
+                dados_existentes   = set(indice_destino["M"])
+                dados_n_existentes = set(_n_sem_sistema(indice_destino["N"], indice_destino["Sistema"]))
         
                 # ===== 3) Garantir N (yyyy-mm-dd + Código) =====
                 df_final['Data_Formatada'] = pd.to_datetime(
@@ -1194,8 +1105,7 @@ with st.spinner("⏳ Processando..."):
                 df_final = df_final.drop(columns=['Data_Formatada'], errors='ignore')
         
                 # ===== 4) Alinhar ao cabeçalho do Sheet =====
-                headers_raw = aba_destino.row_values(1)
-                headers = [h.strip() for h in headers_raw]
+                headers = list(headers_raw)
         
                 def _ns(s: str) -> str:
                     s = str(s or "").strip().lower()
@@ -1263,10 +1173,7 @@ with st.spinner("⏳ Processando..."):
                 M_in = df_final["M"].astype(str).str.strip()
 
                 # N sem Sistema para comparação (Sistema gravado na coluna O é removido via replace)
-                N_sem_sistema = df_final.apply(
-                    lambda row: str(row["N"]).replace(str(row["Sistema"]).strip(), "").strip(),
-                    axis=1
-                )
+                N_sem_sistema = pd.Series(_n_sem_sistema(df_final["N"], df_final["Sistema"]), index=df_final.index)
 
                 is_dup_M = M_in.isin(dados_existentes)
                 is_dup_N = N_sem_sistema.isin(dados_n_existentes)
@@ -1300,9 +1207,10 @@ with st.spinner("⏳ Processando..."):
                 if q_novos > 0:
                     try:
                         dados_para_enviar = df_novos.fillna("").values.tolist()
-                        inicio = len(aba_destino.col_values(1)) + 1
-                        aba_destino.append_rows(dados_para_enviar, value_input_option='USER_ENTERED')
-                        fim = inicio + q_novos - 1
+                        resposta = aba_destino.append_rows(dados_para_enviar, value_input_option='USER_ENTERED')
+                        invalidar_fat_externo()
+                        registrar_anexadas(aba_destino, resposta, df_novos, CHAVES_DESTINO)
+                        inicio, fim = linhas_anexadas(resposta) or (1, 0)
                 
                         if inicio <= fim:
                             data_format   = CellFormat(numberFormat=NumberFormat(type='DATE',   pattern='dd/mm/yyyy'))
@@ -1326,19 +1234,22 @@ with st.spinner("⏳ Processando..."):
                     def _normN(x, sistema=""):
                         return str(x).strip().replace(".0", "").replace(str(sistema).strip(), "").strip()
 
-                    valores_existentes_df2 = valores_existentes_df.copy()
-                    if "N" in valores_existentes_df2.columns and "Sistema" in valores_existentes_df2.columns:
-                        valores_existentes_df2["N"] = valores_existentes_df2.apply(
-                            lambda row: _normN(row["N"], row["Sistema"]), axis=1
-                        )
-                    elif "N" in valores_existentes_df2.columns:
-                        valores_existentes_df2["N"] = valores_existentes_df2["N"].map(lambda x: _normN(x))
-
                     entrada_por_n = {}
                     for _, r in df_suspeitos.iterrows():
                         nkey = _normN(r.get("N",""), r.get("Sistema",""))
                         entrada_por_n[nkey] = r.to_dict()
                 
+                    # só as linhas da planilha com N em conflito, localizadas pelo índice
+                    n_indice = [_normN(n, sis) for n, sis in zip(indice_destino["N"], indice_destino["Sistema"])]
+                    linhas_conflito = indice_destino.loc[pd.Series(n_indice, index=indice_destino.index)
+                                                         .isin(entrada_por_n.keys()), "linha"]
+                    valores_existentes_df2 = ler_linhas(aba_destino, linhas_conflito, headers_raw)
+                    if "N" in valores_existentes_df2.columns and "Sistema" in valores_existentes_df2.columns:
+                        valores_existentes_df2["N"] = [_normN(n, sis) for n, sis in
+                                                       zip(valores_existentes_df2["N"], valores_existentes_df2["Sistema"])]
+                    elif "N" in valores_existentes_df2.columns:
+                        valores_existentes_df2["N"] = valores_existentes_df2["N"].map(lambda x: _normN(x))
+
                     sheet_por_n = {nkey: valores_existentes_df2[valores_existentes_df2["N"] == nkey].copy()
                                    for nkey in entrada_por_n.keys()}
                 
@@ -1548,6 +1459,7 @@ with st.spinner("⏳ Processando..."):
                         try:
                             inicio = len(aba_destino.col_values(1)) + 1
                             aba_destino.append_rows(dados_para_enviar, value_input_option="USER_ENTERED")
+                            invalidar_fat_externo()
                             fim = inicio + q_novos - 1
                 
                             # Formatação (ajuste as colunas conforme seu Sheet)
@@ -2008,6 +1920,10 @@ with st.spinner("⏳ Processando..."):
                     if rows_to_append:
                         ws2.append_rows(rows_to_append, value_input_option='USER_ENTERED')
                         inseridos = len(rows_to_append)
+
+                    if removidos or inseridos:
+                        # exclusões deslocam linhas: espelho local precisa de releitura completa
+                        invalidar_fat_externo(completo=removidos > 0)
     
                     if removidos == 0 and inseridos == 0:
                         st.info("ℹ️ Nada a fazer: nenhuma linha marcada para excluir ou incluir.")
@@ -2062,8 +1978,7 @@ with st.spinner("⏳ Processando..."):
             #st.subheader("Lançamentos manuais (1 linha por vez)")
         
             # Catálogo de lojas para preencher códigos automaticamente
-            gc_ = get_gc()
-            catalogo = carregar_catalogo_codigos(gc_, nome_planilha="Vendas diarias", aba_catalogo="Tabela Empresa")
+            catalogo = carregar_catalogo_codigos(nome_planilha="Vendas diarias")
             lojas_options = sorted(
                 catalogo["Loja"].dropna().astype(str).str.strip().unique().tolist()
             ) if not catalogo.empty else []
@@ -2165,16 +2080,14 @@ with st.spinner("⏳ Processando..."):
         try:
             planilha = gc.open("Vendas diarias")
             aba_everest = planilha.worksheet("Everest")
-            aba_externo = planilha.worksheet("Fat Sistema Externo")
     
             df_everest = pd.DataFrame(aba_everest.get_all_values()[1:])
-            df_externo = pd.DataFrame(aba_externo.get_all_values()[1:])
+            # Fat Sistema Externo vem do espelho local, já tipado (Data datetime, valores float)
+            df_externo = carregar_fat_externo()
     
             df_everest.columns = [f"col{i}" for i in range(df_everest.shape[1])]
-            df_externo.columns = [f"col{i}" for i in range(df_externo.shape[1])]
     
             df_everest["col0"] = pd.to_datetime(df_everest["col0"], dayfirst=True, errors="coerce")
-            df_externo["col0"] = pd.to_datetime(df_externo["col0"], dayfirst=True, errors="coerce")
     
             datas_validas = df_everest["col0"].dropna()
     
@@ -2225,13 +2138,26 @@ with st.spinner("⏳ Processando..."):
                     ev = ev[~ev["Codigo"].astype(str).str.lower().str.contains("total", na=False)]
                     ev = ev[~ev["Codigo"].astype(str).str.lower().str.contains("subtotal", na=False)]
                     
-                    ex = df_externo.rename(columns={
-                        "col0": "Data",
-                        "col2": "Nome Loja Sistema Externo",
-                        "col3": "Codigo",
-                        "col6": "Valor Bruto (Externo)",
-                        "col8": "Valor Real (Externo)"
-                    })
+                    # Espelho: colunas pelo nome do cabeçalho (ignora acento/caixa/pontuação),
+                    # já que colunas sem cabeçalho são descartadas e a posição muda
+                    import unicodedata
+
+                    def _chave_col(s):
+                        s = unicodedata.normalize("NFKD", str(s)).encode("ASCII", "ignore").decode("ASCII")
+                        return re.sub(r"[^a-z0-9]", "", s.lower())
+
+                    cols_ext = {_chave_col(c): c for c in df_externo.columns}
+                    mapa_ext = {
+                        "Data": "Data",
+                        "Loja": "Nome Loja Sistema Externo",
+                        "Código Everest": "Codigo",
+                        "Fat.Total": "Valor Bruto (Externo)",
+                        "Fat.Real": "Valor Real (Externo)",
+                    }
+                    faltando = [n for n in mapa_ext if _chave_col(n) not in cols_ext]
+                    if faltando:
+                        raise ValueError(f"colunas ausentes em 'Fat Sistema Externo': {', '.join(faltando)}")
+                    ex = df_externo[[cols_ext[_chave_col(n)] for n in mapa_ext]].set_axis(list(mapa_ext.values()), axis=1)
     
                     ev["Data"] = pd.to_datetime(ev["Data"], errors="coerce").dt.date
                     ex["Data"] = pd.to_datetime(ex["Data"], errors="coerce").dt.date
@@ -2241,8 +2167,6 @@ with st.spinner("⏳ Processando..."):
     
                     for col in ["Valor Bruto (Everest)", "Impostos (Everest)"]:
                         ev[col] = ev[col].apply(tratar_valor)
-                    for col in ["Valor Bruto (Externo)", "Valor Real (Externo)"]:
-                        ex[col] = ex[col].apply(tratar_valor)
     
                     if "Impostos (Everest)" in ev.columns:
                         ev["Impostos (Everest)"] = pd.to_numeric(ev["Impostos (Everest)"], errors="coerce").fillna(0)
@@ -2452,92 +2376,14 @@ with st.spinner("⏳ Processando..."):
                     return norm_map[t_norm]
             return None
     
-        _MAP_MES = {
-            "jan":1,"fev":2,"mar":3,"abr":4,"mai":5,"jun":6,"jul":7,"ago":8,"set":9,"out":10,"nov":11,"dez":12,
-            "janeiro":1,"fevereiro":2,"março":3,"marco":3,"abril":4,"maio":5,"junho":6,"julho":7,"agosto":8,
-            "setembro":9,"outubro":10,"novembro":11,"dezembro":12,
-            "jan.":1,"feb":2,"feb.":2,"mar.":3,"apr":4,"apr.":4,"may":5,"jun.":6,"jul.":7,"aug":8,"aug.":8,
-            "sep":9,"sept":9,"sep.":9,"oct":10,"oct.":10,"nov.":11,"dec":12,"dec.":12
-        }
-        def _month_to_num(x):
-            s = str(x or "").strip().lower()
-            if s in _MAP_MES: return _MAP_MES[s]
-            try:
-                n = int(float(s))
-                if 1 <= n <= 12: return n
-            except: pass
-            return None
-    
-        def _mk_messtr(m, a):
-            try:
-                m = int(m); a = int(a)
-                if 1 <= m <= 12:
-                    return f"{m:02d}/{a}"
-            except:
-                pass
-            return ""
-    
-        def _to_float_brl_ext(x):
-            s = str(x or "").strip()
-            s = re.sub(r"[^\d,.\-]", "", s)
-            if s == "": return float("nan")
-            if s.count(",") == 1 and s.count(".") >= 1:
-                s = s.replace(".", "").replace(",", ".")
-            elif s.count(",") == 1 and s.count(".") == 0:
-                s = s.replace(",", ".")
-            try:
-                return float(s)
-            except:
-                return float("nan")
-    
-        def _parse_date_series(ser):
-            """
-            Converte uma Series que pode conter datas como texto (dd/mm/aaaa) OU
-            números seriais do Excel (dias desde 1899-12-30) para datetime64[ns],
-            de forma resiliente (evita FloatingPointError).
-            """
-            import numpy as np
-            import pandas as pd
-        
-            # Garante Series
-            if not isinstance(ser, pd.Series):
-                ser = pd.Series(ser)
-        
-            # 1) Tenta parsear como texto (dd/mm/aaaa, etc.)
-            dt_text = pd.to_datetime(ser, dayfirst=True, errors="coerce")
-        
-            # 2) Tenta como serial do Excel, mas SOMENTE para números plausíveis
-            num = pd.to_numeric(ser, errors="coerce")
-        
-            # máscara: numérico, finito e dentro de uma faixa plausível de dias do Excel
-            # (1 até 100000 cobre ~até ano 2173; ajuste se quiser mais curto)
-            mask = num.notna() & np.isfinite(num) & (num >= 1) & (num <= 100000)
-        
-            # Evita passar floats para o parser com unit="D" (que aciona np.round internamente).
-            # Forçamos inteiro por truncamento (ou use np.floor se preferir).
-            num_i = pd.Series(index=ser.index, dtype="Int64")
-            if mask.any():
-                num_i.loc[mask] = np.floor(num.loc[mask].astype(float)).astype("Int64")
-        
-            dt_excel = pd.Series(pd.NaT, index=ser.index, dtype="datetime64[ns]")
-            if mask.any():
-                dt_excel.loc[mask] = pd.to_datetime(
-                    num_i.loc[mask], origin="1899-12-30", unit="D", errors="coerce"
-                )
-        
-            # 3) Prioriza texto; onde NaT, usa Excel; resto fica NaT
-            return dt_text.where(dt_text.notna(), dt_excel)
-
-    
-        # === parser do Meio de Pagamento (mesmo da Aba Vendas)
-        def _valor_meio_pagamento(ser: pd.Series) -> pd.Series:
-            ser = ser.astype(str)
-            ser = ser.str.replace("R$", "", regex=False)
-            ser = ser.str.replace("(", "-", regex=False).str.replace(")", "", regex=False)
-            ser = ser.str.replace(" ", "", regex=False)
-            ser = ser.str.replace(".", "", regex=False)
-            ser = ser.str.replace(",", ".", regex=False)
-            return pd.to_numeric(ser, errors="coerce")
+        def _mk_messtr(mes_num, ano):
+            """MesNum/Ano -> "mm/aaaa" (vazio quando faltar ou o mês for inválido)."""
+            m = pd.to_numeric(mes_num, errors="coerce")
+            a = pd.to_numeric(ano, errors="coerce")
+            ok = m.between(1, 12) & a.notna()
+            txt = (m.where(ok, 1).astype(int).astype(str).str.zfill(2) + "/"
+                   + a.where(ok, 0).astype(int).astype(str))
+            return txt.where(ok, "")
     
         # ✅ BRL: R$ 246.931,52
         def _fmt_brl(v):
@@ -2562,10 +2408,6 @@ with st.spinner("⏳ Processando..."):
         # Abre a planilha pelo ID (substitua pelo seu ID)
         sh = _gc.open_by_key("1GSI291SEeeU9MtOWkGwsKGCGMi_xXMSiQnL_9GhXxfU")
 
-        # 1. Abre a planilha antiga para pegar o Sistema Externo
-        sh_vendas = _gc.open("Vendas diarias")
-        ws_ext = sh_vendas.worksheet("Fat Sistema Externo")
-
         # 2. Abre a NOVA planilha para pegar o Meio de Pagamento
         sh_meio_pagto = _gc.open_by_key("1GSI291SEeeU9MtOWkGwsKGCGMi_xXMSiQnL_9GhXxfU")
         ws_mp = sh_meio_pagto.worksheet("Faturamento Meio Pagamento")
@@ -2573,13 +2415,11 @@ with st.spinner("⏳ Processando..."):
         del _gc
     
         # ---------------- Leitura ----------------
-        #ws_ext = sh.worksheet("Fat Sistema Externo")
-        vals_ext = ws_ext.get_all_values()
-        if len(vals_ext) < 2:
+        # 1. Sistema Externo: espelho local já tipado (Data datetime, Fat.Total float)
+        df_ext = carregar_fat_externo()
+        if df_ext.empty:
             st.error("Aba 'Fat Sistema Externo' vazia.")
             st.stop()
-        header_ext, rows_ext = vals_ext[0], vals_ext[1:]
-        df_ext = pd.DataFrame(rows_ext, columns=[c.strip() for c in header_ext])
     
         #ws_mp = sh.worksheet("Faturamento Meio Pagamento")
         vals_mp = ws_mp.get_all_values()
@@ -2614,14 +2454,14 @@ with st.spinner("⏳ Processando..."):
     
         # ---------------- Preparar EXTERNO ----------------
         ext = pd.DataFrame({
-            "Data":           _parse_date_series(df_ext[col_ext_data]),
+            "Data":           df_ext[col_ext_data],
             "Código Everest": pd.to_numeric(df_ext[col_ext_cod], errors="coerce"),
             "Sistema":        df_ext[col_ext_sis].astype(str).str.strip().str.upper(),
-            "Fat.Total":      df_ext[col_ext_fat].map(_to_float_brl_ext),
+            "Fat.Total":      pd.to_numeric(df_ext[col_ext_fat], errors="coerce"),
             "MesNum":         df_ext[col_ext_mes] if col_ext_mes else None,
             "Ano":            df_ext[col_ext_ano] if col_ext_ano else None,
         })
-        ext["MesNum"] = ext["MesNum"].apply(lambda x: _month_to_num(x) if pd.notna(x) else None)
+        ext["MesNum"] = numero_mes_pt(ext["MesNum"]).astype(float)
         ext["Ano"]    = pd.to_numeric(ext["Ano"], errors="coerce")
         ext = ext[ext["Fat.Total"].notna()].copy()
         if ext["MesNum"].isna().any():
@@ -2630,18 +2470,18 @@ with st.spinner("⏳ Processando..."):
             ext["Ano"] = ext["Ano"].fillna(pd.to_datetime(ext["Data"], errors="coerce").dt.year)
         # 2025+
         ext = ext[ext["Ano"] >= ANO_MIN].copy()
-        ext["Mês"] = ext.apply(lambda r: _mk_messtr(r["MesNum"], r["Ano"]), axis=1)
+        ext["Mês"] = _mk_messtr(ext["MesNum"], ext["Ano"])
     
         # ---------------- Preparar MEIO DE PAGAMENTO ----------------
         mp = pd.DataFrame({
-            "Data":           _parse_date_series(df_mp[col_mp_data]),
+            "Data":           para_data_br(df_mp[col_mp_data]),
             "Código Everest": pd.to_numeric(df_mp[col_mp_cod], errors="coerce"),
             "Sistema":        df_mp[col_mp_sis].astype(str).str.strip().str.upper(),
-            "Valor_MP":       _valor_meio_pagamento(df_mp[col_mp_val]),
+            "Valor_MP":       para_float_br(df_mp[col_mp_val]),
             "MesNum":         df_mp[col_mp_mes] if col_mp_mes else None,
             "Ano":            df_mp[col_mp_ano] if col_mp_ano else None,
         })
-        mp["MesNum"] = mp["MesNum"].apply(lambda x: _month_to_num(x) if pd.notna(x) else None)
+        mp["MesNum"] = numero_mes_pt(mp["MesNum"]).astype(float)
         mp["Ano"]    = pd.to_numeric(mp["Ano"], errors="coerce")
         mp = mp[mp["Valor_MP"].notna()].copy()
         if mp["MesNum"].isna().any():
@@ -2650,7 +2490,7 @@ with st.spinner("⏳ Processando..."):
             mp["Ano"] = mp["Ano"].fillna(pd.to_datetime(mp["Data"], errors="coerce").dt.year)
         # 2025+
         mp = mp[mp["Ano"] >= ANO_MIN].copy()
-        mp["Mês"] = mp.apply(lambda r: _mk_messtr(r["MesNum"], r["Ano"]), axis=1)
+        mp["Mês"] = _mk_messtr(mp["MesNum"], mp["Ano"])
     
         # ---------------- RESUMO (Mês + Sistema) ----------------
         ext_mes = (ext.groupby(["Mês","Sistema"], as_index=False)["Fat.Total"].sum()
@@ -2715,7 +2555,7 @@ with st.spinner("⏳ Processando..."):
             try:
                 df_emp_map = df_empresa.copy()
             except NameError:
-                df_emp_map = pd.DataFrame(sh.worksheet("Tabela Empresa").get_all_records())
+                df_emp_map = carregar_tabela_empresa()
             df_emp_map.columns = df_emp_map.columns.str.strip()
             col_cod_emp = next((c for c in df_emp_map.columns if "everest" in _ns(c) and "grupo" not in _ns(c)), None)
             col_loja    = next((c for c in df_emp_map.columns if _ns(c) == "loja"), None)
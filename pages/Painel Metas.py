@@ -10,11 +10,17 @@ import gspread
 from oauth2client.service_account import ServiceAccountCredentials
 import json
 from datetime import datetime
-import io
 from io import BytesIO
 import openpyxl
 from st_aggrid import AgGrid, GridOptionsBuilder
 
+from comum.conversao import MESES_PT_ABREV, nome_mes_pt, numero_mes_pt, para_float_br
+from comum.downloads import botao_download
+from comum.exportar_excel import exportar_excel
+from comum.cubo_vendas import carregar_cubo_vendas
+from comum.leitura_excel import abas_excel, ler_aba
+from comum.tabela_empresa import carregar_tabela_empresa
+
 if not st.session_state.get("acesso_liberado"):
     st.stop()
 import streamlit as st
@@ -66,7 +72,7 @@ with st.spinner("⏳ Processando..."):
     
     
     
-    df_empresa = pd.DataFrame(planilha_empresa.worksheet("Tabela Empresa").get_all_records())
+    df_empresa = carregar_tabela_empresa()
     
     # Padronizar Tabela Empresa
     for col in ["Loja", "Grupo", "Tipo"]:
@@ -100,31 +106,6 @@ with st.spinner("⏳ Processando..."):
         </div>
     """, unsafe_allow_html=True)
     
-    # ================================
-    # Função auxiliar para converter valores
-    # ================================
-    def parse_valor(val):
-        if pd.isna(val):
-            return 0.0
-        if isinstance(val, (int, float)):
-            return float(val)
-        try:
-            return float(str(val).replace("R$", "").replace(".", "").replace(",", ".").strip())
-        except:
-            return 0.0
-    
-    # Função auxiliar para tratar datas misturadas
-    
-    def tratar_data(val):
-        try:
-            val_str = str(val).strip()
-            if val_str.replace('.', '', 1).isdigit():
-                return pd.Timestamp('1899-12-30') + pd.to_timedelta(float(val), unit='D')
-            else:
-                return pd.to_datetime(val_str, dayfirst=True, errors='coerce')
-        except:
-            return pd.NaT
-    
     def garantir_escalar(x):
         if isinstance(x, list):
             if len(x) == 1:
@@ -155,46 +136,29 @@ with st.spinner("⏳ Processando..."):
     #===========================================
         # --- Metas ---
         df_metas = pd.DataFrame(planilha_empresa.worksheet("Metas").get_all_records())
-        df_metas["Meta"] = df_metas["Meta"].apply(parse_valor)
+        df_metas["Meta"] = para_float_br(df_metas["Meta"]).fillna(0.0)
         df_metas["Loja"] = df_metas["Loja Vendas"].astype(str).str.strip().str.upper()
         df_metas["Grupo"] = df_metas["Grupo"].astype(str).str.strip().str.upper()
         df_metas = df_metas[df_metas["Loja"] != ""]
     
         # --- Realizado ---
-        df_anos = pd.DataFrame(planilha_empresa.worksheet("Fat Sistema Externo").get_all_records())
-        df_anos.columns = df_anos.columns.str.strip()
-        df_anos["Loja"] = df_anos["Loja"].astype(str).str.strip().str.upper()
-        df_anos["Grupo"] = df_anos["Grupo"].astype(str).str.strip().str.upper()
-        df_anos["Data"] = df_anos["Data"].apply(tratar_data)
-        df_anos = df_anos.dropna(subset=["Data"])
+        # cubo mensal: uma linha por loja/mês (Data = último dia com venda), Tipo incluso
+        df_anos = carregar_cubo_vendas("mes")
+        df_anos["Grupo"] = df_anos["Grupo"].str.upper()
+        df_anos["Tipo"] = df_anos["Tipo"].where(df_anos["Tipo"].isna(), df_anos["Tipo"].astype(str).str.strip().str.upper())
     
       
     
-        meses_map = {1: 'Jan', 2: 'Fev', 3: 'Mar', 4: 'Abr', 5: 'Mai', 6: 'Jun', 7: 'Jul', 8: 'Ago', 9: 'Set', 10: 'Out', 11: 'Nov', 12: 'Dez'}
-        df_anos["Mês"] = df_anos["Data"].dt.month.map(meses_map)
-        df_anos["Ano"] = df_anos["Data"].dt.year
-        df_anos["Fat.Total"] = df_anos["Fat.Total"].apply(parse_valor)
+        df_anos["Mês"] = nome_mes_pt(df_anos["Mês"], abreviado=True)
         
-        df_anos = df_anos.merge(df_empresa[["Loja", "Grupo", "Tipo"]], on=["Loja", "Grupo"], how="left")
         ano_atual = datetime.now().year
         from datetime import datetime
     
-        # Mapeamento de meses (sistema → abreviações)
-        mapa_meses = {
-            "janeiro": "Jan", "fevereiro": "Fev", "março": "Mar", "abril": "Abr",
-            "maio": "Mai", "junho": "Jun", "julho": "Jul", "agosto": "Ago",
-            "setembro": "Set", "outubro": "Out", "novembro": "Nov", "dezembro": "Dez"
-        }
-        
         # Lista de meses abreviados para o filtro
-        ordem_meses = list(mapa_meses.values())
-        
-        # Mês atual do sistema (em português) e mapeado
-        mes_extenso = datetime.now().strftime("%B").lower()  # ex: 'agosto'
-        mes_atual = mapa_meses.get(mes_extenso, "Jan")
+        ordem_meses = list(MESES_PT_ABREV)
         
-        # Evita erro caso algo dê errado
-        index_mes = ordem_meses.index(mes_atual) if mes_atual in ordem_meses else 0
+        # Mês atual (pelo número: não depende do locale do servidor)
+        index_mes = datetime.now().month - 1
     
         anos_disponiveis = sorted(df_anos["Ano"].unique())
     
@@ -470,15 +434,6 @@ with st.spinner("⏳ Processando..."):
         colunas_para_remover = ["Tipo", "% Falta Atingir"]
         dados_exportar_excel = dados_exibir.drop(columns=[col for col in colunas_para_remover if col in dados_exibir.columns])
         
-        output = io.BytesIO()
-    
-        # Alternância de cores entre grupos
-        cor_grupo1 = "#fff6eb"
-        cor_grupo2 = "#f8faec"
-        grupo_cores = {}
-        cor_atual = cor_grupo1
-        ultimo_grupo = None
-        
         # Remove colunas indesejadas
         dados_excel = dados_exibir.drop(columns=["Tipo", "% Falta Atingir", "eh_tipo"], errors="ignore")
         
@@ -486,127 +441,48 @@ with st.spinner("⏳ Processando..."):
         dados_excel = dados_excel.drop_duplicates(subset=["Loja"], keep="first")
         
         # Substitui NaN por string vazia
-        dados_excel = dados_excel.fillna("")
-        
-        with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-            dados_excel.to_excel(writer, index=False, sheet_name="Metas")
-            workbook = writer.book
-            worksheet = writer.sheets["Metas"]
-        
-            # Formatos
-            header_format = workbook.add_format({'bold': True, 'bg_color': '#0366d6', 'font_color': 'black', 'border': 1})
-            moeda_format_dict = {'num_format': 'R$ #,##0.00', 'border': 1}
-            percentual_format_dict = {'num_format': '0.00%', 'border': 1}
-            normal_format = workbook.add_format({'border': 1})
-        
-            estilos_especiais = {
-                "Faturamento Desejável": {'bg_color': '#FF6666', 'font_color': 'black', 'border': 1},
-                "TOTAL GERAL": {'bg_color': '#0366d6', 'font_color': 'black', 'border': 1},
-                "Tipo:": {'bg_color': '#FFE699', 'border': 1},
-                "Lojas:": {'bg_color': '#d0e6f7', 'border': 1},
-            }
-        
-           
-            
-            # Ajusta altura do cabeçalho
-            worksheet.set_row(0, 27)
-            
-            # Ajusta largura das colunas
-            worksheet.set_column('A:C', 7)
-            worksheet.set_column('D:D', 29)
-            worksheet.set_column('E:E', 15)
-            worksheet.set_column('F:F', 22)
-            worksheet.set_column('G:G', 10)
-            worksheet.set_column('H:H', 15)
-            
-            # Centraliza e formata o cabeçalho
-            center_format = workbook.add_format({
-                'align': 'center',
-                'valign': 'vcenter',
-                'bold': True,
-                'bg_color': '#0366d6',
-                'border': 1
-            })
-            for col_num, value in enumerate(dados_excel.columns):
-                worksheet.write(0, col_num, value, center_format)
-    
-               
-            linha_excel = 1
-            for _, row in dados_excel.iterrows():
-                    
-                loja_valor = str(row["Loja"])
-                grupo_valor = str(row["Grupo"])
-                atingido = row.get("% Atingido", "")
-        
-                # Alternância de cor por grupo
-                if grupo_valor != ultimo_grupo and "Lojas:" not in loja_valor and not loja_valor.startswith("Tipo:"):
-                    cor_atual = cor_grupo2 if cor_atual == cor_grupo1 else cor_grupo1
-                    ultimo_grupo = grupo_valor
-                grupo_cores[grupo_valor] = cor_atual
-        
-                # Estilo da linha
-                # Decide estilo conforme mesmo critério do Styler
-                if "FATURAMENTO DESEJÁVEL" in loja_valor.upper():
-                    estilo_linha = {'bg_color': '#FFE5E5', 'font_color': 'black', 'border': 1}
-                elif "TOTAL GERAL" in loja_valor.upper():
-                    estilo_linha = {'bg_color': '#cce7fc', 'font_color': 'black', 'border': 1}
-                elif "- LOJAS:" in loja_valor.upper() and not row["Grupo"]:
-                    estilo_linha = {'bg_color': '#f9f9f9', 'font_color': 'black', 'border': 1}  # subtotal tipo
-                elif "LOJAS:" in loja_valor.upper():
-                    estilo_linha = {'bg_color': '#e0e0e0', 'font_color': 'black', 'border': 1}  # subtotal grupo
-                else:
-                    estilo_linha = {'bg_color': '#ffffff', 'font_color': 'black', 'border': 1}  # loja normal
-    
-        
-                for col_num, col_name in enumerate(dados_excel.columns):
-                    val = row[col_name]
-                
-                    if col_name in ["Meta", f"Realizado até {ultima_data_realizado}", "Diferença"]:
-                        fmt = workbook.add_format({**estilo_linha, **moeda_format_dict})
-                
-                    elif col_name == "% Atingido":
-                        if "FATURAMENTO DESEJÁVEL" in loja_valor.upper():
-                            fmt = workbook.add_format({
-                                'bg_color': estilo_linha['bg_color'], 'font_color': 'black',
-                                'bold': True, 'num_format': '0.00%', 'border': 1
-                            })
-                        elif atingido >= percentual_meta_desejavel:
-                            fmt = workbook.add_format({
-                                'bg_color': estilo_linha['bg_color'], 'font_color': 'green',
-                                'bold': True, 'num_format': '0.00%', 'border': 1
-                            })
-                        else:
-                            fmt = workbook.add_format({
-                                'bg_color': estilo_linha['bg_color'], 'font_color': 'red',
-                                'bold': True, 'num_format': '0.00%', 'border': 1
-                            })
-                    else:
-                        # as demais colunas seguem o estilo da linha normalmente
-                        fmt = workbook.add_format(estilo_linha)
-                
-                    # Escreve a célula
-                    if isinstance(val, (int, float, np.integer, np.floating)) and not pd.isna(val):
-                        worksheet.write_number(linha_excel, col_num, val, fmt)
-                    else:
-                        worksheet.write(linha_excel, col_num, str(val), fmt)
-    
-                       
-        
-                       
-                    # Escreve a célula
-                    if isinstance(val, (int, float, np.integer, np.floating)) and not pd.isna(val):
-                        worksheet.write_number(linha_excel, col_num, val, fmt)
-                    else:
-                        worksheet.write(linha_excel, col_num, str(val), fmt)
-        
-                linha_excel += 1
-        
-        # Finaliza o arquivo e gera o botão de download
-        output.seek(0)
+        dados_excel = dados_excel.fillna("").reset_index(drop=True)
+        
+        # Estilo da linha — mesmo critério do Styler (o primeiro que bater vale)
+        loja_up = dados_excel["Loja"].astype(str).str.upper()
+        linha_desejavel = loja_up.str.contains("FATURAMENTO DESEJÁVEL", regex=False)
+        linha_total = ~linha_desejavel & loja_up.str.contains("TOTAL GERAL", regex=False)
+        linha_sub_tipo = (~linha_desejavel & ~linha_total & loja_up.str.contains("- LOJAS:", regex=False)
+                          & dados_excel["Grupo"].astype(str).eq(""))
+        linha_sub_grupo = ~linha_desejavel & ~linha_total & ~linha_sub_tipo & loja_up.str.contains("LOJAS:", regex=False)
+        
+        atingido = pd.to_numeric(dados_excel.get("% Atingido", pd.Series(index=dados_excel.index, dtype=float)), errors="coerce")
+        bateu_meta = atingido >= percentual_meta_desejavel
+        
+        colunas_moeda = ["Meta", f"Realizado até {ultima_data_realizado}", "Diferença"]
+        def gerar_excel():
+            return exportar_excel(
+                dados_excel, aba="Metas",
+                formato_base={'bg_color': '#ffffff', 'font_color': 'black', 'border': 1},
+                formatos_coluna={
+                    **{c: {'num_format': 'R$ #,##0.00'} for c in colunas_moeda},
+                    "% Atingido": {'num_format': '0.00%', 'bold': True},
+                },
+                regras=[
+                    (linha_desejavel, {'bg_color': '#FFE5E5'}),
+                    (linha_total, {'bg_color': '#cce7fc'}),
+                    (linha_sub_tipo, {'bg_color': '#f9f9f9'}),
+                    (linha_sub_grupo, {'bg_color': '#e0e0e0'}),
+                    (~linha_desejavel & bateu_meta, {'font_color': 'green'}, ["% Atingido"]),
+                    (~linha_desejavel & atingido.notna() & ~bateu_meta, {'font_color': 'red'}, ["% Atingido"]),
+                ],
+                formato_cabecalho={'align': 'center', 'valign': 'vcenter', 'bold': True,
+                                   'bg_color': '#0366d6', 'border': 1},
+                altura_cabecalho=27,
+                larguras={0: 7, 1: 7, 2: 7, 3: 29, 4: 15, 5: 22, 6: 10, 7: 15},
+            )
         
-        st.download_button(
+        # Gera o botão de download (o arquivo só é montado quando pedido)
+        botao_download(
             label="📥 Baixar Excel",
-            data=output,
+            gerar=gerar_excel,
+            dados=dados_excel,
+            opcoes=percentual_meta_desejavel,
             file_name=f"Relatorio_Metas_{ano_selecionado}_{mes_selecionado}.xlsx",
             mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             key=f"download_excel_{ano_selecionado}_{mes_selecionado}"
@@ -741,8 +617,8 @@ with st.spinner("⏳ Processando..."):
                 st.session_state.df_resultado = pd.DataFrame()
             st.session_state.nome_arquivo_carregado = uploaded_file.name
     
-            xls = pd.ExcelFile(uploaded_file)
-            todas_abas = xls.sheet_names
+            # cada aba é lida uma vez por arquivo (comum/leitura_excel): a prévia e o processamento reaproveitam a grade
+            todas_abas = abas_excel(uploaded_file)
     
             abas_escolhidas = st.multiselect(
                 "Selecione as abas a processar:",
@@ -755,7 +631,7 @@ with st.spinner("⏳ Processando..."):
     
             if abas_escolhidas:
                 aba_referencia = abas_escolhidas[0]
-                df_preview = pd.read_excel(xls, sheet_name=aba_referencia, header=None).copy()
+                df_preview = ler_aba(uploaded_file, aba_referencia)
                 df_preview.iloc[1, :] = df_preview.iloc[1, :].ffill()
     
                 linha_lojas = df_preview.iloc[1, :].astype(str).str.strip()
@@ -801,17 +677,12 @@ with st.spinner("⏳ Processando..."):
     
                 import re
     
-                mapa_meses = {
-                    "janeiro": "Jan", "fevereiro": "Fev", "março": "Mar", "abril": "Abr",
-                    "maio": "Mai", "junho": "Jun", "julho": "Jul", "agosto": "Ago",
-                    "setembro": "Set", "outubro": "Out", "novembro": "Nov", "dezembro": "Dez"
-                }
-                ordem_meses = ["Jan", "Fev", "Mar", "Abr", "Mai", "Jun", "Jul", "Ago", "Set", "Out", "Nov", "Dez"]
+                ordem_meses = list(MESES_PT_ABREV)
     
-                df_final = pd.DataFrame(columns=["Mês", "Ano", "Grupo", "Loja", "Meta"])
+                partes_final = []
     
                 for aba in abas_escolhidas:
-                    df_raw_original = pd.read_excel(xls, sheet_name=aba, header=None)
+                    df_raw_original = ler_aba(uploaded_file, aba)
                     df_raw_ffill = df_raw_original.copy()
                     
                     # Aplicar ffill apenas nas linhas de cabeçalho (0, 1 e 2)
@@ -845,35 +716,34 @@ with st.spinner("⏳ Processando..."):
                     
                         colunas_validas[col] = (loja, nome_coluna)
     
+                    # Linhas de mês (coluna B, só texto: "Janeiro".."Dezembro") x colunas válidas,
+                    # convertidas de uma vez em vez de célula a célula
                     linha_dados_inicio = 4
-                    for idx in range(linha_dados_inicio, len(df_raw_ffill)):
-                        celula_mes = df_raw_original.iloc[idx, 1]
-                        if pd.isna(celula_mes):
-                            continue
-                        mes_original = str(celula_mes).strip().lower().replace("marco", "março")
-                        if mes_original in ["", "-", "nan", "total"]:
-                            continue
-                        if mes_original not in mapa_meses:
+                    corpo = df_raw_ffill.iloc[linha_dados_inicio:]
+                    celulas_mes = df_raw_original.iloc[linha_dados_inicio:, 1]
+                    celulas_mes = celulas_mes.where(celulas_mes.map(lambda v: isinstance(v, str)))
+                    num_mes = numero_mes_pt(celulas_mes)
+                    corpo = corpo[num_mes.notna().to_numpy()]
+                    meses_aba = nome_mes_pt(num_mes.dropna(), abreviado=True).to_numpy()
+    
+                    for col, (loja, nome_coluna) in colunas_validas.items():
+                        valores = para_float_br(corpo.iloc[:, col]).to_numpy()
+                        ok = ~pd.isna(valores)
+                        if not ok.any():
                             continue
-                        mes = mapa_meses[mes_original]
-    
-                        for col, (loja, nome_coluna) in colunas_validas.items():
-                            valor = df_raw_ffill.iloc[idx, col]
-                            if pd.isna(valor) or str(valor).strip() in ["", "-", "nan"]:
-                                continue
-                            if isinstance(valor, str):
-                                valor = valor.replace('R$', '').replace('.', '').replace(',', '.').strip()
-                                try:
-                                    valor = float(valor)
-                                except:
-                                    continue
-    
-                            match_ano = re.search(r"(20\d{2})", nome_coluna)
-                            ano = int(match_ano.group(1)) if match_ano else None
-    
-                            linha = {"Mês": mes, "Ano": ano, "Grupo": grupo, "Loja": loja, "Meta": valor}
-                            df_final = pd.concat([df_final, pd.DataFrame([linha])], ignore_index=True)
-    
+                        match_ano = re.search(r"(20\d{2})", nome_coluna)
+                        partes_final.append(pd.DataFrame({
+                            "Mês": meses_aba[ok],
+                            "Ano": int(match_ano.group(1)) if match_ano else None,
+                            "Grupo": grupo,
+                            "Loja": loja,
+                            "Meta": valores[ok],
+                        }))
+    
+                df_final = (
+                    pd.concat(partes_final, ignore_index=True) if partes_final
+                    else pd.DataFrame(columns=["Mês", "Ano", "Grupo", "Loja", "Meta"])
+                )
                 df_final = df_final.drop_duplicates()
     
                 if not df_final.empty and colunas_escolhidas_nomes:
@@ -897,12 +767,13 @@ with st.spinner("⏳ Processando..."):
                     else:
                         st.success("✅ Dados consolidados")
                         st.dataframe(st.session_state.df_resultado)
-                        excel_file = formatar_excel_contabil(df_final)
-                        st.download_button(
+                        botao_download(
                             label="📅 Baixar Excel (.xlsx)",
-                            data=excel_file,
+                            gerar=lambda: formatar_excel_contabil(df_final),
+                            dados=df_final,
                             file_name="metas_consolidado.xlsx",
-                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                            key="dl_metas_consolidado",
                         )
     
                 if not abas_escolhidas:
@@ -9,9 +9,6 @@ from datetime import datetime
 import gspread
 from oauth2client.service_account import ServiceAccountCredentials
 import json
-from openpyxl import load_workbook
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
-from openpyxl.utils import get_column_letter
 from reportlab.lib.pagesizes import A4
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image as RLImg
 from reportlab.lib import colors
@@ -19,6 +16,70 @@ from reportlab.lib.styles import getSampleStyleSheet
 import pytz
 import io
 
+from comum.fat_externo import carregar_fat_externo
+from comum.tabela_empresa import carregar_tabela_empresa
+from comum.conversao import float_br
+from comum.downloads import botao_download
+from comum.exportar_excel import exportar_excel
+
+# ===== Excel (cabeçalho azul, bordas, TOTAL/Subtotal destacados pela coluna B) =====
+def excel_relatorio(df_excel: pd.DataFrame, formatos_coluna: dict, colunas_esquerda) -> BytesIO:
+    df_excel = df_excel.reset_index(drop=True)
+    col_b = df_excel.iloc[:, 1]
+    texto_b = col_b.where(col_b.map(lambda v: isinstance(v, str)), "").str.strip().str.upper()
+    linha_total = texto_b.eq("TOTAL")
+    linha_subtotal = ~linha_total & texto_b.str.contains("SUBTOTAL", regex=False)
+    return exportar_excel(
+        df_excel, aba="Relatório",
+        formato_base={"border": 1, "align": "center", "valign": "vcenter", "text_wrap": True},
+        formatos_coluna={**formatos_coluna, **{c: {"align": "left"} for c in colunas_esquerda}},
+        regras=[
+            (linha_total, {"bg_color": "#F4B084"}),
+            (linha_subtotal, {"bg_color": "#D9D9D9"}),
+        ],
+        formato_cabecalho={"bold": True, "font_color": "#FFFFFF", "bg_color": "#305496", "border": 1,
+                           "align": "center", "valign": "vcenter", "text_wrap": True},
+        larguras="auto",
+    )
+
+# ===== PDF (logo, usuário, data de geração e a tabela da tela) =====
+def pdf_relatorio(df_view: pd.DataFrame, titulo: str, usuario: str) -> bytes:
+    buf = io.BytesIO()
+    doc = SimpleDocTemplate(buf, pagesize=A4, topMargin=30, bottomMargin=30, leftMargin=20, rightMargin=20)
+    elems = []; estilos = getSampleStyleSheet(); normal = estilos["Normal"]; h1 = estilos["Heading1"]
+    try:
+        logo_url = "https://raw.githubusercontent.com/MMRConsultoria/mmr-site/main/logo_grupofit.png"
+        img = RLImg(logo_url, width=100, height=40); elems.append(img)
+    except: pass
+    elems.append(Paragraph(f"<b>{titulo}</b>", h1))
+    fuso = pytz.timezone("America/Sao_Paulo")
+    data_ger = datetime.now(fuso).strftime("%d/%m/%Y %H:%M")
+    elems.append(Paragraph(f"<b>Usuário:</b> {usuario}", normal))
+    elems.append(Paragraph(f"<b>Data de Geração:</b> {data_ger}", normal)); elems.append(Spacer(1,12))
+    dados = [df_view.columns.tolist()] + df_view.values.tolist()
+    tabela = Table(dados, repeatRows=1)
+    estilo = [
+        ("BACKGROUND",(0,0),(-1,0),colors.HexColor("#003366")),
+        ("TEXTCOLOR",(0,0),(-1,0),colors.white),
+        ("ALIGN",(1,1),(-1,-1),"CENTER"),
+        ("ALIGN",(0,0),(0,-1),"LEFT"),
+        ("FONTNAME",(0,0),(-1,0),"Helvetica-Bold"),
+        ("FONTSIZE",(0,0),(-1,-1),8),
+        ("BOTTOMPADDING",(0,0),(-1,0),8),
+        ("GRID",(0,0),(-1,-1),0.25,colors.grey),
+    ]
+    # um único TableStyle com os comandos de todas as linhas
+    for i in range(1, len(dados)):
+        txt = str(dados[i][1]).strip().lower() if len(dados[i])>1 else ""
+        if "subtotal" in txt or txt == "total":
+            estilo += [("BACKGROUND",(0,i),(-1,i),colors.HexColor("#BFBFBF")),
+                       ("FONTNAME",(0,i),(-1,i),"Helvetica-Bold")]
+        else:
+            estilo.append(("BACKGROUND",(0,i),(-1,i),colors.HexColor("#F2F2F2")))
+    tabela.setStyle(TableStyle(estilo))
+    elems.append(tabela); doc.build(elems)
+    return buf.getvalue()
+
 # 🔒 Bloqueio de acesso
 if not st.session_state.get("acesso_liberado"):
     st.stop()
@@ -61,8 +122,8 @@ with st.spinner("⏳ Processando..."):
     gc = gspread.authorize(credentials)
     planilha = gc.open("Vendas diarias")
 
-    df_empresa = pd.DataFrame(planilha.worksheet("Tabela Empresa").get_all_records())
-    df_vendas  = pd.DataFrame(planilha.worksheet("Fat Sistema Externo").get_all_records())
+    df_empresa = carregar_tabela_empresa()
+    df_vendas  = carregar_fat_externo()  # espelho local já tipado
 
     # Normalização comum
     df_empresa.columns = df_empresa.columns.str.strip()
@@ -71,8 +132,6 @@ with st.spinner("⏳ Processando..."):
         df_empresa["Loja"] = df_empresa["Loja"].astype(str).str.strip().str.upper()
     if "Grupo" in df_empresa.columns:
         df_empresa["Grupo"] = df_empresa["Grupo"].astype(str).str.strip()
-    if "Data" in df_vendas.columns:
-        df_vendas["Data"] = pd.to_datetime(df_vendas["Data"], dayfirst=True, errors="coerce")
     if "Loja" in df_vendas.columns:
         df_vendas["Loja"] = df_vendas["Loja"].astype(str).str.strip().str.upper()
     if "Grupo" in df_vendas.columns:
@@ -85,16 +144,7 @@ with st.spinner("⏳ Processando..."):
 
     # Converter Fat.Total para número
     if "Fat.Total" in df_vendas.columns:
-        df_vendas["Fat.Total"] = (
-            df_vendas["Fat.Total"].astype(str)
-            .str.replace("R$", "", regex=False)
-            .str.replace("(", "-", regex=False)
-            .str.replace(")", "", regex=False)
-            .str.replace(" ", "", regex=False)
-            .str.replace(".", "", regex=False)
-            .str.replace(",", ".", regex=False)
-        )
-        df_vendas["Fat.Total"] = pd.to_numeric(df_vendas["Fat.Total"], errors="coerce").fillna(0.0)
+        df_vendas["Fat.Total"] = df_vendas["Fat.Total"].fillna(0.0)
     else:
         df_vendas["Fat.Total"] = 0.0
 
@@ -216,10 +266,6 @@ with st.spinner("⏳ Processando..."):
         df_fin["Rateio"] = 0.0
 
         if grupo_sel == "Todos":
-            def moeda_para_float(s: str) -> float:
-                try: return float(s.replace(".", "").replace(",", "."))
-                except: return 0.0
-
             tipos_unicos = [t for t in df_fin["Tipo"].dropna().unique()
                             if str(t).strip() not in ["", "TOTAL"] and not str(t).startswith("Subtotal")]
             valores_rateio = {}
@@ -230,7 +276,7 @@ with st.spinner("⏳ Processando..."):
                 for c, t in zip(cols, linha):
                     with c:
                         valor_str = st.text_input(f"💰 Rateio — {t}", value="0,00", key=f"rateio_{t}_fat")
-                        valores_rateio[t] = moeda_para_float(valor_str)
+                        valores_rateio[t] = float_br(valor_str)
 
             for t in df_fin["Tipo"].unique():
                 mask = ((df_fin["Tipo"] == t) &
@@ -294,48 +340,14 @@ with st.spinner("⏳ Processando..."):
         df_excel = df_fin.copy()
         if "% Total" in df_excel.columns:
             df_excel["% Total"] = pd.to_numeric(df_excel["% Total"], errors="coerce") / 100
-        out = BytesIO()
-        with pd.ExcelWriter(out, engine="openpyxl") as writer:
-            df_excel.to_excel(writer, index=False, sheet_name="Relatório")
-        out.seek(0)
-        wb = load_workbook(out); ws = wb["Relatório"]
-
-        header_font = Font(bold=True, color="FFFFFF")
-        header_fill = PatternFill("solid", fgColor="305496")
-        center_alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-        border = Border(left=Side(style="thin"), right=Side(style="thin"), top=Side(style="thin"), bottom=Side(style="thin"))
-
-        for cell in ws[1]:
-            cell.font = header_font; cell.fill = header_fill
-            cell.alignment = center_alignment; cell.border = border
-
-        for row in ws.iter_rows(min_row=2, max_row=ws.max_row, max_col=ws.max_column):
-            grupo_val = None
-            try: grupo_val = row[1].value
-            except: pass
-            estilo_fundo = None
-            if isinstance(grupo_val, str):
-                if grupo_val.strip().upper() == "TOTAL": estilo_fundo = PatternFill("solid", fgColor="F4B084")
-                elif "SUBTOTAL" in grupo_val.strip().upper(): estilo_fundo = PatternFill("solid", fgColor="D9D9D9")
-            for cell in row:
-                cell.border = border; cell.alignment = center_alignment
-                if estilo_fundo: cell.fill = estilo_fundo
-                col_name = ws.cell(row=1, column=cell.column).value
-                if isinstance(cell.value, (int,float)):
-                    cell.number_format = '0.00%' if col_name == "% Total" else '"R$" #,##0.00'
-
-        for i, col_cells in enumerate(ws.iter_cols(min_row=1, max_row=ws.max_row), start=1):
-            max_len = max((len(str(c.value)) for c in col_cells if c.value), default=0)
-            ws.column_dimensions[get_column_letter(i)].width = max_len + 2
-
-        for col_nome in ["Tipo","Grupo","Loja"]:
-            if col_nome in df_excel.columns:
-                col_idx = df_excel.columns.get_loc(col_nome) + 1
-                for cell in ws.iter_rows(min_row=2, min_col=col_idx, max_col=col_idx):
-                    for c in cell: c.alignment = Alignment(horizontal="left")
-
-        out_final = BytesIO(); wb.save(out_final); out_final.seek(0)
-        st.download_button("📥 Baixar Excel", data=out_final,
+        colunas_num = [c for c in df_excel.columns if pd.api.types.is_numeric_dtype(df_excel[c])]
+        botao_download("📥 Baixar Excel",
+                           gerar=lambda: excel_relatorio(
+                               df_excel,
+                               {c: {"num_format": "0.00%" if c == "% Total" else '"R$" #,##0.00'} for c in colunas_num},
+                               [c for c in ["Tipo", "Grupo", "Loja"] if c in df_excel.columns],
+                           ),
+                           dados=df_excel,
                            file_name="Resumo_%Faturamento.xlsx",
                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                            key="dl_excel_fat")
@@ -348,42 +360,11 @@ with st.spinner("⏳ Processando..."):
         elif len(sele) == 2: mes_rateio = f"{sele[0]} e {sele[1]}"
         else: mes_rateio = f"{', '.join(sele[:-1])} e {sele[-1]}"
 
-        buf = io.BytesIO()
-        doc = SimpleDocTemplate(buf, pagesize=A4, topMargin=30, bottomMargin=30, leftMargin=20, rightMargin=20)
-        elems = []; estilos = getSampleStyleSheet(); normal = estilos["Normal"]; h1 = estilos["Heading1"]
-        try:
-            logo_url = "https://raw.githubusercontent.com/MMRConsultoria/mmr-site/main/logo_grupofit.png"
-            img = RLImg(logo_url, width=100, height=40); elems.append(img)
-        except: pass
-        elems.append(Paragraph(f"<b>Rateio - {mes_rateio}</b>", h1))
-        fuso = pytz.timezone("America/Sao_Paulo")
-        data_ger = datetime.now(fuso).strftime("%d/%m/%Y %H:%M")
-        elems.append(Paragraph(f"<b>Usuário:</b> {usuario}", normal))
-        elems.append(Paragraph(f"<b>Data de Geração:</b> {data_ger}", normal)); elems.append(Spacer(1,12))
-        dados = [df_view.columns.tolist()] + df_view.values.tolist()
-        tabela = Table(dados, repeatRows=1)
-        tabela.setStyle(TableStyle([
-            ("BACKGROUND",(0,0),(-1,0),colors.HexColor("#003366")),
-            ("TEXTCOLOR",(0,0),(-1,0),colors.white),
-            ("ALIGN",(1,1),(-1,-1),"CENTER"),
-            ("ALIGN",(0,0),(0,-1),"LEFT"),
-            ("FONTNAME",(0,0),(-1,0),"Helvetica-Bold"),
-            ("FONTSIZE",(0,0),(-1,-1),8),
-            ("BOTTOMPADDING",(0,0),(-1,0),8),
-            ("GRID",(0,0),(-1,-1),0.25,colors.grey),
-        ]))
-        for i in range(1, len(dados)):
-            txt = str(dados[i][1]).strip().lower() if len(dados[i])>1 else ""
-            if "subtotal" in txt or txt == "total":
-                tabela.setStyle(TableStyle([("BACKGROUND",(0,i),(-1,i),colors.HexColor("#BFBFBF")),
-                                            ("FONTNAME",(0,i),(-1,i),"Helvetica-Bold")]))
-            else:
-                tabela.setStyle(TableStyle([("BACKGROUND",(0,i),(-1,i),colors.HexColor("#F2F2F2"))]))
-        elems.append(tabela); doc.build(elems)
-        pdf_bytes = buf.getvalue(); buf.close()
-        st.download_button("📄 Baixar PDF", data=pdf_bytes,
-                           file_name=f"Rateio_%Faturamento_{datetime.now().strftime('%Y%m%d')}.pdf",
-                           mime="application/pdf", key="dl_pdf_fat")
+        botao_download("📄 Baixar PDF",
+                       gerar=lambda: pdf_relatorio(df_view, f"Rateio - {mes_rateio}", usuario),
+                       dados=df_view, opcoes=(mes_rateio, usuario),
+                       file_name=f"Rateio_%Faturamento_{datetime.now().strftime('%Y%m%d')}.pdf",
+                       mime="application/pdf", key="dl_pdf_fat")
 
 
     # ----------------------------------------------------------------------
@@ -447,19 +428,12 @@ with st.spinner("⏳ Processando..."):
             }
             return mapa.get(s2, None)
     
-        def to_float(x):
-            s = str(x or "").strip().replace(".", "").replace(",", ".")
-            try:
-                return float(s)
-            except:
-                return 0.0
-    
         reg = []
         for r in data_rows:
             mes = parse_mes_num(r[i_mes] if len(r) > i_mes else "")
             ano = str(r[i_ano] if len(r) > i_ano else "").strip()
             grp = str(r[i_grp] if len(r) > i_grp else "").strip().upper()
-            fun = to_float(r[i_func] if len(r) > i_func else "")
+            fun = float_br(r[i_func] if len(r) > i_func else "")
             if mes and ano and grp:
                 reg.append({"Mes/Ano": f"{mes:02d}/{ano}", "Grupo": grp, "Funcionarios": fun})
     
@@ -605,15 +579,7 @@ with st.spinner("⏳ Processando..."):
                 key="rateio_total_vol_str"
             )
         
-        def moeda_ptbr_to_float(s: str) -> float:
-            s = str(s or "").strip()
-            s = s.replace("R$", "").replace(" ", "").replace(".", "").replace(",", ".")
-            try:
-                return float(s)
-            except:
-                return 0.0
-        
-        total_rateio = moeda_ptbr_to_float(valor_str)
+        total_rateio = float_br(valor_str)
         
         # >>> Rateio per capita: (total_rateio ÷ total_funcionarios) × funcionarios_do_grupo
         mask_regular = (
@@ -696,64 +662,13 @@ with st.spinner("⏳ Processando..."):
             ["Tipo", "Grupo", "Funcionários", "Despesa", "Rateio"]
         ].copy()
         
-        out = BytesIO()
-        with pd.ExcelWriter(out, engine="openpyxl") as writer:
-            df_excel.to_excel(writer, index=False, sheet_name="Relatório")
-        out.seek(0)
-        wb = load_workbook(out); ws = wb["Relatório"]
-        
-        # (deixe a parte de formatação igual: cabeçalho azul, bordas, auto-width etc.)
-        # Só garanta que a formatação numérica fique assim:
-        # - Funcionários: '#,##0'
-        # - Rateio: '"R$" #,##0.00'
-
-        
-        header_font = Font(bold=True, color="FFFFFF")
-        header_fill = PatternFill("solid", fgColor="305496")
-        center_alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-        border = Border(left=Side(style="thin"), right=Side(style="thin"), top=Side(style="thin"), bottom=Side(style="thin"))
-        
-        for cell in ws[1]:
-            cell.font = header_font; cell.fill = header_fill
-            cell.alignment = center_alignment; cell.border = border
-        
-        for row in ws.iter_rows(min_row=2, max_row=ws.max_row, max_col=ws.max_column):
-            try:
-                grupo_val = row[1].value  # col B = Grupo
-            except:
-                grupo_val = None
-            estilo_fundo = None
-            if isinstance(grupo_val, str):
-                if grupo_val.strip().upper() == "TOTAL":
-                    estilo_fundo = PatternFill("solid", fgColor="F4B084")
-                elif "SUBTOTAL" in grupo_val.strip().upper():
-                    estilo_fundo = PatternFill("solid", fgColor="D9D9D9")
-        
-            for cell in row:
-                cell.border = border; cell.alignment = center_alignment
-                if estilo_fundo: cell.fill = estilo_fundo
-                # formatos: Funcionários = inteiro; Rateio = moeda R$
-                col_name = ws.cell(row=1, column=cell.column).value
-                if isinstance(cell.value, (int,float)):
-                    if col_name == "Rateio":
-                        cell.number_format = '"R$" #,##0.00'
-                    elif col_name == "Funcionários":
-                        cell.number_format = '#,##0'
-        
-        # auto width
-        for i, col_cells in enumerate(ws.iter_cols(min_row=1, max_row=ws.max_row), start=1):
-            max_len = max((len(str(c.value)) for c in col_cells if c.value), default=0)
-            ws.column_dimensions[get_column_letter(i)].width = max_len + 2
-        
-        # alinha textos à esquerda
-        for col_nome in ["Tipo","Grupo"]:
-            if col_nome in df_excel.columns:
-                col_idx = df_excel.columns.get_loc(col_nome) + 1
-                for cell in ws.iter_rows(min_row=2, min_col=col_idx, max_col=col_idx):
-                    for c in cell: c.alignment = Alignment(horizontal="left")
-        
-        out_final = BytesIO(); wb.save(out_final); out_final.seek(0)
-        st.download_button("📥 Baixar Excel", data=out_final,
+        botao_download("📥 Baixar Excel",
+                           gerar=lambda: excel_relatorio(
+                               df_excel,
+                               {"Rateio": {"num_format": '"R$" #,##0.00'}, "Funcionários": {"num_format": "#,##0"}},
+                               ["Tipo", "Grupo"],
+                           ),
+                           dados=df_excel,
                            file_name="Resumo_Volumetria.xlsx",
                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                            key="dl_excel_vol")
@@ -767,40 +682,8 @@ with st.spinner("⏳ Processando..."):
         elif len(sele) == 2: mes_lbl = f"{sele[0]} e {sele[1]}"
         else: mes_lbl = f"{', '.join(sele[:-1])} e {sele[-1]}"
     
-        buf = io.BytesIO()
-        doc = SimpleDocTemplate(buf, pagesize=A4, topMargin=30, bottomMargin=30, leftMargin=20, rightMargin=20)
-        elems = []; estilos = getSampleStyleSheet(); normal = estilos["Normal"]; h1 = estilos["Heading1"]
-        try:
-            logo_url = "https://raw.githubusercontent.com/MMRConsultoria/mmr-site/main/logo_grupofit.png"
-            img = RLImg(logo_url, width=100, height=40); elems.append(img)
-        except: pass
-        elems.append(Paragraph(f"<b>Volumetria por Funcionários - {mes_lbl}</b>", h1))
-        fuso = pytz.timezone("America/Sao_Paulo")
-        data_ger = datetime.now(fuso).strftime("%d/%m/%Y %H:%M")
-        elems.append(Paragraph(f"<b>Usuário:</b> {usuario}", normal))
-        elems.append(Paragraph(f"<b>Data de Geração:</b> {data_ger}", normal)); elems.append(Spacer(1,12))
-    
-        dados = [df_view.columns.tolist()] + df_view.values.tolist()
-        tabela = Table(dados, repeatRows=1)
-        tabela.setStyle(TableStyle([
-            ("BACKGROUND",(0,0),(-1,0),colors.HexColor("#003366")),
-            ("TEXTCOLOR",(0,0),(-1,0),colors.white),
-            ("ALIGN",(1,1),(-1,-1),"CENTER"),
-            ("ALIGN",(0,0),(0,-1),"LEFT"),
-            ("FONTNAME",(0,0),(-1,0),"Helvetica-Bold"),
-            ("FONTSIZE",(0,0),(-1,-1),8),
-            ("BOTTOMPADDING",(0,0),(-1,0),8),
-            ("GRID",(0,0),(-1,-1),0.25,colors.grey),
-        ]))
-        for i in range(1, len(dados)):
-            txt = str(dados[i][1]).strip().lower() if len(dados[i])>1 else ""
-            if "subtotal" in txt or txt == "total":
-                tabela.setStyle(TableStyle([("BACKGROUND",(0,i),(-1,i),colors.HexColor("#BFBFBF")),
-                                            ("FONTNAME",(0,i),(-1,i),"Helvetica-Bold")]))
-            else:
-                tabela.setStyle(TableStyle([("BACKGROUND",(0,i),(-1,i),colors.HexColor("#F2F2F2"))]))
-        elems.append(tabela); doc.build(elems)
-        pdf_bytes = buf.getvalue(); buf.close()
-        st.download_button("📄 Baixar PDF", data=pdf_bytes,
-                            file_name=f"Volumetria_{datetime.now().strftime('%Y%m%d')}.pdf",
-                            mime="application/pdf", key="dl_pdf_vol")
+        botao_download("📄 Baixar PDF",
+                       gerar=lambda: pdf_relatorio(df_view, f"Volumetria por Funcionários - {mes_lbl}", usuario),
+                       dados=df_view, opcoes=(mes_lbl, usuario),
+                       file_name=f"Volumetria_{datetime.now().strftime('%Y%m%d')}.pdf",
+                       mime="application/pdf", key="dl_pdf_vol")
@@ -7,6 +7,11 @@ from io import BytesIO
 import gspread
 from oauth2client.service_account import ServiceAccountCredentials
 
+from comum.tabela_empresa import carregar_tabela_empresa
+from comum.exportar_excel import exportar_excel
+from comum.cota_sheets import chamar
+from comum.edicoes_sheets import instantaneo, planejar_gravacao
+
 st.set_page_config(
     page_title="Relatórios Caixa e Sangria",
     page_icon="📊",
@@ -36,8 +41,7 @@ with st.spinner("⏳ Carregando dados..."):
     planilha_empresa = gc.open("Vendas diarias")
 
     # Tabela Empresa (para mapear Grupo/Loja/Tipo/PDV etc.)
-    df_empresa = pd.DataFrame(planilha_empresa.worksheet("Tabela Empresa").get_all_records())
-    df_empresa.columns = [str(c).strip() for c in df_empresa.columns]
+    df_empresa = carregar_tabela_empresa()
     # ================================
     # 2. Configuração inicial do app
     # ================================
@@ -632,15 +636,6 @@ with sub_caixa:
                 import re
                 from streamlit import column_config as cc
                 
-                # Import robusto do Cell (funciona em várias versões do gspread)
-                try:
-                    from gspread.cell import Cell          # gspread >= 5.x
-                except Exception:
-                    try:
-                        from gspread.models import Cell    # versões antigas
-                    except Exception:
-                        Cell = None  # sem Cell → usamos fallback célula a célula
-                
                 def _excel_col_letter(idx_zero_based: int) -> str:
                     n = idx_zero_based + 1
                     s = ""
@@ -752,17 +747,6 @@ with sub_caixa:
                 # helpers p/ sheets
                 WS_SISTEMA = "Sangria"  # ⬅️ ajuste se necessário
         
-                def _sheet_df_with_row(ws):
-                    vals = ws.get_all_values()
-                    if not vals:
-                        return pd.DataFrame(), {}
-                    header = vals[0]
-                    rows = vals[1:]
-                    df_ws = pd.DataFrame(rows, columns=header)
-                    df_ws["_row"] = (df_ws.index + 2).astype(int)  # linha real no Sheets
-                    col_map = {c: i + 1 for i, c in enumerate(header)}  # coluna -> índice 1-based
-                    return df_ws, col_map
-        
                 def _desc_options_flex(fallback_df: pd.DataFrame) -> list[str]:
                     try:
                         base_opts = set(df_descricoes["Descrição Agrupada"].astype(str).dropna().unique())
@@ -790,6 +774,78 @@ with sub_caixa:
                             return orig
                     return None
         
+                # ====================== gravação das edições ======================
+                def _tela_anterior(nome, audit_raw, obs_col):
+                    """
+                    Instantâneo (por Duplicidade) de Descrição Agrupada / Observação como a
+                    tela estava antes deste run. O submit do form roda a página de novo e
+                    relê a aba, então o que o usuário viu é o que o run anterior guardou.
+                    """
+                    chave = f"tela_{nome}_{st.session_state['rev_desc']}"
+                    atual = instantaneo(audit_raw, ["Descrição Agrupada", obs_col])
+                    anterior = st.session_state.get(chave, atual)
+                    st.session_state[chave] = atual
+                    return anterior
+
+                def _salvar_edicoes(audit_raw, antes_desc, depois_desc, antes_obs, depois_obs, mask_changed, obs_col, tela):
+                    """
+                    Grava as edições (Descrição Agrupada / Observação) num único batch_update.
+
+                    A aba é relida agora (get_all_values) e comparada com `tela`, o que o
+                    usuário tinha na tela ao editar; só vão as colunas que ele mudou. Célula
+                    que outra pessoa alterou depois disso fica de fora e volta em 'conflitos'.
+                    None se a aba não tem a coluna Duplicidade.
+                    """
+                    ws_sys = planilha_empresa.worksheet(WS_SISTEMA)
+                    valores = chamar(ws_sys.get_all_values)
+                    if not valores:
+                        return None
+
+                    # nome na tela -> nome no Sheets (Observação pode vir grafada diferente)
+                    nomes = {"Descrição Agrupada": "Descrição Agrupada"}
+                    obs_sheet_name = _find_col(valores[0])
+                    if obs_col and obs_sheet_name:
+                        nomes[obs_col] = obs_sheet_name
+                    campos = [("Descrição Agrupada", antes_desc, depois_desc)]
+                    if obs_col in nomes:
+                        campos.append((obs_col, antes_obs, depois_obs))
+
+                    keys = audit_raw["Duplicidade"].astype(str).reset_index(drop=True)
+                    edicoes = [
+                        (keys.iloc[i], nomes[c], depois.iloc[i])
+                        for i in mask_changed[mask_changed].index
+                        for c, antes, depois in campos
+                        if antes.iloc[i] != depois.iloc[i]
+                    ]
+                    tela = {k: {nomes[c]: v for c, v in cols.items() if c in nomes} for k, cols in tela.items()}
+                    plano = planejar_gravacao(valores, edicoes, tela)
+                    if plano is None:
+                        return None
+                    celulas, conflitos = plano
+
+                    if celulas:
+                        chamar(
+                            ws_sys.batch_update,
+                            [{"range": f"{_excel_col_letter(c - 1)}{r}", "values": [[v]]} for (r, c), v in celulas.items()],
+                            value_input_option="USER_ENTERED",
+                            escrita=True,
+                        )
+                    return {"gravadas": len(celulas), "conflitos": pd.DataFrame(conflitos)}
+
+                def _informar_gravacao(resumo, rotulo):
+                    if resumo is None:
+                        st.error("A aba do Sheets precisa ter a coluna 'Duplicidade'.")
+                        return
+                    st.session_state["rev_desc"] += 1
+                    if resumo["conflitos"].empty:
+                        st.success(f"Alterações salvas ({rotulo}).")
+                        st.rerun()
+                    st.warning(
+                        f"⚠️ {resumo['gravadas']} célula(s) salvas ({rotulo}); {len(resumo['conflitos'])} não foram gravadas "
+                        "porque mudaram no Google Sheets depois que a tela foi carregada. Recarregue e refaça:"
+                    )
+                    st.dataframe(resumo["conflitos"], use_container_width=True, hide_index=True)
+
                 # ====================== EXPANDERS (com edição) ======================
                 # -------- INCLUÍDOS --------
                 with st.expander("Sangria(Colibri/CISS)"):
@@ -837,6 +893,8 @@ with sub_caixa:
                     if "Data" in audit_in_view.columns:
                         col_cfg_in["Data"] = cc.DateColumn(label="Data", format="DD/MM/YYYY", disabled=True)
         
+                    tela_in = _tela_anterior("incluidos", audit_in_raw, obs_col_in)
+
                     with st.form("form_editar_desc_incluidos", clear_on_submit=False):
                         edited_in_view = st.data_editor(
                             audit_in_view,
@@ -865,51 +923,8 @@ with sub_caixa:
                             if not mask_changed.any():
                                 st.success("Nada para atualizar — nenhuma alteração em incluídos.")
                             else:
-                                ws_sys = planilha_empresa.worksheet(WS_SISTEMA)
-                                df_ws, col_map = _sheet_df_with_row(ws_sys)
-                                if "Duplicidade" not in df_ws.columns:
-                                    st.error("A aba do Sheets precisa ter a coluna 'Duplicidade'.")
-                                else:
-                                    df_ws["Duplicidade"] = df_ws["Duplicidade"].astype(str)
-                                    col_idx_desc = col_map.get("Descrição Agrupada")
-                                    obs_sheet_name = _find_col(col_map.keys())
-                                    col_idx_obs = col_map.get(obs_sheet_name) if obs_sheet_name else None
-        
-                                    keys = audit_in_raw["Duplicidade"].astype(str).reset_index(drop=True)
-        
-                                    for i in mask_changed[mask_changed].index:
-                                        dup_key   = keys.iloc[i]
-                                        nova_desc = depois_desc.iloc[i].strip()
-                                        nova_obs  = depois_obs.iloc[i].strip()
-        
-                                        hits = df_ws.index[df_ws["Duplicidade"] == dup_key].tolist()
-                                        if not hits:
-                                            continue
-        
-                                        updates = []
-                                        for h in hits:
-                                            row_num = int(df_ws.loc[h, "_row"])
-                                            if Cell is not None:
-                                                if col_idx_desc:
-                                                    updates.append(Cell(row=row_num, col=col_idx_desc, value=nova_desc))
-                                                if col_idx_obs is not None:
-                                                    updates.append(Cell(row=row_num, col=col_idx_obs,  value=nova_obs))
-                                            else:
-                                                if col_idx_desc:
-                                                    updates.append((row_num, col_idx_desc, nova_desc))
-                                                if col_idx_obs is not None:
-                                                    updates.append((row_num, col_idx_obs,  nova_obs))
-                                        if updates:
-                                            if Cell is not None:
-                                                ws_sys.update_cells(updates, value_input_option="USER_ENTERED")
-                                            else:
-                                                for row_num, col_idx, value in updates:
-                                                    a1 = f"{_excel_col_letter(col_idx-1)}{row_num}"
-                                                    ws_sys.update(a1, value, value_input_option="USER_ENTERED")
-        
-                                st.success("Alterações salvas (incluídos).")
-                                st.session_state["rev_desc"] += 1
-                                st.rerun()
+                                resumo = _salvar_edicoes(audit_in_raw, antes_desc, depois_desc, antes_obs, depois_obs, mask_changed, obs_col_in, tela_in)
+                                _informar_gravacao(resumo, "incluídos")
         
                         except Exception as e:
                             st.error(f"Falha ao atualizar (incluídos): {type(e).__name__}: {e}")
@@ -955,6 +970,8 @@ with sub_caixa:
                             disabled=False,
                         )
         
+                    tela_out = _tela_anterior("removidos", audit_out_raw, obs_col_out)
+
                     with st.form("form_editar_desc_removidos", clear_on_submit=False):
                         edited_out_view = st.data_editor(
                             audit_out_view,
@@ -982,51 +999,8 @@ with sub_caixa:
                             if not mask_changed.any():
                                 st.success("Nada para atualizar — nenhuma alteração em removidos.")
                             else:
-                                ws_sys = planilha_empresa.worksheet(WS_SISTEMA)
-                                df_ws, col_map = _sheet_df_with_row(ws_sys)
-                                if "Duplicidade" not in df_ws.columns:
-                                    st.error("A aba do Sheets precisa ter a coluna 'Duplicidade'.")
-                                else:
-                                    df_ws["Duplicidade"] = df_ws["Duplicidade"].astype(str)
-                                    col_idx_desc = col_map.get("Descrição Agrupada")
-                                    obs_sheet_name = _find_col(col_map.keys())
-                                    col_idx_obs = col_map.get(obs_sheet_name) if obs_sheet_name else None
-        
-                                    keys = audit_out_raw["Duplicidade"].astype(str).reset_index(drop=True)
-        
-                                    for i in mask_changed[mask_changed].index:
-                                        dup_key   = keys.iloc[i]
-                                        nova_desc = depois_desc.iloc[i].strip()
-                                        nova_obs  = depois_obs.iloc[i].strip()
-        
-                                        hits = df_ws.index[df_ws["Duplicidade"] == dup_key].tolist()
-                                        if not hits:
-                                            continue
-        
-                                        updates = []
-                                        for h in hits:
-                                            row_num = int(df_ws.loc[h, "_row"])
-                                            if Cell is not None:
-                                                if col_idx_desc:
-                                                    updates.append(Cell(row=row_num, col=col_idx_desc, value=nova_desc))
-                                                if col_idx_obs is not None:
-                                                    updates.append(Cell(row=row_num, col=col_idx_obs,  value=nova_obs))
-                                            else:
-                                                if col_idx_desc:
-                                                    updates.append((row_num, col_idx_desc, nova_desc))
-                                                if col_idx_obs is not None:
-                                                    updates.append((row_num, col_idx_obs,  nova_obs))
-                                        if updates:
-                                            if Cell is not None:
-                                                ws_sys.update_cells(updates, value_input_option="USER_ENTERED")
-                                            else:
-                                                for row_num, col_idx, value in updates:
-                                                    a1 = f"{_excel_col_letter(col_idx-1)}{row_num}"
-                                                    ws_sys.update(a1, value, value_input_option="USER_ENTERED")
-        
-                                st.success("Alterações salvas (removidos).")
-                                st.session_state["rev_desc"] += 1
-                                st.rerun()
+                                resumo = _salvar_edicoes(audit_out_raw, antes_desc, depois_desc, antes_obs, depois_obs, mask_changed, obs_col_out, tela_out)
+                                _informar_gravacao(resumo, "removidos")
         
                         except Exception as e:
                             st.error(f"Falha ao atualizar (removidos): {type(e).__name__}: {e}")
@@ -1236,79 +1210,54 @@ with sub_caixa:
         
                     
                     def exportar_xlsxwriter_tentando_slicers(cmp: pd.DataFrame, usar_mes_sem_acento: bool=False) -> tuple[BytesIO,bool]:
-                        df = _prep_df_export(cmp, usar_mes_sem_acento=usar_mes_sem_acento)
+                        df = _prep_df_export(cmp, usar_mes_sem_acento=usar_mes_sem_acento).reset_index(drop=True)
                         try:
                             import xlsxwriter as xw
                             ver_tuple = tuple(int(p) for p in xw.__version__.split(".")[:3])
                         except Exception:
                             ver_tuple = (0,0,0)
                     
-                        from xlsxwriter import Workbook
-                        buf = BytesIO()
-                        wb  = Workbook(buf, {"in_memory": True})
-                        ws  = wb.add_worksheet("Dados")
-                    
-                        fmt_header = wb.add_format({"bold":True,"align":"center","valign":"vcenter","bg_color":"#F2F2F2","border":1})
-                        fmt_text   = wb.add_format({"border":1})
-                        fmt_int    = wb.add_format({"border":1,"num_format":"0"})
-                        fmt_date   = wb.add_format({"border":1,"num_format":"dd/mm/yyyy"})
-                        fmt_money  = wb.add_format({"border":1,"num_format":'R$ #,##0.00'})
-                    
+                        colunas_int   = [c for c in ("Ano","Mês","Mes","Código Everest") if c in df.columns]
+                        colunas_money = [c for c in ("Sangria (Colibri/CISS)","Sangria Everest","Diferença") if c in df.columns]
+                        for c in colunas_int:
+                            df[c] = pd.to_numeric(df[c], errors="coerce").fillna(0).astype(int)
+                        for c in colunas_money:
+                            df[c] = df[c].astype(float)
                         headers = list(df.columns)
-                        for j,c in enumerate(headers):
-                            ws.write(0,j,c,fmt_header)
-                    
-                        for i,row in df.iterrows():
-                            r = i+1
-                            for j,c in enumerate(headers):
-                                v = row[c]
-                                if c=="Data" and pd.notna(v):
-                                    ws.write_datetime(r,j,pd.to_datetime(v).to_pydatetime(),fmt_date)
-                                elif c in ("Ano","Mês","Mes","Código Everest"):
-                                    ws.write_number(r,j,int(v) if pd.notna(v) else 0,fmt_int)
-                                elif c in ("Sangria (Colibri/CISS)","Sangria Everest","Diferença"):
-                                    ws.write_number(r,j,float(v),fmt_money)
-                                else:
-                                    ws.write(r,j,("" if pd.isna(v) else v),fmt_text)
-                    
-                        last_row = len(df)
-                        last_col = len(headers)-1
-                        ws.add_table(0,0,last_row,last_col,{
-                            "name":"tbl_dados",
-                            "style":"TableStyleMedium9",
-                            "columns":[{"header":h} for h in headers],
-                        })
-                    
-                        col_idx = {c:i for i,c in enumerate(headers)}
-                        if "Data" in col_idx:           ws.set_column(col_idx["Data"], col_idx["Data"], 12, fmt_date)
-                        if "Grupo" in col_idx:          ws.set_column(col_idx["Grupo"],col_idx["Grupo"],10,fmt_text)
-                        if "Loja" in col_idx:           ws.set_column(col_idx["Loja"], col_idx["Loja"], 28,fmt_text)
-                        if "Código Everest" in col_idx: ws.set_column(col_idx["Código Everest"],col_idx["Código Everest"],14,fmt_int)
-                        for c in ("Sangria (Colibri/CISS)","Sangria Everest","Diferença"):
-                            if c in col_idx:            ws.set_column(col_idx[c],col_idx[c],18,fmt_money)
-                        if "Mês" in col_idx:            ws.set_column(col_idx["Mês"],6,6,fmt_int)
-                        if "Mes" in col_idx:            ws.set_column(col_idx["Mes"],6,6,fmt_int)
-                        if "Ano" in col_idx:            ws.set_column(col_idx["Ano"],8,8,fmt_int)
-                        ws.freeze_panes(1,0)
                     
                         slicers_ok = False
-                        if ver_tuple >= (3,2,0) and hasattr(wb, "add_slicer"):
-                            try:
-                                col_mes = "Mes" if ("Mes" in headers) else ("Mês" if "Mês" in headers else None)
-                                if "Ano" in headers:
-                                    wb.add_slicer({"table":"tbl_dados","column":"Ano","cell":"L2","width":130,"height":100})
-                                if col_mes:
-                                    wb.add_slicer({"table":"tbl_dados","column":col_mes,"cell":"L8","width":130,"height":130})
-                                if "Grupo" in headers:
-                                    wb.add_slicer({"table":"tbl_dados","column":"Grupo","cell":"N2","width":180,"height":180})
-                                if "Loja" in headers:
-                                    wb.add_slicer({"table":"tbl_dados","column":"Loja","cell":"N12","width":260,"height":320})
-                                slicers_ok = True
-                            except Exception:
-                                slicers_ok = False  # silencioso
+                        def _slicers(wb, ws):
+                            nonlocal slicers_ok
+                            if ver_tuple >= (3,2,0) and hasattr(wb, "add_slicer"):
+                                try:
+                                    col_mes = "Mes" if ("Mes" in headers) else ("Mês" if "Mês" in headers else None)
+                                    if "Ano" in headers:
+                                        wb.add_slicer({"table":"tbl_dados","column":"Ano","cell":"L2","width":130,"height":100})
+                                    if col_mes:
+                                        wb.add_slicer({"table":"tbl_dados","column":col_mes,"cell":"L8","width":130,"height":130})
+                                    if "Grupo" in headers:
+                                        wb.add_slicer({"table":"tbl_dados","column":"Grupo","cell":"N2","width":180,"height":180})
+                                    if "Loja" in headers:
+                                        wb.add_slicer({"table":"tbl_dados","column":"Loja","cell":"N12","width":260,"height":320})
+                                    slicers_ok = True
+                                except Exception:
+                                    slicers_ok = False  # silencioso
                     
-                        wb.close()
-                        buf.seek(0)
+                        buf = exportar_excel(
+                            df, aba="Dados",
+                            formato_base={"border":1},
+                            formatos_coluna={
+                                "Data": {"num_format":"dd/mm/yyyy"},
+                                **{c: {"num_format":"0"} for c in colunas_int},
+                                **{c: {"num_format":'R$ #,##0.00'} for c in colunas_money},
+                            },
+                            formato_cabecalho={"bold":True,"align":"center","valign":"vcenter","bg_color":"#F2F2F2","border":1},
+                            larguras={"Data":12, "Grupo":10, "Loja":28, "Código Everest":14,
+                                      **{c: 18 for c in colunas_money}, "Mês":6, "Mes":6, "Ano":8},
+                            congelar_cabecalho=True,
+                            tabela={"name":"tbl_dados", "style":"TableStyleMedium9"},
+                            ajustar=_slicers,
+                        )
                         return buf, slicers_ok
         
                     xlsx_out, ok = exportar_xlsxwriter_tentando_slicers(cmp, usar_mes_sem_acento=True)
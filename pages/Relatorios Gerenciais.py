@@ -5,7 +5,6 @@ st.set_page_config(page_title="Vendas Diarias", layout="wide")  # ✅ Escolha um
 import streamlit as st
 import pandas as pd
 import numpy as np
-from io import BytesIO
 from datetime import datetime
 import re
 import gspread
@@ -18,6 +17,16 @@ from datetime import datetime, date
 from datetime import datetime, date, timedelta
 from calendar import monthrange
 
+from comum.cubo_vendas import carregar_cubo_vendas
+from comum.tabela_empresa import carregar_tabela_empresa
+from comum.calendario import eh_feriado
+from comum.conciliacao import projetar_recebimentos
+from comum.conversao import para_data_br, para_float_br
+from comum.downloads import botao_download
+from comum.exportar_excel import (
+    FORMATO_DATA, FORMATO_INTEIRO, FORMATO_PERCENTUAL, FORMATO_REAIS, exportar_excel,
+)
+
 
 #st.set_page_config(page_title="Painel Agrupado", layout="wide")
 #st.set_page_config(page_title="Vendas Diarias", layout="wide")
@@ -54,7 +63,7 @@ with st.spinner("⏳ Processando..."):
     credentials = ServiceAccountCredentials.from_json_keyfile_dict(credentials_dict, scope)
     gc = gspread.authorize(credentials)
     planilha_empresa = gc.open("Vendas diarias")
-    df_empresa = pd.DataFrame(planilha_empresa.worksheet("Tabela Empresa").get_all_records())
+    df_empresa = carregar_tabela_empresa()
     
     # ==========================================
     # Nova Conexão: Planilha Meios de Pagamento
@@ -128,35 +137,12 @@ with st.spinner("⏳ Processando..."):
     # Aba 1: Graficos Anuais
     # ================================
     with aba1:
-        planilha = gc.open("Vendas diarias")
-        aba = planilha.worksheet("Fat Sistema Externo")
-        dados = aba.get_all_records()
-        df = pd.DataFrame(dados)
-    
-          
-        # ✅ Limpa espaços invisíveis nos nomes das colunas
-        df.columns = df.columns.str.strip()
+        # Cubo mensal (Ano × Mês × Loja × Grupo × Tipo × Sistema; Data = último dia com venda)
+        df = carregar_cubo_vendas("mes")
         
         #st.write("🧪 Colunas carregadas:", df.columns.tolist())
-        
-        
-       
-        def limpar_valor(x):
-            try:
-                if isinstance(x, str):
-                    return float(x.replace("R$", "").replace(".", "").replace(",", ".").strip())
-                return float(x)
-            except:
-                return None
-    
-        for col in ["Fat.Total", "Serv/Tx", "Fat.Real"]:
-            if col in df.columns:
-                df[col] = df[col].apply(limpar_valor)
     
-        # Datas e campos derivados
-        df["Data"] = pd.to_datetime(df["Data"], errors="coerce", dayfirst=True)
-        df["Ano"] = df["Data"].dt.year
-        df["Mês"] = df["Data"].dt.month
+        # Campos derivados
         meses_portugues = {
             1:"Janeiro",2:"Fevereiro",3:"Março",4:"Abril",5:"Maio",6:"Junho",
             7:"Julho",8:"Agosto",9:"Setembro",10:"Outubro",11:"Novembro",12:"Dezembro"
@@ -184,16 +170,7 @@ with st.spinner("⏳ Processando..."):
         # 1) Filtra o dataframe pelos anos escolhidos
         df_anos = df[df["Ano"].isin(anos_comparacao)].dropna(subset=["Data","Fat.Total"]).copy()
         
-        # 2) Adiciona "Tipo" via Tabela Empresa (se existir)
-        try:
-            df_emp = df_empresa[["Loja","Tipo"]].copy()
-        except NameError:
-            df_emp = pd.DataFrame(columns=["Loja","Tipo"])
-        
-        df_emp["Loja_norm"]  = df_emp["Loja"].astype(str).str.strip().str.lower()
-        df_anos["Loja_norm"] = df_anos["Loja"].astype(str).str.strip().str.lower()
-        df_anos = df_anos.merge(df_emp[["Loja_norm","Tipo"]], on="Loja_norm", how="left")
-        df_anos.drop(columns=["Loja_norm"], inplace=True)
+        # 2) "Tipo" já vem do cubo (Tabela Empresa)
         df_anos["Tipo"] = df_anos["Tipo"].fillna("Sem tipo")
         
         # 3) “Filtrar por” (Loja ou Grupo) – só mostra o que existir
@@ -667,16 +644,13 @@ with st.spinner("⏳ Processando..."):
     
     
         # Carrega dados
-        df_empresa = pd.DataFrame(planilha_empresa.worksheet("Tabela Empresa").get_all_records())
-        df_vendas = pd.DataFrame(planilha_empresa.worksheet("Fat Sistema Externo").get_all_records())
+        df_empresa = carregar_tabela_empresa()
+        df_vendas = carregar_cubo_vendas("dia")  # já traz Tipo
     
         # Normalização
         df_empresa["Loja"] = df_empresa["Loja"].str.strip().str.upper()
         df_empresa["Grupo"] = df_empresa["Grupo"].str.strip()
-        df_vendas.columns = df_vendas.columns.str.strip()
-        df_vendas["Data"] = pd.to_datetime(df_vendas["Data"], dayfirst=True, errors="coerce")
-        df_vendas["Loja"] = df_vendas["Loja"].astype(str).str.strip().str.upper()
-        df_vendas["Grupo"] = df_vendas["Grupo"].astype(str).str.strip()
+        # (Loja/Grupo do cubo já vêm normalizados)
         # (mantenha suas normalizações acima)
         df_empresa.columns = [str(c).strip() for c in df_empresa.columns]
         
@@ -698,24 +672,6 @@ with st.spinner("⏳ Processando..."):
             # se não houver coluna de status, considera todas ativas
             df_empresa_ativas = df_empresa.copy()
 
-        # Merge com Tipo
-        df_vendas = df_vendas.merge(
-            df_empresa[["Loja", "Tipo"]],
-            on="Loja",
-            how="left"
-        )    
-        df_vendas["Fat.Total"] = (
-            df_vendas["Fat.Total"]
-            .astype(str)
-            .str.replace("R$", "", regex=False)
-            .str.replace("(", "-", regex=False)
-            .str.replace(")", "", regex=False)
-            .str.replace(" ", "", regex=False)
-            .str.replace(".", "", regex=False)
-            .str.replace(",", ".", regex=False)
-        )
-        df_vendas["Fat.Total"] = pd.to_numeric(df_vendas["Fat.Total"], errors="coerce")
-    
         # ==== Filtros principais ====
         # ==== Filtros principais ====
         # ==== Salvaguardas de datas (logo após a normalização de df_vendas) ====
@@ -791,6 +747,8 @@ with st.spinner("⏳ Processando..."):
 
         
         elif modo_periodo == "Mensal":
+            # Mensal/Anual não precisam do dia: o cubo mensal tem uma linha por loja/mês
+            df_vendas = carregar_cubo_vendas("mes")
 
             df_vendas["Mes/Ano"] = df_vendas["Data"].dt.strftime("%m/%Y")
         
@@ -824,6 +782,7 @@ with st.spinner("⏳ Processando..."):
     
         
         elif modo_periodo == "Anual":
+            df_vendas = carregar_cubo_vendas("mes")
             df_vendas["Ano"] = df_vendas["Data"].dt.strftime("%Y")
             anos_disponiveis = sorted(df_vendas["Ano"].dropna().unique().tolist())
         
@@ -985,120 +944,123 @@ with st.spinner("⏳ Processando..."):
             use_container_width=True,
             height=700
         )
-        from io import BytesIO
-        from openpyxl import load_workbook
-        from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
-        
-        # ➤ Usa a mesma lógica da visualização: remove "Loja" se for modo Grupo
-        df_exportar = df_final.drop(columns=["Loja"]) if modo_exibicao == "Grupo" else df_final.copy()
-        
-        # ➤ Exporta para Excel com BytesIO
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine="openpyxl") as writer:
-            df_exportar.to_excel(writer, index=False, sheet_name="Relatório")
-        output.seek(0)
-        
-        # ➤ Reabre com openpyxl para aplicar formatação
-        wb = load_workbook(output)
-        ws = wb["Relatório"]
-        
-        # === Estilos ===
-        header_font = Font(bold=True, color="FFFFFF")
-        header_fill = PatternFill("solid", fgColor="305496")  # Azul escuro
-        center_alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-        border = Border(
-            left=Side(style="thin"),
-            right=Side(style="thin"),
-            top=Side(style="thin"),
-            bottom=Side(style="thin")
-        )
-        
-        # ➤ Aplica estilo no cabeçalho
-        for cell in ws[1]:
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = center_alignment
-            cell.border = border
-        
-        # ➤ Detecta nome da última coluna (geralmente "% Total")
-        ultima_coluna_nome = df_exportar.columns[-1]
-        
-        # ➤ Aplica formatação e estilo nas células
-        # ➤ Aplica formatação e estilo nas células
-        for row in ws.iter_rows(min_row=2, max_row=ws.max_row, max_col=ws.max_column):
-            grupo_valor = row[1].value  # Coluna "Grupo" (segunda coluna)
-            estilo_fundo = None
-        
-            if isinstance(grupo_valor, str):
-                if grupo_valor.strip().upper() == "TOTAL":
-                    estilo_fundo = PatternFill("solid", fgColor="F4B084")  # Laranja escuro
-                elif grupo_valor.strip().upper() == "LOJAS ATIVAS":
-                    estilo_fundo = PatternFill("solid", fgColor="D9D9D9")  # Cinza claro
-        
-            for cell in row:
-                cell.border = border
+        def gerar_excel_relatorio():
+            from io import BytesIO
+            from openpyxl import load_workbook
+            from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+
+            # ➤ Usa a mesma lógica da visualização: remove "Loja" se for modo Grupo
+            df_exportar = df_final.drop(columns=["Loja"]) if modo_exibicao == "Grupo" else df_final.copy()
+
+            # ➤ Exporta para Excel com BytesIO
+            output = BytesIO()
+            with pd.ExcelWriter(output, engine="openpyxl") as writer:
+                df_exportar.to_excel(writer, index=False, sheet_name="Relatório")
+            output.seek(0)
+
+            # ➤ Reabre com openpyxl para aplicar formatação
+            wb = load_workbook(output)
+            ws = wb["Relatório"]
+
+            # === Estilos ===
+            header_font = Font(bold=True, color="FFFFFF")
+            header_fill = PatternFill("solid", fgColor="305496")  # Azul escuro
+            center_alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
+            border = Border(
+                left=Side(style="thin"),
+                right=Side(style="thin"),
+                top=Side(style="thin"),
+                bottom=Side(style="thin")
+            )
+
+            # ➤ Aplica estilo no cabeçalho
+            for cell in ws[1]:
+                cell.font = header_font
+                cell.fill = header_fill
                 cell.alignment = center_alignment
-                if estilo_fundo:
-                    cell.fill = estilo_fundo
-        
-                col_name = ws.cell(row=1, column=cell.column).value  # Nome da coluna
-        
-                if isinstance(cell.value, (int, float)):
-                    if col_name == "% Total":
-                        cell.number_format = "0.000%"
-                    else:
-                        cell.number_format = '"R$" #,##0.00'
-    
-        from openpyxl.styles import Alignment
-        from openpyxl.utils import get_column_letter
-        # ➤ Ajusta a largura das colunas automaticamente
-        from openpyxl.utils import get_column_letter
-    
-        # ➤ Ajusta a largura das colunas com base no valor formatado
-        for i, col_cells in enumerate(ws.iter_cols(min_row=1, max_row=ws.max_row), start=1):
-            max_length = 0
-            for cell in col_cells:
-                try:
-                    if cell.value:
-                        cell_str = str(cell.value)
-                        max_length = max(max_length, len(cell_str))
-                except:
-                    pass
-            col_letter = get_column_letter(i)
-            ws.column_dimensions[col_letter].width = max_length + 2
-    
-    
-    
-    
-        # ➤ Alinha à esquerda as colunas "Tipo", "Grupo" e "Loja"
-        colunas_df = list(df_exportar.columns)
-        colunas_esquerda = ["Tipo", "Grupo", "Loja"]
-        for col_nome in colunas_esquerda:
-            if col_nome in colunas_df:
-                col_idx = colunas_df.index(col_nome) + 1
-                for cell in ws.iter_rows(min_row=2, min_col=col_idx, max_col=col_idx):
-                    for c in cell:
-                        c.alignment = Alignment(horizontal="left")
-        
-        # ➤ Define largura fixa da coluna "Loja" para 22
-        if "Loja" in colunas_df:
-            col_idx_loja = colunas_df.index("Loja")
-            col_letra_loja = chr(ord("A") + col_idx_loja)
-            ws.column_dimensions[col_letra_loja].width = 22
-    
-    
-        
-        # ➤ Salva para download
-        output_final = BytesIO()
-        wb.save(output_final)
-        output_final.seek(0)
+                cell.border = border
+
+            # ➤ Aplica formatação e estilo nas células
+            # ➤ Aplica formatação e estilo nas células
+            for row in ws.iter_rows(min_row=2, max_row=ws.max_row, max_col=ws.max_column):
+                grupo_valor = row[1].value  # Coluna "Grupo" (segunda coluna)
+                estilo_fundo = None
+
+                if isinstance(grupo_valor, str):
+                    if grupo_valor.strip().upper() == "TOTAL":
+                        estilo_fundo = PatternFill("solid", fgColor="F4B084")  # Laranja escuro
+                    elif grupo_valor.strip().upper() == "LOJAS ATIVAS":
+                        estilo_fundo = PatternFill("solid", fgColor="D9D9D9")  # Cinza claro
+
+                for cell in row:
+                    cell.border = border
+                    cell.alignment = center_alignment
+                    if estilo_fundo:
+                        cell.fill = estilo_fundo
+
+                    col_name = ws.cell(row=1, column=cell.column).value  # Nome da coluna
+
+                    if isinstance(cell.value, (int, float)):
+                        if col_name == "% Total":
+                            cell.number_format = "0.000%"
+                        else:
+                            cell.number_format = '"R$" #,##0.00'
+
+            from openpyxl.styles import Alignment
+            from openpyxl.utils import get_column_letter
+            # ➤ Ajusta a largura das colunas automaticamente
+            from openpyxl.utils import get_column_letter
+
+            # ➤ Ajusta a largura das colunas com base no valor formatado
+            for i, col_cells in enumerate(ws.iter_cols(min_row=1, max_row=ws.max_row), start=1):
+                max_length = 0
+                for cell in col_cells:
+                    try:
+                        if cell.value:
+                            cell_str = str(cell.value)
+                            max_length = max(max_length, len(cell_str))
+                    except:
+                        pass
+                col_letter = get_column_letter(i)
+                ws.column_dimensions[col_letter].width = max_length + 2
+
+
+
+
+            # ➤ Alinha à esquerda as colunas "Tipo", "Grupo" e "Loja"
+            colunas_df = list(df_exportar.columns)
+            colunas_esquerda = ["Tipo", "Grupo", "Loja"]
+            for col_nome in colunas_esquerda:
+                if col_nome in colunas_df:
+                    col_idx = colunas_df.index(col_nome) + 1
+                    for cell in ws.iter_rows(min_row=2, min_col=col_idx, max_col=col_idx):
+                        for c in cell:
+                            c.alignment = Alignment(horizontal="left")
+
+            # ➤ Define largura fixa da coluna "Loja" para 22
+            if "Loja" in colunas_df:
+                col_idx_loja = colunas_df.index("Loja")
+                col_letra_loja = chr(ord("A") + col_idx_loja)
+                ws.column_dimensions[col_letra_loja].width = 22
+
+
+
+            # ➤ Salva para download
+            output_final = BytesIO()
+            wb.save(output_final)
+            output_final.seek(0)
+
+            return output_final
         
-        # ➤ Botão de download
-        st.download_button(
+        # ➤ Botão de download (o arquivo só é montado quando pedido)
+        botao_download(
             label="📥 Baixar Excel",
-            data=output_final,
+            gerar=gerar_excel_relatorio,
+            dados=df_final,
+            opcoes=modo_exibicao,
             file_name="Relatorio_Vendas.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            key="dl_relatorio_vendas",
         )
     
     
@@ -1107,25 +1069,10 @@ with st.spinner("⏳ Processando..."):
     # ================================
     with aba3:
         # Carrega dados
-        df_empresa = pd.DataFrame(planilha_empresa.worksheet("Tabela Empresa").get_all_records())
-        df_vendas = pd.DataFrame(planilha_empresa.worksheet("Fat Sistema Externo").get_all_records())
+        df_empresa = carregar_tabela_empresa()
+        df_vendas = carregar_cubo_vendas("dia")
         df_empresa["Loja"] = df_empresa["Loja"].str.strip().str.upper()
         df_empresa["Grupo"] = df_empresa["Grupo"].str.strip()
-        df_vendas.columns = df_vendas.columns.str.strip()
-        df_vendas["Data"] = pd.to_datetime(df_vendas["Data"], dayfirst=True, errors="coerce")
-        df_vendas["Loja"] = df_vendas["Loja"].astype(str).str.strip().str.upper()
-        df_vendas["Grupo"] = df_vendas["Grupo"].astype(str).str.strip()
-        df_vendas["Fat.Total"] = (
-            df_vendas["Fat.Total"]
-            .astype(str)
-            .str.replace("R$", "", regex=False)
-            .str.replace("(", "-", regex=False)
-            .str.replace(")", "", regex=False)
-            .str.replace(" ", "", regex=False)
-            .str.replace(".", "", regex=False)
-            .str.replace(",", ".", regex=False)
-        )
-        df_vendas["Fat.Total"] = pd.to_numeric(df_vendas["Fat.Total"], errors="coerce")
         
         
         
@@ -1286,17 +1233,7 @@ with st.spinner("⏳ Processando..."):
         }
         df_metas["Mês"] = df_metas["Mês"].astype(str).str.strip().str.upper().map(mapa_meses)
         df_metas["Ano"] = df_metas["Ano"].astype(str).str.strip()
-        df_metas["Meta"] = (
-            df_metas["Meta"]
-            .astype(str)
-            .str.replace("R$", "", regex=False)
-            .str.replace("(", "-", regex=False)
-            .str.replace(")", "", regex=False)
-            .str.replace(" ", "", regex=False)
-            .str.replace(".", "", regex=False)
-            .str.replace(",", ".", regex=False)
-        )
-        df_metas["Meta"] = pd.to_numeric(df_metas["Meta"], errors="coerce").fillna(0)
+        df_metas["Meta"] = para_float_br(df_metas["Meta"]).fillna(0)
         mes_filtro = data_fim_dt.strftime("%m")
         ano_filtro = data_fim_dt.strftime("%Y")
         df_metas_filtrado = df_metas[(df_metas["Mês"] == mes_filtro) & (df_metas["Ano"] == ano_filtro)].copy()
@@ -1646,226 +1583,232 @@ with st.spinner("⏳ Processando..."):
             height=750
         )
         
-        import openpyxl
-        from openpyxl.styles import PatternFill, Font, Alignment
-        from io import BytesIO
-        from openpyxl.utils import get_column_letter
-        from openpyxl.styles import Border, Side
-        
-        # Gera o Excel já na memória
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Vendas"
-        
-        # Define bordas
-        border_padrao = Border(
-            left=Side(style="thin"),
-            right=Side(style="thin"),
-            top=Side(style="thin"),
-            bottom=Side(style="thin"),
-        )
-        
-        border_grossa = Border(
-            left=Side(style="medium"),
-            right=Side(style="medium"),
-            top=Side(style="medium"),
-            bottom=Side(style="medium"),
-        )
-        
-        # Cabeçalho com azul escuro
-        # === Linha "Faturamento Desejável" na LINHA 1 ===
-        # --- Linha FATURAMENTO DESEJÁVEL na linha 1 ---
-        for col_idx, (col_nome, valor) in enumerate(linha_desejavel.iloc[0].items(), start=1):
-            if col_nome.strip().upper() == "PDV":
-                valor = ""  # ⛔ não exibe valor na linha Faturamento Ideal
-            cell = ws.cell(row=1, column=col_idx, value=valor)
-            cell.fill = PatternFill("solid", fgColor="DDDDDD")  # cinza claro
-            cell.font = Font(bold=True)
-            cell.alignment = Alignment(horizontal="left" if col_idx == 2 else "right")
-        
-            # 🔁 Aplica borda apenas nas laterais (remove linhas internas)
-            if col_idx == 1:
-                cell.border = Border(left=Side(style="thin"))
-            elif col_idx == len(linha_desejavel.columns):
-                cell.border = Border(right=Side(style="thin"))
-            else:
-                cell.border = Border()  # sem borda
-    
-        
-        # === Cabeçalho na LINHA 2 ===
-        for col_idx, col in enumerate(df_exibir.columns, start=1):
-            cell = ws.cell(row=2, column=col_idx, value=col)
-            cell.fill = PatternFill("solid", fgColor="1F4E78")  # azul escuro
-            cell.font = Font(bold=True, color="FFFFFF")         # texto branco
-            cell.alignment = Alignment(horizontal="center", vertical="center")
-            cell.border = border_grossa
-        
-        # Ajuste de altura das linhas
-        ws.row_dimensions[1].height = 25
-        ws.row_dimensions[2].height = 30
-    
-        
-        # Preenche os dados na planilha
-        # Dentro do loop de preenchimento de dados
-        from openpyxl.styles import PatternFill, Font, Alignment, Border, Side
-        
-        # Estilos de borda
-        thin = Side(border_style="thin", color="000000")
-        thick = Side(border_style="medium", color="000000")
-        border_padrao = Border(left=thin, right=thin, top=thin, bottom=thin)
-        border_grossa = Border(left=thick, right=thick, top=thick, bottom=thick)
-    
-        if "PDV" in df_exibir.columns:
-            df_exibir["PDV"] = pd.to_numeric(df_exibir["PDV"], errors="coerce").fillna(0).astype(int)
-        
-        
-        # Dados
-        # Detecta total de linhas que serão preenchidas
-        # Preenche os dados na planilha
-        for row_idx, (i, row) in enumerate(df_exibir.iterrows(), start=3):
-            estilo_linha = estilos_final[row_idx - 3]
-        
-            grupo = row.get("Operação", "")
-            grupo_str = str(grupo).strip().upper()  # garante consistência
-            is_subtotal = grupo_str.startswith("SUBTOTAL")
-            is_total = grupo_str == "TOTAL"
-            usar_borda_grossa = is_subtotal or is_total
-        
-            for col_idx, (col, valor) in enumerate(row.items(), start=1):
-    
-                # 🎯 Trate "PDV" como número inteiro SEMPRE, com prioridade total
-                if col.strip().upper() == "PDV":
-                    try:
-                        valor_int = int(str(valor).strip().replace(".0", ""))
-                        cell = ws.cell(row=row_idx, column=col_idx, value=valor_int)
-                        cell.number_format = '0'  # inteiro puro
-                    except:
-                        cell = ws.cell(row=row_idx, column=col_idx, value=valor)
-            
-                elif isinstance(valor, str) and "%" in valor:
-                    try:
-                        valor_float = float(valor.replace("%", "").replace(",", ".")) / 100
-                        cell = ws.cell(row=row_idx, column=col_idx, value=valor_float)
-                        cell.number_format = '0.00%'
-                    except:
-                        cell = ws.cell(row=row_idx, column=col_idx, value=valor)
-            
-                elif isinstance(valor, str) and "R$" in valor:
-                    try:
-                        valor_float = float(valor.replace("R$", "").replace(".", "").replace(",", "."))
-                        cell = ws.cell(row=row_idx, column=col_idx, value=valor_float)
-                        cell.number_format = 'R$ #,##0.00'
-                    except:
-                        cell = ws.cell(row=row_idx, column=col_idx, value=valor)
-            
-                else:
-                    cell = ws.cell(row=row_idx, column=col_idx, value=valor)
-    
-    
-        
-               # 🎨 Estilo de fundo com prioridade ao TOTAL e SUBTOTAL
-               # 🎨 Estilo de fundo com prioridade ao TOTAL e SUBTOTAL
-                estilo = estilo_linha[col_idx - 1]
-                cor_personalizada = None
-                
-                if is_total:
-                    cor_personalizada = "F4B183"  # Laranja escuro p/ TOTAL
-                elif is_subtotal:
-                    cor_personalizada = "FCE4D6"  # Laranja claro p/ SUBTOTAL
-                elif "background-color" in estilo:
-                    cor_personalizada = estilo.split("background-color: ")[1].split(";")[0].replace("#", "")
-                
-                if cor_personalizada:
-                    cell.fill = PatternFill("solid", fgColor=cor_personalizada)
-    
-                    
-                # 🅱️ Negrito
-                if "font-weight: bold" in estilo:
-                    cell.font = Font(bold=True)
-        
-                # 📏 Alinhamento
-                # Detecta a posição da coluna 'Loja'
-                pos_coluna_loja = list(df_exibir.columns).index("Loja")
-                
-                # Define alinhamento: esquerda até 'Loja', centralizado depois
-                if col_idx - 1 <= pos_coluna_loja:
-                    cell.alignment = Alignment(horizontal="left")
-                else:
-                    cell.alignment = Alignment(horizontal="center")
-        
-                # 🧱 Bordas
-                if row_idx == 3:  # Linha Faturamento Ideal Desejável
-                    cell.border = Border(left=Side(style="thin"), right=Side(style="thin"))
+        def gerar_excel_vendas_metas():
+            import openpyxl
+            from openpyxl.styles import PatternFill, Font, Alignment
+            from io import BytesIO
+            from openpyxl.utils import get_column_letter
+            from openpyxl.styles import Border, Side
+
+            # Gera o Excel já na memória
+            wb = openpyxl.Workbook()
+            ws = wb.active
+            ws.title = "Vendas"
+
+            # Define bordas
+            border_padrao = Border(
+                left=Side(style="thin"),
+                right=Side(style="thin"),
+                top=Side(style="thin"),
+                bottom=Side(style="thin"),
+            )
+
+            border_grossa = Border(
+                left=Side(style="medium"),
+                right=Side(style="medium"),
+                top=Side(style="medium"),
+                bottom=Side(style="medium"),
+            )
+
+            # Cabeçalho com azul escuro
+            # === Linha "Faturamento Desejável" na LINHA 1 ===
+            # --- Linha FATURAMENTO DESEJÁVEL na linha 1 ---
+            for col_idx, (col_nome, valor) in enumerate(linha_desejavel.iloc[0].items(), start=1):
+                if col_nome.strip().upper() == "PDV":
+                    valor = ""  # ⛔ não exibe valor na linha Faturamento Ideal
+                cell = ws.cell(row=1, column=col_idx, value=valor)
+                cell.fill = PatternFill("solid", fgColor="DDDDDD")  # cinza claro
+                cell.font = Font(bold=True)
+                cell.alignment = Alignment(horizontal="left" if col_idx == 2 else "right")
+
+                # 🔁 Aplica borda apenas nas laterais (remove linhas internas)
+                if col_idx == 1:
+                    cell.border = Border(left=Side(style="thin"))
+                elif col_idx == len(linha_desejavel.columns):
+                    cell.border = Border(right=Side(style="thin"))
                 else:
-                    cell.border = border_grossa if usar_borda_grossa else border_padrao
-        
-                # ✅ Cor verde/vermelha no %Atingido
-                if col == "%Atingido":
-                    try:
-                        if isinstance(valor, str) and "%" in valor:
+                    cell.border = Border()  # sem borda
+
+
+            # === Cabeçalho na LINHA 2 ===
+            for col_idx, col in enumerate(df_exibir.columns, start=1):
+                cell = ws.cell(row=2, column=col_idx, value=col)
+                cell.fill = PatternFill("solid", fgColor="1F4E78")  # azul escuro
+                cell.font = Font(bold=True, color="FFFFFF")         # texto branco
+                cell.alignment = Alignment(horizontal="center", vertical="center")
+                cell.border = border_grossa
+
+            # Ajuste de altura das linhas
+            ws.row_dimensions[1].height = 25
+            ws.row_dimensions[2].height = 30
+
+
+            # Preenche os dados na planilha
+            # Dentro do loop de preenchimento de dados
+            from openpyxl.styles import PatternFill, Font, Alignment, Border, Side
+
+            # Estilos de borda
+            thin = Side(border_style="thin", color="000000")
+            thick = Side(border_style="medium", color="000000")
+            border_padrao = Border(left=thin, right=thin, top=thin, bottom=thin)
+            border_grossa = Border(left=thick, right=thick, top=thick, bottom=thick)
+
+            if "PDV" in df_exibir.columns:
+                df_exibir["PDV"] = pd.to_numeric(df_exibir["PDV"], errors="coerce").fillna(0).astype(int)
+
+
+            # Dados
+            # Detecta total de linhas que serão preenchidas
+            # Preenche os dados na planilha
+            for row_idx, (i, row) in enumerate(df_exibir.iterrows(), start=3):
+                estilo_linha = estilos_final[row_idx - 3]
+
+                grupo = row.get("Operação", "")
+                grupo_str = str(grupo).strip().upper()  # garante consistência
+                is_subtotal = grupo_str.startswith("SUBTOTAL")
+                is_total = grupo_str == "TOTAL"
+                usar_borda_grossa = is_subtotal or is_total
+
+                for col_idx, (col, valor) in enumerate(row.items(), start=1):
+
+                    # 🎯 Trate "PDV" como número inteiro SEMPRE, com prioridade total
+                    if col.strip().upper() == "PDV":
+                        try:
+                            valor_int = int(str(valor).strip().replace(".0", ""))
+                            cell = ws.cell(row=row_idx, column=col_idx, value=valor_int)
+                            cell.number_format = '0'  # inteiro puro
+                        except:
+                            cell = ws.cell(row=row_idx, column=col_idx, value=valor)
+
+                    elif isinstance(valor, str) and "%" in valor:
+                        try:
                             valor_float = float(valor.replace("%", "").replace(",", ".")) / 100
-                        elif isinstance(valor, (int, float)):
-                            valor_float = float(valor)
-                        else:
-                            valor_float = None
-        
-                        if valor_float is not None:
-                            if valor_float >= perc_desejavel:
-                                cell.font = Font(color="006400", bold=True)  # Verde escuro
+                            cell = ws.cell(row=row_idx, column=col_idx, value=valor_float)
+                            cell.number_format = '0.00%'
+                        except:
+                            cell = ws.cell(row=row_idx, column=col_idx, value=valor)
+
+                    elif isinstance(valor, str) and "R$" in valor:
+                        try:
+                            valor_float = float(valor.replace("R$", "").replace(".", "").replace(",", "."))
+                            cell = ws.cell(row=row_idx, column=col_idx, value=valor_float)
+                            cell.number_format = 'R$ #,##0.00'
+                        except:
+                            cell = ws.cell(row=row_idx, column=col_idx, value=valor)
+
+                    else:
+                        cell = ws.cell(row=row_idx, column=col_idx, value=valor)
+
+
+
+                   # 🎨 Estilo de fundo com prioridade ao TOTAL e SUBTOTAL
+                   # 🎨 Estilo de fundo com prioridade ao TOTAL e SUBTOTAL
+                    estilo = estilo_linha[col_idx - 1]
+                    cor_personalizada = None
+
+                    if is_total:
+                        cor_personalizada = "F4B183"  # Laranja escuro p/ TOTAL
+                    elif is_subtotal:
+                        cor_personalizada = "FCE4D6"  # Laranja claro p/ SUBTOTAL
+                    elif "background-color" in estilo:
+                        cor_personalizada = estilo.split("background-color: ")[1].split(";")[0].replace("#", "")
+
+                    if cor_personalizada:
+                        cell.fill = PatternFill("solid", fgColor=cor_personalizada)
+
+
+                    # 🅱️ Negrito
+                    if "font-weight: bold" in estilo:
+                        cell.font = Font(bold=True)
+
+                    # 📏 Alinhamento
+                    # Detecta a posição da coluna 'Loja'
+                    pos_coluna_loja = list(df_exibir.columns).index("Loja")
+
+                    # Define alinhamento: esquerda até 'Loja', centralizado depois
+                    if col_idx - 1 <= pos_coluna_loja:
+                        cell.alignment = Alignment(horizontal="left")
+                    else:
+                        cell.alignment = Alignment(horizontal="center")
+
+                    # 🧱 Bordas
+                    if row_idx == 3:  # Linha Faturamento Ideal Desejável
+                        cell.border = Border(left=Side(style="thin"), right=Side(style="thin"))
+                    else:
+                        cell.border = border_grossa if usar_borda_grossa else border_padrao
+
+                    # ✅ Cor verde/vermelha no %Atingido
+                    if col == "%Atingido":
+                        try:
+                            if isinstance(valor, str) and "%" in valor:
+                                valor_float = float(valor.replace("%", "").replace(",", ".")) / 100
+                            elif isinstance(valor, (int, float)):
+                                valor_float = float(valor)
                             else:
-                                cell.font = Font(color="B22222", bold=True)  # Vermelho escuro
+                                valor_float = None
+
+                            if valor_float is not None:
+                                if valor_float >= perc_desejavel:
+                                    cell.font = Font(color="006400", bold=True)  # Verde escuro
+                                else:
+                                    cell.font = Font(color="B22222", bold=True)  # Vermelho escuro
+                        except:
+                            pass
+
+
+
+
+
+
+
+
+
+            # ⬇️ Ajusta automaticamente a largura das colunas
+            # Ajuste refinado de largura das colunas
+            for col_idx, column_cells in enumerate(ws.columns, start=1):
+                max_length = 0
+                for cell in column_cells:
+                    try:
+                        if cell.number_format == 'R$ #,##0.00' and isinstance(cell.value, (float, int)):
+                            cell_str = f'R$ {cell.value:,.2f}'.replace(",", "X").replace(".", ",").replace("X", ".")
+                            length = len(cell_str)
+                        elif cell.number_format == '0.00%' and isinstance(cell.value, (float, int)):
+                            cell_str = f'{cell.value:.2%}'.replace(".", ",")
+                            length = len(cell_str)
+                        else:
+                            cell_str = str(cell.value) if cell.value is not None else ""
+                            length = len(cell_str)
+                        max_length = max(max_length, length)
                     except:
                         pass
-    
-    
-    
-        
-            
-        
-            
-        
+
+                adjusted_width = max_length + 2  # margem extra
+                col_letter = get_column_letter(col_idx)
+                ws.column_dimensions[col_letter].width = adjusted_width
+            # 🔥 Exclui a linha duplicada "FATURAMENTO IDEAL ATÉ..." da planilha final
+            for row in ws.iter_rows(min_row=3, max_row=ws.max_row):  # pula cabeçalhos
+                cell_val = row[2].value  # coluna B → índice 1
+                if isinstance(cell_val, str) and cell_val.startswith("FATURAMENTO IDEAL ATÉ"):
+                    ws.delete_rows(row[0].row, 1)
+                    break  # remove apenas a primeira ocorrência
+
+
+            # Salva em memória
+            buffer = BytesIO()
+            wb.save(buffer)
+            buffer.seek(0)
+
+            return buffer
         
-        # ⬇️ Ajusta automaticamente a largura das colunas
-        # Ajuste refinado de largura das colunas
-        for col_idx, column_cells in enumerate(ws.columns, start=1):
-            max_length = 0
-            for cell in column_cells:
-                try:
-                    if cell.number_format == 'R$ #,##0.00' and isinstance(cell.value, (float, int)):
-                        cell_str = f'R$ {cell.value:,.2f}'.replace(",", "X").replace(".", ",").replace("X", ".")
-                        length = len(cell_str)
-                    elif cell.number_format == '0.00%' and isinstance(cell.value, (float, int)):
-                        cell_str = f'{cell.value:.2%}'.replace(".", ",")
-                        length = len(cell_str)
-                    else:
-                        cell_str = str(cell.value) if cell.value is not None else ""
-                        length = len(cell_str)
-                    max_length = max(max_length, length)
-                except:
-                    pass
-        
-            adjusted_width = max_length + 2  # margem extra
-            col_letter = get_column_letter(col_idx)
-            ws.column_dimensions[col_letter].width = adjusted_width
-        # 🔥 Exclui a linha duplicada "FATURAMENTO IDEAL ATÉ..." da planilha final
-        for row in ws.iter_rows(min_row=3, max_row=ws.max_row):  # pula cabeçalhos
-            cell_val = row[2].value  # coluna B → índice 1
-            if isinstance(cell_val, str) and cell_val.startswith("FATURAMENTO IDEAL ATÉ"):
-                ws.delete_rows(row[0].row, 1)
-                break  # remove apenas a primeira ocorrência
-    
-        
-        # Salva em memória
-        buffer = BytesIO()
-        wb.save(buffer)
-        buffer.seek(0)
-        
-        # Botão direto de download
-        st.download_button(
+        # Botão de download (o arquivo só é montado quando pedido)
+        botao_download(
             label="📥 Baixar Excel",
-            data=buffer,
+            gerar=gerar_excel_vendas_metas,
+            dados=(df_exibir, linha_desejavel, estilos_final),
+            opcoes=perc_desejavel,
             file_name="vendas_formatado.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            key="dl_vendas_metas",
         )
     # ======================
     # 📝 Relatórios Financeiros
@@ -1926,24 +1869,11 @@ with st.spinner("⏳ Processando..."):
             
             
             # Corrige valores e datas
-            df_relatorio["Valor (R$)"] = (
-                df_relatorio["Valor (R$)"].astype(str)
-                .str.replace("R$", "", regex=False)
-                .str.replace("(", "-")
-                .str.replace(")", "")
-                .str.replace(" ", "")
-                .str.replace(".", "")
-                .str.replace(",", ".")
-                .replace("-", "0")
-                #.astype(float)
-            )
-            #df_relatorio["Data"] = pd.to_datetime(df_relatorio["Data"], dayfirst=True, errors="coerce")
-
-            df_relatorio["Valor (R$)"] = pd.to_numeric(df_relatorio["Valor (R$)"], errors="coerce").fillna(0)
+            df_relatorio["Valor (R$)"] = para_float_br(df_relatorio["Valor (R$)"]).fillna(0)
             
             # Datas mínimas e máximas
             # Converte coluna Data para datetime de forma segura
-            df_relatorio["Data"] = pd.to_datetime(df_relatorio["Data"], dayfirst=True, errors="coerce")
+            df_relatorio["Data"] = para_data_br(df_relatorio["Data"])
             
             # Remove linhas sem Data se necessário (opcional)
             df_relatorio = df_relatorio.dropna(subset=["Data"])
@@ -2056,60 +1986,30 @@ with st.spinner("⏳ Processando..."):
             
                 st.dataframe(df_pivot_total, use_container_width=True)
     
-            import xlsxwriter
-            from io import BytesIO
-            
             # === Prepara dados para exportar
             df_export = df_pivot_total.copy()
             
             # === Remove o símbolo R$ e converte para número para aplicar formato corretamente no Excel
             colunas_valores = [col for col in df_export.columns if "Vendas" in col or "Total Vendas" in col]
             for col in colunas_valores:
-                df_export[col] = (
-                    df_export[col].astype(str)
-                    .str.replace("R$", "", regex=False)
-                    .str.replace(" ", "", regex=False)
-                    .str.replace(".", "", regex=False)
-                    .str.replace(",", ".", regex=False)
-                )
-                df_export[col] = pd.to_numeric(df_export[col], errors="coerce").fillna(0.0)
+                df_export[col] = para_float_br(df_export[col]).fillna(0.0)
             
             # === Gera arquivo Excel com formatação
-            output = BytesIO()
-            workbook = xlsxwriter.Workbook(output, {'in_memory': True})
-            worksheet = workbook.add_worksheet("Vendas")
-            
-            # === Formatos
-            formato_header = workbook.add_format({'bold': True, 'bg_color': '#CCCCCC'})
-            formato_reais = workbook.add_format({'num_format': 'R$ #,##0.00'})
-            
-            # === Escreve cabeçalhos
-            for col_idx, col_name in enumerate(df_export.columns):
-                worksheet.write(0, col_idx, col_name, formato_header)
-            
-            # === Escreve dados com formatação de reais
-            for row_idx, row in enumerate(df_export.itertuples(index=False), start=1):
-                for col_idx, value in enumerate(row):
-                    col_name = df_export.columns[col_idx]
-                    if col_name in colunas_valores:
-                        worksheet.write_number(row_idx, col_idx, value, formato_reais)
-                    else:
-                        worksheet.write(row_idx, col_idx, value)
-            
-            # === Ajusta larguras das colunas
-            for i, col in enumerate(df_export.columns):
-                max_width = max(df_export[col].astype(str).map(len).max(), len(col)) + 2
-                worksheet.set_column(i, i, max_width)
-            
-            workbook.close()
-            output.seek(0)
+            def gerar_excel():
+                return exportar_excel(
+                    df_export, aba="Vendas",
+                    formatos_coluna={c: FORMATO_REAIS for c in colunas_valores},
+                    larguras="auto",
+                )
             
             # === Botão de download
-            st.download_button(
+            botao_download(
                 label="⬇️ Baixar Excel",
-                data=output,
+                gerar=gerar_excel,
+                dados=df_export,
                 file_name="Vendas_Meio_Pagamento.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                key="dl_vendas_meio_pagamento",
             )
     
             # === ABA PRAZO E TAXAS ===
@@ -2187,9 +2087,6 @@ with st.spinner("⏳ Processando..."):
                 st.dataframe(df_pivot_exibe, use_container_width=True)
     
     
-                import xlsxwriter
-                from io import BytesIO
-                
                 # Cópia do DataFrame
                 df_export = df_pivot_total.copy()
                 
@@ -2213,71 +2110,35 @@ with st.spinner("⏳ Processando..."):
                     "Vendas", "Vlr Taxa Bandeira", "Vlr Taxa Antecipação", "Total"
                 ])]
                 
-                # Geração do Excel
-                output = BytesIO()
-                workbook = xlsxwriter.Workbook(output, {'in_memory': True})
-                worksheet = workbook.add_worksheet("Prazo e Taxas")
-                
-                # Formatos
-                formato_header = workbook.add_format({'bold': True, 'bg_color': '#CCCCCC'})
-                formato_reais = workbook.add_format({'num_format': 'R$ #,##0.00'})
-                formato_percentual = workbook.add_format({'num_format': '0.00%'})
-                formato_inteiro = workbook.add_format({'num_format': '0'})
-                formato_texto = workbook.add_format()
-                
-                # Cabeçalhos
-                for col_idx, col_name in enumerate(df_export.columns):
-                    worksheet.write(0, col_idx, col_name, formato_header)
-                
-                # Conteúdo
-                for row_idx, row in enumerate(df_export.itertuples(index=False), start=1):
-                    for col_idx, value in enumerate(row):
-                        col_name = df_export.columns[col_idx]
-                
-                        if col_name == "Prazo":
-                            worksheet.write_number(row_idx, col_idx, value, formato_inteiro)
-                        elif col_name in ["Taxa Bandeira", "Taxa Antecipação"]:
-                            worksheet.write_number(row_idx, col_idx, value, formato_percentual)
-                        elif col_name in colunas_valores:
-                            worksheet.write_number(row_idx, col_idx, value, formato_reais)
-                        else:
-                            worksheet.write(row_idx, col_idx, str(value), formato_texto)
-                
-                # Ajusta largura
-                for i, col in enumerate(df_export.columns):
-                    max_width = max(df_export[col].astype(str).map(len).max(), len(col)) + 2
-                    worksheet.set_column(i, i, max_width)
-                
-                workbook.close()
-                output.seek(0)
+                # Geração do Excel (demais colunas como texto, igual à tela)
+                formatos_coluna = {c: FORMATO_REAIS for c in colunas_valores}
+                formatos_coluna.update({"Prazo": FORMATO_INTEIRO,
+                                        "Taxa Bandeira": FORMATO_PERCENTUAL,
+                                        "Taxa Antecipação": FORMATO_PERCENTUAL})
+                for col in df_export.columns:
+                    if col not in formatos_coluna:
+                        df_export[col] = df_export[col].astype(str)
+                def gerar_excel():
+                    return exportar_excel(df_export, aba="Prazo e Taxas", formatos_coluna=formatos_coluna, larguras="auto")
                 
                 # Botão de download
-                st.download_button(
+                botao_download(
                     label="⬇️ Baixar Excel",
-                    data=output,
+                    gerar=gerar_excel,
+                    dados=df_export,
                     file_name="Prazo_Taxas.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    key="dl_prazo_taxas",
                 )
     
     
             # === ABA FINANCEIRO ===
             with aba_financeiro:
-                df_completo = df_filtrado.merge(
-                    df_meio_pagamento[["Meio de Pagamento", "Prazo", "Antecipa S/N"]],
-                    on="Meio de Pagamento",
-                    how="left"
-                )
-                df_completo["Prazo"] = pd.to_numeric(df_completo["Prazo"], errors="coerce").fillna(0).astype(int)
-                df_completo["Antecipa S/N"] = df_completo["Antecipa S/N"].astype(str).str.upper().str.strip()
-    
-                from pandas.tseries.offsets import BDay
-                df_completo["Data Recebimento"] = df_completo.apply(
-                    lambda row: row["Data"] + BDay(1) if row["Antecipa S/N"] == "SIM" else row["Data"] + BDay(row["Prazo"]),
-                    axis=1
-                )
+                # Data + Prazo (ou antecipação) em dias úteis, com feriados
+                df_completo = projetar_recebimentos(df_filtrado, df_meio_pagamento)
     
-                df_financeiro = df_completo.groupby(df_completo["Data Recebimento"].dt.date)["Valor (R$)"].sum().reset_index()
-                df_financeiro = df_financeiro.rename(columns={"Data Recebimento": "Data"})
+                df_financeiro = df_completo.groupby(df_completo["Data Prevista"].dt.date)["Valor (R$)"].sum().reset_index()
+                df_financeiro = df_financeiro.rename(columns={"Data Prevista": "Data"})
     
                 total_geral = df_financeiro["Valor (R$)"].sum()
                 linha_total = pd.DataFrame([["TOTAL GERAL", total_geral]], columns=df_financeiro.columns)
@@ -2291,68 +2152,32 @@ with st.spinner("⏳ Processando..."):
     
     
         
-                import xlsxwriter
-                from io import BytesIO
-                
                 # === Corrige valores para float e converte a coluna Data para datetime
                 df_export = df_financeiro_total.copy()
                 
                 # Trata "Valor (R$)"
-                df_export["Valor (R$)"] = (
-                    df_export["Valor (R$)"]
-                    .astype(str)
-                    .str.replace("R$", "", regex=False)
-                    .str.replace(" ", "", regex=False)
-                    .str.replace(".", "", regex=False)
-                    .str.replace(",", ".", regex=False)
-                )
-                df_export["Valor (R$)"] = pd.to_numeric(df_export["Valor (R$)"], errors="coerce").fillna(0.0)
+                df_export["Valor (R$)"] = para_float_br(df_export["Valor (R$)"]).fillna(0.0)
                 
-                # Converte coluna "Data" para datetime (exceto TOTAL GERAL)
-                df_export["Data"] = pd.to_datetime(df_export["Data"], errors="coerce")
+                # Converte coluna "Data" para datetime (exceto TOTAL GERAL, que fica como texto)
+                datas = pd.to_datetime(df_export["Data"], errors="coerce")
+                df_export["Data"] = datas.astype(object).where(datas.notna(), "TOTAL GERAL")
                 
                 # Gera arquivo Excel com formatação
-                output = BytesIO()
-                workbook = xlsxwriter.Workbook(output, {'in_memory': True})
-                worksheet = workbook.add_worksheet("Financeiro")
-                
-                # Formatos
-                formato_header = workbook.add_format({'bold': True, 'bg_color': '#CCCCCC'})
-                formato_reais = workbook.add_format({'num_format': 'R$ #,##0.00'})
-                formato_data = workbook.add_format({'num_format': 'dd/mm/yyyy'})
-                
-                # Escreve cabeçalhos
-                for col_idx, col_name in enumerate(df_export.columns):
-                    worksheet.write(0, col_idx, col_name, formato_header)
-                
-                # Escreve dados
-                for row_idx, row in enumerate(df_export.itertuples(index=False), start=1):
-                    for col_idx, value in enumerate(row):
-                        col_name = df_export.columns[col_idx]
-                        if col_name == "Valor (R$)":
-                            worksheet.write_number(row_idx, col_idx, value, formato_reais)
-                        elif col_name == "Data":
-                            if pd.notnull(value):
-                                worksheet.write_datetime(row_idx, col_idx, value, formato_data)
-                            else:
-                                worksheet.write(row_idx, col_idx, "TOTAL GERAL")
-                        else:
-                            worksheet.write(row_idx, col_idx, value)
-                
-                # Ajusta largura das colunas
-                for i, col in enumerate(df_export.columns):
-                    max_width = max(df_export[col].astype(str).map(len).max(), len(col)) + 2
-                    worksheet.set_column(i, i, max_width)
-                
-                workbook.close()
-                output.seek(0)
+                def gerar_excel():
+                    return exportar_excel(
+                        df_export, aba="Financeiro",
+                        formatos_coluna={"Valor (R$)": FORMATO_REAIS, "Data": FORMATO_DATA},
+                        larguras="auto",
+                    )
                 
                 # Botão de download
-                st.download_button(
+                botao_download(
                     label="⬇️ Baixar Excel",
-                    data=output,
+                    gerar=gerar_excel,
+                    dados=df_export,
                     file_name="Financeiro Recebimento.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    key="dl_financeiro",
                 )
     
             # ========================
@@ -2385,6 +2210,8 @@ with st.spinner("⏳ Processando..."):
                 data_final = df_fat["Data"].max()
                 data_inicial = data_final - pd.Timedelta(days=30)
                 df_30dias = df_fat[(df_fat["Data"] >= data_inicial) & (df_fat["Data"] <= data_final)].copy()
+                # feriado não é um dia da semana típico: fora da média
+                df_30dias = df_30dias[~eh_feriado(df_30dias["Data"])]
             
                 # Traduz dia da semana
                 dias_semana = {
@@ -2399,16 +2226,7 @@ with st.spinner("⏳ Processando..."):
                 df_30dias["Dia da Semana"] = df_30dias["Data"].dt.day_name().map(dias_semana)
             
                 # Limpa e converte valores
-                df_30dias["Valor (R$)"] = (
-                    df_30dias["Valor (R$)"]
-                    .astype(str)
-                    .str.replace("R$", "", regex=False)
-                    .str.replace(" ", "", regex=False)
-                    .str.replace(".", "", regex=False)
-                    .str.replace(",", ".", regex=False)
-                )
-                df_30dias = df_30dias[df_30dias["Valor (R$)"].str.strip() != ""]
-                df_30dias["Valor (R$)"] = pd.to_numeric(df_30dias["Valor (R$)"], errors="coerce")
+                df_30dias["Valor (R$)"] = para_float_br(df_30dias["Valor (R$)"])
                 df_30dias = df_30dias.dropna(subset=["Valor (R$)"])
             
                 # Seleciona colunas
@@ -2421,15 +2239,11 @@ with st.spinner("⏳ Processando..."):
                 df_fc = df_fc.merge(df_empresa[["Loja", "Grupo", "Tipo"]], on="Loja", how="left")
             
                 # Define ID FC
-                def definir_id_fc(row):
-                    if row["Tipo"] == "Airports":
-                        return row["Código Grupo Everest"]
-                    elif row["Tipo"] in ["Koop - Airports", "On-Premise"]:
-                        return row["Código Everest"]
-                    else:
-                        return None
-            
-                df_fc["ID FC"] = df_fc.apply(definir_id_fc, axis=1)
+                df_fc["ID FC"] = np.select(
+                    [df_fc["Tipo"].eq("Airports"), df_fc["Tipo"].isin(["Koop - Airports", "On-Premise"])],
+                    [df_fc["Código Grupo Everest"].astype(object), df_fc["Código Everest"].astype(object)],
+                    default=None,
+                )
             
                 # Agrupa e calcula média
                 df_resultado = (
@@ -2449,57 +2263,26 @@ with st.spinner("⏳ Processando..."):
             
                 # Exibe
                 st.dataframe(df_resultado, use_container_width=True)
-                import xlsxwriter
-                from io import BytesIO
-                
                 # === Corrige valores para float antes de exportar
                 df_export = df_resultado.copy()
-                df_export["Faturamento Médio"] = (
-                    df_export["Faturamento Médio"]
-                    .astype(str)
-                    .str.replace("R$", "", regex=False)
-                    .str.replace(" ", "", regex=False)
-                    .str.replace(".", "", regex=False)
-                    .str.replace(",", ".", regex=False)
-                )
-                
-                df_export["Faturamento Médio"] = pd.to_numeric(df_export["Faturamento Médio"], errors="coerce").fillna(0.0)
+                df_export["Faturamento Médio"] = para_float_br(df_export["Faturamento Médio"]).fillna(0.0)
                             
                 # Gera arquivo Excel com formatação
-                output = BytesIO()
-                workbook = xlsxwriter.Workbook(output, {'in_memory': True})
-                worksheet = workbook.add_worksheet("Previsão FC")
-                
-                # Formatos
-                formato_header = workbook.add_format({'bold': True, 'bg_color': '#CCCCCC'})
-                formato_reais = workbook.add_format({'num_format': 'R$ #,##0.00'})
-                
-                # Escreve cabeçalhos
-                for col_idx, col_name in enumerate(df_export.columns):
-                    worksheet.write(0, col_idx, col_name, formato_header)
-                
-                # Escreve dados com formatação de reais
-                for row_idx, row in enumerate(df_export.itertuples(index=False), start=1):
-                    for col_idx, value in enumerate(row):
-                        if df_export.columns[col_idx] == "Faturamento Médio":
-                            worksheet.write_number(row_idx, col_idx, value, formato_reais)
-                        else:
-                            worksheet.write(row_idx, col_idx, value)
-                
-                # Ajusta largura
-                for i, col in enumerate(df_export.columns):
-                    max_width = max(df_export[col].astype(str).map(len).max(), len(col)) + 2
-                    worksheet.set_column(i, i, max_width)
-                
-                workbook.close()
-                output.seek(0)
+                def gerar_excel():
+                    return exportar_excel(
+                        df_export, aba="Previsão FC",
+                        formatos_coluna={"Faturamento Médio": FORMATO_REAIS},
+                        larguras="auto",
+                    )
                 
                 # Botão de download
-                st.download_button(
+                botao_download(
                     label="⬇️ Baixar Excel",
-                    data=output,
+                    gerar=gerar_excel,
+                    dados=df_export,
                     file_name="Previsao_FC.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    key="dl_previsao_fc",
                 )
     
     
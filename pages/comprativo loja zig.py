@@ -1,22 +1,15 @@
 import streamlit as st
-import requests
 import pandas as pd
 from datetime import date, datetime, timedelta
 from io import BytesIO
 
+from comum.zig import (
+    Consulta, EstatisticasCache, buscar_lojas, executar_consultas, resultado_get, resultado_paginado
+)
+
 st.set_page_config(page_title="ZIG - Venda Completa", layout="wide")
 st.title("🧪 ZIG - Venda Completa Detalhada")
 
-token = st.secrets["zig"]["token"]
-rede = st.secrets["zig"]["rede"]
-
-headers = {
-    "Authorization": token,
-    "Accept": "application/json"
-}
-
-base_url = "https://api.zigcore.com.br/integration"
-
 
 def gerar_periodos_1_dia(data_inicio, data_fim):
     periodos = []
@@ -29,54 +22,6 @@ def gerar_periodos_1_dia(data_inicio, data_fim):
     return periodos
 
 
-def buscar_get(endpoint, params, timeout=60):
-    try:
-        resp = requests.get(
-            f"{base_url}{endpoint}",
-            headers=headers,
-            params=params,
-            timeout=timeout
-        )
-
-        if resp.status_code != 200:
-            return [], f"Erro {resp.status_code}: {resp.text}"
-
-        dados = resp.json()
-
-        if isinstance(dados, list):
-            return dados, None
-
-        if isinstance(dados, dict):
-            return [dados], None
-
-        return [], "Retorno inválido"
-
-    except Exception as e:
-        return [], str(e)
-
-
-def buscar_paginado(endpoint, params_base, max_paginas=100):
-    todos = []
-    erros = []
-
-    for page in range(1, max_paginas + 1):
-        params = params_base.copy()
-        params["page"] = page
-
-        dados, erro = buscar_get(endpoint, params)
-
-        if erro:
-            erros.append(erro)
-            break
-
-        if not dados:
-            break
-
-        todos.extend(dados)
-
-    return todos, erros
-
-
 def centavos(valor):
     return float(valor or 0) / 100
 
@@ -105,19 +50,13 @@ if st.button("🔍 Gerar Venda Completa"):
         st.error("A data inicial não pode ser maior que a data final.")
         st.stop()
 
-    resp_lojas = requests.get(
-        f"{base_url}/erp/lojas",
-        headers=headers,
-        params={"rede": rede},
-        timeout=30
-    )
+    lojas, erro_lojas = buscar_lojas()
 
-    if resp_lojas.status_code != 200:
+    if erro_lojas:
         st.error("Erro ao buscar lojas")
-        st.text(resp_lojas.text)
+        st.text(erro_lojas)
         st.stop()
 
-    lojas = resp_lojas.json()
     datas = gerar_periodos_1_dia(dtinicio, dtfim)
 
     produtos = []
@@ -127,9 +66,28 @@ if st.button("🔍 Gerar Venda Completa"):
     notas = []
     erros = []
 
-    total_consultas = len(lojas) * len(datas)
+    # Chamadas de todas as lojas/dias em paralelo; o laço abaixo consome na ordem original
+    consultas = []
+    for loja in lojas:
+        for data_ref in datas:
+            data_str = data_ref.strftime("%Y-%m-%d")
+            params = {"dtinicio": data_str, "dtfim": data_str, "loja": loja.get("id")}
+            consultas += [
+                Consulta("/erp/saida-produtos", params),
+                Consulta("/erp/compradores", params),
+                Consulta("/erp/faturamento", params),
+                Consulta("/erp/faturamento/detalhesMaquinaIntegrada", params),
+                Consulta("/erp/invoice", params, paginado=True),
+            ]
+
     progresso = st.progress(0)
-    contador = 0
+    estatisticas_cache = EstatisticasCache()
+    resultados = executar_consultas(
+        consultas,
+        ao_progredir=lambda feitas, total: progresso.progress(feitas / total),
+        estatisticas=estatisticas_cache
+    )
+    st.caption(estatisticas_cache.resumo())
 
     for loja in lojas:
         loja_id = loja.get("id")
@@ -138,9 +96,6 @@ if st.button("🔍 Gerar Venda Completa"):
         for data_ref in datas:
             data_str = data_ref.strftime("%Y-%m-%d")
 
-            contador += 1
-            progresso.progress(contador / total_consultas)
-
             params = {
                 "dtinicio": data_str,
                 "dtfim": data_str,
@@ -148,7 +103,7 @@ if st.button("🔍 Gerar Venda Completa"):
             }
 
             # PRODUTOS
-            dados, erro = buscar_get("/erp/saida-produtos", params)
+            dados, erro = resultado_get(resultados, "/erp/saida-produtos", params)
 
             if erro:
                 erros.append({
@@ -200,7 +155,7 @@ if st.button("🔍 Gerar Venda Completa"):
                     })
 
             # COMPRADORES / GORJETA
-            dados, erro = buscar_get("/erp/compradores", params)
+            dados, erro = resultado_get(resultados, "/erp/compradores", params)
 
             if erro:
                 erros.append({
@@ -230,7 +185,7 @@ if st.button("🔍 Gerar Venda Completa"):
                     })
 
             # FATURAMENTO
-            dados, erro = buscar_get("/erp/faturamento", params)
+            dados, erro = resultado_get(resultados, "/erp/faturamento", params)
 
             if erro:
                 erros.append({
@@ -255,7 +210,7 @@ if st.button("🔍 Gerar Venda Completa"):
                     })
 
             # MÁQUINA INTEGRADA
-            dados, erro = buscar_get("/erp/faturamento/detalhesMaquinaIntegrada", params)
+            dados, erro = resultado_get(resultados, "/erp/faturamento/detalhesMaquinaIntegrada", params)
 
             if erro:
                 erros.append({
@@ -283,7 +238,7 @@ if st.button("🔍 Gerar Venda Completa"):
                             })
 
             # NOTAS FISCAIS
-            dados, erros_nf = buscar_paginado("/erp/invoice", params)
+            dados, erros_nf = resultado_paginado(resultados, "/erp/invoice", params)
 
             if erros_nf:
                 for erro_nf in erros_nf:
@@ -1,30 +1,12 @@
 import streamlit as st
 import pandas as pd
-import psycopg2
 from datetime import date, timedelta
 from io import BytesIO
 import uuid
 
-st.set_page_config(layout="wide", page_title="Diagnóstico Meio de Pagamento 3S")
+from comum.postgres import obter_conexao, devolver_conexao
 
-CERT_PATH = "aws-us-east-2-bundle.pem"
-
-def ensure_cert_written():
-    if "cert_written_diag" not in st.session_state:
-        with open(CERT_PATH, "w", encoding="utf-8") as f:
-            f.write(st.secrets["certs"]["aws_rds_us_east_2"])
-        st.session_state["cert_written_diag"] = True
-
-def get_db_conn():
-    return psycopg2.connect(
-        host=st.secrets["db"]["host"],
-        port=st.secrets["db"]["port"],
-        dbname=st.secrets["db"]["database"],
-        user=st.secrets["db"]["user"],
-        password=st.secrets["db"]["password"],
-        sslmode="verify-full",
-        sslrootcert=CERT_PATH,
-    )
+st.set_page_config(layout="wide", page_title="Diagnóstico Meio de Pagamento 3S")
 
 def _make_excel_safe(df: pd.DataFrame) -> pd.DataFrame:
     df_safe = df.copy()
@@ -52,7 +34,6 @@ def df_to_excel_bytes(df: pd.DataFrame, sheet_name="data"):
     return output.getvalue()
 
 # ========================
-ensure_cert_written()
 
 st.title("Diagnóstico: Meio de Pagamento vazio por loja (3S)")
 
@@ -71,7 +52,7 @@ if st.button("🔍 Consultar", type="primary"):
 
     loja_norm = loja.strip().lstrip("0")
 
-    conn = get_db_conn()
+    conn = obter_conexao()
     try:
         with st.spinner("Buscando order_picture..."):
             # Todas as colunas de order_picture
@@ -166,4 +147,4 @@ if st.button("🔍 Consultar", type="primary"):
     except Exception as e:
         st.error(f"Erro: {e}")
     finally:
-        conn.close()
+        devolver_conexao(conn)
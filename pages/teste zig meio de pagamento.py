@@ -1,5 +1,4 @@
 import streamlit as st
-import requests
 import pandas as pd
 import numpy as np
 import re
@@ -10,6 +9,9 @@ from io import BytesIO
 import gspread
 from oauth2client.service_account import ServiceAccountCredentials
 
+from comum.tabela_empresa import carregar_tabela_empresa
+from comum.zig import Consulta, EstatisticasCache, buscar_lojas, executar_consultas, resultado_get
+
 st.set_page_config(page_title="Teste ZIG Meio Pagamento", layout="wide")
 st.title("🧪 Teste ZIG - Meio de Pagamento")
 
@@ -45,8 +47,7 @@ gc = gspread.authorize(credentials)
 
 planilha = gc.open("Tabelas")
 
-df_empresa = pd.DataFrame(planilha.worksheet("Tabela Empresa").get_all_records())
-df_empresa.columns = [str(c).strip() for c in df_empresa.columns]
+df_empresa = carregar_tabela_empresa("Tabelas")
 
 df_meio_pgto_google = pd.DataFrame(planilha.worksheet("Tabela Meio Pagamento").get_all_records())
 df_meio_pgto_google.columns = [str(c).strip() for c in df_meio_pgto_google.columns]
@@ -63,20 +64,6 @@ if "Loja" in df_empresa.columns:
     df_empresa["Loja"] = df_empresa["Loja"].astype(str).str.strip().str.lower()
 
 
-# ======================
-# ZIG
-# ======================
-token = st.secrets["zig"]["token"]
-rede = st.secrets["zig"]["rede"]
-
-headers = {
-    "Authorization": token,
-    "Accept": "application/json"
-}
-
-base_url = "https://api.zigcore.com.br/integration"
-
-
 col1, col2 = st.columns(2)
 
 with col1:
@@ -92,20 +79,31 @@ if st.button("🔄 Buscar ZIG Meio de Pagamento"):
         st.error("A data inicial não pode ser maior que a data final.")
         st.stop()
 
-    resp_lojas = requests.get(
-        f"{base_url}/erp/lojas",
-        headers=headers,
-        params={"rede": rede},
-        timeout=30
-    )
+    lojas, erro_lojas = buscar_lojas()
 
-    if resp_lojas.status_code != 200:
+    if erro_lojas:
         st.error("Erro ao buscar lojas ZIG")
         st.stop()
 
-    lojas = resp_lojas.json()
     periodos = gerar_periodos_1_dia(dtinicio, dtfim)
 
+    def params_bloco(loja_id, inicio_bloco, fim_bloco):
+        return {
+            "dtinicio": inicio_bloco.strftime("%Y-%m-%d"),
+            "dtfim": fim_bloco.strftime("%Y-%m-%d"),
+            "loja": loja_id
+        }
+
+    endpoint = "/erp/faturamento/detalhesMaquinaIntegrada"
+    progresso = st.progress(0)
+    estatisticas_cache = EstatisticasCache()
+    resultados = executar_consultas(
+        [Consulta(endpoint, params_bloco(loja.get("id"), i, f)) for loja in lojas for i, f in periodos],
+        ao_progredir=lambda feitas, total: progresso.progress(feitas / total),
+        estatisticas=estatisticas_cache
+    )
+    st.caption(estatisticas_cache.resumo())
+
     registros = []
     lojas_sem_movimento = []
 
@@ -116,23 +114,9 @@ if st.button("🔄 Buscar ZIG Meio de Pagamento"):
 
         for inicio_bloco, fim_bloco in periodos:
 
-            resp = requests.get(
-                f"{base_url}/erp/faturamento/detalhesMaquinaIntegrada",
-                headers=headers,
-                params={
-                    "dtinicio": inicio_bloco.strftime("%Y-%m-%d"),
-                    "dtfim": fim_bloco.strftime("%Y-%m-%d"),
-                    "loja": loja_id
-                },
-                timeout=60
-            )
-
-            if resp.status_code != 200:
-                continue
-
-            dados = resp.json()
+            dados, erro = resultado_get(resultados, endpoint, params_bloco(loja_id, inicio_bloco, fim_bloco))
 
-            if not isinstance(dados, list):
+            if erro:
                 continue
 
             if len(dados) > 0:
@@ -3,24 +3,13 @@ import requests
 import pandas as pd
 from datetime import date, datetime, timedelta
 from io import BytesIO
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
-import json
+
+from comum.tabela_empresa import carregar_tabela_empresa
 
 st.set_page_config(page_title="Teste ZIG Final", layout="wide")
 st.title("🧪 Teste ZIG - Padrão Final")
 
-scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-credentials_dict = json.loads(st.secrets["GOOGLE_SERVICE_ACCOUNT"])
-credentials = ServiceAccountCredentials.from_json_keyfile_dict(credentials_dict, scope)
-gc = gspread.authorize(credentials)
-
-planilha_empresa = gc.open("Vendas diarias")
-aba_empresa = planilha_empresa.worksheet("Tabela Empresa")
-valores_empresa = aba_empresa.get_all_values()
-
-df_empresa = pd.DataFrame(valores_empresa[1:], columns=valores_empresa[0])
-df_empresa.columns = df_empresa.columns.str.strip()
+df_empresa = carregar_tabela_empresa()
 df_empresa["Loja"] = df_empresa["Loja"].astype(str).str.lower().str.strip()
 
 token = st.secrets["zig"]["token"]
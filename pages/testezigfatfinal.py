@@ -1,22 +1,15 @@
 import streamlit as st
-import requests
 import pandas as pd
 from datetime import date, datetime, timedelta
 from io import BytesIO
 
+from comum.zig import (
+    Consulta, EstatisticasCache, buscar_lojas, executar_consultas, resultado_get, resultado_paginado
+)
+
 st.set_page_config(page_title="ZIG - Auditoria Todas as Tabelas", layout="wide")
 st.title("🧪 ZIG - Auditoria de Todas as Tabelas por Período")
 
-token = st.secrets["zig"]["token"]
-rede = st.secrets["zig"]["rede"]
-
-headers = {
-    "Authorization": token,
-    "Accept": "application/json"
-}
-
-base_url = "https://api.zigcore.com.br/integration"
-
 
 def gerar_periodos_1_dia(data_inicio, data_fim):
     periodos = []
@@ -29,54 +22,6 @@ def gerar_periodos_1_dia(data_inicio, data_fim):
     return periodos
 
 
-def buscar_get(endpoint, params, timeout=60):
-    try:
-        resp = requests.get(
-            f"{base_url}{endpoint}",
-            headers=headers,
-            params=params,
-            timeout=timeout
-        )
-
-        if resp.status_code != 200:
-            return [], f"Erro {resp.status_code}: {resp.text}"
-
-        dados = resp.json()
-
-        if isinstance(dados, list):
-            return dados, None
-
-        if isinstance(dados, dict):
-            return [dados], None
-
-        return [], "Retorno não é lista nem dicionário"
-
-    except Exception as e:
-        return [], str(e)
-
-
-def buscar_paginado(endpoint, params_base, campo_page="page", max_paginas=100):
-    todos = []
-    erros = []
-
-    for page in range(1, max_paginas + 1):
-        params = params_base.copy()
-        params[campo_page] = page
-
-        dados, erro = buscar_get(endpoint, params)
-
-        if erro:
-            erros.append(f"Página {page}: {erro}")
-            break
-
-        if not dados:
-            break
-
-        todos.extend(dados)
-
-    return todos, erros
-
-
 def normalizar_lista(registros):
     if not registros:
         return pd.DataFrame()
@@ -148,20 +93,13 @@ if st.button("🔍 Buscar todas as tabelas ZIG"):
         st.error("A data inicial não pode ser maior que a data final.")
         st.stop()
 
-    resp_lojas = requests.get(
-        f"{base_url}/erp/lojas",
-        headers=headers,
-        params={"rede": rede},
-        timeout=30
-    )
+    lojas, erro_lojas = buscar_lojas()
 
-    if resp_lojas.status_code != 200:
+    if erro_lojas:
         st.error("Erro ao buscar lojas ZIG")
-        st.text(resp_lojas.text)
+        st.text(erro_lojas)
         st.stop()
 
-    lojas = resp_lojas.json()
-
     if not isinstance(lojas, list) or not lojas:
         st.warning("Nenhuma loja encontrada.")
         st.stop()
@@ -179,9 +117,32 @@ if st.button("🔍 Buscar todas as tabelas ZIG"):
     registros_recharges = []
     erros_gerais = []
 
-    total_consultas = len(lojas) * len(periodos)
+    # Todas as chamadas (lojas × dias × endpoints) saem em paralelo;
+    # o laço abaixo só consome os resultados, na ordem original.
+    consultas = []
+    for loja in lojas:
+        for inicio, fim in periodos:
+            data_str = inicio.strftime("%Y-%m-%d")
+            params_periodo = {"dtinicio": data_str, "dtfim": data_str, "loja": loja.get("id")}
+            params_checkins = {"desde": data_str, "dtfim": data_str, "loja": loja.get("id")}
+            consultas += [
+                Consulta("/erp/saida-produtos", params_periodo),
+                Consulta("/erp/compradores", params_periodo),
+                Consulta("/erp/faturamento", params_periodo),
+                Consulta("/erp/faturamento/detalhesMaquinaIntegrada", params_periodo),
+                Consulta("/erp/invoice", params_periodo, paginado=True),
+                Consulta("/erp/checkins", params_checkins, paginado=True),
+                Consulta("/erp/recharges", params_periodo),
+            ]
+
     progresso = st.progress(0)
-    contador = 0
+    estatisticas_cache = EstatisticasCache()
+    resultados = executar_consultas(
+        consultas,
+        ao_progredir=lambda feitas, total: progresso.progress(feitas / total),
+        estatisticas=estatisticas_cache
+    )
+    st.caption(estatisticas_cache.resumo())
 
     for loja in lojas:
         loja_id = loja.get("id")
@@ -195,9 +156,6 @@ if st.button("🔍 Buscar todas as tabelas ZIG"):
         for inicio, fim in periodos:
             data_str = inicio.strftime("%Y-%m-%d")
 
-            contador += 1
-            progresso.progress(contador / total_consultas)
-
             params_periodo = {
                 "dtinicio": data_str,
                 "dtfim": data_str,
@@ -208,7 +166,7 @@ if st.button("🔍 Buscar todas as tabelas ZIG"):
             # 1. SAÍDA DE PRODUTOS
             # ==========================
             endpoint = "/erp/saida-produtos"
-            dados, erro = buscar_get(endpoint, params_periodo)
+            dados, erro = resultado_get(resultados, endpoint, params_periodo)
 
             if erro:
                 erros_gerais.append({
@@ -227,7 +185,7 @@ if st.button("🔍 Buscar todas as tabelas ZIG"):
             # 2. COMPRADORES
             # ==========================
             endpoint = "/erp/compradores"
-            dados, erro = buscar_get(endpoint, params_periodo)
+            dados, erro = resultado_get(resultados, endpoint, params_periodo)
 
             if erro:
                 erros_gerais.append({
@@ -246,7 +204,7 @@ if st.button("🔍 Buscar todas as tabelas ZIG"):
             # 3. FATURAMENTO
             # ==========================
             endpoint = "/erp/faturamento"
-            dados, erro = buscar_get(endpoint, params_periodo)
+            dados, erro = resultado_get(resultados, endpoint, params_periodo)
 
             if erro:
                 erros_gerais.append({
@@ -265,7 +223,7 @@ if st.button("🔍 Buscar todas as tabelas ZIG"):
             # 4. MÁQUINA INTEGRADA
             # ==========================
             endpoint = "/erp/faturamento/detalhesMaquinaIntegrada"
-            dados, erro = buscar_get(endpoint, params_periodo)
+            dados, erro = resultado_get(resultados, endpoint, params_periodo)
 
             if erro:
                 erros_gerais.append({
@@ -294,7 +252,7 @@ if st.button("🔍 Buscar todas as tabelas ZIG"):
             # 5. NOTAS FISCAIS
             # ==========================
             endpoint = "/erp/invoice"
-            dados, erros = buscar_paginado(endpoint, params_periodo)
+            dados, erros = resultado_paginado(resultados, endpoint, params_periodo)
 
             if erros:
                 for erro in erros:
@@ -321,7 +279,7 @@ if st.button("🔍 Buscar todas as tabelas ZIG"):
                 "loja": loja_id
             }
 
-            dados, erros = buscar_paginado(endpoint, params_checkins)
+            dados, erros = resultado_paginado(resultados, endpoint, params_checkins)
 
             if erros:
                 for erro in erros:
@@ -341,7 +299,7 @@ if st.button("🔍 Buscar todas as tabelas ZIG"):
             # 7. RECARGAS
             # ==========================
             endpoint = "/erp/recharges"
-            dados, erro = buscar_get(endpoint, params_periodo)
+            dados, erro = resultado_get(resultados, endpoint, params_periodo)
 
             if erro:
                 erros_gerais.append({
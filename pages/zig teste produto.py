@@ -1,48 +1,27 @@
 import streamlit as st
-import requests
 import pandas as pd
 import numpy as np
 from datetime import date, datetime, timedelta
 from io import BytesIO
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
-import json
+
+from comum.tabela_empresa import carregar_tabela_empresa
+from comum.zig import Consulta, EstatisticasCache, buscar_lojas, executar_consultas, resultado_get
 
 st.set_page_config(page_title="Teste ZIG Produtos", layout="wide")
 st.title("🧪 Teste ZIG - Faturamento + Produtos + Ticket")
 
-scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-credentials_dict = json.loads(st.secrets["GOOGLE_SERVICE_ACCOUNT"])
-credentials = ServiceAccountCredentials.from_json_keyfile_dict(credentials_dict, scope)
-gc = gspread.authorize(credentials)
-
-planilha_empresa = gc.open("Vendas diarias")
-aba_empresa = planilha_empresa.worksheet("Tabela Empresa")
-valores_empresa = aba_empresa.get_all_values()
-
-df_empresa = pd.DataFrame(valores_empresa[1:], columns=valores_empresa[0])
-df_empresa.columns = df_empresa.columns.str.strip()
+df_empresa = carregar_tabela_empresa()
 df_empresa["Loja"] = df_empresa["Loja"].astype(str).str.lower().str.strip()
 
-token = st.secrets["zig"]["token"]
-rede = st.secrets["zig"]["rede"]
-
-headers = {
-    "Authorization": token,
-    "Accept": "application/json"
-}
-
-base_url = "https://api.zigcore.com.br/integration"
 
-
-def gerar_periodos_5_dias(data_inicio, data_fim):
+def gerar_periodos_1_dia(data_inicio, data_fim):
+    # o cliente ZIG (comum/zig.py) junta os dias em janelas maiores quando o volume permite
     periodos = []
     atual = data_inicio
 
     while atual <= data_fim:
-        fim_bloco = min(atual + timedelta(days=4), data_fim)
-        periodos.append((atual, fim_bloco))
-        atual = fim_bloco + timedelta(days=1)
+        periodos.append((atual, atual))
+        atual = atual + timedelta(days=1)
 
     return periodos
 
@@ -61,19 +40,34 @@ if st.button("🔄 Testar Faturamento + Produtos"):
         st.error("A data inicial não pode ser maior que a data final.")
         st.stop()
 
-    resp_lojas = requests.get(
-        f"{base_url}/erp/lojas",
-        headers=headers,
-        params={"rede": rede},
-        timeout=30
-    )
+    lojas, erro_lojas = buscar_lojas()
 
-    if resp_lojas.status_code != 200:
+    if erro_lojas:
         st.error("Erro ao buscar lojas ZIG")
         st.stop()
 
-    lojas = resp_lojas.json()
-    periodos = gerar_periodos_5_dias(dtinicio, dtfim)
+    periodos = gerar_periodos_1_dia(dtinicio, dtfim)
+
+    def params_bloco(loja_id, inicio_bloco, fim_bloco):
+        return {
+            "dtinicio": inicio_bloco.strftime("%Y-%m-%d"),
+            "dtfim": fim_bloco.strftime("%Y-%m-%d"),
+            "loja": loja_id
+        }
+
+    progresso = st.progress(0)
+    estatisticas_cache = EstatisticasCache()
+    resultados = executar_consultas(
+        [
+            Consulta(endpoint, params_bloco(loja.get("id"), i, f))
+            for loja in lojas
+            for i, f in periodos
+            for endpoint in ("/erp/faturamento", "/erp/saida-produtos")
+        ],
+        ao_progredir=lambda feitas, total: progresso.progress(feitas / total),
+        estatisticas=estatisticas_cache
+    )
+    st.caption(estatisticas_cache.resumo())
 
     registros_faturamento = []
     registros_produtos = []
@@ -86,21 +80,12 @@ if st.button("🔄 Testar Faturamento + Produtos"):
 
         for inicio_bloco, fim_bloco in periodos:
 
-            resp_fat = requests.get(
-                f"{base_url}/erp/faturamento",
-                headers=headers,
-                params={
-                    "dtinicio": inicio_bloco.strftime("%Y-%m-%d"),
-                    "dtfim": fim_bloco.strftime("%Y-%m-%d"),
-                    "loja": loja_id
-                },
-                timeout=60
+            dados_fat, erro_fat = resultado_get(
+                resultados, "/erp/faturamento", params_bloco(loja_id, inicio_bloco, fim_bloco)
             )
 
-            if resp_fat.status_code == 200:
-                dados_fat = resp_fat.json()
-
-                if isinstance(dados_fat, list) and len(dados_fat) > 0:
+            if not erro_fat:
+                if len(dados_fat) > 0:
                     teve_movimento = True
 
                     for item in dados_fat:
@@ -110,21 +95,12 @@ if st.button("🔄 Testar Faturamento + Produtos"):
                             "Fat.Total": float(item.get("value", 0) or 0) / 100
                         })
 
-            resp_prod = requests.get(
-                f"{base_url}/erp/saida-produtos",
-                headers=headers,
-                params={
-                    "dtinicio": inicio_bloco.strftime("%Y-%m-%d"),
-                    "dtfim": fim_bloco.strftime("%Y-%m-%d"),
-                    "loja": loja_id
-                },
-                timeout=60
+            dados_prod, erro_prod = resultado_get(
+                resultados, "/erp/saida-produtos", params_bloco(loja_id, inicio_bloco, fim_bloco)
             )
 
-            if resp_prod.status_code == 200:
-                dados_prod = resp_prod.json()
-
-                if isinstance(dados_prod, list) and len(dados_prod) > 0:
+            if not erro_prod:
+                if len(dados_prod) > 0:
                     teve_movimento = True
 
                     for item in dados_prod:
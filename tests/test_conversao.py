@@ -0,0 +1,144 @@
+"""
+comum.conversao x os parsers por célula (.apply) que as páginas usavam:
+mesmos resultados e, no valor em real, mais rápido.
+
+    python -m pytest tests/test_conversao.py
+    MMR_BENCHMARK=1 python -m pytest tests/test_conversao.py   # inclui a medição de tempo
+"""
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from comum.conversao import float_br, numero_mes_pt, para_data_br, para_float_br
+
+# Medição de tempo só sob demanda: depende da máquina e não checa comportamento
+benchmark = pytest.mark.skipif(os.environ.get("MMR_BENCHMARK") != "1", reason="defina MMR_BENCHMARK=1")
+
+
+# ----------------- Parsers antigos (referência) -----------------
+def _antigo_float_br(x):
+    t = str(x or "").strip()
+    if not t or t.upper() in ("NAN", "NONE"):
+        return None
+    t = t.replace(" ", "").replace("R$", "")
+    neg = t.startswith("(") and t.endswith(")")
+    t = t.strip("()")
+    has_c, has_p = "," in t, "." in t
+    if has_c and has_p:
+        t = t.replace(".", "").replace(",", ".") if t.rfind(",") > t.rfind(".") else t.replace(",", "")
+    elif has_c:
+        t = t.replace(",", ".")
+    try:
+        v = float(t)
+    except ValueError:
+        return None
+    return -v if neg else v
+
+
+def _antigo_data(val):
+    try:
+        s = str(val).strip()
+        if s.replace(".", "", 1).isdigit():
+            return pd.Timestamp("1899-12-30") + pd.to_timedelta(float(val), unit="D")
+        return pd.to_datetime(s, dayfirst=True, errors="coerce")
+    except Exception:
+        return pd.NaT
+
+
+_MAPA_MES = {"janeiro": 1, "fevereiro": 2, "março": 3, "marco": 3, "abril": 4, "maio": 5, "junho": 6,
+             "julho": 7, "agosto": 8, "setembro": 9, "outubro": 10, "novembro": 11, "dezembro": 12}
+
+
+def _antigo_mes(x):
+    return _MAPA_MES.get(str(x or "").strip().lower())
+
+
+# ----------------- Dados sintéticos -----------------
+def _valores(n, seed=42):
+    rng = np.random.default_rng(seed)
+    v = rng.uniform(-50_000, 500_000, n).round(2)
+    reais = pd.Series([f"{abs(x):,.2f}".replace(",", "X").replace(".", ",").replace("X", ".") for x in v])
+    reais = reais.where(v >= 0, "(" + reais + ")")
+    reais = reais.where(rng.random(n) > 0.5, "R$ " + reais)
+    valores = reais.astype(object)
+    crus = rng.random(n) < 0.3
+    valores[crus] = v[crus]  # UNFORMATTED_VALUE: parte chega como número
+    return valores
+
+
+def _datas(n, seed=42):
+    rng = np.random.default_rng(seed)
+    base = pd.Timestamp("2023-01-01") + pd.to_timedelta(rng.integers(0, 3 * 365, n), unit="D")
+    datas = pd.Series(base.strftime("%d/%m/%Y"), dtype=object)
+    seriais = rng.random(n) < 0.4
+    datas[seriais] = (base[seriais] - pd.Timestamp("1899-12-30")).days.astype(int)
+    return datas
+
+
+def _tempo(func, repeticoes=3):
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        func()
+        melhor = min(melhor, time.perf_counter() - t0)
+    return melhor
+
+
+# ----------------- Valor em real -----------------
+@pytest.mark.parametrize("texto, esperado", [
+    ("R$ 1.234,56", 1234.56),
+    ("R$ (1.234,56)", -1234.56),
+    ("R$ -10,00", -10.0),
+    ("R$-10,00", -10.0),
+    ("(1.234,56)", -1234.56),
+    ("-1.234,56", -1234.56),
+    ("1.234,56-", -1234.56),
+    ("1,234.56", 1234.56),
+    ("1.234.567", 1234567.0),
+    ("1234.56", 1234.56),
+    ("3,5%", 3.5),
+    (" r$ 7,00 ", 7.0),
+])
+def test_float_br_formatos(texto, esperado):
+    assert para_float_br([texto]).iloc[0] == pytest.approx(esperado)
+
+
+@pytest.mark.parametrize("texto", ["", "-", "abc", "R$", "()"])
+def test_float_br_sem_numero(texto):
+    assert pd.isna(para_float_br([texto]).iloc[0])
+    assert float_br(texto, padrao=0.0) == 0.0
+
+
+def test_float_br_numeros_crus_passam_direto():
+    out = para_float_br(pd.Series([1.5, -2, None, "1,5"], dtype=object))
+    assert out.iloc[0] == 1.5 and out.iloc[1] == -2.0 and pd.isna(out.iloc[2]) and out.iloc[3] == 1.5
+
+
+def test_float_br_igual_ao_apply():
+    valores = _valores(20_000)
+    ref = pd.to_numeric(valores.apply(_antigo_float_br), errors="coerce").astype(float)
+    np.testing.assert_allclose(para_float_br(valores).to_numpy(), ref.to_numpy(), equal_nan=True)
+
+
+@benchmark
+def test_float_br_mais_rapido_que_apply():
+    valores = _valores(200_000)
+    antigo = _tempo(lambda: valores.apply(_antigo_float_br))
+    novo = _tempo(lambda: para_float_br(valores))
+    assert novo < antigo, f"vetorizado {novo:.3f}s x apply {antigo:.3f}s"
+
+
+# ----------------- Data / mês -----------------
+def test_data_br_igual_ao_apply():
+    datas = _datas(2_000)
+    ref = pd.to_datetime(datas.apply(_antigo_data)).dt.normalize()
+    assert (para_data_br(datas) == ref).all()
+
+
+def test_mes_pt_igual_ao_mapa_antigo():
+    meses = pd.Series(list(_MAPA_MES) * 3)
+    ref = meses.map(_antigo_mes).astype("Int64")
+    assert (numero_mes_pt(meses) == ref).all()
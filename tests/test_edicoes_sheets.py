@@ -0,0 +1,75 @@
+"""
+comum.edicoes_sheets: o conflito é medido contra o que estava na tela, não
+contra a releitura feita no submit.
+
+    python -m pytest tests/test_edicoes_sheets.py
+"""
+import pandas as pd
+
+from comum.edicoes_sheets import instantaneo, mesmo_valor, planejar_gravacao
+
+HEADER = ["Data", "Duplicidade", "Descrição Agrupada", "Observação"]
+
+
+def _aba():
+    return [
+        HEADER,
+        ["01/10/2026", "A1", "Sangria", ""],
+        ["01/10/2026", "B2", "Depósito", "conferido"],
+        ["02/10/2026", "C3", "Sangria", ""],
+    ]
+
+
+def _tela(valores):
+    """Como a página monta: get_all_records -> DataFrame -> instantâneo no render."""
+    df = pd.DataFrame(valores[1:], columns=valores[0])
+    return instantaneo(df, ["Descrição Agrupada", "Observação"])
+
+
+def test_edicao_concorrente_entre_render_e_save_vira_conflito():
+    tela = _tela(_aba())                      # render: usuário vê A1 = "Sangria"
+    no_save = _aba()
+    no_save[1][2] = "Troco"                   # outra pessoa muda A1 antes do clique
+    # o submit relê a aba: a página já vê "Troco" como "antes", mas a tela mostrava "Sangria"
+    celulas, conflitos = planejar_gravacao(no_save, [("A1", "Descrição Agrupada", "Vale")], tela)
+    assert celulas == {}
+    assert conflitos == [{"Duplicidade": "A1", "Coluna": "Descrição Agrupada", "Na tela": "Sangria",
+                          "No Sheets": "Troco", "Editado": "Vale"}]
+
+
+def test_celula_sem_mudanca_no_meio_tempo_e_gravada():
+    tela = _tela(_aba())
+    no_save = _aba()
+    no_save[1][2] = "Troco"                   # mudou A1, mas a edição é em C3
+    celulas, conflitos = planejar_gravacao(
+        no_save, [("C3", "Descrição Agrupada", "Vale"), ("B2", "Observação", " ok ")], tela)
+    assert celulas == {(4, 3): "Vale", (3, 4): "ok"}
+    assert conflitos == []
+
+
+def test_ja_igual_ao_editado_nao_grava_nem_conflita():
+    tela = _tela(_aba())
+    no_save = _aba()
+    no_save[3][2] = "Vale"                    # outra pessoa fez a mesma edição
+    assert planejar_gravacao(no_save, [("C3", "Descrição Agrupada", "Vale")], tela) == ({}, [])
+
+
+def test_chave_repetida_grava_todas_as_linhas():
+    valores = _aba() + [["03/10/2026", "A1", "Sangria", ""]]
+    celulas, _ = planejar_gravacao(valores, [("A1", "Descrição Agrupada", "Vale")], _tela(valores))
+    assert celulas == {(2, 3): "Vale", (5, 3): "Vale"}
+
+
+def test_linha_que_a_tela_nao_mostrava_vira_conflito():
+    celulas, conflitos = planejar_gravacao(_aba(), [("C3", "Observação", "x")], {})
+    assert celulas == {} and len(conflitos) == 1
+
+
+def test_sem_coluna_duplicidade():
+    assert planejar_gravacao([["Data", "Observação"]], [("A1", "Observação", "x")], {}) is None
+
+
+def test_mesmo_valor_numeros_de_get_all_records():
+    assert mesmo_valor(7, "007")
+    assert mesmo_valor(float("nan"), "")
+    assert not mesmo_valor("Sangria", "Troco")